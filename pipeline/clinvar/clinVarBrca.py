@@ -4,66 +4,97 @@
 The ClinVar XML file contains ClinVarSet records and XML header/footer
 information.  The purpose of this script is to output the
 header/footer information plus those ClinVarSet records containing
-BRCA variants.  It reads through the file line by line.  When it's
-reading a ClinVarSet record, it concatenates the contents of the
-record into a buffer.  When it comes to the end of a ClinVarSet
-record, it checks whether the record contains a BRCA variant, and if
-so, it prints it.  If it's not reading a ClinVarSet record, then it
-echoes each line to stdout.
+BRCA variants.  It reads through the file in large chunks and finds
+the ClinVarSet records by searching for their start and end tags.
+Each record is checked for the (case insensitive) text "brca" in
+place, and only the records that mention BRCA are parsed, by a pool of
+worker processes: a record is printed, in file order, if it's a current
+record of a BRCA1 or BRCA2 variant.  The
+lines that are not part of a ClinVarSet record are echoed to stdout.
 """
 import argparse
 import clinvar
 import gzip
+import multiprocessing
 import xml.etree.ElementTree as ET
 import sys
 import logging
 
-# Below is a magic formula that keeps the code from choking on characters
-# beyond the standard ASCII set.
-reload(sys)
-sys.setdefaultencoding('utf8')
+
+def parseBrcaRecord(record):
+    """Parse a ClinVarSet record that mentions BRCA.  Returns its clinvar.clinVarSet if it's a
+    current BRCA1/BRCA2 variant, otherwise None"""
+    cvs = ET.fromstring(record)
+    if not clinvar.isCurrent(cvs):
+        return None
+    try:
+        submissionSet = clinvar.clinVarSet(cvs)
+    except AttributeError:
+        logging.debug("AttributeError running clinvar.clinVarSet(cvs), inputBuffer: %s, cvs: %s", record, cvs)
+        return None
+    variant = submissionSet.referenceAssertion.variant
+    if variant != None and (variant.geneSymbol == "BRCA1" or variant.geneSymbol == "BRCA2"):
+        return submissionSet
+    return None
+
+
+def isBrcaRecord(record):
+    return parseBrcaRecord(record) is not None
+
+
+def formatLines(text):
+    """The header/footer lines in text that aren't empty, without trailing whitespace"""
+    lines = text.split("\n")
+    output = []
+    for i, line in enumerate(lines):
+        if i < len(lines) - 1:
+            line += "\n"
+        if len(line) > 1:
+            output.append(line.rstrip() + "\n")
+    return "".join(output)
+
+
+def formatItem(item):
+    """Returns (output text, is a BRCA record) for an item of clinvar.readClinVarSets"""
+    text, isRecord = item
+    if not isRecord:
+        return formatLines(text), False
+    if isBrcaRecord(text):
+        return text + "\n", True
+    return "", False
+
+
+def extractBrcaRecords(inputFile, outputFile, chunkSize=clinvar.CHUNK_SIZE, workers=1):
+    """Write the header/footer lines and the BRCA ClinVarSet records of inputFile to outputFile.
+    Returns the number of BRCA records.  Only the records that mention "brca" are parsed, by
+    workers processes"""
+    count = 0
+    items = clinvar.readClinVarSets(inputFile, keyword="brca", chunkSize=chunkSize)
+    for text, isBrca in clinvar.mapRecords(formatItem, items, workers):
+        outputFile.write(text)
+        count += isBrca
+    return count
 
 
 def main():
+    # Below is a magic formula that keeps the code from choking on characters
+    # beyond the standard ASCII set.
+    reload(sys)
+    sys.setdefaultencoding('utf8')
+
     parser = argparse.ArgumentParser()
     parser.add_argument("clinVarXmlFilename")
     parser.add_argument('-a', "--artifacts_dir", help='Artifacts directory with pipeline artifact files.')
+    parser.add_argument('-w', "--workers", type=int, default=0,
+                        help='Number of processes parsing records (default: number of cpus)')
     args = parser.parse_args()
 
     logging_level = logging.DEBUG
     log_file_path = args.artifacts_dir + "clinvarbrcapy.log"
     logging.basicConfig(filename=log_file_path, filemode="w", level=logging_level)
 
-    inputBuffer = ""
-
     with gzip.open(args.clinVarXmlFilename) as inputFile:
-        inClinVarSet = False
-        for line in inputFile:
-            if "<ClinVarSet" in line:
-                inHeader = False
-                inputBuffer = line
-                inClinVarSet = True
-            elif "</ClinVarSet>" in line:
-                inputBuffer += line
-                inClinVarSet = False
-                cvs = ET.fromstring(inputBuffer)
-                # Ignore non-brca variants
-                if clinvar.isCurrent(cvs) and "brca" in inputBuffer.lower():
-                    try:
-                        submissionSet = clinvar.clinVarSet(cvs)
-                    except AttributeError:
-                        logging.debug("AttributeError running clinvar.clinVarSet(cvs), inputBuffer: %s, cvs: %s", inputBuffer, cvs)
-                        continue
-                    variant = submissionSet.referenceAssertion.variant
-                    if variant != None:
-                        if variant.geneSymbol == "BRCA1" or variant.geneSymbol == "BRCA2":
-                            print inputBuffer
-                inputBuffer = None
-            elif inClinVarSet:
-                inputBuffer += line
-            else:
-                if len(line) > 1:
-                    print line.rstrip()
+        extractBrcaRecords(inputFile, sys.stdout, workers=args.workers or multiprocessing.cpu_count())
 
 if __name__ == "__main__":
     # execute only if run as a script
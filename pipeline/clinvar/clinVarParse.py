@@ -5,19 +5,26 @@ clinVarParse: parse the ClinVar XML file and output the data of interest
 import argparse
 import clinvar
 import codecs
+import functools
+import multiprocessing
 import re
 import sys
 import xml.etree.ElementTree as ET
 
 
+COLUMNS = ("HGVS", "Submitter", "ClinicalSignificance",
+           "DateLastUpdated", "SCV", "ID", "Origin", "Method",
+           "Genomic_Coordinate", "Symbol", "Protein", "Description",
+           "SummaryEvidence", "ReviewStatus")
+
+
 def printHeader():
-    print("\t".join(("HGVS", "Submitter", "ClinicalSignificance",
-                     "DateLastUpdated", "SCV", "ID", "Origin", "Method",
-                     "Genomic_Coordinate", "Symbol", "Protein", "Description",
-                     "SummaryEvidence", "ReviewStatus")))
+    print("\t".join(COLUMNS))
 
 
-def processSubmission(submissionSet, assembly):
+def flattenSubmission(submissionSet, assembly):
+    """Returns the output rows (tuples of fields) of the germline submissions of a ClinVarSet"""
+    rows = []
     ra = submissionSet.referenceAssertion
     for oa in submissionSet.otherAssertions.values():
         submitter = oa.submitter
@@ -43,49 +50,52 @@ def processSubmission(submissionSet, assembly):
 
                 # Omit the variants that don't have any genomic start coordinate indicated.
                 if start != None and start != "None" and start != "NA":
-                    print("\t".join((str(hgvs),
-                                     oa.submitter.encode('utf-8'),
-                                     str(oa.clinicalSignificance),
-                                     str(oa.dateLastUpdated),
-                                     str(oa.accession),
-                                     str(oa.id),
-                                     str(oa.origin),
-                                     str(oa.method),
-                                     genomicCoordinate,
-                                     str(variant.geneSymbol),
-                                     str(proteinChange),
-                                     str(oa.description),
-                                     str(oa.summaryEvidence),
-                                     str(oa.reviewStatus),
-                                     )))
+                    rows.append((str(hgvs),
+                                 oa.submitter.encode('utf-8'),
+                                 str(oa.clinicalSignificance),
+                                 str(oa.dateLastUpdated),
+                                 str(oa.accession),
+                                 str(oa.id),
+                                 str(oa.origin),
+                                 str(oa.method),
+                                 genomicCoordinate,
+                                 str(variant.geneSymbol),
+                                 str(proteinChange),
+                                 str(oa.description),
+                                 str(oa.summaryEvidence),
+                                 str(oa.reviewStatus),
+                                 ))
+    return rows
+
+
+def parseRecord(item, assembly):
+    """Returns the output rows of an item of clinvar.readClinVarSets"""
+    record, isRecord = item
+    if not isRecord:
+        return []
+    cvs = ET.fromstring(record)
+    if not clinvar.isCurrent(cvs):
+        return []
+    return flattenSubmission(clinvar.clinVarSet(cvs), assembly)
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("clinVarXmlFilename")
     parser.add_argument('-a', "--assembly", default="GRCh38")
+    parser.add_argument('-w', "--workers", type=int, default=0,
+                        help='Number of processes parsing records (default: number of cpus)')
     args = parser.parse_args()
 
     printHeader()
 
-    inputBuffer = ""
+    # records are parsed by a pool of processes and their rows printed in file order
     with open(args.clinVarXmlFilename) as inputFile:
-        inClinVarSet = False
-        for line in inputFile:
-            if "<ClinVarSet" in line:
-                inHeader = False
-                inputBuffer = line
-                inClinVarSet = True
-            elif "</ClinVarSet>" in line:
-                inputBuffer += line
-                inClinVarSet = False
-                cvs = ET.fromstring(inputBuffer)
-                if clinvar.isCurrent(cvs):
-                    submissionSet = clinvar.clinVarSet(cvs)
-                    processSubmission(submissionSet, args.assembly)
-                inputBuffer = None
-            elif inClinVarSet:
-                inputBuffer += line
+        items = clinvar.readClinVarSets(inputFile)
+        for rows in clinvar.mapRecords(functools.partial(parseRecord, assembly=args.assembly), items,
+                                       args.workers or multiprocessing.cpu_count()):
+            for row in rows:
+                print("\t".join(row))
 
 if __name__ == "__main__":
     # execute only if run as a script
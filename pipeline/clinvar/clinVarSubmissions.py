@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""clinVarSubmissions: the BRCA submission rows of the ClinVar XML file, in one pass
+
+Does what clinVarBrca.py followed by clinVarParse.py do, without the
+intermediate XML file: the ClinVarSet records of the gzipped ClinVar
+release that are current BRCA1/BRCA2 variants are parsed once, by a
+pool of worker processes, and their germline submissions are printed
+as clinVarParse.py prints them.  With --columnar, the rows are also
+written to a columnar table file (see data_merging/columnar_table.py)
+with the submitter and other repetitive columns dictionary encoded, so
+readers can load just the columns they need (convert_tsv_to_vcf.py
+reads it instead of the printed rows).
+"""
+import argparse
+import clinvar
+import clinVarBrca
+import clinVarParse
+import functools
+import gzip
+import logging
+import multiprocessing
+import sys
+
+import columnar_table
+
+COLUMN_TYPES = {"Submitter": "dictionary",
+                "ClinicalSignificance": "dictionary",
+                "DateLastUpdated": "dictionary",
+                "ID": "auto",
+                "Origin": "dictionary",
+                "Method": "dictionary",
+                "Symbol": "dictionary",
+                "ReviewStatus": "dictionary"}
+
+
+def brcaSubmissionRows(item, assembly):
+    """Returns the submission rows of an item of clinvar.readClinVarSets"""
+    record, isRecord = item
+    if not isRecord:
+        return []
+    submissionSet = clinVarBrca.parseBrcaRecord(record)
+    if submissionSet is None:
+        return []
+    return clinVarParse.flattenSubmission(submissionSet, assembly)
+
+
+def writeSubmissions(inputFile, outputFile, assembly="GRCh38", columnarPath=None, workers=1,
+                     chunkSize=clinvar.CHUNK_SIZE):
+    """Write the header and the BRCA submission rows of inputFile (the ClinVar XML) to outputFile,
+    and to columnarPath if given.  Returns the number of rows"""
+    outputFile.write("\t".join(clinVarParse.COLUMNS) + "\n")
+    count = 0
+    rows = []
+    items = clinvar.readClinVarSets(inputFile, keyword="brca", chunkSize=chunkSize)
+    for recordRows in clinvar.mapRecords(functools.partial(brcaSubmissionRows, assembly=assembly), items, workers):
+        for row in recordRows:
+            outputFile.write("\t".join(row) + "\n")
+            count += 1
+            if columnarPath is not None:
+                rows.append(row)
+    if columnarPath is not None:
+        columnar_table.write_table(columnarPath, clinVarParse.COLUMNS, rows, COLUMN_TYPES,
+                                   metadata={"assembly": assembly})
+    return count
+
+
+def main():
+    # Below is a magic formula that keeps the code from choking on characters
+    # beyond the standard ASCII set.
+    reload(sys)
+    sys.setdefaultencoding('utf8')
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("clinVarXmlFilename", help="ClinVar release XML, gzipped")
+    parser.add_argument("--assembly", default="GRCh38")
+    parser.add_argument('-a', "--artifacts_dir", default="", help='Artifacts directory with pipeline artifact files.')
+    parser.add_argument('-c', "--columnar", help='Also write the rows to this columnar table file')
+    parser.add_argument('-w', "--workers", type=int, default=0,
+                        help='Number of processes parsing records (default: number of cpus)')
+    args = parser.parse_args()
+
+    logging.basicConfig(filename=args.artifacts_dir + "clinvarbrcapy.log", filemode="w", level=logging.DEBUG)
+
+    with gzip.open(args.clinVarXmlFilename) as inputFile:
+        writeSubmissions(inputFile, sys.stdout, args.assembly, args.columnar,
+                         args.workers or multiprocessing.cpu_count())
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main()
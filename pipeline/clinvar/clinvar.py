@@ -2,15 +2,21 @@
 ClinVarUtils: basic
 """
 
+import collections
+import itertools
+import multiprocessing
 import xml.etree.ElementTree as ET
 
+START_TAG = "<ClinVarSet"
+END_TAG = "</ClinVarSet>"
+CHUNK_SIZE = 1 << 22
+
 def isCurrent(element):
     """Determine if the indicated clinvar set is current"""
-    rr = element.find("RecordStatus")
-    if rr == None:
-        return False
-    else:
-        return(rr.text == "current")
+    for child in element:
+        if child.tag == "RecordStatus":
+            return child.text == "current"
+    return False
 
 def textIfPresent(element, field):
     """Return the text associated with a field under the element, or
@@ -21,9 +27,38 @@ def textIfPresent(element, field):
     else:
         return(ff.text.encode('utf-8'))
 
-class genomicCoordinates:
+def childTexts(element):
+    """Return the text of the first child of the element with each tag,
+    like textIfPresent, in one pass over the children"""
+    texts = dict()
+    for child in element:
+        if child.tag not in texts:
+            texts[child.tag] = None if child.text == None else child.text.encode('utf-8')
+    return texts
+
+def visitChildren(record, element, handlers):
+    """Visit the children of the element once.  handlers maps tags to
+    (function, every): function(record, child) is called for every child
+    with the tag if every is true, otherwise for the first one only (like
+    element.find).  Returns the set of tags handled with every false"""
+    seen = set()
+    for child in element:
+        tag = child.tag
+        if tag in handlers:
+            function, every = handlers[tag]
+            if not every:
+                if tag in seen:
+                    continue
+                seen.add(tag)
+            function(record, child)
+    return seen
+
+class genomicCoordinates(object):
     """Contains the genomic information on the variant"""
 
+    __slots__ = ("element", "chrom", "start", "stop", "length",
+                 "referenceAllele", "alternateAllele")
+
     def __init__(self, element, useNone=False, debug=False):
         if debug:
             print("Parsing genomic coordinates")
@@ -37,25 +72,28 @@ class genomicCoordinates:
             self.alternateAllele = None
         else:
             self.element = element
-            self.chrom = element.get("Chr")
-            self.stop = element.get("stop")
-            self.length = element.get("variantLength")
-            self.start = element.get("start")
-            self.referenceAllele = element.get("referenceAllele")
-            self.alternateAllele = element.get("alternateAllele")
+            attrib = element.attrib
+            self.chrom = attrib.get("Chr")
+            self.stop = attrib.get("stop")
+            self.length = attrib.get("variantLength")
+            self.start = attrib.get("start")
+            self.referenceAllele = attrib.get("referenceAllele")
+            self.alternateAllele = attrib.get("alternateAllele")
 
             """If standard ref/alt values are not provided, use the VCF values and the
             associated VCF position."""
             if self.referenceAllele == None and self.alternateAllele == None:
-                self.start = element.get("positionVCF")
-                self.referenceAllele = element.get("referenceAlleleVCF")
-                self.alternateAllele = element.get("alternateAlleleVCF")
+                self.start = attrib.get("positionVCF")
+                self.referenceAllele = attrib.get("referenceAlleleVCF")
+                self.alternateAllele = attrib.get("alternateAlleleVCF")
 
 
-class variant:
+class variant(object):
     """The Measure set.  We are interested in the variants specifically, 
     but measure sets can be other things as well, such as haplotypes"""
-    
+
+    __slots__ = ("element", "id", "name", "attribute", "coordinates", "geneSymbol")
+
     def __init__(self, element, name, id, debug=False):
         self.element = element
         self.id = id
@@ -64,25 +102,36 @@ class variant:
         self.name = name
         
         self.attribute = dict()
-        for attrs in element.findall("AttributeSet"):
-            for attrib in attrs.findall("Attribute"):
-                self.attribute[attrib.get("Type")] = attrib.text
         self.coordinates = dict()
-        for item in element.findall("SequenceLocation"):
-            assembly = item.get("Assembly")
-            genomic = genomicCoordinates(item, debug=debug)
-            self.coordinates[assembly] = genomic
         self.geneSymbol = None
-        measureRelationship = element.find("MeasureRelationship")
-        if measureRelationship != None:
-            symbol = measureRelationship.find("Symbol")
-            if symbol != None:
-                self.geneSymbol = textIfPresent(symbol, "ElementValue")
+        visitChildren(self, element, self.handlers)
+
+    def _attributeSet(self, element):
+        for attrib in element:
+            if attrib.tag == "Attribute":
+                self.attribute[attrib.get("Type")] = attrib.text
+
+    def _sequenceLocation(self, element):
+        self.coordinates[element.get("Assembly")] = genomicCoordinates(element)
+
+    def _measureRelationship(self, element):
+        for symbol in element:
+            if symbol.tag == "Symbol":
+                self.geneSymbol = childTexts(symbol).get("ElementValue")
+                break
+
+    handlers = {"AttributeSet": (_attributeSet, True),
+                "SequenceLocation": (_sequenceLocation, True),
+                "MeasureRelationship": (_measureRelationship, False)}
             
 
-class referenceAssertion:
+class referenceAssertion(object):
     """For gathering the reference assertion"""
-    
+
+    __slots__ = ("element", "id", "reviewStatus", "clinicalSignificance",
+                 "origin", "ethnicity", "geographicOrigin", "age", "gender",
+                 "familyData", "method", "variant")
+
     def __init__(self, element, debug=False):
         self.element = element
         self.id = element.get("ID")
@@ -90,12 +139,12 @@ class referenceAssertion:
             print("Parsing ReferenceClinVarAssertion", self.id)
         self.reviewStatus = None
         self.clinicalSignificance = None
-        cs = element.find("ClinicalSignificance")
-        if cs != None:
-            self.reviewStatus = textIfPresent(cs, "ReviewStatus")
-            self.clinicalSignificance = textIfPresent(cs, "Description")
-        obs = element.find("ObservedIn")
-        if obs == None:
+        self.variant = None
+        seen = visitChildren(self, element, self.handlers)
+        if debug and "MeasureSet" in seen:
+            if len(element.find("MeasureSet").findall("Measure")) > 1:
+                print(self.id, "has multiple measures")
+        if "ObservedIn" not in seen:
             self.origin = None
             self.ethnicity = None
             self.geographicOrigin = None
@@ -103,101 +152,240 @@ class referenceAssertion:
             self.gender = None
             self.familyData = None
             self.method = None
-        else:
-            sample = obs.find("Sample")
-            if sample != None:
-                self.origin = textIfPresent(sample, "Origin")
-                self.ethnicity = textIfPresent(sample, "Ethnicity")
-                self.geographicOrigin = textIfPresent(sample, "GeographicOrigin")
-                self.age = textIfPresent(sample, "Age")
-                self.gender = textIfPresent(sample, "Gender")
-                self.familyData = textIfPresent(sample, "FamilyData")
-            method = obs.find("Method")
-            if method != None:
-                self.method = textIfPresent(method, "MethodType")
-        self.variant = None
-        measureSet = element.find("MeasureSet")
-        #if measureSet.get("Type") == "Variant":
-        if debug:
-            if len(measureSet.findall("Measure")) > 1:
-                print(self.id, "has multiple measures")
-        if len(measureSet.findall("Measure")) == 1:
-            name = measureSet.find("Name")
-            if name == None:
-                variantName = none
-            else:
-                variantName = name.find("ElementValue").text
-            self.variant = variant(measureSet.find("Measure"), variantName, 
-                                   measureSet.get("ID"), 
-                                   debug=debug)
+        if "MeasureSet" not in seen:
+            raise AttributeError("ReferenceClinVarAssertion %s has no MeasureSet" % (self.id))
+
+    def _clinicalSignificance(self, element):
+        texts = childTexts(element)
+        self.reviewStatus = texts.get("ReviewStatus")
+        self.clinicalSignificance = texts.get("Description")
+
+    def _observedIn(self, element):
+        for child in element:
+            if child.tag == "Sample":
+                texts = childTexts(child)
+                self.origin = texts.get("Origin")
+                self.ethnicity = texts.get("Ethnicity")
+                self.geographicOrigin = texts.get("GeographicOrigin")
+                self.age = texts.get("Age")
+                self.gender = texts.get("Gender")
+                self.familyData = texts.get("FamilyData")
+                break
+        for child in element:
+            if child.tag == "Method":
+                self.method = childTexts(child).get("MethodType")
+                break
+
+    def _measureSet(self, element):
+        measures = [child for child in element if child.tag == "Measure"]
+        if len(measures) == 1:
+            variantName = None
+            for name in element:
+                if name.tag == "Name":
+                    variantName = name.find("ElementValue").text
+                    break
+            self.variant = variant(measures[0], variantName, element.get("ID"))
+
+    handlers = {"ClinicalSignificance": (_clinicalSignificance, False),
+                "ObservedIn": (_observedIn, False),
+                "MeasureSet": (_measureSet, False)}
                 
 
-class clinVarAssertion:
+class clinVarAssertion(object):
     """Class for representing one submission (i.e. one annotation of a 
     submitted variant"""
-    
+
+    __slots__ = ("element", "id", "submitter", "dateSubmitted", "accession",
+                 "origin", "method", "description", "clinicalSignificance",
+                 "reviewStatus", "dateLastUpdated", "summaryEvidence")
+
     def __init__(self, element, debug=False):
         self.element = element
         self.id = element.get("ID")
         if debug:
             print("Parsing ClinVarAssertion", self.id)
-        cvsd = element.find("ClinVarSubmissionID")
-        if cvsd == None:
-            self.submitter = None
-            self.dateSubmitted = None
-        else:
-            self.submitter = cvsd.get("submitter", default=None)
-            self.dateSubmitted = cvsd.get("submitterDate")
-        cva = element.find("ClinVarAccession")
-        if cva == None:
-            self.accession = None
-        else:
-            self.accession = cva.get("Acc", default=None)
+        self.submitter = None
+        self.dateSubmitted = None
+        self.accession = None
         self.origin = None
         self.method = None
         self.description = None
-        oi = element.find("ObservedIn")
-        if oi != None:
-            sample = oi.find("Sample")
-            if sample != None:
-                self.origin = textIfPresent(sample, "Origin")
-            method = oi.find("Method")
-            if method != None:
-                self.method = textIfPresent(method, "MethodType")
-            description = oi.find("ObservedData")
-            if description != None:
-                for attr in description.findall("Attribute"):
-                    if attr.attrib["Type"] == 'Description':
-                        self.description = textIfPresent(description, "Attribute")
         self.clinicalSignificance = None
         self.reviewStatus = None
         self.dateLastUpdated = None
-        cs = element.find("ClinicalSignificance")
-        if cs != None:
-            self.dateLastUpdated = cva.get("DateUpdated")
-            self.clinicalSignificance = textIfPresent(cs, "Description")
-            self.reviewStatus = textIfPresent(cs, "ReviewStatus")
-            self.summaryEvidence = textIfPresent(cs, "Comment")
+        seen = visitChildren(self, element, self.handlers)
+        if "ClinicalSignificance" not in seen:
+            self.dateLastUpdated = None
+        elif "ClinVarAccession" not in seen:
+            raise AttributeError("ClinVarAssertion %s has a ClinicalSignificance but no ClinVarAccession" % (self.id))
+
+    def _clinVarSubmissionID(self, element):
+        self.submitter = element.get("submitter")
+        self.dateSubmitted = element.get("submitterDate")
+
+    def _clinVarAccession(self, element):
+        self.accession = element.get("Acc")
+        # the date of the submission's ClinicalSignificance, if it has one
+        self.dateLastUpdated = element.get("DateUpdated")
+
+    def _observedIn(self, element):
+        for child in element:
+            if child.tag == "Sample":
+                self.origin = childTexts(child).get("Origin")
+                break
+        for child in element:
+            if child.tag == "Method":
+                self.method = childTexts(child).get("MethodType")
+                break
+        for child in element:
+            if child.tag == "ObservedData":
+                attributes = [attr for attr in child if attr.tag == "Attribute"]
+                if "Description" in [attr.attrib["Type"] for attr in attributes]:
+                    # the text of the first Attribute
+                    self.description = childTexts(child).get("Attribute")
+                break
+
+    def _clinicalSignificance(self, element):
+        texts = childTexts(element)
+        self.clinicalSignificance = texts.get("Description")
+        self.reviewStatus = texts.get("ReviewStatus")
+        self.summaryEvidence = texts.get("Comment")
+
+    handlers = {"ClinVarSubmissionID": (_clinVarSubmissionID, False),
+                "ClinVarAccession": (_clinVarAccession, False),
+                "ObservedIn": (_observedIn, False),
+                "ClinicalSignificance": (_clinicalSignificance, False)}
                  
 
-class clinVarSet:
+class clinVarSet(object):
     """Container class for a ClinVarSet record, which is a set of submissions
     that were submitted to ClinVar together.  In the ClinVar terminology, 
     each ClinVarSet is one aggregate record ("RCV Accession"), which contains
     one or more submissions ("SCV Accessions").
+
+    Each element of the record is visited once: the children of an element
+    are dispatched on their tag through the handlers table of its class.
     """
 
+    __slots__ = ("element", "id", "referenceAssertion", "otherAssertions")
+
     def __init__(self, element, debug=False):
         self.element = element
         self.id = element.get("ID")
         if debug:
             print("Parsing ClinVarSet ID", self.id)
-        rcva = element.find("ReferenceClinVarAssertion")
-        if isCurrent(rcva):
-            self.referenceAssertion = referenceAssertion(rcva, debug=debug)
         self.otherAssertions = dict()
-        for item in element.findall("ClinVarAssertion"):
-            if isCurrent(item):
-                cva = clinVarAssertion(item)
-                accession = cva.accession
-                self.otherAssertions[accession] = cva
+        seen = visitChildren(self, element, self.handlers)
+        if "ReferenceClinVarAssertion" not in seen:
+            raise AttributeError("ClinVarSet %s has no ReferenceClinVarAssertion" % (self.id))
+
+    def _referenceClinVarAssertion(self, element):
+        if isCurrent(element):
+            self.referenceAssertion = referenceAssertion(element)
+
+    def _clinVarAssertion(self, element):
+        if isCurrent(element):
+            cva = clinVarAssertion(element)
+            self.otherAssertions[cva.accession] = cva
+
+    handlers = {"ReferenceClinVarAssertion": (_referenceClinVarAssertion, False),
+                "ClinVarAssertion": (_clinVarAssertion, True)}
+
+
+def readClinVarSets(inputFile, keyword=None, chunkSize=CHUNK_SIZE):
+    """Yield (text, isRecord) for the ClinVarSet records of inputFile and the text between them,
+    in file order.  If keyword is given, the records that don't contain it (in any case) are skipped.
+
+    The file is read in chunks, and records are found and checked for the keyword by searching
+    the chunks (and a lower case copy) in place.  A record is the lines from the one with
+    "<ClinVarSet" to the one with "</ClinVarSet>", and a "<ClinVarSet" line within a record
+    starts it over, like reading the file line by line.  Only the current record and one chunk
+    are kept in memory."""
+    data = ""
+    # lower case copy of data, for finding the keyword in any case
+    lowered = ""
+    position = 0
+    recordStart = None
+    eof = False
+    while True:
+        if recordStart is None:
+            start = data.find(START_TAG, position)
+            startLineEnd = data.find("\n", start) + 1 if start != -1 else 0
+            if startLineEnd > 0 or (start != -1 and eof):
+                lineStart = data.rfind("\n", 0, start) + 1
+                if lineStart > position:
+                    yield data[position:lineStart], False
+                recordStart = lineStart
+                position = startLineEnd if startLineEnd > 0 else len(data)
+                continue
+            if eof:
+                if len(data) > position:
+                    yield data[position:], False
+                return
+            # the complete lines don't start a record
+            lineEnd = data.rfind("\n", position) + 1
+            if lineEnd > position:
+                yield data[position:lineEnd], False
+                position = lineEnd
+        else:
+            end = data.find(END_TAG, position)
+            endLineEnd = data.find("\n", end) + 1 if end != -1 else 0
+            if end != -1 and endLineEnd == 0 and eof:
+                endLineEnd = len(data)
+            if endLineEnd > 0:
+                restart = data.rfind(START_TAG, position, endLineEnd)
+                if restart != -1:
+                    recordStart = data.rfind("\n", 0, restart) + 1
+                    position = data.find("\n", restart) + 1 or len(data)
+                    continue
+                if keyword is None or lowered.find(keyword, recordStart, endLineEnd) != -1:
+                    yield data[recordStart:endLineEnd], True
+                recordStart = None
+                position = endLineEnd
+                continue
+            if eof:
+                # an unterminated record is dropped
+                return
+
+        # read the next chunk, keeping the unprocessed part of the buffer
+        keep = recordStart if recordStart is not None else position
+        chunk = inputFile.read(chunkSize)
+        eof = not chunk
+        data = data[keep:] + chunk
+        if keyword is not None:
+            lowered = lowered[keep:] + chunk.lower()
+        position -= keep
+        if recordStart is not None:
+            recordStart = 0
+
+
+def _mapBatch(function, batch):
+    return [function(item) for item in batch]
+
+
+def mapRecords(function, items, workers=1, batchSize=100):
+    """Yield function(item) for every item, in order.  With more than one worker, batches of
+    items are handed to a pool of worker processes; function must be a module level function.
+    At most two batches per worker are in flight, so items are read only as fast as they're
+    processed."""
+    if workers <= 1:
+        for item in items:
+            yield function(item)
+        return
+    pool = multiprocessing.Pool(workers)
+    try:
+        pending = collections.deque()
+        items = iter(items)
+        batches = iter(lambda: list(itertools.islice(items, batchSize)), [])
+        for batch in batches:
+            pending.append(pool.apply_async(_mapBatch, (function, batch)))
+            if len(pending) >= 2 * workers:
+                for result in pending.popleft().get():
+                    yield result
+        while pending:
+            for result in pending.popleft().get():
+                yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,89 @@
+import pytest
+import unittest
+import random
+from StringIO import StringIO
+import clinvar
+import clinVarBrca
+
+HEADER = ['<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n',
+          '<ReleaseSet Dated="2017-08-01" Type="full" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">\n',
+          '\n']
+FOOTER = ['</ReleaseSet>\n']
+
+
+def clinVarSet(id, symbol, status="current", comment="", measures=1, accession=True):
+    """A synthetic ClinVarSet record, as lines"""
+    measure = ['      <Measure Type="single nucleotide variant" ID="%d">\n' % (id),
+               '        <SequenceLocation Assembly="GRCh38" Chr="17" start="%d" stop="%d" referenceAllele="A" alternateAllele="G"/>\n' % (id, id),
+               '        <MeasureRelationship Type="variant in gene">\n',
+               '          <Symbol><ElementValue Type="Preferred">%s</ElementValue></Symbol>\n' % (symbol),
+               '        </MeasureRelationship>\n',
+               '      </Measure>\n']
+    return (['<ClinVarSet ID="%d">\n' % (id),
+             '  <RecordStatus>%s</RecordStatus>\n' % (status),
+             '  <ReferenceClinVarAssertion ID="%d">\n' % (id),
+             '    <RecordStatus>current</RecordStatus>\n',
+             '    <ClinicalSignificance><ReviewStatus>no assertion</ReviewStatus><Description>Benign</Description></ClinicalSignificance>\n',
+             '    <MeasureSet Type="Variant" ID="%d">\n' % (id),
+             '      <Name><ElementValue Type="Preferred">NM_0000%d.1(%s):c.%dA&gt;G</ElementValue></Name>\n' % (id, symbol, id)] +
+            measure * measures +
+            ['    </MeasureSet>\n',
+             '  </ReferenceClinVarAssertion>\n',
+             '  <ClinVarAssertion ID="%d">\n' % (id + 1),
+             '    <RecordStatus>current</RecordStatus>\n',
+             '    <ClinVarAccession Acc="SCV%d" DateUpdated="2017-01-01"/>\n' % (id) if accession else
+             '    <ClinicalSignificance><Description>Benign</Description></ClinicalSignificance>\n',
+             '    <Comment>%s</Comment>\n' % (comment),
+             '  </ClinVarAssertion>\n',
+             '</ClinVarSet>\n'])
+
+
+class testClinVarBrca(unittest.TestCase):
+
+    def extract(self, lines, chunkSize=clinvar.CHUNK_SIZE, workers=1):
+        output = StringIO()
+        count = clinVarBrca.extractBrcaRecords(StringIO("".join(lines)), output, chunkSize, workers)
+        return count, output.getvalue()
+
+    def test_extractsCurrentBrcaRecords(self):
+        brca1 = clinVarSet(1, "BRCA1")
+        brca2 = clinVarSet(3, "BRCA2", comment="reported in a family")
+        records = [brca1, clinVarSet(5, "TP53"),
+                   # mentions BRCA but isn't a BRCA variant
+                   clinVarSet(7, "PALB2", comment="partner and localizer of Brca2"),
+                   clinVarSet(9, "BRCA1", status="replaced"),
+                   # two measures: no variant
+                   clinVarSet(11, "BRCA2", measures=2),
+                   # a submission without accession: AttributeError in clinvar.clinVarSet
+                   clinVarSet(13, "BRCA2", accession=False),
+                   brca2]
+        lines = HEADER + sum(records, []) + FOOTER
+        self.assertEquals(self.extract(lines),
+                          (2, "".join(line for line in HEADER if len(line) > 1) +
+                           "".join(brca1) + "\n" + "".join(brca2) + "\n" + "".join(FOOTER)))
+
+    def test_prefilterDoesNotChangeOutput(self):
+        # only records whose text contains "brca" in any case are parsed, which can't change the output
+        random.seed(41)
+        records = [clinVarSet(i, random.choice(["BRCA1", "BRCA2", "BRCA3", "ATM", "CHEK2"]),
+                              status=random.choice(["current", "current", "replaced"]),
+                              comment=random.choice(["", "BRCA", "brca", "bRcA-related"]))
+                   for i in xrange(0, 400, 2)]
+        lines = HEADER + sum(records, []) + FOOTER
+        expected = [record for record in records
+                    if record[1] == '  <RecordStatus>current</RecordStatus>\n'
+                    and ('BRCA1<' in record[10] or 'BRCA2<' in record[10])]
+        # records and lines cross the boundaries of small chunks
+        for chunkSize, workers in [(clinvar.CHUNK_SIZE, 1), (1000, 1), (7, 1), (1000, 3)]:
+            count, output = self.extract(lines, chunkSize, workers)
+            self.assertEquals(count, len(expected))
+            self.assertEquals(output, "".join(HEADER[:2]) + "".join("".join(record) + "\n" for record in expected) +
+                              "".join(FOOTER))
+
+    def test_recordBoundariesFollowLines(self):
+        brca1 = clinVarSet(1, "BRCA1")
+        # a start tag within a record starts it over, lines outside records are echoed without trailing spaces
+        lines = HEADER + ["  <!-- a comment -->  \n"] + clinVarSet(3, "BRCA2")[:6] + brca1 + ["</ReleaseSet>"]
+        for chunkSize in [clinvar.CHUNK_SIZE, 5]:
+            self.assertEquals(self.extract(lines, chunkSize),
+                              (1, "".join(HEADER[:2]) + "  <!-- a comment -->\n" + "".join(brca1) + "\n</ReleaseSet>\n"))
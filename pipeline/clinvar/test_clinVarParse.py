@@ -0,0 +1,56 @@
+import pytest
+import unittest
+from StringIO import StringIO
+import functools
+import clinvar
+import clinVarParse
+
+
+def clinVarSet(id, origin="germline", start=None, symbol="BRCA1", submitter=None):
+    """A synthetic ClinVarSet record with one submission"""
+    return ('<ClinVarSet ID="%d">\n' % (id) +
+            '  <RecordStatus>current</RecordStatus>\n'
+            '  <ReferenceClinVarAssertion ID="%d">\n' % (id) +
+            '    <RecordStatus>current</RecordStatus>\n'
+            '    <MeasureSet Type="Variant" ID="%d">\n' % (id) +
+            '      <Name><ElementValue Type="Preferred">NM_007294.3(%s):c.%dA&gt;G (p.Lys%dGlu)</ElementValue></Name>\n' % (symbol, id, id) +
+            '      <Measure Type="single nucleotide variant" ID="%d">\n' % (id) +
+            '        <AttributeSet><Attribute Type="HGVS, protein, RefSeq">NP_009225.1:p.Lys%dGlu</Attribute></AttributeSet>\n' % (id) +
+            '        <SequenceLocation Assembly="GRCh38" Chr="17" start="%s" stop="%s" referenceAllele="A" alternateAllele="G"/>\n' % (start or 43000000 + id, start or 43000000 + id) +
+            '        <MeasureRelationship><Symbol><ElementValue>%s</ElementValue></Symbol></MeasureRelationship>\n' % (symbol) +
+            '      </Measure>\n'
+            '    </MeasureSet>\n'
+            '  </ReferenceClinVarAssertion>\n'
+            '  <ClinVarAssertion ID="%d">\n' % (id + 1) +
+            '    <RecordStatus>current</RecordStatus>\n'
+            '    <ClinVarSubmissionID submitter="%s" submitterDate="2016-01-01"/>\n' % (submitter or "Lab %d" % (id)) +
+            '    <ClinVarAccession Acc="SCV%d" DateUpdated="2017-01-01"/>\n' % (id) +
+            '    <ObservedIn><Sample><Origin>%s</Origin></Sample><Method><MethodType>clinical testing</MethodType></Method></ObservedIn>\n' % (origin) +
+            '    <ClinicalSignificance><ReviewStatus>criteria provided</ReviewStatus><Description>Benign</Description></ClinicalSignificance>\n'
+            '  </ClinVarAssertion>\n'
+            '</ClinVarSet>\n')
+
+
+def expectedRow(id):
+    return ("NM_007294.3:c.%dA>G" % (id), "Lab %d" % (id), "Benign", "2017-01-01", "SCV%d" % (id), str(id + 1),
+            "germline", "clinical testing", "chr17:%d:A>G" % (43000000 + id), "BRCA1",
+            "NP_009225.1:p.Lys%dGlu" % (id), "None", "None", "criteria provided")
+
+
+class testClinVarParse(unittest.TestCase):
+
+    def parse(self, text, workers):
+        items = clinvar.readClinVarSets(StringIO(text), chunkSize=1000)
+        parseRecord = functools.partial(clinVarParse.parseRecord, assembly="GRCh38")
+        return [row for rows in clinvar.mapRecords(parseRecord, items, workers, batchSize=7) for row in rows]
+
+    def test_parseRecords(self):
+        text = "<ReleaseSet>\n" + clinVarSet(1) + clinVarSet(3, origin="somatic") + clinVarSet(5, start="NA") + \
+            clinVarSet(7) + "</ReleaseSet>\n"
+        self.assertEquals(self.parse(text, 1), [expectedRow(1), expectedRow(7)])
+
+    def test_workersKeepFileOrder(self):
+        text = "<ReleaseSet>\n" + "".join(clinVarSet(id) for id in xrange(1, 400, 2)) + "</ReleaseSet>\n"
+        rows = [expectedRow(id) for id in xrange(1, 400, 2)]
+        self.assertEquals(self.parse(text, 1), rows)
+        self.assertEquals(self.parse(text, 3), rows)
@@ -0,0 +1,52 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import os
+from StringIO import StringIO
+import clinvar
+import clinVarBrca
+import clinVarParse
+import clinVarSubmissions
+import columnar_table
+from test_clinVarParse import clinVarSet
+
+
+class testClinVarSubmissions(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        records = []
+        for id in xrange(1, 300, 2):
+            records.append(clinVarSet(id, symbol=["BRCA1", "BRCA2", "TP53"][id % 3], origin=["germline", "somatic"][id % 5 == 0],
+                                      submitter=["Lab A", "Lab B", "Lab C"][id % 7 % 3]))
+        self.xml = '<?xml version="1.0"?>\n<ReleaseSet>\n' + "".join(records) + "</ReleaseSet>\n"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def twoPasses(self):
+        # clinVarBrca.py, then clinVarParse.py on its output
+        brcaXml = StringIO()
+        clinVarBrca.extractBrcaRecords(StringIO(self.xml), brcaXml)
+        items = clinvar.readClinVarSets(StringIO(brcaXml.getvalue()))
+        rows = [row for item in items for row in clinVarParse.parseRecord(item, "GRCh38")]
+        return "".join("\t".join(row) + "\n" for row in [clinVarParse.COLUMNS] + rows)
+
+    def test_matchesTwoPasses(self):
+        columnarPath = os.path.join(self.tmp_dir, "ClinVarBrca.columns")
+        for workers in [1, 2]:
+            output = StringIO()
+            count = clinVarSubmissions.writeSubmissions(StringIO(self.xml), output, "GRCh38", columnarPath, workers,
+                                                        chunkSize=500)
+            self.assertEquals(output.getvalue(), self.twoPasses())
+            self.assertEquals(count, len(output.getvalue().splitlines()) - 1)
+
+        table = columnar_table.ColumnarTable(columnarPath)
+        self.assertEquals(table.column_names, list(clinVarParse.COLUMNS))
+        self.assertEquals(table.metadata, {"assembly": "GRCh38"})
+        self.assertEquals(table.column_type("ID"), "int64")
+        submitters, codes = table.dictionary("Submitter")
+        self.assertEquals(sorted(submitters), ["Lab A", "Lab B", "Lab C"])
+        self.assertEquals(["\t".join(str(value) for value in row) for row in table.rows()],
+                          output.getvalue().splitlines()[1:])
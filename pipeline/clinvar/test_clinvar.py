@@ -0,0 +1,121 @@
+import pytest
+import unittest
+import xml.etree.ElementTree as ET
+import clinvar
+
+
+def clinVarSet(id, genes=("BRCA1",), submissions=2):
+    """A synthetic ClinVarSet record with the elements of a ClinVar release that the model classes read"""
+    assertions = "".join(
+        '  <ClinVarAssertion ID="%d">\n' % (id + i) +
+        '    <ClinVarSubmissionID submitter="Lab %d" submitterDate="2016-0%d-01"/>\n' % (i, i + 1) +
+        '    <RecordStatus>%s</RecordStatus>\n' % ("replaced" if i == 3 else "current") +
+        '    <ClinVarAccession Acc="SCV%d" Type="SCV" Version="1" DateUpdated="2017-0%d-01"/>\n' % (id + i, i + 1) +
+        '    <ClinicalSignificance>\n'
+        '      <ReviewStatus>criteria provided, single submitter</ReviewStatus>\n'
+        '      <Description>%s</Description>\n' % (["Benign", "Pathogenic", "Uncertain significance"][i % 3]) +
+        '      <Comment>Submission %d of variant %d</Comment>\n' % (i, id) +
+        '    </ClinicalSignificance>\n'
+        '    <ObservedIn>\n'
+        '      <Sample><Origin>%s</Origin><Species>human</Species><AffectedStatus>yes</AffectedStatus></Sample>\n' %
+        (["germline", "somatic"][i % 2]) +
+        '      <Method><MethodType>clinical testing</MethodType></Method>\n'
+        '      <ObservedData><Attribute Type="Description">Seen in family %d</Attribute></ObservedData>\n' % (i) +
+        '    </ObservedIn>\n'
+        '  </ClinVarAssertion>\n' for i in xrange(1, submissions + 1))
+    relationships = "".join(
+        '        <MeasureRelationship Type="variant in gene">\n'
+        '          <Name><ElementValue Type="Preferred">%s gene</ElementValue></Name>\n' % (gene) +
+        '          <Symbol><ElementValue Type="Preferred">%s</ElementValue></Symbol>\n' % (gene) +
+        '        </MeasureRelationship>\n' for gene in genes)
+    return ('<ClinVarSet ID="%d">\n' % (id) +
+            '  <RecordStatus>current</RecordStatus>\n'
+            '  <Title>NM_007294.3(%s):c.%dA&gt;G AND not provided</Title>\n' % (genes[0], id) +
+            '  <ReferenceClinVarAssertion ID="%d" DateCreated="2016-01-01">\n' % (id) +
+            '    <ClinVarAccession Acc="RCV%d" Version="2" Type="RCV" DateUpdated="2017-01-01"/>\n' % (id) +
+            '    <RecordStatus>current</RecordStatus>\n'
+            '    <ClinicalSignificance><ReviewStatus>criteria provided, multiple submitters</ReviewStatus>'
+            '<Description>Conflicting interpretations</Description></ClinicalSignificance>\n'
+            '    <ObservedIn>\n'
+            '      <Sample><Origin>germline</Origin><Ethnicity>mixed</Ethnicity><Gender>female</Gender></Sample>\n'
+            '      <Method><MethodType>literature only</MethodType></Method>\n'
+            '    </ObservedIn>\n'
+            '    <MeasureSet Type="Variant" ID="%d">\n' % (id + 1000000) +
+            '      <Name><ElementValue Type="Preferred">NM_007294.3(%s):c.%dA&gt;G (p.Lys%dGlu)</ElementValue></Name>\n' % (genes[0], id, id) +
+            '      <Measure Type="single nucleotide variant" ID="%d">\n' % (id + 2000000) +
+            '        <AttributeSet><Attribute Type="HGVS, coding, RefSeq">NM_007294.3:c.%dA&gt;G</Attribute></AttributeSet>\n' % (id) +
+            '        <AttributeSet><Attribute Type="HGVS, protein, RefSeq">NP_009225.1:p.Lys%dGlu</Attribute></AttributeSet>\n' % (id) +
+            '        <CytogeneticLocation>17q21.31</CytogeneticLocation>\n'
+            '        <SequenceLocation Assembly="GRCh38" Chr="17" start="%d" stop="%d" variantLength="1" '
+            'referenceAllele="A" alternateAllele="G"/>\n' % (43000000 + id, 43000000 + id) +
+            '        <SequenceLocation Assembly="GRCh37" Chr="17" start="%d" stop="%d" variantLength="1" '
+            'positionVCF="%d" referenceAlleleVCF="A" alternateAlleleVCF="G"/>\n' % (41000000 + id, 41000000 + id, 41000000 + id) +
+            relationships +
+            '      </Measure>\n'
+            '    </MeasureSet>\n'
+            '  </ReferenceClinVarAssertion>\n' +
+            assertions +
+            '</ClinVarSet>\n')
+
+
+class testClinVarModel(unittest.TestCase):
+
+    def test_decodesRecord(self):
+        cvs = clinvar.clinVarSet(ET.fromstring(clinVarSet(7, genes=("BRCA1", "NBR2"), submissions=3)))
+        self.assertEquals(cvs.id, "7")
+
+        ra = cvs.referenceAssertion
+        self.assertEquals((ra.id, ra.reviewStatus, ra.clinicalSignificance),
+                          ("7", "criteria provided, multiple submitters", "Conflicting interpretations"))
+        self.assertEquals((ra.origin, ra.ethnicity, ra.gender, ra.age, ra.method),
+                          ("germline", "mixed", "female", None, "literature only"))
+
+        variant = ra.variant
+        self.assertEquals((variant.id, variant.name), ("1000007", "NM_007294.3(BRCA1):c.7A>G (p.Lys7Glu)"))
+        self.assertEquals(variant.attribute, {"HGVS, coding, RefSeq": "NM_007294.3:c.7A>G",
+                                              "HGVS, protein, RefSeq": "NP_009225.1:p.Lys7Glu"})
+        # the first gene in gene relationships
+        self.assertEquals(variant.geneSymbol, "BRCA1")
+        self.assertEquals(sorted(variant.coordinates), ["GRCh37", "GRCh38"])
+        grch38 = variant.coordinates["GRCh38"]
+        self.assertEquals((grch38.chrom, grch38.start, grch38.stop, grch38.length,
+                           grch38.referenceAllele, grch38.alternateAllele),
+                          ("17", "43000007", "43000007", "1", "A", "G"))
+        # VCF values are used when there are no reference/alternate alleles
+        grch37 = variant.coordinates["GRCh37"]
+        self.assertEquals((grch37.start, grch37.referenceAllele, grch37.alternateAllele), ("41000007", "A", "G"))
+
+        # the replaced submission is left out
+        self.assertEquals(sorted(cvs.otherAssertions), ["SCV8", "SCV9"])
+        oa = cvs.otherAssertions["SCV9"]
+        self.assertEquals((oa.id, oa.submitter, oa.dateSubmitted, oa.accession, oa.dateLastUpdated),
+                          ("9", "Lab 2", "2016-03-01", "SCV9", "2017-03-01"))
+        self.assertEquals((oa.clinicalSignificance, oa.reviewStatus, oa.summaryEvidence),
+                          ("Uncertain significance", "criteria provided, single submitter", "Submission 2 of variant 7"))
+        self.assertEquals((oa.origin, oa.method, oa.description), ("germline", "clinical testing", "Seen in family 2"))
+
+    def test_firstChildOnly(self):
+        # like element.find, only the first of repeated single valued elements is read
+        text = clinVarSet(1, submissions=1).replace(
+            '<ClinicalSignificance><ReviewStatus>criteria provided, multiple submitters</ReviewStatus>',
+            '<ClinicalSignificance><Description>Benign</Description></ClinicalSignificance>\n'
+            '    <ClinicalSignificance><ReviewStatus>criteria provided, multiple submitters</ReviewStatus>')
+        ra = clinvar.clinVarSet(ET.fromstring(text)).referenceAssertion
+        self.assertEquals((ra.reviewStatus, ra.clinicalSignificance), (None, "Benign"))
+
+    def test_malformedRecords(self):
+        # records without the elements the model needs raise AttributeError, which clinVarBrca.py skips
+        record = clinVarSet(1, submissions=1)
+        for start, end in [("<ReferenceClinVarAssertion", "</ReferenceClinVarAssertion>"),
+                           ("<MeasureSet", "</MeasureSet>"),
+                           ('<ClinVarAccession Acc="SCV', "/>")]:
+            begin = record.index(start)
+            with self.assertRaises(AttributeError):
+                clinvar.clinVarSet(ET.fromstring(record[:begin] + record[record.index(end, begin) + len(end):]))
+
+    def test_multipleMeasures(self):
+        record = clinVarSet(1)
+        begin = record.index("<Measure ")
+        measure = record[begin:record.index("</Measure>") + len("</Measure>")]
+        cvs = clinvar.clinVarSet(ET.fromstring(record.replace(measure, measure + measure)))
+        self.assertEquals(cvs.referenceAssertion.variant, None)
@@ -0,0 +1,36 @@
+'''
+Benchmarks for decoding ClinVarSet records into the clinvar model classes
+
+The fixture is 10k synthetic ClinVarSet records (test_clinvar.clinVarSet) with one to four
+submissions each, parsed with ElementTree beforehand so only the model classes are timed.
+'''
+
+import xml.etree.ElementTree as ET
+import pytest
+pytest.importorskip("pytest_benchmark")
+import clinvar
+from test_clinvar import clinVarSet
+
+RECORDS = 10000
+
+
+@pytest.fixture(scope="module")
+def elements():
+    return [ET.fromstring(clinVarSet(id, genes=(["BRCA1", "BRCA2"][id % 2],), submissions=1 + id % 4))
+            for id in xrange(RECORDS)]
+
+
+def test_benchmarkDecode(benchmark, elements):
+    benchmark.extra_info["records"] = len(elements)
+    results = benchmark.pedantic(lambda: [clinvar.clinVarSet(element) for element in elements], rounds=5)
+    assert len(results) == RECORDS
+    # the third submission of a record is replaced
+    assert sum(len(result.otherAssertions) for result in results) == 20000
+    for id, result in enumerate(results):
+        assert (result.id, result.referenceAssertion.variant.geneSymbol) == (str(id), ["BRCA1", "BRCA2"][id % 2])
+        assert result.referenceAssertion.clinicalSignificance == "Conflicting interpretations"
+        assert (sorted((assertion.accession, assertion.submitter, assertion.clinicalSignificance, assertion.origin)
+                       for assertion in result.otherAssertions.values()) ==
+                sorted(("SCV%d" % (id + i), "Lab %d" % (i), ["Benign", "Pathogenic", "Uncertain significance"][i % 3],
+                        ["germline", "somatic"][i % 2]) for i in xrange(1, 2 + id % 4) if i != 3))
+
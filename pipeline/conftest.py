@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the modules shared by the scripts of the different sources (e.g. packed_resources) are imported
+# from data_merging, which the luigi pipeline puts on the PYTHONPATH of the scripts it runs
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_merging"))
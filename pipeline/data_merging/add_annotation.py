@@ -27,7 +27,7 @@ VEP_TRANSCRIPT_CONSEQUENCES = {
 ERROR_COUNT = 0
 
 
-def main():
+def main(argv=None):
     global ERROR_COUNT
     parser = argparse.ArgumentParser()
     parser.add_argument("-i", "--input",
@@ -36,7 +36,8 @@ def main():
                         default="/hive/groups/cgl/brca/release1.0/merged_withVEP_cleaned.tsv")
     parser.add_argument('-l', "--log_file_path", help='Location of log file.')
     parser.add_argument("-v", "--verbose", action="count", default=False, help="determines logging")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    ERROR_COUNT = 0
 
     if args.verbose:
         logging_level = logging.DEBUG
@@ -46,17 +47,18 @@ def main():
     log_file_path = args.log_file_path
     logging.basicConfig(filename=log_file_path, filemode="w", level=logging_level)
 
-    csvIn = csv.DictReader(open(args.input, "r"), delimiter='\t')
-    outputColumns = setOutputColumns(csvIn.fieldnames, VEP_TRANSCRIPT_CONSEQUENCES)
-    csvOut = csv.DictWriter(open(args.output, "w"), delimiter='\t',
-                            fieldnames=outputColumns)
-    csvOut.writerow(dict((fn, fn) for fn in outputColumns))
-    for row in csvIn:
-        row = addVepResults(row, VEP_TRANSCRIPT_CONSEQUENCES)
-        if row is not False:
-            csvOut.writerow(row)
-        else:
-            ERROR_COUNT += 1
+    with open(args.input, "r") as inputFile, open(args.output, "w") as outputFile:
+        csvIn = csv.DictReader(inputFile, delimiter='\t')
+        outputColumns = setOutputColumns(csvIn.fieldnames, VEP_TRANSCRIPT_CONSEQUENCES)
+        csvOut = csv.DictWriter(outputFile, delimiter='\t',
+                                fieldnames=outputColumns)
+        csvOut.writerow(dict((fn, fn) for fn in outputColumns))
+        for row in csvIn:
+            row = addVepResults(row, VEP_TRANSCRIPT_CONSEQUENCES)
+            if row is not False:
+                csvOut.writerow(row)
+            else:
+                ERROR_COUNT += 1
 
     logging.info("ERROR COUNT: %d", ERROR_COUNT)
 
@@ -35,24 +35,25 @@ FIELDS_TO_RENAME = {"Gene_symbol_ENIGMA": "Gene_Symbol",
                     "BIC_Nomenclature_ENIGMA": "BIC_Nomenclature"}
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument("-i", "--input",
                         default="/hive/groups/cgl/brca/release1.0/merged_withVEP_cleaned.csv")
     parser.add_argument("-o", "--output",
                         default="/hive/groups/cgl/brca/release1.0/aggregated.csv")
-    args = parser.parse_args()
-
-    csvIn = csv.DictReader(open(args.input, "r"), delimiter='\t')
-    outputColumns = setOutputColumns(csvIn.fieldnames, FIELDS_TO_REMOVE,
-                                     FIELDS_TO_ADD, FIELDS_TO_RENAME)
-    csvOut = csv.DictWriter(open(args.output, "w"), delimiter='\t',
-                            fieldnames=outputColumns)
-    csvOut.writerow(dict((fn, fn) for fn in outputColumns))
-    rowCount = 0
-    for row in csvIn:
-        rowCount += 1
-        csvOut.writerow(updateRow(row, FIELDS_TO_RENAME, FIELDS_TO_REMOVE))
+    args = parser.parse_args(argv)
+
+    with open(args.input, "r") as inputFile, open(args.output, "w") as outputFile:
+        csvIn = csv.DictReader(inputFile, delimiter='\t')
+        outputColumns = setOutputColumns(csvIn.fieldnames, FIELDS_TO_REMOVE,
+                                         FIELDS_TO_ADD, FIELDS_TO_RENAME)
+        csvOut = csv.DictWriter(outputFile, delimiter='\t',
+                                fieldnames=outputColumns)
+        csvOut.writerow(dict((fn, fn) for fn in outputColumns))
+        rowCount = 0
+        for row in csvIn:
+            rowCount += 1
+            csvOut.writerow(updateRow(row, FIELDS_TO_RENAME, FIELDS_TO_REMOVE))
     print "Process complete, aggregated %s variants." % (rowCount)
 
 
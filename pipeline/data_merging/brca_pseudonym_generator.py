@@ -9,12 +9,11 @@ import hgvs.dataproviders.uta
 import hgvs.assemblymapper
 import hgvs.normalizer
 import pyhgvs
-import pyhgvs.utils as pyhgvs_utils
 import logging
 import csv
 from ometa.runtime import ParseError
-from pygr.seqdb import SequenceFileDB
 import traceback
+import packed_resources
 
 
 '''
@@ -26,7 +25,7 @@ import traceback
 '''
 
 
-def parse_args():
+def parse_args(argv=None):
     """
     Description:
         function 'parse_args' parses arguments from command-line and returns an argparse
@@ -55,13 +54,13 @@ def parse_args():
     parser.add_argument('--artifacts_dir', help='Artifacts directory with pipeline artifact files.')
 
     parser.set_defaults(calcProtein=False)
-    options = parser.parse_args()
+    options = parser.parse_args(argv)
     return options
 
 
-def main(args):
+def main(args=None):
 
-    options = parse_args()
+    options = parse_args(args)
     brcaFile = options.inBRCA
     hg18_fa = options.inHg18
     hg19_fa = options.inHg19
@@ -83,13 +82,14 @@ def main(args):
     hgvs_norm = hgvs.normalizer.Normalizer(hgvs_dp)
     hgvs_am = hgvs.assemblymapper.AssemblyMapper(hgvs_dp, assembly_name='GRCh38')
 
-    genome36 = SequenceFileDB(hg18_fa.name)
-    genome37 = SequenceFileDB(hg19_fa.name)
-    genome38 = SequenceFileDB(hg38_fa.name)
+    # genomes and transcripts are reused by later calls in the same process
+    genome36 = packed_resources.load_genome(hg18_fa.name)
+    genome37 = packed_resources.load_genome(hg19_fa.name)
+    genome38 = packed_resources.load_genome(hg38_fa.name)
 
-    transcripts36 = pyhgvs_utils.read_transcripts(refSeq18)
-    transcripts37 = pyhgvs_utils.read_transcripts(refSeq19)
-    transcripts38 = pyhgvs_utils.read_transcripts(refSeq38)
+    transcripts36 = packed_resources.load_transcripts(refSeq18.name)
+    transcripts37 = packed_resources.load_transcripts(refSeq19.name)
+    transcripts38 = packed_resources.load_transcripts(refSeq38.name)
 
     def get_transcript36(name):
         return transcripts36.get(name)
@@ -266,7 +266,9 @@ def main(args):
     refSeq18.close()
     refSeq19.close()
     refSeq38.close()
+    brcaFile.close()
+    outputFile.close()
 
 
 if __name__ == "__main__":
-    sys.exit(main(sys.argv))
+    sys.exit(main(sys.argv[1:]))
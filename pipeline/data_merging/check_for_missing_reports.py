@@ -8,13 +8,12 @@ import logging
 from os import listdir
 from os.path import isfile, join, abspath
 from aggregate_reports import get_reports_files
-import vcf
 
 
 ARGS = None
 
 
-def main():
+def main(argv=None):
     global ARGS
     parser = argparse.ArgumentParser()
     parser.add_argument("-b", "--built",
@@ -24,95 +23,147 @@ def main():
     parser.add_argument('-a', "--artifacts_dir", help='Artifacts directory with pipeline artifact files.')
     parser.add_argument("-v", "--verbose", action="count", default=True, help="determines logging")
 
-    ARGS = parser.parse_args()
+    ARGS = parser.parse_args(argv)
 
     configure_logging()
 
-    bx_ids = get_bx_ids()
+    bx_ids = get_bx_ids(ARGS.ready_input_dir)
 
-    matches_per_source = find_matches_per_source(bx_ids)
+    matches_per_source = find_matches_per_source(bx_ids, ARGS.built)
 
     missing_reports = find_missing_reports(matches_per_source, bx_ids)
 
     logging.debug("Reports absent from release: %s", missing_reports)
 
+    log_missing_reports(missing_reports, bx_ids)
 
-def get_bx_ids():
-    # Get all bx_ids present in source files organized by source
+
+def get_bx_ids(ready_input_dir):
+    # Get all bx_ids present in source files organized by source, with the file each bx_id is from
     bx_ids = {}
 
-    files = get_reports_files(ARGS.ready_input_dir)
+    files = get_reports_files(ready_input_dir)
 
     for file in files:
-        file_path = abspath(ARGS.ready_input_dir + file)
+        file_path = abspath(ready_input_dir + file)
         if file_path.endswith('.tsv'):
             source = "ENIGMA"
-            bx_ids[source] = []
-            tsv_file = csv.DictReader(open(file_path, "r"), delimiter='\t')
-            for report in tsv_file:
-                ids = map(int, report['BX_ID'].split(','))
-                bx_ids[source] = bx_ids[source] + ids
+            bx_ids[source] = {}
+            with open(file_path, "r") as f:
+                for ids in read_tsv_bx_ids(f):
+                    add_bx_ids(bx_ids[source], map(int, ids), file)
         else:
             suffix = '.vcf'
             source = file[:(len(file)-len(suffix))]
-            bx_ids[source] = []
-            vcf_reader = vcf.Reader(open(file_path, 'r'), strict_whitespace=True)
-            try:
-                for record in vcf_reader:
-                    ids = map(int, record.INFO['BX_ID'])
-                    bx_ids[source] = bx_ids[source] + ids
-            except ValueError as e:
-                print e
+            bx_ids[source] = {}
+            with open(file_path, "r") as f:
+                try:
+                    for ids in read_vcf_bx_ids(f):
+                        add_bx_ids(bx_ids[source], map(int, ids), file)
+                except ValueError as e:
+                    print e
 
     return bx_ids
 
 
-def find_matches_per_source(bx_ids):
-    matches_per_source = {}
-    built = csv.DictReader(open(ARGS.built, "r"), delimiter='\t')
-    column_prefix = "BX_ID_"
-    bx_id_columns = [f for f in built.fieldnames if column_prefix in f]
+def read_tsv_bx_ids(f):
+    """
+    Yields the BX_IDs of every report of a tsv file with a BX_ID column, as lists of strings
+    """
+    reader = csv.reader(f, delimiter='\t')
+    bx_id_index = next(reader).index('BX_ID')
+    for row in reader:
+        # csv.DictReader skips empty rows
+        if row:
+            yield row[bx_id_index].split(',')
+
+
+def read_vcf_bx_ids(f):
+    """
+    Yields the BX_IDs of every record of a VCF file, as lists of strings, from the INFO column as
+    vcf.Reader(strict_whitespace=True) reads it, without parsing the rest of the record
+    """
+    for line in f:
+        if line.startswith('#') or not line.strip():
+            continue
+        info = line.rstrip().split('\t')[7]
+        for entry in info.split(';'):
+            if entry.startswith('BX_ID='):
+                yield entry[len('BX_ID='):].split(',')
+                break
+        else:
+            raise KeyError('BX_ID')
+
+
+def add_bx_ids(source_bx_ids, ids, file):
+    for bx_id in ids:
+        # bx_ids are unique within a source
+        assert bx_id not in source_bx_ids, "BX_ID %d is in %s and %s" % (bx_id, source_bx_ids[bx_id], file)
+        source_bx_ids[bx_id] = file
+
+
+def find_matches_per_source(bx_ids, built_path):
     matches_per_source = {}
-    for variant in built:
-        for column in bx_id_columns:
-            source = column[len(column_prefix):]
-            if source not in matches_per_source:
-                matches_per_source[source] = []
-            source_bx_ids = variant[column]
-            variant_sources = variant["Source"].split(',')
-            match = False
-            for src in variant_sources:
-                if source == src:
-                    match = True
-            if isEmpty(source_bx_ids):
-                if match:
-                    logging.warning("Variant %s has source %s but no report ids from that source", variant, source)
-            else:
-                if not match:
-                    logging.warning("Variant %s has report(s) %s from source %s, but source is not associated with variant", variant, source_bx_ids, source)
+    with open(built_path, "r") as f:
+        built = csv.reader(f, delimiter='\t')
+        fieldnames = next(built)
+        column_prefix = "BX_ID_"
+        bx_id_columns = [(fieldnames.index(f), f[len(column_prefix):]) for f in fieldnames if column_prefix in f]
+        source_index = fieldnames.index("Source")
+        for source in set(source for index, source in bx_id_columns):
+            matches_per_source[source] = set()
+        for row in built:
+            if not row:
+                continue
+            variant_sources = set(row[source_index].split(','))
+            for index, source in bx_id_columns:
+                source_bx_ids = row[index] if index < len(row) else None
+                match = source in variant_sources
+                if isEmpty(source_bx_ids):
+                    if match:
+                        logging.warning("Variant %s has source %s but no report ids from that source",
+                                        variant_dict(fieldnames, row), source)
                 else:
-                    source_bx_ids = map(int, source_bx_ids.split(','))
-                    for source_bx_id in source_bx_ids:
-                        if source_bx_id in bx_ids[source]:
-                            matches_per_source[source].append(source_bx_id)
-                        else:
-                            logging.warning("Report(s) %s found on variant %s, but report does not exist from source %s", source_bx_ids, variant, source)
+                    if not match:
+                        logging.warning("Variant %s has report(s) %s from source %s, but source is not associated with variant",
+                                        variant_dict(fieldnames, row), source_bx_ids, source)
+                    else:
+                        source_bx_ids = map(int, source_bx_ids.split(','))
+                        matches = matches_per_source[source]
+                        for source_bx_id in source_bx_ids:
+                            if source_bx_id in bx_ids[source]:
+                                # a report is on one variant only
+                                assert source_bx_id not in matches, "BX_ID %d from source %s is on more than one variant" % (source_bx_id, source)
+                                matches.add(source_bx_id)
+                            else:
+                                logging.warning("Report(s) %s found on variant %s, but report does not exist from source %s",
+                                                source_bx_ids, variant_dict(fieldnames, row), source)
     return matches_per_source
 
 
+def variant_dict(fieldnames, row):
+    # the variant as csv.DictReader reads it, for logging
+    variant = dict(zip(fieldnames, row))
+    if len(row) > len(fieldnames):
+        variant[None] = row[len(fieldnames):]
+    else:
+        for field in fieldnames[len(row):]:
+            variant[field] = None
+    return variant
+
+
 def find_missing_reports(matches_per_source, bx_ids):
     missing_reports = {}
     for source in matches_per_source:
-        matches_set = get_set_of_ids(matches_per_source[source])
-        original_ids_set = get_set_of_ids(bx_ids[source])
-        missing_reports[source] = matches_set.symmetric_difference(original_ids_set)
+        missing_reports[source] = matches_per_source[source].symmetric_difference(bx_ids[source])
     return missing_reports
 
 
-def get_set_of_ids(ids):
-    id_set = set(ids)
-    assert len(ids) == len(set(id_set))
-    return id_set
+def log_missing_reports(missing_reports, bx_ids):
+    for source in sorted(missing_reports):
+        for bx_id in sorted(missing_reports[source]):
+            logging.warning("Report %d from source %s (%s) is absent from release", bx_id, source,
+                            bx_ids[source].get(bx_id))
 
 
 def configure_logging():
@@ -0,0 +1,198 @@
+"""
+Typed columnar table files: a table is stored column by column so a reader can load just the
+columns it needs, and the file is mmapped so loading a column doesn't parse anything.
+
+Layout: the 8 byte magic, a little endian uint32 header size and a JSON header with the number of
+rows and the type, offset and size of every column, followed by the columns (8 byte aligned).
+Column types:
+    string      uint64 offsets[num_rows + 1] into the concatenated values
+    dictionary  the distinct values as a string column, then int32 codes[num_rows] (for columns with
+                few distinct values, e.g. submitters)
+    int64       int64 values[num_rows]
+
+Values are byte strings (or ints for int64 columns), written and read back as they are.
+"""
+
+import json
+import mmap
+import struct
+
+import numpy as np
+
+MAGIC = "BRCACOL1"
+TYPES = ("string", "dictionary", "int64")
+
+
+def is_canonical_int(value):
+    try:
+        return str(int(value)) == value
+    except (TypeError, ValueError):
+        return False
+
+
+def encode_strings(values):
+    offsets = np.zeros(len(values) + 1, dtype="<u8")
+    np.cumsum([len(value) for value in values], out=offsets[1:])
+    return offsets.tostring() + "".join(values)
+
+
+def encode_column(values, column_type):
+    """
+    Returns (the column's bytes, the column's header fields). column_type "auto" is int64 if every
+    value is an integer written the way str(int) writes it, otherwise string
+    """
+    if column_type == "auto":
+        column_type = "int64" if values and all(is_canonical_int(value) for value in values) else "string"
+    if column_type == "string":
+        return encode_strings(values), {"type": "string"}
+    if column_type == "dictionary":
+        codes = {}
+        dictionary = []
+        column_codes = np.empty(len(values), dtype="<i4")
+        for i, value in enumerate(values):
+            if value not in codes:
+                codes[value] = len(dictionary)
+                dictionary.append(value)
+            column_codes[i] = codes[value]
+        encoded_dictionary = encode_strings(dictionary)
+        return encoded_dictionary + column_codes.tostring(), {"type": "dictionary",
+                                                              "dictionary_size": len(dictionary),
+                                                              "codes_offset": len(encoded_dictionary)}
+    if column_type == "int64":
+        return np.array([int(value) for value in values], dtype="<i8").tostring(), {"type": "int64"}
+    raise ValueError("Unknown column type %s, expected one of %s" % (column_type, ", ".join(TYPES + ("auto",))))
+
+
+def write_table(path, column_names, rows, column_types=None, metadata=None):
+    """
+    Writes rows (sequences of values in the order of column_names) to path. column_types maps column
+    names to a type (default: string). Returns the number of rows
+    """
+    columns = [[] for name in column_names]
+    for row in rows:
+        for column, value in zip(columns, row):
+            column.append(value)
+    return write_columns(path, column_names, columns, column_types, metadata)
+
+
+def write_columns(path, column_names, columns, column_types=None, metadata=None):
+    """
+    Writes columns (lists of values, one per name in column_names, all of the same length) to path, as
+    write_table does. Returns the number of rows
+    """
+    column_types = column_types or {}
+    num_rows = len(columns[0]) if columns else 0
+
+    encoded = []
+    header = {"num_rows": num_rows, "columns": [], "metadata": metadata or {}}
+    for name, values in zip(column_names, columns):
+        data, fields = encode_column(values, column_types.get(name, "string"))
+        fields.update({"name": name, "size": len(data)})
+        header["columns"].append(fields)
+        encoded.append(data)
+
+    # offsets depend on the header size, which depends on the offsets: reserve room for them first
+    for fields in header["columns"]:
+        fields["offset"] = 0
+    header_size = len(json.dumps(header, sort_keys=True)) + 24 * len(column_names) + 8
+    offset = len(MAGIC) + 4 + header_size
+    for fields, data in zip(header["columns"], encoded):
+        offset += -offset % 8
+        fields["offset"] = offset
+        offset += len(data)
+    header_json = json.dumps(header, sort_keys=True).ljust(header_size)
+
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", header_size) + header_json)
+        for fields, data in zip(header["columns"], encoded):
+            f.write("\0" * (fields["offset"] - f.tell()))
+            f.write(data)
+    return num_rows
+
+
+class ColumnarTable(object):
+    """
+    Read only view of a columnar table file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data[:len(MAGIC)] != MAGIC:
+            raise ValueError("%s is not a columnar table file" % (path))
+        header_size = struct.unpack("<I", self._data[len(MAGIC):len(MAGIC) + 4])[0]
+        header = json.loads(self._data[len(MAGIC) + 4:len(MAGIC) + 4 + header_size])
+        self.num_rows = header["num_rows"]
+        self.metadata = header["metadata"]
+        self._columns = dict((str(fields["name"]), fields) for fields in header["columns"])
+        self.column_names = [str(fields["name"]) for fields in header["columns"]]
+
+    def __len__(self):
+        return self.num_rows
+
+    def _fields(self, name):
+        if name not in self._columns:
+            raise KeyError("%s has no column %s" % (self.path, name))
+        return self._columns[name]
+
+    def _strings(self, offset, count):
+        offsets = np.frombuffer(self._data, "<u8", count + 1, offset)
+        start = offset + 8 * (count + 1)
+        data = self._data[start + int(offsets[0]):start + int(offsets[-1])]
+        return [data[int(begin):int(end)] for begin, end in zip(offsets[:-1], offsets[1:])]
+
+    def column_type(self, name):
+        return self._fields(name)["type"]
+
+    def dictionary(self, name):
+        """
+        Returns (distinct values, numpy array of each row's index into them) of a dictionary column
+        """
+        fields = self._fields(name)
+        if fields["type"] != "dictionary":
+            raise ValueError("%s is a %s column, not a dictionary column" % (name, fields["type"]))
+        values = self._strings(fields["offset"], fields["dictionary_size"])
+        codes = np.frombuffer(self._data, "<i4", self.num_rows, fields["offset"] + fields["codes_offset"])
+        return values, codes
+
+    def _string(self, offset, count, index):
+        begin, end = struct.unpack_from("<QQ", self._data, offset + 8 * index)
+        start = offset + 8 * (count + 1)
+        return self._data[start + begin:start + end]
+
+    def value(self, name, row):
+        """
+        Returns the value of a column in one row, without reading the rest of the column
+        """
+        fields = self._fields(name)
+        if not 0 <= row < self.num_rows:
+            raise IndexError("row %d of %s is out of range" % (row, self.path))
+        if fields["type"] == "string":
+            return self._string(fields["offset"], self.num_rows, row)
+        if fields["type"] == "dictionary":
+            code = struct.unpack_from("<i", self._data, fields["offset"] + fields["codes_offset"] + 4 * row)[0]
+            return self._string(fields["offset"], fields["dictionary_size"], code)
+        return struct.unpack_from("<q", self._data, fields["offset"] + 8 * row)[0]
+
+    def column(self, name):
+        """
+        Returns the values of a column as a list
+        """
+        fields = self._fields(name)
+        if fields["type"] == "string":
+            return self._strings(fields["offset"], self.num_rows)
+        if fields["type"] == "dictionary":
+            values, codes = self.dictionary(name)
+            return [values[code] for code in codes]
+        return np.frombuffer(self._data, "<i8", self.num_rows, fields["offset"]).tolist()
+
+    def rows(self, names=None):
+        """
+        Returns the rows as a list of tuples of the values of names (default: all columns)
+        """
+        columns = [self.column(name) for name in (names or self.column_names)]
+        return zip(*columns) if columns else []
+
+    def close(self):
+        self._data.close()
@@ -1,29 +1,58 @@
 #!/usr/bin/env python
 """
-this script converts a tsv file into a vcf file
+this script converts a tsv file (or a columnar table file, see columnar_table.py) into a vcf file
 """
 import argparse
 import fileinput
 import os
 
-def main():
-    args = arg_parse()
-    tsv = open(args.input, "r")
+import columnar_table
+
+def main(argv=None):
+    args = arg_parse(argv)
+    if args.columnar:
+        info_keys, infos = read_columnar(args.input)
+    else:
+        info_keys, infos = read_tsv(args.input, args.delimiter)
+
+    sorted_infos = sort_by_pos(infos)
+    write_header(args.output, info_keys, args.source, args.version)
+    write_body(args.output, sorted_infos)
+    merge_header_body(args.output)
+
+def read_tsv(path, delimiter):
+    tsv = open(path, "r")
     line_num = 0
     info_keys = []
     infos = []
     for line in tsv:
         line_num += 1
         if line_num == 1:
-            info_keys = line.strip().split(args.delimiter)
+            info_keys = line.strip().split(delimiter)
         else:
-            info_values = line.strip().split(args.delimiter)
-            infos.append(dict(zip(info_keys, info_values)))  
-    
-    sorted_infos = sort_by_pos(infos)
-    write_header(args.output, info_keys, args.source, args.version)
-    write_body(args.output, sorted_infos)
-    merge_header_body(args.output)
+            info_values = line.strip().split(delimiter)
+            infos.append(dict(zip(info_keys, info_values)))
+    return info_keys, infos
+
+def read_columnar(path):
+    table = columnar_table.ColumnarTable(path)
+    info_keys = table.column_names
+    columns = []
+    for info_key in info_keys:
+        column = table.column(info_key)
+        if table.column_type(info_key) == "int64":
+            column = [str(value) for value in column]
+        columns.append(column)
+    table.close()
+    infos = []
+    for info_values in zip(*columns):
+        # the values as read_tsv reads them from the stripped line of the row, which only differ
+        # if the row begins or ends with whitespace or an empty value
+        first, last = info_values[0], info_values[-1]
+        if not first or not last or first[0].isspace() or last[-1].isspace():
+            info_values = "\t".join(info_values).strip().split("\t")
+        infos.append(dict(zip(info_keys, info_values)))
+    return info_keys, infos
 
 def sort_by_pos(infos):
     info_dict = {13:{}, 17:{}}
@@ -62,15 +91,17 @@ def write_header(output_path, info_keys, source, version):
         ["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO\n"]))
     f_out.close()
 
-def arg_parse():
+def arg_parse(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument("-i", "--input")
+    parser.add_argument("-c", "--columnar", action="store_true",
+        help="input is a columnar table file (e.g. ClinVarBrca.columns) instead of a tsv file")
     parser.add_argument("-o", "--output")
     parser.add_argument("-s", "--source")
     parser.add_argument("-d", "--delimiter", default="\t")
     parser.add_argument("-g", "--version", choices=['37', '38'], default="38",
         help="genome assembly version can be either GRCh37 or GRCh38")
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
 def write_body(path_output, infos):
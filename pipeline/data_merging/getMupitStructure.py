@@ -6,13 +6,13 @@ import csv
 import time
 
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description='Determine correct BRCA structure from MuPIT.')
     parser.add_argument('-i', '--input', type=argparse.FileType('r'),
                         help='Input variants.')
     parser.add_argument('-o', '--output', type=argparse.FileType('w'),
                         help='Output variants.')
-    options = parser.parse_args()
+    options = parser.parse_args(argv)
     return options
 
 
@@ -47,8 +47,8 @@ def hasRelevantProteinChange(hgvsProtein):
     return True
 
 
-def main(args):
-    options = parse_args()
+def main(args=None):
+    options = parse_args(args)
     inputFile = options.input
     outputFile = options.output
 
@@ -91,6 +91,9 @@ def main(args):
 
         output_file.writerow(variant)
 
+    inputFile.close()
+    outputFile.close()
+
 
 def get_brca_struct(chrom, pos):
     '''
@@ -162,4 +165,4 @@ def get_brca_struct(chrom, pos):
 
 
 if __name__ == "__main__":
-    sys.exit(main(sys.argv))
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,399 @@
+"""
+Reference genomes and transcript models in on-disk formats that are read in place instead of being
+loaded, so every pipeline process (luigi workers and the scripts they run as subprocesses) opens them
+in milliseconds and processes running in parallel share one copy in the page cache.
+
+Genomes are kept in the UCSC .2bit format (https://genome.ucsc.edu/FAQ/FAQformat.html#format7):
+4 bases per byte plus lists of N and lowercase (soft-masked) blocks. The file is mmapped and only
+the bytes of the requested ranges are decoded. open_genome uses a .2bit file next to a FASTA file if
+there is one, otherwise it converts the FASTA to .2bit in a cache directory ($BRCA_GENOME_CACHE, by
+default ~/.cache/brca-exchange/genomes) the first time it is opened (or when the FASTA is newer), so
+the resources directory can be read only. Like faToTwoBit, bases other than ACGTN (IUPAC ambiguity
+codes) are stored as N.
+
+genome[chrom][start:end] returns the sequence as a string, so TwoBitGenome can be used wherever a pygr
+SequenceFileDB was used (pyhgvs, str(genome[chrom][start:end]).upper()).
+
+Transcripts are served by TranscriptIndex, which only records where each transcript's line is in the
+genePred file and parses a transcript when it is asked for: the scripts look up a handful of BRCA
+transcripts out of the whole refGene table. (A pickle of the parsed transcripts takes longer to load
+than parsing the text.)
+
+Scripts run inside a luigi worker (see run_pipeline_script in luigi/CompileVCFFiles.py) open their
+resources through load_genome, load_transcripts and load_reference_sequence, which keep what they
+loaded for the life of the process, keyed by path and modification time: later tasks in the same
+process reuse it and a file that changed in between is loaded again.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+
+import numpy as np
+import pyhgvs.utils as pyhgvs_utils
+
+TWOBIT_SIGNATURE = 0x1A412743
+TWOBIT_SUFFIX = ".2bit"
+GENOME_CACHE_ENV = "BRCA_GENOME_CACHE"
+
+# 2 bits per base, the first base of a byte in the most significant bits
+BASES = "TCAG"
+BASE_CODES = np.zeros(256, dtype=np.uint8)
+for code, base in enumerate(BASES):
+    BASE_CODES[ord(base)] = code
+IS_BASE = np.zeros(256, dtype=bool)
+IS_BASE[[ord(base) for base in BASES]] = True
+
+# the 4 bases of every byte value
+DECODE_TABLE = np.array([[ord(BASES[(byte >> shift) & 3]) for shift in (6, 4, 2, 0)] for byte in xrange(256)],
+                        dtype=np.uint8)
+
+LOWERCASE_BIT = 0x20
+
+
+def read_fasta(fasta_path):
+    """
+    Yields (name, sequence) for every sequence in fasta_path, name is the header up to the first space
+    """
+    name, lines = None, []
+    with open(fasta_path, "r") as f:
+        for line in f:
+            if line.startswith(">"):
+                if name is not None:
+                    yield name, "".join(lines)
+                name, lines = line[1:].split(None, 1)[0], []
+            else:
+                lines.append(line.rstrip())
+    if name is not None:
+        yield name, "".join(lines)
+
+
+def find_blocks(mask):
+    """
+    Returns (starts, sizes) of the runs of True in the boolean array mask
+    """
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    return starts, np.flatnonzero(edges == -1) - starts
+
+
+def pack_sequence(sequence):
+    """
+    Returns the .2bit record of sequence
+    """
+    bases = np.frombuffer(sequence, dtype=np.uint8)
+    lowercase = (bases >= ord("a")) & (bases <= ord("z"))
+    upper = np.where(lowercase, bases ^ LOWERCASE_BIT, bases)
+    n_starts, n_sizes = find_blocks(~IS_BASE[upper])
+    mask_starts, mask_sizes = find_blocks(lowercase)
+
+    codes = BASE_CODES[upper]
+    codes = np.concatenate((codes, np.zeros(-len(codes) % 4, dtype=np.uint8)))
+    packed = (codes[0::4] << 6) | (codes[1::4] << 4) | (codes[2::4] << 2) | codes[3::4]
+
+    return "".join([struct.pack("<II", len(sequence), len(n_starts)),
+                    n_starts.astype("<u4").tostring(), n_sizes.astype("<u4").tostring(),
+                    struct.pack("<I", len(mask_starts)),
+                    mask_starts.astype("<u4").tostring(), mask_sizes.astype("<u4").tostring(),
+                    struct.pack("<I", 0),
+                    packed.astype(np.uint8).tostring()])
+
+
+def write_twobit(fasta_path, twobit_path):
+    """
+    Converts fasta_path to .2bit, one sequence in memory at a time. Returns the number of sequences
+    """
+    # the index holds the offset of every record, so records go to a temporary file until all sizes are known
+    names, record_sizes = [], []
+    records_path = twobit_path + ".records"
+    with open(records_path, "wb") as records:
+        for name, sequence in read_fasta(fasta_path):
+            record = pack_sequence(sequence)
+            records.write(record)
+            names.append(name)
+            record_sizes.append(len(record))
+
+    offset = 16 + sum(1 + len(name) + 4 for name in names)
+    with open(twobit_path, "wb") as f:
+        f.write(struct.pack("<IIII", TWOBIT_SIGNATURE, 0, len(names), 0))
+        for name, record_size in zip(names, record_sizes):
+            f.write(struct.pack("<B", len(name)) + name + struct.pack("<I", offset))
+            offset += record_size
+        with open(records_path, "rb") as records:
+            for chunk in iter(lambda: records.read(1 << 20), ""):
+                f.write(chunk)
+    os.remove(records_path)
+    return len(names)
+
+
+class TwoBitSequence(object):
+    """
+    One sequence of a TwoBitGenome, sliced like a string
+    """
+
+    def __init__(self, genome, name, offset):
+        self.name = name
+        self._data = genome._data
+        uint32 = genome._uint32
+        self._size, n_count = np.frombuffer(self._data, uint32, 2, offset)
+        offset += 8
+        self._n_starts = np.frombuffer(self._data, uint32, n_count, offset).astype(np.int64)
+        self._n_ends = self._n_starts + np.frombuffer(self._data, uint32, n_count, offset + 4 * n_count)
+        offset += 8 * n_count
+        mask_count = np.frombuffer(self._data, uint32, 1, offset)[0]
+        offset += 4
+        self._mask_starts = np.frombuffer(self._data, uint32, mask_count, offset).astype(np.int64)
+        self._mask_ends = self._mask_starts + np.frombuffer(self._data, uint32, mask_count, offset + 4 * mask_count)
+        # skip the reserved word
+        self._dna_offset = offset + 8 * mask_count + 4
+
+    def __len__(self):
+        return int(self._size)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, end, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("%s: slices with a step are not supported" % (self.name))
+            return self.fetch(start, end)
+        index = key + len(self) if key < 0 else key
+        if not 0 <= index < len(self):
+            raise IndexError("%s: index %d out of range" % (self.name, key))
+        return self.fetch(index, index + 1)
+
+    def __str__(self):
+        return self.fetch(0, len(self))
+
+    def __repr__(self):
+        return "TwoBitSequence(%r, %d bp)" % (self.name, len(self))
+
+    def fetch(self, start, end):
+        """
+        Returns the bases of the 0-based, end exclusive interval [start, end) as a string
+        """
+        if end <= start:
+            return ""
+        first_byte, last_byte = start // 4, (end + 3) // 4
+        packed = np.frombuffer(self._data, np.uint8, last_byte - first_byte, self._dna_offset + first_byte)
+        bases = DECODE_TABLE[packed].ravel()[start - 4 * first_byte:end - 4 * first_byte]
+        # the block lists are sorted and don't overlap, so the blocks overlapping the interval are consecutive
+        for block_starts, block_ends, apply_block in ((self._n_starts, self._n_ends, self._set_n),
+                                                      (self._mask_starts, self._mask_ends, self._set_lowercase)):
+            first = np.searchsorted(block_ends, start, side="right")
+            last = np.searchsorted(block_starts, end, side="left")
+            for block_start, block_end in zip(block_starts[first:last], block_ends[first:last]):
+                apply_block(bases, max(block_start, start) - start, min(block_end, end) - start)
+        return bases.tostring()
+
+    @staticmethod
+    def _set_n(bases, start, end):
+        bases[start:end] = ord("N")
+
+    @staticmethod
+    def _set_lowercase(bases, start, end):
+        bases[start:end] |= LOWERCASE_BIT
+
+
+class TwoBitGenome(object):
+    """
+    Read only, mmapped .2bit genome: genome[chrom][start:end] returns a string
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        signature = struct.unpack("<I", self._data[:4])[0]
+        if signature == TWOBIT_SIGNATURE:
+            byte_order = "<"
+        elif signature == struct.unpack(">I", struct.pack("<I", TWOBIT_SIGNATURE))[0]:
+            byte_order = ">"
+        else:
+            raise ValueError("%s is not a .2bit file" % (path))
+        self._uint32 = np.dtype(byte_order + "u4")
+        version, count = struct.unpack(byte_order + "II", self._data[4:12])
+        if version != 0:
+            raise ValueError("%s: unsupported .2bit version %d" % (path, version))
+
+        self._offsets = {}
+        self._names = []
+        position = 16
+        for i in xrange(count):
+            name_size = ord(self._data[position])
+            name = self._data[position + 1:position + 1 + name_size]
+            self._offsets[name] = struct.unpack(byte_order + "I",
+                                                self._data[position + 1 + name_size:position + 5 + name_size])[0]
+            self._names.append(name)
+            position += 5 + name_size
+        self._sequences = {}
+
+    def __getitem__(self, name):
+        if name not in self._sequences:
+            if name not in self._offsets:
+                raise KeyError("%s is not in %s" % (name, self.path))
+            self._sequences[name] = TwoBitSequence(self, name, self._offsets[name])
+        return self._sequences[name]
+
+    def __contains__(self, name):
+        return name in self._offsets
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def keys(self):
+        return list(self._names)
+
+    def close(self):
+        self._sequences.clear()
+        self._data.close()
+
+
+def get_cache_dir():
+    return os.environ.get(GENOME_CACHE_ENV) or os.path.join(os.path.expanduser("~"), ".cache", "brca-exchange",
+                                                            "genomes")
+
+
+def get_twobit_path(fasta_path, cache_dir=None):
+    """
+    Returns the path of the .2bit copy of fasta_path in the cache directory
+    """
+    fasta_path = os.path.abspath(fasta_path)
+    name = os.path.splitext(os.path.basename(fasta_path))[0]
+    return os.path.join(cache_dir or get_cache_dir(),
+                        "%s.%s%s" % (name, hashlib.md5(fasta_path).hexdigest(), TWOBIT_SUFFIX))
+
+
+def is_up_to_date(twobit_path, fasta_path):
+    return os.path.exists(twobit_path) and os.path.getmtime(twobit_path) >= os.path.getmtime(fasta_path)
+
+
+def open_genome(path, cache_dir=None):
+    """
+    Opens a .2bit genome, or the .2bit copy of a FASTA genome: the .2bit file next to it if it's up to
+    date, else the one in the cache directory, converting it if it's missing or out of date
+    """
+    if path.endswith(TWOBIT_SUFFIX):
+        return TwoBitGenome(path)
+    next_to_fasta = os.path.splitext(path)[0] + TWOBIT_SUFFIX
+    if is_up_to_date(next_to_fasta, path):
+        return TwoBitGenome(next_to_fasta)
+
+    twobit_path = get_twobit_path(path, cache_dir)
+    if not is_up_to_date(twobit_path, path):
+        try:
+            os.makedirs(os.path.dirname(twobit_path))
+        except OSError:
+            if not os.path.isdir(os.path.dirname(twobit_path)):
+                raise
+        # one process converts the genome, the others opening it at the same time wait for it
+        with open(twobit_path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not is_up_to_date(twobit_path, path):
+                tmp_path = twobit_path + ".tmp"
+                write_twobit(path, tmp_path)
+                os.rename(tmp_path, twobit_path)
+    return TwoBitGenome(twobit_path)
+
+
+def get_transcript_keys(transcript_id):
+    """
+    Returns the names pyhgvs_utils.read_transcripts stores the transcript under: name and full name
+    """
+    if "." in transcript_id:
+        name, version = transcript_id.split(".")
+        return [name, "%s.%d" % (name, int(version))]
+    return [transcript_id]
+
+
+class TranscriptIndex(object):
+    """
+    Lazily parsed genePred (refGene) file, a drop in for the dictionary returned by
+    pyhgvs_utils.read_transcripts: the file is scanned for transcript names once and each transcript
+    is parsed the first time it's looked up
+    """
+
+    def __init__(self, genepred_path):
+        self.path = genepred_path
+        # like read_transcripts, the last line of a transcript name wins
+        self._offsets = {}
+        self._transcripts = {}
+        offset = 0
+        with open(genepred_path, "rb") as f:
+            for line in f:
+                if not line.startswith("#"):
+                    if line.rstrip("\n").count("\t") != 15:
+                        raise ValueError("File has incorrect number of columns in at least one line.")
+                    for key in get_transcript_keys(line.split("\t", 2)[1]):
+                        self._offsets[key] = offset
+                offset += len(line)
+
+    def _read(self, offset):
+        if offset not in self._transcripts:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                record = next(pyhgvs_utils.read_refgene([f.readline()]))
+            self._transcripts[offset] = pyhgvs_utils.make_transcript(record)
+        return self._transcripts[offset]
+
+    def get(self, name, default=None):
+        if name not in self._offsets:
+            return default
+        return self._read(self._offsets[name])
+
+    def __getitem__(self, name):
+        if name not in self._offsets:
+            raise KeyError(name)
+        return self._read(self._offsets[name])
+
+    def __contains__(self, name):
+        return name in self._offsets
+
+    def __iter__(self):
+        return iter(self._offsets)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def keys(self):
+        return self._offsets.keys()
+
+
+# resources loaded in this process: (kind, absolute path) -> (mtime, resource)
+loaded_resources = {}
+
+
+def load_resource(kind, path, load):
+    """
+    Returns load(path), loaded once per process for each path and modification time of the file
+    """
+    key = (kind, os.path.abspath(path))
+    mtime = os.path.getmtime(path)
+    if key not in loaded_resources or loaded_resources[key][0] != mtime:
+        loaded_resources[key] = (mtime, load(path))
+    return loaded_resources[key][1]
+
+
+def read_reference_sequence(path):
+    with open(path, "r") as f:
+        return f.read().upper()
+
+
+def load_genome(path):
+    return load_resource("genome", path, open_genome)
+
+
+def load_transcripts(genepred_path):
+    return load_resource("transcripts", genepred_path, TranscriptIndex)
+
+
+def load_reference_sequence(path):
+    return load_resource("reference_sequence", path, read_reference_sequence)
+
+
+def clear_loaded_resources():
+    loaded_resources.clear()
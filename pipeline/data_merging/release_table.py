@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+"""
+Binary companion file of a release TSV (built_with_change_types.tsv), written with columnar_table so
+that a column or a single variant can be read without parsing the TSV.
+
+    - every column of the TSV is kept with the type that fits its values: int64 if they are all
+      integers (written the way str(int) writes them), dictionary if there are few distinct values
+      (submitters, sources, classifications), string otherwise
+    - a genomic coordinate index: the rows sorted by chromosome and position of their
+      pyhgvs_Genomic_Coordinate_38, so variant and region look ups are binary searches
+    - a checksum per column, the sum of checksums of the (genomic coordinate, value) pairs of the
+      column, so it doesn't depend on the order of the rows: two releases have the same checksum for a
+      column if every variant has the same value in it. changed_columns uses them to tell which
+      columns of a release can differ from the previous release for the variants of both, releaseDiff
+      doesn't compare the other columns
+
+Usage:
+    python release_table.py write built_with_change_types.tsv built_with_change_types.columns
+    python release_table.py variant built_with_change_types.columns chr17:g.43045678:A>G
+    python release_table.py changed previous.columns built_with_change_types.columns
+"""
+
+import argparse
+import csv
+import itertools
+import re
+import sys
+import zlib
+
+import numpy as np
+
+import columnar_table
+
+FORMAT = "brca release table"
+VERSION = 1
+COORDINATE_COLUMN = "pyhgvs_Genomic_Coordinate_38"
+ORDER_COLUMN = "_coordinate_order"
+KEY_COLUMN = "_coordinate_key"
+# columns with at most this fraction of distinct values are dictionary encoded
+DICTIONARY_FRACTION = 0.25
+INT64_RANGE = (-2 ** 63, 2 ** 63)
+
+COORDINATE = re.compile(r"^(?:chr)?([^:]+):(?:g\.)?([0-9]+)")
+CHROMOSOME_NUMBERS = {"X": 23, "Y": 24, "M": 25, "MT": 25}
+POSITIONS_PER_CHROMOSOME = 10 ** 10
+
+
+def coordinate_key(coordinate):
+    '''
+    Returns a number ordering genomic coordinates like chr17:g.43045678:A>G by chromosome and position,
+    coordinates that can't be parsed come last
+    '''
+    match = COORDINATE.match(coordinate)
+    if match is None:
+        return 99 * POSITIONS_PER_CHROMOSOME
+    chromosome, position = match.groups()
+    number = int(chromosome) if chromosome.isdigit() else CHROMOSOME_NUMBERS.get(chromosome.upper(), 98)
+    return number * POSITIONS_PER_CHROMOSOME + int(position)
+
+
+def is_int64(value):
+    return columnar_table.is_canonical_int(value) and INT64_RANGE[0] <= int(value) < INT64_RANGE[1]
+
+
+def pair_checksum(coordinate, value):
+    # as stage_integrity.fingerprint_tsv, for the pair of variant and value
+    pair = coordinate + "\t" + value
+    return ((zlib.crc32(pair) & 0xffffffff) << 32) | (zlib.adler32(pair) & 0xffffffff)
+
+
+class ColumnStats(object):
+    '''
+    Checksum and type of a column, updated as each value is added
+    '''
+    __slots__ = ("checksum", "count", "all_int64", "distinct")
+
+    def __init__(self):
+        self.checksum = 0
+        self.count = 0
+        self.all_int64 = True
+        self.distinct = set()
+
+    def add(self, coordinate, value):
+        self.checksum += pair_checksum(coordinate, value)
+        self.count += 1
+        if self.all_int64 and not is_int64(value):
+            self.all_int64 = False
+        self.distinct.add(value)
+
+    def column_type(self):
+        if self.count and self.all_int64:
+            return "int64"
+        if len(self.distinct) <= DICTIONARY_FRACTION * self.count:
+            return "dictionary"
+        return "string"
+
+    def column_checksum(self):
+        return "%016x" % (self.checksum & 0xffffffffffffffff)
+
+
+def write_release_table(tsv_path, table_path, coordinate_column=COORDINATE_COLUMN):
+    '''
+    Writes the release TSV at tsv_path to table_path, Returns the number of variants
+    The rows are read once, each value is added to its column and to the column's checksum and type
+    '''
+    with open(tsv_path, "rb") as f:
+        reader = csv.reader(f, delimiter="\t")
+        header = next(reader)
+        coordinate_index = header.index(coordinate_column)
+        columns = [[] for name in header]
+        stats = [ColumnStats() for name in header]
+        for row in reader:
+            if not row:
+                continue
+            # rows as csv.DictReader reads them, missing values are empty
+            if len(row) != len(header):
+                row = (row + [""] * (len(header) - len(row)))[:len(header)]
+            coordinate = row[coordinate_index]
+            for column, column_stats, value in itertools.izip(columns, stats, row):
+                column.append(value)
+                column_stats.add(coordinate, value)
+
+    coordinates = columns[coordinate_index]
+    keys = [coordinate_key(coordinate) for coordinate in coordinates]
+    order = sorted(xrange(len(coordinates)), key=lambda row: (keys[row], coordinates[row]))
+    column_types = dict((name, column_stats.column_type()) for name, column_stats in zip(header, stats))
+    column_types.update({ORDER_COLUMN: "int64", KEY_COLUMN: "int64"})
+    metadata = {"format": FORMAT, "version": VERSION, "columns": header, "coordinate_column": coordinate_column,
+                "checksums": dict((name, column_stats.column_checksum()) for name, column_stats in zip(header, stats))}
+
+    return columnar_table.write_columns(table_path, header + [ORDER_COLUMN, KEY_COLUMN],
+                                        columns + [order, [keys[row] for row in order]], column_types, metadata)
+
+
+class ReleaseTable(object):
+    '''
+    Reads a release table. Columns are returned with their types (ints for int64 columns), rows and
+    variants as dictionaries of strings, like csv.DictReader returns the rows of the release TSV
+    '''
+
+    def __init__(self, path):
+        self.table = columnar_table.ColumnarTable(path)
+        metadata = self.table.metadata
+        if metadata.get("format") != FORMAT or metadata.get("version") != VERSION:
+            self.table.close()
+            raise ValueError("%s is not a version %d release table" % (path, VERSION))
+        self.column_names = [str(name) for name in metadata["columns"]]
+        self.coordinate_column = str(metadata["coordinate_column"])
+        self.checksums = dict((str(name), str(checksum)) for name, checksum in metadata["checksums"].items())
+        self._keys = None
+
+    def __len__(self):
+        return len(self.table)
+
+    def column(self, name):
+        if name not in self.checksums:
+            raise KeyError("%s has no column %s" % (self.table.path, name))
+        return self.table.column(name)
+
+    def checksum(self, name):
+        return self.checksums[name]
+
+    def value(self, name, row):
+        '''
+        Returns the value of column name in row number row as a string
+        '''
+        return str(self.table.value(name, row))
+
+    def row(self, row):
+        '''
+        Returns row number row as a dictionary, reading only that row of every column
+        '''
+        return dict((name, self.value(name, row)) for name in self.column_names)
+
+    def rows(self):
+        '''
+        Yields every row as a dictionary, in the order of the release TSV
+        '''
+        columns = [[str(value) for value in self.table.column(name)] if self.table.column_type(name) == "int64"
+                   else self.table.column(name) for name in self.column_names]
+        for values in zip(*columns):
+            yield dict(zip(self.column_names, values))
+
+    def _index(self):
+        if self._keys is None:
+            self._keys = np.asarray(self.table.column(KEY_COLUMN), dtype="<i8")
+            self._order = self.table.column(ORDER_COLUMN)
+        return self._keys, self._order
+
+    def region(self, chromosome, start, end):
+        '''
+        Returns the row numbers of the variants from start to end (inclusive) of a chromosome, by position
+        '''
+        keys, order = self._index()
+        base = coordinate_key("%s:%d" % (chromosome, 0))
+        first = int(np.searchsorted(keys, base + start, "left"))
+        last = int(np.searchsorted(keys, base + end, "right"))
+        return order[first:last]
+
+    def find(self, coordinate):
+        '''
+        Returns the row number of the variant with genomic coordinate coordinate, None if there's none
+        '''
+        key = coordinate_key(coordinate)
+        keys, order = self._index()
+        for row in order[int(np.searchsorted(keys, key, "left")):int(np.searchsorted(keys, key, "right"))]:
+            if self.table.value(self.coordinate_column, row) == coordinate:
+                return row
+        return None
+
+    def variant(self, coordinate):
+        '''
+        Returns the variant with genomic coordinate coordinate as a dictionary, None if there's none
+        '''
+        row = self.find(coordinate)
+        return None if row is None else self.row(row)
+
+    def close(self):
+        self.table.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def changed_columns(old, new):
+    '''
+    Returns the columns of the release table new whose values can differ from the release table old
+    for the variants of both releases: the columns whose checksums differ once the pairs of the
+    variants that were removed from old or added to new are taken out of them. Every column if the
+    releases aren't keyed by the same coordinate column or a coordinate is repeated
+    '''
+    if old.coordinate_column != new.coordinate_column:
+        return list(new.column_names)
+    old_coordinates = old.column(old.coordinate_column)
+    new_coordinates = new.column(new.coordinate_column)
+    old_variants, new_variants = set(old_coordinates), set(new_coordinates)
+    if len(old_variants) != len(old_coordinates) or len(new_variants) != len(new_coordinates):
+        return list(new.column_names)
+    removed = [row for row, coordinate in enumerate(old_coordinates) if coordinate not in new_variants]
+    added = [row for row, coordinate in enumerate(new_coordinates) if coordinate not in old_variants]
+
+    def common_checksum(table, name, coordinates, rows):
+        checksum = int(table.checksum(name), 16)
+        for row in rows:
+            checksum -= pair_checksum(coordinates[row], table.value(name, row))
+        return checksum & 0xffffffffffffffff
+
+    return [name for name in new.column_names
+            if name not in old.checksums or
+            common_checksum(old, name, old_coordinates, removed) != common_checksum(new, name, new_coordinates, added)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write and read release tables.")
+    subparsers = parser.add_subparsers(dest="command")
+    write = subparsers.add_parser("write", help="write the release table of a release TSV")
+    write.add_argument("tsv")
+    write.add_argument("table")
+    variant = subparsers.add_parser("variant", help="print a variant of a release table")
+    variant.add_argument("table")
+    variant.add_argument("coordinate")
+    changed = subparsers.add_parser("changed", help="list the columns that can differ between the variants of two "
+                                                    "releases")
+    changed.add_argument("old_table")
+    changed.add_argument("new_table")
+    args = parser.parse_args(argv)
+
+    if args.command == "write":
+        print "Wrote %d variants to %s" % (write_release_table(args.tsv, args.table), args.table)
+    elif args.command == "variant":
+        with ReleaseTable(args.table) as table:
+            row = table.find(args.coordinate)
+            if row is None:
+                sys.exit("%s is not in %s" % (args.coordinate, args.table))
+            values = table.row(row)
+            for name in table.column_names:
+                print "%s\t%s" % (name, values[name])
+    else:
+        with ReleaseTable(args.old_table) as old, ReleaseTable(args.new_table) as new:
+            for name in changed_columns(old, new):
+                print name
+
+
+if __name__ == "__main__":
+    main()
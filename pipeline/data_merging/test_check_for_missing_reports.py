@@ -0,0 +1,89 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import os
+import mock
+import check_for_missing_reports
+
+VCF_SOURCES = ["ClinVar", "LOVD", "BIC", "ExAC"]
+SOURCES = VCF_SOURCES + ["ENIGMA"]
+
+
+def write_release(directory, reports, missing_every=1000):
+    """
+    Writes the ready input files of a synthetic release with reports reports, spread over the
+    sources, and built.tsv with the variants they're on (two reports per variant), to directory.
+    Every missing_every-th report is on no variant
+    Returns the path of built.tsv and the missing reports by source
+    """
+    ids = dict((source, []) for source in SOURCES)
+    for bx_id in xrange(1, reports + 1):
+        ids[SOURCES[bx_id % len(SOURCES)]].append(bx_id)
+    for source in VCF_SOURCES:
+        with open(os.path.join(directory, source + ".vcf"), "w") as f:
+            f.write("##fileformat=VCFv4.0\n"
+                    '##INFO=<ID=BX_ID,Number=.,Type=String,Description="BX_ID">\n'
+                    '##INFO=<ID=Submitter,Number=.,Type=String,Description="Submitter">\n'
+                    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n")
+            for bx_id in ids[source]:
+                f.write("13\t%d\t.\tA\tG\t.\t.\tSubmitter=Lab_%d;BX_ID=%d\n" % (32300000 + bx_id, bx_id % 7, bx_id))
+    with open(os.path.join(directory, "ENIGMA_combined_with_bx_ids.tsv"), "w") as f:
+        f.write("Gene_symbol\tGenomic_Coordinate\tClinical_significance\tBX_ID\n")
+        for bx_id in ids["ENIGMA"]:
+            f.write("BRCA2\tchr13:%d:A>G\tBenign\t%d\n" % (32300000 + bx_id, bx_id))
+
+    missing = dict((source, set(source_ids[::missing_every])) for source, source_ids in ids.items())
+    built_path = os.path.join(directory, "built.tsv")
+    with open(built_path, "w") as f:
+        f.write("\t".join(["Source"] + ["BX_ID_" + source for source in SOURCES] + ["Pathogenicity_all"]) + "\n")
+        for source in SOURCES:
+            on_variants = [bx_id for bx_id in ids[source] if bx_id not in missing[source]]
+            for i in xrange(0, len(on_variants), 2):
+                f.write("\t".join([source] + [",".join(map(str, on_variants[i:i + 2])) if column == source else "-"
+                                              for column in SOURCES] + ["Benign"]) + "\n")
+    return built_path, missing
+
+
+class testCheckForMissingReports(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp() + "/"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_findsMissingReports(self):
+        built_path, missing = write_release(self.tmp_dir, 2000, missing_every=50)
+        bx_ids = check_for_missing_reports.get_bx_ids(self.tmp_dir)
+        self.assertEquals(sorted(bx_ids), sorted(SOURCES))
+        self.assertEquals(bx_ids["LOVD"][6], "LOVD.vcf")
+        self.assertEquals(bx_ids["ENIGMA"][9], "ENIGMA_combined_with_bx_ids.tsv")
+        self.assertEquals(sum(len(source_ids) for source_ids in bx_ids.values()), 2000)
+
+        matches = check_for_missing_reports.find_matches_per_source(bx_ids, built_path)
+        self.assertEquals(check_for_missing_reports.find_missing_reports(matches, bx_ids), missing)
+
+    def test_logsInconsistentVariants(self):
+        write_release(self.tmp_dir, 20)
+        built_path = os.path.join(self.tmp_dir, "inconsistent.tsv")
+        with open(built_path, "w") as f:
+            f.write("Source\tBX_ID_ClinVar\tBX_ID_LOVD\n"
+                    "ClinVar\t-\t2\n"
+                    "ClinVar,LOVD\t5,99\t\n")
+        bx_ids = check_for_missing_reports.get_bx_ids(self.tmp_dir)
+        with mock.patch.object(check_for_missing_reports.logging, "warning") as warning:
+            matches = check_for_missing_reports.find_matches_per_source(bx_ids, built_path)
+        messages = "\n".join(call[0][0] % call[0][1:] for call in warning.call_args_list)
+        self.assertIn("has source ClinVar but no report ids from that source", messages)
+        self.assertIn("has report(s) 2 from source LOVD, but source is not associated with variant", messages)
+        self.assertIn("Report(s) [5, 99] found on variant", messages)
+        self.assertIn("'BX_ID_LOVD': ''", messages)
+        self.assertEquals(matches, {"ClinVar": set([5]), "LOVD": set()})
+
+    def test_duplicateReports(self):
+        write_release(self.tmp_dir, 20)
+        with open(os.path.join(self.tmp_dir, "BIC.vcf"), "a") as f:
+            f.write("13\t32300000\t.\tA\tG\t.\t.\tBX_ID=7,2\n")
+        with self.assertRaises(AssertionError):
+            check_for_missing_reports.get_bx_ids(self.tmp_dir)
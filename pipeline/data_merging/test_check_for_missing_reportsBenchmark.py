@@ -0,0 +1,35 @@
+'''
+Scaling benchmark for check_for_missing_reports
+
+The fixtures are synthetic releases (test_check_for_missing_reports.write_release) of 25k, 50k and
+100k reports from four VCF sources and ENIGMA, two reports per variant of built.tsv, one in a thousand
+missing. The benchmark times reading the reports and checking built.tsv against them, so the time per
+report should stay the same as the release grows.
+'''
+
+import tempfile
+import shutil
+import pytest
+pytest.importorskip("pytest_benchmark")
+import check_for_missing_reports
+from test_check_for_missing_reports import write_release
+
+
+@pytest.fixture(scope="module", params=[25000, 50000, 100000])
+def release(request):
+    directory = tempfile.mkdtemp() + "/"
+    built_path, missing = write_release(directory, request.param)
+    yield request.param, directory, built_path, missing
+    shutil.rmtree(directory)
+
+
+def find_missing_reports(ready_input_dir, built_path):
+    bx_ids = check_for_missing_reports.get_bx_ids(ready_input_dir)
+    matches_per_source = check_for_missing_reports.find_matches_per_source(bx_ids, built_path)
+    return check_for_missing_reports.find_missing_reports(matches_per_source, bx_ids)
+
+
+def test_benchmarkFindMissingReports(benchmark, release):
+    reports, directory, built_path, missing = release
+    benchmark.extra_info["reports"] = reports
+    assert benchmark.pedantic(find_missing_reports, (directory, built_path), rounds=3) == missing
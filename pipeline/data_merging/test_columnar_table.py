@@ -0,0 +1,54 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import os
+import columnar_table
+
+
+class testColumnarTable(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "table.columns")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_roundTrip(self):
+        rows = [("NM_007294.3:c.%dA>G" % (i), ["Lab A", "Lab \xc3\xa9", ""][i % 3], str(i * 1000), "%d" % (i % 4), "")
+                for i in xrange(50)]
+        columns = ["HGVS", "Submitter", "ID", "Count", "Empty"]
+        self.assertEquals(columnar_table.write_table(self.path, columns, rows,
+                                                     {"Submitter": "dictionary", "ID": "int64", "Count": "auto",
+                                                      "Empty": "auto"}, {"source": "test"}), 50)
+
+        table = columnar_table.ColumnarTable(self.path)
+        self.assertEquals((table.column_names, len(table), table.metadata), (columns, 50, {"source": "test"}))
+        self.assertEquals([table.column_type(name) for name in columns], ["string", "dictionary", "int64", "int64",
+                                                                          "string"])
+        self.assertEquals(table.column("HGVS"), [row[0] for row in rows])
+        self.assertEquals(table.column("ID"), [i * 1000 for i in xrange(50)])
+        values, codes = table.dictionary("Submitter")
+        self.assertEquals(values, ["Lab A", "Lab \xc3\xa9", ""])
+        self.assertEquals(list(codes), [i % 3 for i in xrange(50)])
+        self.assertEquals(table.rows(["Submitter", "Empty"]), [(row[1], row[4]) for row in rows])
+        self.assertEquals([table.value(name, 49) for name in columns], ["NM_007294.3:c.49A>G", "Lab \xc3\xa9", 49000, 1, ""])
+        self.assertEquals(table.value("HGVS", 0), rows[0][0])
+        with self.assertRaises(IndexError):
+            table.value("ID", 50)
+        with self.assertRaises(KeyError):
+            table.column("Missing")
+        with self.assertRaises(ValueError):
+            table.dictionary("HGVS")
+
+    def test_autoTypeKeepsStrings(self):
+        # values that don't read back the same as integers stay strings
+        columnar_table.write_table(self.path, ["ID"], [("1",), ("007",)], {"ID": "auto"})
+        table = columnar_table.ColumnarTable(self.path)
+        self.assertEquals((table.column_type("ID"), table.column("ID")), ("string", ["1", "007"]))
+
+    def test_emptyTable(self):
+        columnar_table.write_table(self.path, ["A", "B"], [], {"B": "dictionary"})
+        table = columnar_table.ColumnarTable(self.path)
+        self.assertEquals((len(table), table.column("A"), table.column("B"), table.rows()), (0, [], [], []))
@@ -0,0 +1,49 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import os
+import columnar_table
+import convert_tsv_to_vcf
+
+COLUMNS = ["HGVS", "Submitter", "ID", "Genomic_Coordinate", "ReviewStatus"]
+
+ROWS = [["NM_000059.3:c.9G>A", "Lab A", "17", "chr13:32315482:G>A", "criteria provided, single submitter"],
+        ["NM_007294.3:c.5T>C", "Lab B", "3", "chr17:43124092:T>C", "no assertion criteria provided"],
+        ["NM_000059.3:c.1A>G", "Lab A", "5", "chr13:32315474:A>G", ""],
+        ["NM_000059.3:c.2A>G", "Lab C", "12", "chr13:32315475:A>G", "practice guideline"]]
+
+
+class testConvertTsvToVcf(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.tsv_path = os.path.join(self.tmp_dir, "ClinVarBrca.txt")
+        self.columnar_path = os.path.join(self.tmp_dir, "ClinVarBrca.columns")
+        with open(self.tsv_path, "w") as f:
+            for row in [COLUMNS] + ROWS:
+                f.write("\t".join(row) + "\n")
+        columnar_table.write_table(self.columnar_path, COLUMNS, ROWS,
+                                   {"Submitter": "dictionary", "ID": "auto", "ReviewStatus": "dictionary"})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def convert(self, name, args):
+        vcf_path = os.path.join(self.tmp_dir, name)
+        convert_tsv_to_vcf.main(args + ["-o", vcf_path, "-s", "ClinVar"])
+        with open(vcf_path) as f:
+            return f.read()
+
+    def test_columnarInput(self):
+        table = columnar_table.ColumnarTable(self.columnar_path)
+        self.assertEquals(table.column_type("ID"), "int64")
+        table.close()
+        self.assertEquals(convert_tsv_to_vcf.read_columnar(self.columnar_path),
+                          convert_tsv_to_vcf.read_tsv(self.tsv_path, "\t"))
+
+        vcf = self.convert("ClinVarBrca.vcf", ["-i", self.tsv_path])
+        self.assertEquals(self.convert("ClinVarBrca_columnar.vcf", ["-i", self.columnar_path, "-c"]), vcf)
+        body = [line.split("\t") for line in vcf.splitlines() if not line.startswith("#")]
+        self.assertEquals([(line[0], line[1]) for line in body],
+                          [("13", "32315474"), ("13", "32315475"), ("13", "32315482"), ("17", "43124092")])
@@ -0,0 +1,136 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import random
+import os
+import mock
+from os import path
+import pyhgvs.utils as pyhgvs_utils
+from pygr.seqdb import SequenceFileDB
+import packed_resources
+
+REFGENE_FILENAME = path.join(path.dirname(__file__), '../enigma/hg38.BRCA.refGene.txt')
+
+
+def describe_transcript(transcript):
+    positions = [transcript.tx_position, transcript.cds_position] + [exon.tx_position for exon in transcript.exons]
+    return (transcript.full_name, transcript.gene.name,
+            [(p.chrom, p.chrom_start, p.chrom_stop, p.is_forward_strand) for p in positions])
+
+
+class testPackedResources(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = path.join(self.tmp_dir, "cache")
+        random.seed(40)
+        # soft-masked runs, N runs (upper and lower case), an ambiguity code and a sequence that isn't a multiple of 4
+        chr13 = list("".join(random.choice("ACGT") for i in xrange(1001)))
+        chr13[100:150] = "".join(random.choice("acgt") for i in xrange(50))
+        chr13[0:20] = "N" * 20
+        chr13[140:160] = "n" * 10 + "N" * 10
+        chr13[500] = "R"
+        self.sequences = [("chr13", "".join(chr13)), ("chr17", "".join(random.choice("ACGTacgt") for i in xrange(333))),
+                          ("chrM", "GATC")]
+        self.fasta = path.join(self.tmp_dir, "hg38.fa")
+        with open(self.fasta, "w") as f:
+            for name, sequence in self.sequences:
+                f.write(">%s description\n" % (name))
+                for start in xrange(0, len(sequence), 70):
+                    f.write(sequence[start:start + 70] + "\n")
+
+    def tearDown(self):
+        packed_resources.clear_loaded_resources()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_twoBitMatchesFasta(self):
+        genome = packed_resources.open_genome(self.fasta, self.cache_dir)
+        self.assertTrue(path.exists(packed_resources.get_twobit_path(self.fasta, self.cache_dir)))
+        self.assertFalse(path.exists(path.join(self.tmp_dir, "hg38.2bit")))
+        self.assertEquals(genome.keys(), ["chr13", "chr17", "chrM"])
+        self.assertFalse("chr1" in genome)
+        with self.assertRaises(KeyError):
+            genome["chr1"]
+
+        for name, sequence in self.sequences:
+            expected = sequence.replace("R", "N")
+            self.assertEquals(len(genome[name]), len(sequence))
+            self.assertEquals(str(genome[name]), expected)
+            for i in xrange(200):
+                start = random.randint(0, len(sequence))
+                end = random.randint(start, len(sequence) + 5)
+                self.assertEquals(genome[name][start:end], expected[start:end])
+        self.assertEquals(genome["chr13"][-3:], self.sequences[0][1][-3:])
+        self.assertEquals(genome["chr17"][5], self.sequences[1][1][5])
+
+    def test_twoBitMatchesSequenceFileDB(self):
+        genome = packed_resources.open_genome(self.fasta, self.cache_dir)
+        seqdb = SequenceFileDB(self.fasta)
+        for start, end in [(0, 25), (95, 165), (498, 503), (990, 1001)]:
+            self.assertEquals(genome["chr13"][start:end].upper(),
+                              str(seqdb["chr13"][start:end]).upper().replace("R", "N"))
+
+    def test_openGenomeConvertsOnce(self):
+        twobit_path = packed_resources.get_twobit_path(self.fasta, self.cache_dir)
+        packed_resources.open_genome(self.fasta, self.cache_dir)
+        os.utime(twobit_path, (2000000000, 2000000000))
+        packed_resources.open_genome(self.fasta, self.cache_dir)
+        self.assertEquals(path.getmtime(twobit_path), 2000000000)
+
+        # a FASTA newer than its .2bit is converted again
+        os.utime(self.fasta, (2100000000, 2100000000))
+        self.assertEquals(packed_resources.open_genome(self.fasta, self.cache_dir)["chrM"][:], "GATC")
+        self.assertNotEquals(path.getmtime(twobit_path), 2000000000)
+        self.assertEquals(packed_resources.TwoBitGenome(twobit_path)["chrM"][1:3], "AT")
+        self.assertEquals(sorted(os.listdir(self.cache_dir)), sorted([path.basename(twobit_path),
+                                                                      path.basename(twobit_path) + ".lock"]))
+
+    def test_openGenomeUsesTwoBitNextToFasta(self):
+        next_to_fasta = path.join(self.tmp_dir, "hg38.2bit")
+        packed_resources.write_twobit(self.fasta, next_to_fasta)
+        genome = packed_resources.open_genome(self.fasta, self.cache_dir)
+        self.assertEquals(genome.path, next_to_fasta)
+        self.assertFalse(path.exists(self.cache_dir))
+
+        # a FASTA with the same name in another directory has its own copy in the cache
+        other_fasta = path.join(self.tmp_dir, "other", "hg38.fa")
+        os.makedirs(path.dirname(other_fasta))
+        with open(other_fasta, "w") as f:
+            f.write(">chrM\nGGCC\n")
+        self.assertEquals(packed_resources.open_genome(other_fasta, self.cache_dir)["chrM"][:], "GGCC")
+        self.assertNotEquals(packed_resources.get_twobit_path(other_fasta, self.cache_dir),
+                             packed_resources.get_twobit_path(self.fasta, self.cache_dir))
+
+    def test_transcriptIndex(self):
+        with open(REFGENE_FILENAME, "r") as f:
+            expected = pyhgvs_utils.read_transcripts(f)
+        transcripts = packed_resources.TranscriptIndex(REFGENE_FILENAME)
+        self.assertEquals(sorted(transcripts.keys()), sorted(expected.keys()))
+        for name in expected:
+            self.assertEquals(describe_transcript(transcripts.get(name)), describe_transcript(expected[name]))
+        self.assertIs(transcripts.get("NM_007294"), transcripts["NM_007294.3"])
+        self.assertIsNone(transcripts.get("NM_000000"))
+
+    def test_loadedResourcesAreReused(self):
+        with mock.patch.dict(os.environ, {packed_resources.GENOME_CACHE_ENV: self.cache_dir}):
+            genome = packed_resources.load_genome(self.fasta)
+            self.assertIs(packed_resources.load_genome(path.join(self.tmp_dir, "..", path.basename(self.tmp_dir),
+                                                                 "hg38.fa")), genome)
+        self.assertEquals(str(genome["chrM"]), "GATC")
+        transcripts = packed_resources.load_transcripts(REFGENE_FILENAME)
+        self.assertIs(packed_resources.load_transcripts(REFGENE_FILENAME), transcripts)
+
+        reference = path.join(self.tmp_dir, "brca1_hg38.txt")
+        with open(reference, "w") as f:
+            f.write("acgtn")
+        self.assertEquals(packed_resources.load_reference_sequence(reference), "ACGTN")
+        with mock.patch("packed_resources.read_reference_sequence") as read:
+            packed_resources.load_reference_sequence(reference)
+            self.assertFalse(read.called)
+
+        # a file that changed is loaded again
+        with open(reference, "w") as f:
+            f.write("ttt")
+        os.utime(reference, (0, 0))
+        self.assertEquals(packed_resources.load_reference_sequence(reference), "TTT")
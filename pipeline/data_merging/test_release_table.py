@@ -0,0 +1,141 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import csv
+import os
+import random
+import release_table
+
+COLUMNS = ["Source", "Gene_Symbol", "pyhgvs_Genomic_Coordinate_38", "Hg38_Start", "Submitter_ClinVar",
+           "Pathogenicity_expert", "change_type"]
+
+
+def variant(rand, chromosome, position):
+    return {
+        "Source": rand.choice(["ClinVar", "ClinVar,LOVD", "ENIGMA,ClinVar,BIC"]),
+        "Gene_Symbol": "BRCA1" if chromosome == "17" else "BRCA2",
+        "pyhgvs_Genomic_Coordinate_38": "chr%s:g.%d:A>G" % (chromosome, position),
+        "Hg38_Start": str(position),
+        "Submitter_ClinVar": ",".join(rand.sample(["Invitae", "GeneDx", "Counsyl", "Ambry_Genetics"], 2)),
+        "Pathogenicity_expert": rand.choice(["Not Yet Reviewed", "Pathogenic"]),
+        "change_type": rand.choice(["none", "added_information", "new"]),
+    }
+
+
+def write_release(path, variants, columns=COLUMNS):
+    """
+    Writes the variants of a synthetic release to a release TSV at path
+    """
+    with open(path, "w") as f:
+        writer = csv.DictWriter(f, columns, delimiter="\t", lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(variants)
+
+
+def release_variants(variants, seed=17):
+    rand = random.Random(seed)
+    return ([variant(rand, "17", 43044295 + 7 * i) for i in xrange(variants)] +
+            [variant(rand, "13", 32315474 + 5 * i) for i in xrange(variants)])
+
+
+class testReleaseTable(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.tsv_path = os.path.join(self.tmp_dir, "built_with_change_types.tsv")
+        self.table_path = os.path.join(self.tmp_dir, "built_with_change_types.columns")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, variants, name="built_with_change_types"):
+        tsv_path = os.path.join(self.tmp_dir, name + ".tsv")
+        table_path = os.path.join(self.tmp_dir, name + ".columns")
+        write_release(tsv_path, variants)
+        self.assertEquals(release_table.write_release_table(tsv_path, table_path), len(variants))
+        return tsv_path, table_path
+
+    def test_coordinateKey(self):
+        self.assertEquals(release_table.coordinate_key("chr17:g.43045678:A>G"), 17 * 10 ** 10 + 43045678)
+        self.assertEquals(release_table.coordinate_key("13:32315474"), 13 * 10 ** 10 + 32315474)
+        self.assertTrue(release_table.coordinate_key("chr2:g.5:A>G") < release_table.coordinate_key("chr13:g.1:A>G") <
+                        release_table.coordinate_key("chrX:g.1:A>G") < release_table.coordinate_key("-"))
+
+    def test_readsRelease(self):
+        variants = release_variants(200)
+        tsv_path, table_path = self.write(variants)
+        with release_table.ReleaseTable(table_path) as table:
+            self.assertEquals((table.column_names, len(table)), (COLUMNS, 400))
+            self.assertEquals(table.table.column_type("Hg38_Start"), "int64")
+            self.assertEquals(table.table.column_type("Pathogenicity_expert"), "dictionary")
+            self.assertEquals(table.table.column_type("pyhgvs_Genomic_Coordinate_38"), "string")
+            self.assertEquals(table.column("Hg38_Start"), [int(row["Hg38_Start"]) for row in variants])
+            with self.assertRaises(KeyError):
+                table.column(release_table.KEY_COLUMN)
+
+            with open(tsv_path) as f:
+                self.assertEquals(list(table.rows()), list(csv.DictReader(f, delimiter="\t")))
+            self.assertEquals(table.row(250), variants[250])
+            self.assertEquals(table.variant("chr17:g.43044295:A>G"), variants[0])
+            self.assertEquals(table.find("chr13:g.32315479:A>G"), 201)
+            self.assertEquals(table.find("chr13:g.32315475:A>G"), None)
+            self.assertEquals(table.variant("chr13:g.43044295:A>G"), None)
+
+            rows = table.region("chr13", 32315474, 32315489)
+            self.assertEquals(rows, [200, 201, 202, 203])
+            self.assertEquals(table.region("17", 43044296, 43044301), [])
+
+    def test_shortRowsAndEmptyRelease(self):
+        with open(self.tsv_path, "w") as f:
+            f.write("pyhgvs_Genomic_Coordinate_38\tSource\tHg38_Start\n"
+                    "chr17:g.43044295:A>G\tClinVar\n"
+                    "-\tLOVD\t5\n")
+        self.assertEquals(release_table.write_release_table(self.tsv_path, self.table_path), 2)
+        with release_table.ReleaseTable(self.table_path) as table:
+            self.assertEquals(list(table.rows()), [
+                {"pyhgvs_Genomic_Coordinate_38": "chr17:g.43044295:A>G", "Source": "ClinVar", "Hg38_Start": ""},
+                {"pyhgvs_Genomic_Coordinate_38": "-", "Source": "LOVD", "Hg38_Start": "5"}])
+            self.assertEquals(table.find("-"), 1)
+
+        tsv_path, table_path = self.write([], "empty")
+        with release_table.ReleaseTable(table_path) as table:
+            self.assertEquals((len(table), list(table.rows())), (0, []))
+            self.assertEquals(table.variant("chr17:g.43044295:A>G"), None)
+
+    def test_changedColumns(self):
+        variants = release_variants(100)
+        old_path = self.write(variants, "old")[1]
+        shuffled = list(variants)
+        random.Random(3).shuffle(shuffled)
+        same_path = self.write(shuffled, "same")[1]
+        changed = [dict(row) for row in variants]
+        changed[7]["change_type"] = "changed_classification" if changed[7]["change_type"] != "changed_classification" \
+            else "none"
+        changed_path = self.write(changed, "changed")[1]
+        fewer_path = self.write(variants[1:], "fewer")[1]
+        # variant 0 removed, a new variant added and the submitters of variant 5 changed
+        other = [dict(row) for row in variants[1:]] + [variant(random.Random(4), "13", 32315000)]
+        other[4]["Submitter_ClinVar"] = "Invitae,Quest_Diagnostics"
+        other_path = self.write(other, "other")[1]
+        repeated_path = self.write(variants + variants[:1], "repeated")[1]
+
+        with release_table.ReleaseTable(old_path) as old:
+            with release_table.ReleaseTable(same_path) as same:
+                self.assertEquals(same.checksums, old.checksums)
+                self.assertEquals(release_table.changed_columns(old, same), [])
+            with release_table.ReleaseTable(changed_path) as new:
+                self.assertEquals(release_table.changed_columns(old, new), ["change_type"])
+            # only the variants in both releases are compared
+            with release_table.ReleaseTable(fewer_path) as fewer:
+                self.assertNotEquals(fewer.checksums, old.checksums)
+                self.assertEquals(release_table.changed_columns(old, fewer), [])
+            with release_table.ReleaseTable(other_path) as other:
+                self.assertEquals(release_table.changed_columns(old, other), ["Submitter_ClinVar"])
+            with release_table.ReleaseTable(repeated_path) as repeated:
+                self.assertEquals(release_table.changed_columns(old, repeated), COLUMNS)
+
+    def test_notAReleaseTable(self):
+        release_table.columnar_table.write_table(self.table_path, ["A"], [("1",)])
+        with self.assertRaises(ValueError):
+            release_table.ReleaseTable(self.table_path)
@@ -0,0 +1,53 @@
+'''
+Benchmark for reading a release table
+
+The fixture is the release table of a synthetic release (test_release_table.release_variants) of 30k
+variants. The benchmarks time reading one column, and looking up a thousand variants by genomic
+coordinate, which only read the index and the rows of the variants, so neither should grow with the
+number of columns of the release.
+'''
+
+import tempfile
+import shutil
+import os
+import pytest
+pytest.importorskip("pytest_benchmark")
+import release_table
+from test_release_table import release_variants, write_release
+
+VARIANTS = 15000
+
+
+@pytest.fixture(scope="module")
+def release():
+    directory = tempfile.mkdtemp()
+    tsv_path = os.path.join(directory, "built_with_change_types.tsv")
+    table_path = os.path.join(directory, "built_with_change_types.columns")
+    variants = release_variants(VARIANTS)
+    write_release(tsv_path, variants)
+    release_table.write_release_table(tsv_path, table_path)
+    yield variants, table_path
+    shutil.rmtree(directory)
+
+
+def test_benchmarkReadColumn(benchmark, release):
+    variants, table_path = release
+    benchmark.extra_info["variants"] = len(variants)
+
+    def read_column():
+        with release_table.ReleaseTable(table_path) as table:
+            return table.column("Submitter_ClinVar")
+
+    assert benchmark.pedantic(read_column, rounds=5) == [row["Submitter_ClinVar"] for row in variants]
+
+
+def test_benchmarkFindVariants(benchmark, release):
+    variants, table_path = release
+    coordinates = [row["pyhgvs_Genomic_Coordinate_38"] for row in variants[::len(variants) // 1000]]
+    benchmark.extra_info["variants"] = len(variants)
+
+    def find_variants():
+        with release_table.ReleaseTable(table_path) as table:
+            return [table.variant(coordinate) for coordinate in coordinates]
+
+    assert benchmark.pedantic(find_variants, rounds=5) == variants[::len(variants) // 1000]
@@ -22,6 +22,7 @@ import csv
 import aggregate_reports
 import urllib
 import utilities
+import packed_resources
 
 
 # GENOMIC VERSION:
@@ -200,22 +201,22 @@ def init(args):
 
     ARGS = args
     BRCA1 = {"hg38": {"start": 43000000,
-                      "sequence": open(ARGS.reference + "brca1_hg38.txt", "r").read().upper()},
+                      "sequence": packed_resources.load_reference_sequence(ARGS.reference + "brca1_hg38.txt")},
              "hg19": {"start": 41100000,
-                      "sequence": open(ARGS.reference + "brca1_hg19.txt", "r").read().upper()}}
+                      "sequence": packed_resources.load_reference_sequence(ARGS.reference + "brca1_hg19.txt")}}
     BRCA2 = {"hg38": {"start": 32300000,
-                      "sequence": open(ARGS.reference + "brca2_hg38.txt", "r").read().upper()},
+                      "sequence": packed_resources.load_reference_sequence(ARGS.reference + "brca2_hg38.txt")},
              "hg19": {"start": 32800000,
-                      "sequence": open(ARGS.reference + "brca2_hg19.txt", "r").read().upper()}}
+                      "sequence": packed_resources.load_reference_sequence(ARGS.reference + "brca2_hg19.txt")}}
 
 
-def main():
+def main(argv=None):
     global DISCARDED_REPORTS_WRITER
 
     parser = argparse.ArgumentParser()
     options(parser)
 
-    init(parser.parse_args())
+    init(parser.parse_args(argv))
 
     if ARGS.verbose:
         logging_level = logging.DEBUG
@@ -7,14 +7,30 @@ if [ -n "${DATA_DATE}" ]; then
     DATE_PARAM_OPT="--date ${DATA_DATE}"
 fi
 
+# if DOWNLOAD_MIRROR is set, downloaded source files are kept in (or, for a file:// url, only read from) that mirror
+if [ -n "${DOWNLOAD_MIRROR}" ]; then
+    MIRROR_PARAM_OPT="--downloads-mirror ${DOWNLOAD_MIRROR}"
+fi
+
+# if INCREMENTAL_BUILD is set, tasks whose inputs, parameters and code are unchanged reuse their outputs from the previous release
+if [ -n "${INCREMENTAL_BUILD}" ]; then
+    INCREMENTAL_PARAM_OPT="--incremental-build-reuse"
+fi
+
 OUTPUT_DIR=/files/data/output
 PARENT_DIR=/files/data
 BRCA_RESOURCES=/files/resources
 
+# FASTA genomes of the resources directory are converted to .2bit once, and kept with the data
+export BRCA_GENOME_CACHE=${BRCA_GENOME_CACHE:-${PARENT_DIR}/genome_cache}
+
 PREVIOUS_RELEASE_TAR=/files/previous_release.tar.gz
 
 RELEASE_NOTES=/files/release_notes.txt
 
+# number of luigi tasks to run in parallel, the independent data sources are processed concurrently
+LUIGI_WORKERS=${LUIGI_WORKERS:-4}
+
 CODE_MNT=$(mount | grep /opt/brca-exchange)
 [ -z "${CODE_MNT}" ] || echo "WARNING: BRCA Code base mounted from host file system"
 
@@ -25,4 +41,4 @@ echo "Git hash: $(git log | head -n 1)"
 
 cd /opt/brca-exchange/pipeline/luigi
 
-python -m luigi --logging-conf-file luigi_log_configuration.conf --module CompileVCFFiles RunAll --resources-dir ${BRCA_RESOURCES} --file-parent-dir ${PARENT_DIR} --output-dir ${OUTPUT_DIR} --previous-release-tar ${PREVIOUS_RELEASE_TAR} --release-notes ${RELEASE_NOTES} ${DATE_PARAM_OPT} --local-scheduler
+python -m luigi --logging-conf-file luigi_log_configuration.conf --module CompileVCFFiles RunAll --resources-dir ${BRCA_RESOURCES} --file-parent-dir ${PARENT_DIR} --output-dir ${OUTPUT_DIR} --previous-release-tar ${PREVIOUS_RELEASE_TAR} --release-notes ${RELEASE_NOTES} ${DATE_PARAM_OPT} ${MIRROR_PARAM_OPT} ${INCREMENTAL_PARAM_OPT} --workers ${LUIGI_WORKERS} --local-scheduler
@@ -17,12 +17,11 @@ import os
 from Bio.SeqUtils import seq1
 from pprint import pprint as pp
 import pyhgvs
-import pyhgvs.utils as pyhgvs_utils
-from pygr.seqdb import SequenceFileDB
 import hgvs.dataproviders.uta
 import hgvs.parser
 import hgvs.variantmapper
 import datetime
+import packed_resources
 
 
 COLUMNS_TO_SAVE = np.array(["Gene_symbol",
@@ -50,6 +49,8 @@ HDP = hgvs.dataproviders.uta.connect()
 EVM = hgvs.variantmapper.EasyVariantMapper(HDP, primary_assembly='GRCh37', alt_aln_method='splign')
 HP = hgvs.parser.Parser()
 REFGENE = None
+# TranscriptIndex keyed by REFGENE path, see get_transcript
+TRANSCRIPTS = {}
 
 
 def main():
@@ -65,7 +66,7 @@ def main():
                         help='Link to hg38.BRCA.refgene.txt.')
 
     args = parser.parse_args()
-    GENOME = SequenceFileDB(args.genome_path)
+    GENOME = packed_resources.open_genome(args.genome_path)
     REFGENE = args.reference_genome
 
     f_in = open(args.readable_input, "r")
@@ -179,9 +180,9 @@ def get_transcript(name):
     global REFGENE
     if REFGENE is None:
         sys.exit("No reference genome was provided. Try to locate hg38.BRCA.refGene.txt.")
-    with open(REFGENE) as infile:
-        TRANSCRIPTS = pyhgvs_utils.read_transcripts(infile)
-    return TRANSCRIPTS.get(name)
+    if REFGENE not in TRANSCRIPTS:
+        TRANSCRIPTS[REFGENE] = packed_resources.TranscriptIndex(REFGENE)
+    return TRANSCRIPTS[REFGENE].get(name)
 
 
 if __name__ == "__main__":
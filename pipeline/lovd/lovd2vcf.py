@@ -19,9 +19,8 @@ import sys
 import os
 from collections import defaultdict
 import pyhgvs as hgvs
-import pyhgvs.utils as hgvs_utils
-from pygr.seqdb import SequenceFileDB
 import urllib
+import packed_resources
 
 
 LOVD_LIST_FIELDS = ["genetic_origin", "RNA", "variant_effect", "individuals", "Protein", "submission_id", "cDNA", "submitters"]
@@ -61,10 +60,8 @@ def main(args):
     refseq_path = options.rpath
     errorsFile = options.errors
 
-    with open(refseq_path) as infile:
-        transcripts = hgvs_utils.read_transcripts(infile)
-
-    genome = SequenceFileDB(genome_path)
+    transcripts = packed_resources.TranscriptIndex(refseq_path)
+    genome = packed_resources.open_genome(genome_path)
 
     def get_transcript(name):
         return transcripts.get(name)
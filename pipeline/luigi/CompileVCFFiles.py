@@ -1,20 +1,28 @@
 import subprocess
 import os
-import urllib2
+import sys
+import errno
+import importlib
+import logging
 import tarfile
 import datetime
 import socket
 from shutil import copy
 import luigi
 import synapseclient
-import csv
 from luigi.util import inherits, requires
 import re
-import tempfile
 import shutil
 import json
+import multiprocessing
 
-from retrying import retry
+import dag_report
+import download_manager
+import build_manifest
+import release_archive
+import stage_integrity
+import task_profile
+import vcf_tools
 
 
 #######################
@@ -23,8 +31,12 @@ from retrying import retry
 
 
 def create_path_if_nonexistent(path):
-    if not os.path.exists(path):
+    # independent tasks may create the same directory concurrently when run with --workers
+    try:
         os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST or not os.path.isdir(path):
+            raise
     return path
 
 
@@ -38,65 +50,77 @@ def print_subprocess_output_and_error(sp):
         print err
 
 
-@retry(stop_max_attempt_number=3, wait_fixed=3000)
-def urlopen_with_retry(url):
-    return urllib2.urlopen(url)
+def get_liftover(resources_dir):
+    # hg19 to hg38 liftover of VCF records, replacing CrossMap.py vcf with the same chain file and genome
+    return vcf_tools.Liftover(resources_dir + "/hg19ToHg38.over.chain.gz", resources_dir + "/hg38.fa")
 
 
-def download_file_and_display_progress(url, file_name=None):
-    if file_name is None:
-        file_name = url.split('/')[-1]
+class downloads(luigi.Config):
+    mirror = luigi.Parameter(default="", description='directory to keep a content-addressed copy of downloaded source \
+                             files in, or file:// url of a pre-populated mirror to build from without network access')
 
-    u = urlopen_with_retry(url)
-    f = open(file_name, 'wb')
-    meta = u.info()
-    file_size = int(meta.getheaders("Content-Length")[0])
-    print "Downloading: %s Bytes: %s" % (file_name, file_size)
 
-    file_size_dl = 0
-    block_sz = 8192
-    while True:
-        buffer = u.read(block_sz)
-        if not buffer:
-            break
+def get_download_manager():
+    mirror = downloads().mirror
+    return download_manager.DownloadManager(mirror if mirror else None)
 
-        file_size_dl += len(buffer)
-        f.write(buffer)
-        status = r"%10d  [%3.2f%%]" % (file_size_dl, file_size_dl * 100. / file_size)
-        status = status + chr(8)*(len(status)+1)
-        print status,
 
-    f.close()
-    print "Finished downloading %s" % (file_name)
+def download_file_and_display_progress(url, file_name=None):
+    get_download_manager().fetch(url, file_name)
 
 
 def download_file_with_basic_auth(url, file_name, username, password):
-    p = urllib2.HTTPPasswordMgrWithDefaultRealm()
+    get_download_manager().fetch(url, file_name, username=username, password=password)
 
-    p.add_password(None, url, username, password)
 
-    handler = urllib2.HTTPBasicAuthHandler(p)
-    opener = urllib2.build_opener(handler)
-    urllib2.install_opener(opener)
+def check_file_for_contents(file_path):
+    handle_process_success_or_failure(os.stat(file_path).st_size != 0, file_path)
 
-    data = urlopen_with_retry(url).read()
-    f = open(file_name, "wb")
-    f.write(data)
-    f.close()
-    print "Finished downloading %s" % (file_name)
 
+class incremental_build(luigi.Config):
+    reuse = luigi.BoolParameter(default=False, description='take the outputs of tasks whose inputs, parameters and \
+                                code are unchanged from the previous release archive instead of running them again')
 
-def check_file_for_contents(file_path):
-    handle_process_success_or_failure(os.stat(file_path).st_size != 0, file_path)
+
+class profiling(luigi.Config):
+    cprofile = luigi.BoolParameter(default=False, description='run every task under cProfile and include the \
+                                   functions with the most cumulative time in the task profile report')
+
+
+class archive(luigi.Config):
+    workers = luigi.IntParameter(default=0, description='number of threads compressing the release archive and \
+                                 hashing files for md5sums.txt (default: number of cpus)')
+
+
+class clinvar_parsing(luigi.Config):
+    workers = luigi.IntParameter(default=0, description='number of processes parsing ClinVar XML records in \
+                                 clinVarSubmissions.py (default: number of cpus divided by --workers)')
+
+
+def processes_per_task(workers):
+    '''
+    Returns workers, or if it's 0 the number of cpus shared out between the tasks luigi runs at the same time
+    '''
+    return workers or max(1, multiprocessing.cpu_count() // luigi.interface.core().workers)
+
+
+class release_diff(luigi.Config):
+    workers = luigi.IntParameter(default=0, description='number of processes diffing the variants of the previous \
+                                 and the new release in releaseDiff.py (default: number of cpus)')
+
+
+class integrity_report(luigi.Config):
+    fingerprints = luigi.BoolParameter(default=False, description='also compare per column fingerprints of the \
+                                       input and output of each stage in the stage integrity report')
 
 
-def check_input_and_output_tsvs_for_same_number_variants(tsvIn, tsvOut, numVariantsRemoved=0):
-    tsvInput = csv.DictReader(open(tsvIn, 'r'), delimiter='\t')
-    numVariantsIn = len(list(tsvInput))
-    tsvOutput = csv.DictReader(open(tsvOut, 'r'), delimiter='\t')
-    numVariantsOut = len(list(tsvOutput))
-    print("Number of variants in input: %s \nNumber of variants in output: %s \n Number of variants removed: %s\n" % (numVariantsIn, numVariantsOut, numVariantsRemoved))
-    handle_process_success_or_failure(numVariantsIn - numVariantsRemoved == numVariantsOut, tsvOut)
+def check_input_and_output_tsvs_for_same_number_variants(tsvIn, tsvOut, numVariantsRemoved=0, reportFile=None):
+    stage = stage_integrity.check_stage(tsvIn, tsvOut, numVariantsRemoved,
+                                        fingerprints=integrity_report().fingerprints)
+    print("Number of variants in input: %s \nNumber of variants in output: %s \n Number of variants removed: %s\n" % (stage["input_variants"], stage["output_variants"], numVariantsRemoved))
+    if reportFile is not None:
+        stage_integrity.record_stage(reportFile, stage)
+    handle_process_success_or_failure(stage["passed"], tsvOut)
 
 
 def handle_process_success_or_failure(process_succeeded, file_path):
@@ -111,11 +135,42 @@ def handle_process_success_or_failure(process_succeeded, file_path):
         print("**** Failure creating %s ****\n" % (file_name))
 
 
-def extract_file(archive_path, tmp_dir, file_path):
-        with tarfile.open(archive_path, "r:gz") as tar:
-            tar.extract(file_path, tmp_dir)
-
-        return tmp_dir + '/' + file_path
+def run_pipeline_script(method_dir, module_name, args):
+    '''
+    Imports the pipeline script module_name from method_dir and calls its main function with args
+    (command line arguments without the script name) in this process instead of a new python
+    interpreter. method_dir is first on sys.path only while the script is imported and runs.
+    '''
+    sys_path = sys.path[:]
+    sys.path.insert(0, method_dir)
+
+    # scripts configure their own log files with logging.basicConfig, which only has an effect
+    # if the root logger has no handlers, so luigi's handlers are set aside while the script runs
+    root_logger = logging.getLogger()
+    luigi_handlers, luigi_level = root_logger.handlers[:], root_logger.level
+    root_logger.handlers = []
+    try:
+        module = importlib.import_module(module_name)
+        module.main(args)
+    except SystemExit as e:
+        if e.code:
+            raise RuntimeError("%s exited with status %s" % (module_name, e.code))
+    finally:
+        sys.path[:] = sys_path
+        for handler in root_logger.handlers:
+            handler.close()
+        root_logger.handlers = luigi_handlers
+        root_logger.setLevel(luigi_level)
+        sys.stdout.flush()
+
+
+def open_previous_release(task):
+    '''
+    Returns a release_archive.ReleaseArchive reading the previous release of task, members are cached
+    in the file parent directory so that every task of the run extracts them only once
+    '''
+    return release_archive.ReleaseArchive(task.previous_release_tar,
+                                          cache_dir=os.path.join(task.file_parent_dir, "previous_release"))
 
 
 #######################################
@@ -138,6 +193,16 @@ enigma_method_dir = os.path.abspath('../enigma')
 data_merging_method_dir = os.path.abspath('../data_merging')
 utilities_method_dir = os.path.abspath('../utilities')
 
+# modules shared by the scripts of the different sources (e.g. packed_resources) are in data_merging,
+# the scripts run as subprocesses import them from the PYTHONPATH they inherit
+os.environ["PYTHONPATH"] = os.pathsep.join([data_merging_method_dir] +
+                                           [path for path in [os.environ.get("PYTHONPATH")] if path])
+
+# directories of the scripts run by the tasks (and of the modules they call in process, like vcf_tools),
+# their versions are part of the tasks' build hashes
+script_dirs = [bic_method_dir, clinvar_method_dir, esp_method_dir, lovd_method_dir, g1k_method_dir,
+               enigma_method_dir, data_merging_method_dir, utilities_method_dir, luigi_dir]
+
 
 ###############################################
 #                   CLINVAR                   #
@@ -168,48 +233,31 @@ class DownloadLatestClinvarData(luigi.Task):
 
 
 @requires(DownloadLatestClinvarData)
-class ConvertLatestClinvarDataToXML(luigi.Task):
+class ConvertLatestClinvarDataToTXT(luigi.Task):
 
     def output(self):
-        artifacts_dir = create_path_if_nonexistent(self.output_dir + "/release/artifacts/")
-        return luigi.LocalTarget(self.file_parent_dir + "/ClinVar/ClinVarBrca.xml")
+        return {'txt': luigi.LocalTarget(self.file_parent_dir + "/ClinVar/ClinVarBrca.txt"),
+                'columns': luigi.LocalTarget(self.file_parent_dir + "/ClinVar/ClinVarBrca.columns")}
 
     def run(self):
         artifacts_dir = create_path_if_nonexistent(self.output_dir + "/release/artifacts/")
         clinvar_file_dir = self.file_parent_dir + "/ClinVar"
         os.chdir(clinvar_method_dir)
 
-        clinvar_xml_file = clinvar_file_dir + "/ClinVarBrca.xml"
-        writable_clinvar_xml_file = open(clinvar_xml_file, "w")
-        args = ["python", "clinVarBrca.py", clinvar_file_dir + "/ClinVarFullRelease_00-latest.xml.gz", "-a", artifacts_dir]
-        print "Running clinVarBrca.py with the following args: %s. This takes a while..." % (args)
-        sp = subprocess.Popen(args, stdout=writable_clinvar_xml_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-
-        check_file_for_contents(clinvar_xml_file)
-
-
-@requires(ConvertLatestClinvarDataToXML)
-class ConvertClinvarXMLToTXT(luigi.Task):
-
-    def output(self):
-        return luigi.LocalTarget(self.file_parent_dir + "/ClinVar/ClinVarBrca.txt")
-
-    def run(self):
-        clinvar_file_dir = self.file_parent_dir + "/ClinVar"
-        os.chdir(clinvar_method_dir)
-
         clinvar_txt_file = clinvar_file_dir + "/ClinVarBrca.txt"
         writable_clinvar_txt_file = open(clinvar_txt_file, "w")
-        args = ["python", "clinVarParse.py", clinvar_file_dir + "/ClinVarBrca.xml", "--assembly", "GRCh38"]
-        print "Running clinVarParse.py with the following args: %s" % (args)
+        args = ["python", "clinVarSubmissions.py", clinvar_file_dir + "/ClinVarFullRelease_00-latest.xml.gz",
+                "--assembly", "GRCh38", "-a", artifacts_dir, "-c", clinvar_file_dir + "/ClinVarBrca.columns",
+                "-w", str(processes_per_task(clinvar_parsing().workers))]
+        print "Running clinVarSubmissions.py with the following args: %s. This takes a while..." % (args)
         sp = subprocess.Popen(args, stdout=writable_clinvar_txt_file, stderr=subprocess.PIPE)
         print_subprocess_output_and_error(sp)
 
         check_file_for_contents(clinvar_txt_file)
+        check_file_for_contents(clinvar_file_dir + "/ClinVarBrca.columns")
 
 
-@requires(ConvertClinvarXMLToTXT)
+@requires(ConvertLatestClinvarDataToTXT)
 class ConvertClinvarTXTToVCF(luigi.Task):
 
     def output(self):
@@ -220,7 +268,8 @@ class ConvertClinvarTXTToVCF(luigi.Task):
         clinvar_vcf_file = clinvar_file_dir + "/ClinVarBrca.vcf"
 
         os.chdir(data_merging_method_dir)
-        args = ["python", "convert_tsv_to_vcf.py", "-i", clinvar_file_dir + "/ClinVarBrca.txt", "-o",
+        # the submissions are loaded from the columnar table, ClinVarBrca.txt has the same rows
+        args = ["python", "convert_tsv_to_vcf.py", "-i", clinvar_file_dir + "/ClinVarBrca.columns", "-c", "-o",
                 clinvar_file_dir + "/ClinVarBrca.vcf", "-s", "ClinVar"]
         print "Running convert_tsv_to_vcf.py with the following args: %s" % (args)
         sp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
@@ -314,7 +363,7 @@ class ExtractESPDataForBRCA1Region(luigi.Task):
         check_file_for_contents(brca1_region_output)
 
 
-@requires(ExtractESPDataForBRCA1Region)
+@requires(DecompressESPTarfile)
 class ExtractESPDataForBRCA2Region(luigi.Task):
 
     def output(self):
@@ -334,50 +383,23 @@ class ExtractESPDataForBRCA2Region(luigi.Task):
         print_subprocess_output_and_error(sp)
 
 
-@requires(ExtractESPDataForBRCA2Region)
-class ConcatenateESPBRCA12Data(luigi.Task):
-
-    def output(self):
-        esp_file_dir = self.file_parent_dir + "/ESP"
-        return luigi.LocalTarget(esp_file_dir + "/esp.brca12.hg38.vcf")
-
-    def run(self):
-        # Note: requires correct installation of VCF tools and export PERL5LIB=/path/to/your/vcftools-directory/src/perl/ in path
-        esp_file_dir = self.file_parent_dir + "/ESP"
-        brca1_region_output = esp_file_dir + "/esp.brca1.vcf"
-        brca2_region_output = esp_file_dir + "/esp.brca2.vcf"
-        concatenated_brca_output_file = esp_file_dir + "/esp.brca12.hg38.vcf"
-        writable_concatenated_brca_output_file = open(concatenated_brca_output_file, 'w')
-        args = ["vcf-concat", brca1_region_output, brca2_region_output]
-        print "Calling vcf-concat with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_concatenated_brca_output_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-
-        writable_concatenated_brca_output_file.close()
-        check_file_for_contents(concatenated_brca_output_file)
-        print "Concatenation complete."
-
-
-@requires(ConcatenateESPBRCA12Data)
+@inherits(DecompressESPTarfile)
 class SortConcatenatedESPBRCA12Data(luigi.Task):
 
+    def requires(self):
+        return [self.clone(ExtractESPDataForBRCA1Region), self.clone(ExtractESPDataForBRCA2Region)]
+
     def output(self):
         esp_file_dir = self.file_parent_dir + "/ESP"
         return luigi.LocalTarget(esp_file_dir + "/esp.brca12.sorted.hg38.vcf")
 
     def run(self):
         esp_file_dir = self.file_parent_dir + "/ESP"
-        sorted_concatenated_brca_output_file = esp_file_dir + "/esp.brca12.sorted.hg38.vcf"
-        concatenated_brca_output_file = esp_file_dir + "/esp.brca12.hg38.vcf"
-        writable_sorted_concatenated_brca_output_file = open(sorted_concatenated_brca_output_file, 'w')
-        args = ["vcf-sort", concatenated_brca_output_file]
-        print "Calling vcf-sort with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_sorted_concatenated_brca_output_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
+        vcf_files = [esp_file_dir + "/esp.brca1.vcf", esp_file_dir + "/esp.brca2.vcf"]
+        print "Concatenating and sorting %s" % (vcf_files)
+        vcf_tools.merge_vcfs(vcf_files, self.output().path)
 
-        writable_sorted_concatenated_brca_output_file.close()
-        check_file_for_contents(sorted_concatenated_brca_output_file)
-        print "Sorting of concatenated files complete."
+        check_file_for_contents(self.output().path)
 
 
 @requires(SortConcatenatedESPBRCA12Data)
@@ -428,7 +450,7 @@ class DownloadBRCA1BICData(luigi.Task):
         download_file_with_basic_auth(brca1_data_url, brca1_file_name, self.u, self.p)
 
 
-@requires(DownloadBRCA1BICData)
+@inherits(DownloadBRCA1BICData)
 class DownloadBRCA2BICData(luigi.Task):
 
     def output(self):
@@ -436,7 +458,7 @@ class DownloadBRCA2BICData(luigi.Task):
         return luigi.LocalTarget(bic_file_dir + "/brca2_data.txt")
 
     def run(self):
-        bic_file_dir = self.file_parent_dir + '/BIC'
+        bic_file_dir = create_path_if_nonexistent(self.file_parent_dir + '/BIC')
         os.chdir(bic_file_dir)
 
         brca2_data_url = "https://research.nhgri.nih.gov/projects/bic/Member/cgi-bin/bic_query_result.cgi/brca2_data.txt?table=brca2_exons&download=1&submit=Download"
@@ -444,7 +466,7 @@ class DownloadBRCA2BICData(luigi.Task):
         download_file_with_basic_auth(brca2_data_url, brca2_file_name, self.u, self.p)
 
 
-@requires(DownloadBRCA2BICData)
+@requires(DownloadBRCA1BICData)
 class ConvertBRCA1BICDataToVCF(luigi.Task):
 
     def output(self):
@@ -468,7 +490,7 @@ class ConvertBRCA1BICDataToVCF(luigi.Task):
         check_file_for_contents(bic_brca1_vcf_file)
 
 
-@requires(ConvertBRCA1BICDataToVCF)
+@requires(DownloadBRCA2BICData)
 class ConvertBRCA2BICDataToVCF(luigi.Task):
 
     def output(self):
@@ -492,67 +514,23 @@ class ConvertBRCA2BICDataToVCF(luigi.Task):
         check_file_for_contents(bic_brca2_vcf_file)
 
 
-@requires(ConvertBRCA2BICDataToVCF)
-class ConcatenateBRCA12BICData(luigi.Task):
-
-    def output(self):
-        bic_file_dir = self.file_parent_dir + '/BIC'
-        return luigi.LocalTarget(bic_file_dir + "/bic_brca12.hg19.vcf")
-
-    def run(self):
-        bic_file_dir = self.file_parent_dir + '/BIC'
-
-        bic_brca12_vcf_file = bic_file_dir + "/bic_brca12.hg19.vcf"
-        writable_bic_brca12_vcf_file = open(bic_brca12_vcf_file, 'w')
-        args = ["vcf-concat", bic_file_dir + "/bic_brca1.hg19.vcf", bic_file_dir + "/bic_brca2.hg19.vcf"]
-        print "Concatenating BRCA1/2 BIC data with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_bic_brca12_vcf_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-
-        check_file_for_contents(bic_brca12_vcf_file)
-
-
-@requires(ConcatenateBRCA12BICData)
-class CrossmapConcatenatedBICData(luigi.Task):
-
-    def output(self):
-        bic_file_dir = self.file_parent_dir + '/BIC'
-        return luigi.LocalTarget(bic_file_dir + "/bic_brca12.hg38.vcf")
-
-    def run(self):
-        bic_file_dir = self.file_parent_dir + '/BIC'
-        brca_resources_dir = self.resources_dir
-
-        bic_brca12_hg38_vcf_file = bic_file_dir + "/bic_brca12.hg38.vcf"
-        writable_bic_brca12_hg38_vcf_file = open(bic_brca12_hg38_vcf_file, 'w')
-        args = ["CrossMap.py", "vcf", brca_resources_dir + "/hg19ToHg38.over.chain.gz",
-                bic_file_dir + "/bic_brca12.hg19.vcf", brca_resources_dir + "/hg38.fa",
-                bic_file_dir + "/bic_brca12.hg38.vcf"]
-        print "Crossmapping concatenated BIC data with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_bic_brca12_hg38_vcf_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-
-        check_file_for_contents(bic_brca12_hg38_vcf_file)
-
-
-@requires(CrossmapConcatenatedBICData)
+@inherits(DownloadBRCA1BICData)
 class SortBICData(luigi.Task):
 
+    def requires(self):
+        return [self.clone(ConvertBRCA1BICDataToVCF), self.clone(ConvertBRCA2BICDataToVCF)]
+
     def output(self):
         bic_file_dir = self.file_parent_dir + '/BIC'
         return luigi.LocalTarget(bic_file_dir + "/bic_brca12.sorted.hg38.vcf")
 
     def run(self):
         bic_file_dir = self.file_parent_dir + '/BIC'
+        vcf_files = [bic_file_dir + "/bic_brca1.hg19.vcf", bic_file_dir + "/bic_brca2.hg19.vcf"]
+        print "Concatenating, crossmapping and sorting BIC data from %s" % (vcf_files)
+        vcf_tools.merge_vcfs(vcf_files, self.output().path, get_liftover(self.resources_dir))
 
-        sorted_bic_output_file = bic_file_dir + "/bic_brca12.sorted.hg38.vcf"
-        writable_sorted_bic_output_file = open(sorted_bic_output_file, 'w')
-        args = ["vcf-sort", bic_file_dir + "/bic_brca12.hg38.vcf"]
-        print "Sorting BIC data with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_sorted_bic_output_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-
-        check_file_for_contents(sorted_bic_output_file)
+        check_file_for_contents(self.output().path)
 
 
 @requires(SortBICData)
@@ -631,7 +609,7 @@ class ConvertEXLOVDBRCA1ExtractToVCF(luigi.Task):
         check_file_for_contents(ex_lovd_file_dir + "/exLOVD_brca1.hg19.vcf")
 
 
-@requires(ConvertEXLOVDBRCA1ExtractToVCF)
+@requires(ExtractDataFromLatestEXLOVD)
 class ConvertEXLOVDBRCA2ExtractToVCF(luigi.Task):
 
     def output(self):
@@ -643,6 +621,8 @@ class ConvertEXLOVDBRCA2ExtractToVCF(luigi.Task):
         brca_resources_dir = self.resources_dir
         artifacts_dir = create_path_if_nonexistent(self.output_dir + "/release/artifacts/")
 
+        os.chdir(lovd_method_dir)
+
         args = ["./lovd2vcf.py", "-i", ex_lovd_file_dir + "/BRCA2.txt", "-o",
                 ex_lovd_file_dir + "/exLOVD_brca2.hg19.vcf", "-a", "exLOVDAnnotation",
                 "-r", brca_resources_dir + "/refseq_annotation.hg19.gp", "-g",
@@ -654,66 +634,23 @@ class ConvertEXLOVDBRCA2ExtractToVCF(luigi.Task):
         check_file_for_contents(ex_lovd_file_dir + "/exLOVD_brca2.hg19.vcf")
 
 
-@requires(ConvertEXLOVDBRCA2ExtractToVCF)
-class ConcatenateEXLOVDVCFFiles(luigi.Task):
-
-    def output(self):
-        ex_lovd_file_dir = self.file_parent_dir + "/exLOVD"
-        return luigi.LocalTarget(ex_lovd_file_dir + "/exLOVD_brca12.hg19.vcf")
-
-    def run(self):
-        ex_lovd_file_dir = self.file_parent_dir + "/exLOVD"
-
-        ex_lovd_brca12_hg19_vcf_file = ex_lovd_file_dir + "/exLOVD_brca12.hg19.vcf"
-        writable_ex_lovd_brca12_hg19_vcf_file = open(ex_lovd_brca12_hg19_vcf_file, 'w')
-        args = ["vcf-concat", ex_lovd_file_dir + "/exLOVD_brca1.hg19.vcf", ex_lovd_file_dir + "/exLOVD_brca2.hg19.vcf"]
-        print "Running vcf-concat with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_ex_lovd_brca12_hg19_vcf_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-
-        check_file_for_contents(ex_lovd_file_dir + "/exLOVD_brca12.hg19.vcf")
-
-
-@requires(ConcatenateEXLOVDVCFFiles)
-class CrossmapConcatenatedEXLOVDData(luigi.Task):
-
-    def output(self):
-        ex_lovd_file_dir = self.file_parent_dir + "/exLOVD"
-        return luigi.LocalTarget(ex_lovd_file_dir + "/exLOVD_brca12.hg38.vcf")
-
-    def run(self):
-        ex_lovd_file_dir = self.file_parent_dir + "/exLOVD"
-        brca_resources_dir = self.resources_dir
-
-        args = ["CrossMap.py", "vcf", brca_resources_dir + "/hg19ToHg38.over.chain.gz",
-                ex_lovd_file_dir + "/exLOVD_brca12.hg19.vcf", brca_resources_dir + "/hg38.fa",
-                ex_lovd_file_dir + "/exLOVD_brca12.hg38.vcf"]
-        print "Running CrossMap.py with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-
-        check_file_for_contents(ex_lovd_file_dir + "/exLOVD_brca12.hg38.vcf")
-
-
-@requires(CrossmapConcatenatedEXLOVDData)
+@inherits(ExtractDataFromLatestEXLOVD)
 class SortEXLOVDOutput(luigi.Task):
 
+    def requires(self):
+        return [self.clone(ConvertEXLOVDBRCA1ExtractToVCF), self.clone(ConvertEXLOVDBRCA2ExtractToVCF)]
+
     def output(self):
         ex_lovd_file_dir = self.file_parent_dir + "/exLOVD"
         return luigi.LocalTarget(ex_lovd_file_dir + "/exLOVD_brca12.sorted.hg38.vcf")
 
     def run(self):
         ex_lovd_file_dir = self.file_parent_dir + "/exLOVD"
+        vcf_files = [ex_lovd_file_dir + "/exLOVD_brca1.hg19.vcf", ex_lovd_file_dir + "/exLOVD_brca2.hg19.vcf"]
+        print "Concatenating, crossmapping and sorting %s" % (vcf_files)
+        vcf_tools.merge_vcfs(vcf_files, self.output().path, get_liftover(self.resources_dir))
 
-        sorted_ex_lovd_output_file = ex_lovd_file_dir + "/exLOVD_brca12.sorted.hg38.vcf"
-        writable_sorted_ex_lovd_output_file = open(sorted_ex_lovd_output_file, 'w')
-        args = ["vcf-sort", ex_lovd_file_dir + "/exLOVD_brca12.hg38.vcf"]
-        print "Running vcf-sort with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_sorted_ex_lovd_output_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-        print "Sorted BRCA1/2 hg38 vcf file into %s" % (writable_sorted_ex_lovd_output_file)
-
-        check_file_for_contents(ex_lovd_file_dir + "/exLOVD_brca12.sorted.hg38.vcf")
+        check_file_for_contents(self.output().path)
 
 
 @requires(SortEXLOVDOutput)
@@ -768,9 +705,7 @@ class DownloadLOVDInputFile(luigi.Task):
 
     def run(self):
         create_path_if_nonexistent(os.path.dirname(self.output().path))
-        data = urlopen_with_retry(self.shared_lovd_data_url).read()
-        with open(self.output().path, "wb") as f:
-            f.write(data)
+        download_file_and_display_progress(self.shared_lovd_data_url, self.output().path)
 
 
 @requires(DownloadLOVDInputFile)
@@ -824,27 +759,6 @@ class ConvertSharedLOVDToVCF(luigi.Task):
 
 
 @requires(ConvertSharedLOVDToVCF)
-class CrossmapConcatenatedSharedLOVDData(luigi.Task):
-
-    def output(self):
-        lovd_file_dir = self.file_parent_dir + "/LOVD"
-        return luigi.LocalTarget(lovd_file_dir + "/sharedLOVD_brca12.hg38.vcf")
-
-    def run(self):
-        lovd_file_dir = self.file_parent_dir + "/LOVD"
-        brca_resources_dir = self.resources_dir
-
-        args = ["CrossMap.py", "vcf", brca_resources_dir + "/hg19ToHg38.over.chain.gz",
-                lovd_file_dir + "/sharedLOVD_brca12.hg19.vcf", brca_resources_dir + "/hg38.fa",
-                lovd_file_dir + "/sharedLOVD_brca12.hg38.vcf"]
-        print "Running CrossMap.py with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-
-        check_file_for_contents(lovd_file_dir + "/sharedLOVD_brca12.hg38.vcf")
-
-
-@requires(CrossmapConcatenatedSharedLOVDData)
 class SortSharedLOVDOutput(luigi.Task):
 
     def output(self):
@@ -853,16 +767,11 @@ class SortSharedLOVDOutput(luigi.Task):
 
     def run(self):
         lovd_file_dir = self.file_parent_dir + "/LOVD"
+        vcf_files = [lovd_file_dir + "/sharedLOVD_brca12.hg19.vcf"]
+        print "Crossmapping and sorting %s" % (vcf_files)
+        vcf_tools.merge_vcfs(vcf_files, self.output().path, get_liftover(self.resources_dir))
 
-        sorted_lovd_output_file = lovd_file_dir + "/sharedLOVD_brca12.sorted.hg38.vcf"
-        writable_sorted_lovd_output_file = open(sorted_lovd_output_file, 'w')
-        args = ["vcf-sort", lovd_file_dir + "/sharedLOVD_brca12.hg38.vcf"]
-        print "Running vcf-sort with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_sorted_lovd_output_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-        print "Sorted BRCA1/2 hg38 vcf file into %s" % (writable_sorted_lovd_output_file)
-
-        check_file_for_contents(lovd_file_dir + "/sharedLOVD_brca12.sorted.hg38.vcf")
+        check_file_for_contents(self.output().path)
 
 
 @requires(SortSharedLOVDOutput)
@@ -911,7 +820,7 @@ class DownloadG1KCHR13GZ(luigi.Task):
         download_file_and_display_progress(chr13_vcf_gz_url)
 
 
-@requires(DownloadG1KCHR13GZ)
+@inherits(DownloadG1KCHR13GZ)
 class DownloadG1KCHR17GZ(luigi.Task):
 
     def output(self):
@@ -919,14 +828,14 @@ class DownloadG1KCHR17GZ(luigi.Task):
         return luigi.LocalTarget(g1k_file_dir + "/ALL.chr17.phase3_shapeit2_mvncall_integrated_v5a.20130502.genotypes.vcf.gz")
 
     def run(self):
-        g1k_file_dir = self.file_parent_dir + '/G1K'
+        g1k_file_dir = create_path_if_nonexistent(self.file_parent_dir + '/G1K')
         os.chdir(g1k_file_dir)
 
         chr17_vcf_gz_url = "ftp://ftp.1000genomes.ebi.ac.uk/vol1/ftp/release/20130502/ALL.chr17.phase3_shapeit2_mvncall_integrated_v5a.20130502.genotypes.vcf.gz"
         download_file_and_display_progress(chr17_vcf_gz_url)
 
 
-@requires(DownloadG1KCHR17GZ)
+@inherits(DownloadG1KCHR13GZ)
 class DownloadG1KCHR13GZTBI(luigi.Task):
 
     def output(self):
@@ -934,14 +843,14 @@ class DownloadG1KCHR13GZTBI(luigi.Task):
         return luigi.LocalTarget(g1k_file_dir + "/ALL.chr13.phase3_shapeit2_mvncall_integrated_v5a.20130502.genotypes.vcf.gz.tbi")
 
     def run(self):
-        g1k_file_dir = self.file_parent_dir + '/G1K'
+        g1k_file_dir = create_path_if_nonexistent(self.file_parent_dir + '/G1K')
         os.chdir(g1k_file_dir)
 
         chr13_vcf_gz_tbi_url = "ftp://ftp.1000genomes.ebi.ac.uk/vol1/ftp/release/20130502/ALL.chr13.phase3_shapeit2_mvncall_integrated_v5a.20130502.genotypes.vcf.gz.tbi"
         download_file_and_display_progress(chr13_vcf_gz_tbi_url)
 
 
-@requires(DownloadG1KCHR13GZTBI)
+@inherits(DownloadG1KCHR13GZ)
 class DownloadG1KCHR17GZTBI(luigi.Task):
 
     def output(self):
@@ -949,16 +858,19 @@ class DownloadG1KCHR17GZTBI(luigi.Task):
         return luigi.LocalTarget(g1k_file_dir + "/ALL.chr17.phase3_shapeit2_mvncall_integrated_v5a.20130502.genotypes.vcf.gz.tbi")
 
     def run(self):
-        g1k_file_dir = self.file_parent_dir + '/G1K'
+        g1k_file_dir = create_path_if_nonexistent(self.file_parent_dir + '/G1K')
         os.chdir(g1k_file_dir)
 
         chr17_vcf_gz_tbi_url = "ftp://ftp.1000genomes.ebi.ac.uk/vol1/ftp/release/20130502/ALL.chr17.phase3_shapeit2_mvncall_integrated_v5a.20130502.genotypes.vcf.gz.tbi"
         download_file_and_display_progress(chr17_vcf_gz_tbi_url)
 
 
-@requires(DownloadG1KCHR17GZTBI)
+@inherits(DownloadG1KCHR13GZ)
 class ExtractCHR13BRCAData(luigi.Task):
 
+    def requires(self):
+        return [self.clone(DownloadG1KCHR13GZ), self.clone(DownloadG1KCHR13GZTBI)]
+
     def output(self):
         g1k_file_dir = self.file_parent_dir + '/G1K'
         return luigi.LocalTarget(g1k_file_dir + "/chr13_brca2_1000g_GRCh37.vcf")
@@ -967,20 +879,19 @@ class ExtractCHR13BRCAData(luigi.Task):
         g1k_file_dir = self.file_parent_dir + '/G1K'
 
         chr13_brca2_vcf_file = g1k_file_dir + "/chr13_brca2_1000g_GRCh37.vcf"
-        writable_chr13_brca2_vcf_file = open(chr13_brca2_vcf_file, "w")
-        args = ["tabix", "-h",
-                g1k_file_dir + "/ALL.chr13.phase3_shapeit2_mvncall_integrated_v5a.20130502.genotypes.vcf.gz",
-                "13:32889617-32973809"]
-        print "Running tabix with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_chr13_brca2_vcf_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
+        vcf_gz = g1k_file_dir + "/ALL.chr13.phase3_shapeit2_mvncall_integrated_v5a.20130502.genotypes.vcf.gz"
+        print "Extracting 13:32889617-32973809 from %s" % (vcf_gz)
+        vcf_tools.extract_region(vcf_gz, "13:32889617-32973809", chr13_brca2_vcf_file)
 
         check_file_for_contents(chr13_brca2_vcf_file)
 
 
-@requires(ExtractCHR13BRCAData)
+@inherits(DownloadG1KCHR13GZ)
 class ExtractCHR17BRCAData(luigi.Task):
 
+    def requires(self):
+        return [self.clone(DownloadG1KCHR17GZ), self.clone(DownloadG1KCHR17GZTBI)]
+
     def output(self):
         g1k_file_dir = self.file_parent_dir + '/G1K'
         return luigi.LocalTarget(g1k_file_dir + "/chr17_brca1_1000g_GRCh37.vcf")
@@ -989,76 +900,30 @@ class ExtractCHR17BRCAData(luigi.Task):
         g1k_file_dir = self.file_parent_dir + '/G1K'
 
         chr17_brca1_vcf_file = g1k_file_dir + "/chr17_brca1_1000g_GRCh37.vcf"
-        writable_chr17_brca1_vcf_file = open(chr17_brca1_vcf_file, "w")
-        args = ["tabix", "-h",
-                g1k_file_dir + "/ALL.chr17.phase3_shapeit2_mvncall_integrated_v5a.20130502.genotypes.vcf.gz",
-                "17:41196312-41277500"]
-        print "Running tabix with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_chr17_brca1_vcf_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
+        vcf_gz = g1k_file_dir + "/ALL.chr17.phase3_shapeit2_mvncall_integrated_v5a.20130502.genotypes.vcf.gz"
+        print "Extracting 17:41196312-41277500 from %s" % (vcf_gz)
+        vcf_tools.extract_region(vcf_gz, "17:41196312-41277500", chr17_brca1_vcf_file)
 
         check_file_for_contents(chr17_brca1_vcf_file)
 
 
-@requires(ExtractCHR17BRCAData)
-class ConcatenateG1KData(luigi.Task):
-
-    def output(self):
-        g1k_file_dir = self.file_parent_dir + '/G1K'
-        return luigi.LocalTarget(g1k_file_dir + "/brca12_1000g_GRCh37.vcf")
-
-    def run(self):
-        g1k_file_dir = self.file_parent_dir + '/G1K'
-        concatenated_g1k_vcf = g1k_file_dir + "/brca12_1000g_GRCh37.vcf"
-        writable_concatenated_g1k_vcf = open(concatenated_g1k_vcf, "w")
-        args = ["vcf-concat", g1k_file_dir + "/chr13_brca2_1000g_GRCh37.vcf",
-                g1k_file_dir + "/chr17_brca1_1000g_GRCh37.vcf"]
-        print "Running vcf-concat with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_concatenated_g1k_vcf, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-
-        check_file_for_contents(concatenated_g1k_vcf)
-
-
-@requires(ConcatenateG1KData)
-class CrossmapConcatenatedG1KData(luigi.Task):
-
-    def output(self):
-        g1k_file_dir = self.file_parent_dir + '/G1K'
-        return luigi.LocalTarget(g1k_file_dir + "/1000G_brca.hg38.vcf")
-
-    def run(self):
-        g1k_file_dir = self.file_parent_dir + '/G1K'
-        brca_resources_dir = self.resources_dir
-
-        args = ["CrossMap.py", "vcf", brca_resources_dir + "/hg19ToHg38.over.chain.gz",
-                g1k_file_dir + "/brca12_1000g_GRCh37.vcf", brca_resources_dir + "/hg38.fa",
-                g1k_file_dir + "/1000G_brca.hg38.vcf"]
-        print "Running CrossMap.py with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-
-        check_file_for_contents(g1k_file_dir + "/1000G_brca.hg38.vcf")
-
-
-@requires(CrossmapConcatenatedG1KData)
+@inherits(DownloadG1KCHR13GZ)
 class SortG1KData(luigi.Task):
 
+    def requires(self):
+        return [self.clone(ExtractCHR13BRCAData), self.clone(ExtractCHR17BRCAData)]
+
     def output(self):
         g1k_file_dir = self.file_parent_dir + '/G1K'
         return luigi.LocalTarget(g1k_file_dir + "/1000G_brca.sorted.hg38.vcf")
 
     def run(self):
         g1k_file_dir = self.file_parent_dir + '/G1K'
+        vcf_files = [g1k_file_dir + "/chr13_brca2_1000g_GRCh37.vcf", g1k_file_dir + "/chr17_brca1_1000g_GRCh37.vcf"]
+        print "Concatenating, crossmapping and sorting %s" % (vcf_files)
+        vcf_tools.merge_vcfs(vcf_files, self.output().path, get_liftover(self.resources_dir))
 
-        sorted_g1k_output_file = g1k_file_dir + "/1000G_brca.sorted.hg38.vcf"
-        writable_sorted_g1k_output_file = open(sorted_g1k_output_file, 'w')
-        args = ["vcf-sort", g1k_file_dir + "/1000G_brca.hg38.vcf"]
-        print "Running vcf-sort with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_sorted_g1k_output_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-
-        check_file_for_contents(g1k_file_dir + "/1000G_brca.sorted.hg38.vcf")
+        check_file_for_contents(self.output().path)
 
 
 @requires(SortG1KData)
@@ -1107,14 +972,14 @@ class DownloadEXACVCFGZFile(luigi.Task):
         download_file_and_display_progress(exac_vcf_gz_url, exac_vcf_gz_file_name)
 
 
-@requires(DownloadEXACVCFGZFile)
+@inherits(DownloadEXACVCFGZFile)
 class DownloadEXACVCFGZTBIFile(luigi.Task):
     def output(self):
         exac_file_dir = self.file_parent_dir + '/exac'
         return luigi.LocalTarget(exac_file_dir + "/ExAC_nonTCGA.r0.3.1.sites.vep.vcf.gz.tbi")
 
     def run(self):
-        exac_file_dir = self.file_parent_dir + '/exac'
+        exac_file_dir = create_path_if_nonexistent(self.file_parent_dir + '/exac')
         os.chdir(exac_file_dir)
 
         exac_vcf_gz_tbi_url = "ftp://ftp.broadinstitute.org/pub/ExAC_release/current/subsets/ExAC_nonTCGA.r0.3.1.sites.vep.vcf.gz.tbi"
@@ -1122,8 +987,11 @@ class DownloadEXACVCFGZTBIFile(luigi.Task):
         download_file_and_display_progress(exac_vcf_gz_tbi_url, exac_vcf_gz_tbi_file_name)
 
 
-@requires(DownloadEXACVCFGZTBIFile)
+@inherits(DownloadEXACVCFGZFile)
 class ExtractBRCA1DataFromExac(luigi.Task):
+    def requires(self):
+        return [self.clone(DownloadEXACVCFGZFile), self.clone(DownloadEXACVCFGZTBIFile)]
+
     def output(self):
         exac_file_dir = self.file_parent_dir + '/exac'
         return luigi.LocalTarget(exac_file_dir + "/exac.brca1.hg19.vcf")
@@ -1132,18 +1000,18 @@ class ExtractBRCA1DataFromExac(luigi.Task):
         exac_file_dir = self.file_parent_dir + '/exac'
 
         exac_brca1_hg19_vcf_file = exac_file_dir + "/exac.brca1.hg19.vcf"
-        writable_exac_brca1_hg19_vcf_file = open(exac_brca1_hg19_vcf_file, 'w')
-
-        args = ["tabix", "-h", exac_file_dir + "/ExAC_nonTCGA.r0.3.1.sites.vep.vcf.gz", "17:41196312-41277500"]
-        print "Running tabix with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_exac_brca1_hg19_vcf_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
+        vcf_gz = exac_file_dir + "/ExAC_nonTCGA.r0.3.1.sites.vep.vcf.gz"
+        print "Extracting 17:41196312-41277500 from %s" % (vcf_gz)
+        vcf_tools.extract_region(vcf_gz, "17:41196312-41277500", exac_brca1_hg19_vcf_file)
 
         check_file_for_contents(exac_brca1_hg19_vcf_file)
 
 
-@requires(ExtractBRCA1DataFromExac)
+@inherits(DownloadEXACVCFGZFile)
 class ExtractBRCA2DataFromExac(luigi.Task):
+    def requires(self):
+        return [self.clone(DownloadEXACVCFGZFile), self.clone(DownloadEXACVCFGZTBIFile)]
+
     def output(self):
         exac_file_dir = self.file_parent_dir + '/exac'
         return luigi.LocalTarget(exac_file_dir + "/exac.brca2.hg19.vcf")
@@ -1152,71 +1020,30 @@ class ExtractBRCA2DataFromExac(luigi.Task):
         exac_file_dir = self.file_parent_dir + '/exac'
 
         exac_brca2_hg19_vcf_file = exac_file_dir + "/exac.brca2.hg19.vcf"
-        writable_exac_brca2_hg19_vcf_file = open(exac_brca2_hg19_vcf_file, 'w')
-
-        args = ["tabix", "-h", exac_file_dir + "/ExAC_nonTCGA.r0.3.1.sites.vep.vcf.gz", "13:32889617-32973809"]
-        print "Running tabix with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_exac_brca2_hg19_vcf_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
+        vcf_gz = exac_file_dir + "/ExAC_nonTCGA.r0.3.1.sites.vep.vcf.gz"
+        print "Extracting 13:32889617-32973809 from %s" % (vcf_gz)
+        vcf_tools.extract_region(vcf_gz, "13:32889617-32973809", exac_brca2_hg19_vcf_file)
 
         check_file_for_contents(exac_brca2_hg19_vcf_file)
 
 
-@requires(ExtractBRCA2DataFromExac)
-class ConcatenateEXACData(luigi.Task):
-    def output(self):
-        exac_file_dir = self.file_parent_dir + '/exac'
-        return luigi.LocalTarget(exac_file_dir + "/exac.brca12.hg19.vcf")
-
-    def run(self):
-        exac_file_dir = self.file_parent_dir + '/exac'
-
-        exac_brca12_hg19_vcf_file = exac_file_dir + "/exac.brca12.hg19.vcf"
-        writable_exac_brca12_hg19_vcf_file = open(exac_brca12_hg19_vcf_file, 'w')
-        args = ["vcf-concat", exac_file_dir + "/exac.brca1.hg19.vcf", exac_file_dir + "/exac.brca2.hg19.vcf"]
-        print "Running tabix with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=writable_exac_brca12_hg19_vcf_file, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-
-        check_file_for_contents(exac_brca12_hg19_vcf_file)
-
-
-@requires(ConcatenateEXACData)
-class CrossmapEXACData(luigi.Task):
-    def output(self):
-        exac_file_dir = self.file_parent_dir + '/exac'
-        return luigi.LocalTarget(exac_file_dir + "/exac.brca12.hg38.vcf")
-
-    def run(self):
-        exac_file_dir = self.file_parent_dir + '/exac'
-        brca_resources_dir = self.resources_dir
-
-        args = ["CrossMap.py", "vcf", brca_resources_dir + "/hg19ToHg38.over.chain.gz",
-                exac_file_dir + "/exac.brca12.hg19.vcf", brca_resources_dir + "/hg38.fa",
-                exac_file_dir + "/exac.brca12.hg38.vcf"]
-        print "Running CrossMap.py with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
-
-        check_file_for_contents(exac_file_dir + "/exac.brca12.hg38.vcf")
+@inherits(DownloadEXACVCFGZFile)
+class SortEXACData(luigi.Task):
 
+    def requires(self):
+        return [self.clone(ExtractBRCA1DataFromExac), self.clone(ExtractBRCA2DataFromExac)]
 
-@requires(CrossmapEXACData)
-class SortEXACData(luigi.Task):
     def output(self):
         exac_file_dir = self.file_parent_dir + '/exac'
         return luigi.LocalTarget(exac_file_dir + "/exac.brca12.sorted.hg38.vcf")
 
     def run(self):
         exac_file_dir = self.file_parent_dir + '/exac'
+        vcf_files = [exac_file_dir + "/exac.brca1.hg19.vcf", exac_file_dir + "/exac.brca2.hg19.vcf"]
+        print "Concatenating, crossmapping and sorting %s" % (vcf_files)
+        vcf_tools.merge_vcfs(vcf_files, self.output().path, get_liftover(self.resources_dir))
 
-        with self.output().open("w") as vcf_file:
-            args = ["vcf-sort", exac_file_dir + "/exac.brca12.hg38.vcf"]
-            print "Running tabix with the following args: %s" % (args)
-            sp = subprocess.Popen(args, stdout=vcf_file, stderr=subprocess.PIPE)
-            print_subprocess_output_and_error(sp)
-
-        check_file_for_contents(exac_file_dir + "/exac.brca12.sorted.hg38.vcf")
+        check_file_for_contents(self.output().path)
 
 
 @requires(SortEXACData)
@@ -1289,6 +1116,12 @@ class DownloadLatestEnigmaData(luigi.Task):
 
 class MergeVCFsIntoTSVFile(luigi.Task):
     date = luigi.DateParameter(default=datetime.date.today())
+    u = luigi.Parameter(default="UNKNOWN_USER")
+    p = luigi.Parameter(default="UNKNOWN_PASSWORD", significant=False)
+
+    synapse_username = luigi.Parameter(default="UNKNOWN_SYNAPSE_USER", description='used to access preprocessed enigma files')
+    synapse_password = luigi.Parameter(default="UNKNOWN_SYNAPSE_PASSWORD", description='used to access preprocessed enigma files', significant=False)
+    synapse_enigma_file_id = luigi.Parameter(default="UNKNOWN_SYNAPSE_FILEID", description='file id for combined enigma tsv file')
 
     resources_dir = luigi.Parameter(default=DEFAULT_BRCA_RESOURCES_DIR,
                                     description='directory to store brca-resources data')
@@ -1304,6 +1137,20 @@ class MergeVCFsIntoTSVFile(luigi.Task):
 
     release_notes = luigi.Parameter(default=None, description='notes for release, must be a .txt file')
 
+    def requires(self):
+        '''
+        variant_merging.py reads the output of every source from output_dir, the source pipelines
+        are independent of each other and can run in parallel with --workers
+        '''
+        return [self.clone(CopyClinvarVCFToOutputDir),
+                self.clone(CopyESPOutputToOutputDir),
+                self.clone(CopyBICOutputToOutputDir),
+                self.clone(CopyG1KOutputToOutputDir),
+                self.clone(CopyEXACOutputToOutputDir),
+                self.clone(CopyEXLOVDOutputToOutputDir),
+                self.clone(CopySharedLOVDOutputToOutputDir),
+                self.clone(DownloadLatestEnigmaData)]
+
     def output(self):
         artifacts_dir = create_path_if_nonexistent(self.output_dir + "/release/artifacts/")
         return luigi.LocalTarget(artifacts_dir + "merged.tsv")
@@ -1314,11 +1161,10 @@ class MergeVCFsIntoTSVFile(luigi.Task):
 
         os.chdir(data_merging_method_dir)
 
-        args = ["python", "variant_merging.py", "-i", self.output_dir + "/", "-o",
+        args = ["-i", self.output_dir + "/", "-o",
                 artifacts_dir, "-p", "-r", brca_resources_dir + "/", "-a", artifacts_dir, "-v"]
         print "Running variant_merging.py with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
+        run_pipeline_script(data_merging_method_dir, "variant_merging", args)
 
         check_file_for_contents(artifacts_dir + "merged.tsv")
 
@@ -1334,11 +1180,10 @@ class AnnotateMergedOutput(luigi.Task):
         artifacts_dir = self.output_dir + "/release/artifacts/"
         os.chdir(data_merging_method_dir)
 
-        args = ["python", "add_annotation.py", "-i", artifacts_dir + "merged.tsv",
+        args = ["-i", artifacts_dir + "merged.tsv",
                 "-o", artifacts_dir + "annotated.tsv", "-l", artifacts_dir + "add-annotation.log", "-v"]
         print "Running add_annotation.py with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
+        run_pipeline_script(data_merging_method_dir, "add_annotation", args)
 
         # get number of variants thrown out
         numVariantsRemoved = 0
@@ -1350,7 +1195,8 @@ class AnnotateMergedOutput(luigi.Task):
                     numVariantsRemoved = int(filter(str.isdigit, line))
 
         check_input_and_output_tsvs_for_same_number_variants(artifacts_dir + "merged.tsv",
-                                                             artifacts_dir + "annotated.tsv", numVariantsRemoved)
+                                                             artifacts_dir + "annotated.tsv", numVariantsRemoved,
+                                                             reportFile=artifacts_dir + "stage_integrity.json")
 
 
 @requires(AnnotateMergedOutput)
@@ -1364,14 +1210,14 @@ class AggregateMergedOutput(luigi.Task):
         artifacts_dir = self.output_dir + "/release/artifacts/"
         os.chdir(data_merging_method_dir)
 
-        args = ["python", "aggregate_across_columns.py", "-i", artifacts_dir + "annotated.tsv",
+        args = ["-i", artifacts_dir + "annotated.tsv",
                 "-o", artifacts_dir + "aggregated.tsv"]
         print "Running aggregate_across_columns.py with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
+        run_pipeline_script(data_merging_method_dir, "aggregate_across_columns", args)
 
         check_input_and_output_tsvs_for_same_number_variants(artifacts_dir + "annotated.tsv",
-                                                             artifacts_dir + "aggregated.tsv")
+                                                             artifacts_dir + "aggregated.tsv",
+                                                             reportFile=artifacts_dir + "stage_integrity.json")
 
 
 @requires(AggregateMergedOutput)
@@ -1387,7 +1233,7 @@ class BuildAggregatedOutput(luigi.Task):
         brca_resources_dir = self.resources_dir
         os.chdir(data_merging_method_dir)
 
-        args = ["python", "brca_pseudonym_generator.py", "-i", artifacts_dir + "/aggregated.tsv", "-p",
+        args = ["-i", artifacts_dir + "/aggregated.tsv", "-p",
                 "-j", brca_resources_dir + "/hg18.fa",
                 "-k", brca_resources_dir + "/hg19.fa",
                 "-l", brca_resources_dir + "/hg38.fa",
@@ -1397,11 +1243,11 @@ class BuildAggregatedOutput(luigi.Task):
                 "-o", artifacts_dir + "built.tsv",
                 "--artifacts_dir", artifacts_dir]
         print "Running brca_pseudonym_generator.py with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
+        run_pipeline_script(data_merging_method_dir, "brca_pseudonym_generator", args)
 
         check_input_and_output_tsvs_for_same_number_variants(artifacts_dir + "aggregated.tsv",
-                                                             artifacts_dir + "built.tsv")
+                                                             artifacts_dir + "built.tsv",
+                                                             reportFile=artifacts_dir + "stage_integrity.json")
 
 
 @requires(BuildAggregatedOutput)
@@ -1417,14 +1263,14 @@ class AppendMupitStructure(luigi.Task):
         brca_resources_dir = self.resources_dir
         os.chdir(data_merging_method_dir)
 
-        args = ["python", "getMupitStructure.py", "-i", artifacts_dir + "built.tsv", "-o",
+        args = ["-i", artifacts_dir + "built.tsv", "-o",
                 artifacts_dir + "/built_with_mupit.tsv"]
         print "Running getMupitStructure.py with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
+        run_pipeline_script(data_merging_method_dir, "getMupitStructure", args)
 
         check_input_and_output_tsvs_for_same_number_variants(artifacts_dir + "built.tsv",
-                                                             artifacts_dir + "built_with_mupit.tsv")
+                                                             artifacts_dir + "built_with_mupit.tsv",
+                                                             reportFile=artifacts_dir + "stage_integrity.json")
 
 
 @requires(AppendMupitStructure)
@@ -1438,19 +1284,40 @@ class FindMissingReports(luigi.Task):
         artifacts_dir = self.output_dir + "/release/artifacts/"
         os.chdir(data_merging_method_dir)
 
-        args = ["python", "check_for_missing_reports.py", "-b", artifacts_dir + "built_with_mupit.tsv", "-r", artifacts_dir,
+        args = ["-b", artifacts_dir + "built_with_mupit.tsv", "-r", artifacts_dir,
                 "-a", artifacts_dir, "-v"]
         print "Running check_for_missing_reports.py with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
+        run_pipeline_script(data_merging_method_dir, "check_for_missing_reports", args)
 
         check_file_for_contents(artifacts_dir + "missing_reports.log")
 
 
 @requires(FindMissingReports)
+class WriteReleaseTable(luigi.Task):
+    # the release table of built_with_mupit.tsv is shipped in the release, releaseDiff compares its column
+    # checksums with those of the previous release's to skip the columns that didn't change
+    def output(self):
+        artifacts_dir = self.output_dir + "/release/artifacts/"
+        return luigi.LocalTarget(artifacts_dir + "built_with_mupit.columns")
+
+    def run(self):
+        artifacts_dir = self.output_dir + "/release/artifacts/"
+        os.chdir(data_merging_method_dir)
+
+        args = ["write", artifacts_dir + "built_with_mupit.tsv", artifacts_dir + "built_with_mupit.columns"]
+        print "Running release_table.py with the following args: %s" % (args)
+        run_pipeline_script(data_merging_method_dir, "release_table", args)
+
+        check_file_for_contents(artifacts_dir + "built_with_mupit.columns")
+
+
+@requires(WriteReleaseTable)
 class RunDiffAndAppendChangeTypesToOutput(luigi.Task):
-    def _extract_release_date(self, version_json):
-        with open(version_json, 'r') as f:
+    # the change types are diffed against the previous release
+    build_hash_params = ["previous_release_tar"]
+
+    def _extract_release_date(self, previous_release):
+        with open(previous_release.cached('output/release/metadata/version.json'), 'r') as f:
             j = json.load(f)
             return datetime.datetime.strptime(j['date'], '%Y-%m-%d')
 
@@ -1472,32 +1339,41 @@ class RunDiffAndAppendChangeTypesToOutput(luigi.Task):
         diff_dir = create_path_if_nonexistent(release_dir + "diff/")
         os.chdir(utilities_method_dir)
 
-        tmp_dir = tempfile.mkdtemp()
-        previous_data_path = extract_file(self.previous_release_tar, tmp_dir, 'output/release/built_with_change_types.tsv')
-        version_json_path = extract_file(self.previous_release_tar, tmp_dir, 'output/release/metadata/version.json')
-        previous_release_date = self._extract_release_date(version_json_path)
+        with open_previous_release(self) as previous_release:
+            previous_data_path = previous_release.cached('output/release/built_with_change_types.tsv')
+            try:
+                previous_columns_path = previous_release.cached('output/release/artifacts/built_with_mupit.columns')
+            except KeyError:
+                # releases from before the release table was written, every column is compared
+                previous_columns_path = None
+            previous_release_date = self._extract_release_date(previous_release)
         previous_release_date_str = datetime.datetime.strftime(previous_release_date, '%m-%d-%Y')
         
         args = ["python", "releaseDiff.py", "--v2", artifacts_dir + "built_with_mupit.tsv", "--v1", previous_data_path,
                 "--removed", diff_dir + "removed.tsv", "--added", diff_dir + "added.tsv", "--added_data",
                 diff_dir + "added_data.tsv", "--diff", diff_dir + "diff.txt", "--diff_json", diff_dir + "diff.json",
                 "--output", release_dir + "built_with_change_types.tsv", "--artifacts_dir", artifacts_dir,
-                "--diff_dir", diff_dir, "--v1_release_date", previous_release_date_str, "--reports", "False"]
+                "--diff_dir", diff_dir, "--v1_release_date", previous_release_date_str, "--reports", "False",
+                "-w", str(release_diff().workers), "--v2_columns", artifacts_dir + "built_with_mupit.columns"]
+        if previous_columns_path is not None:
+            args += ["--v1_columns", previous_columns_path]
 
         print "Running releaseDiff.py with the following args: %s" % (args)
         sp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         print_subprocess_output_and_error(sp)
 
-        shutil.rmtree(tmp_dir) # cleaning up
-
         check_input_and_output_tsvs_for_same_number_variants(artifacts_dir + "built_with_mupit.tsv",
-                                                             release_dir + "built_with_change_types.tsv")
+                                                             release_dir + "built_with_change_types.tsv",
+                                                             reportFile=artifacts_dir + "stage_integrity.json")
 
 
 @requires(RunDiffAndAppendChangeTypesToOutput)
 class RunDiffAndAppendChangeTypesToOutputReports(luigi.Task):
-    def _extract_release_date(self, version_json):
-        with open(version_json, 'r') as f:
+    # the change types are diffed against the previous release
+    build_hash_params = ["previous_release_tar"]
+
+    def _extract_release_date(self, previous_release):
+        with open(previous_release.cached('output/release/metadata/version.json'), 'r') as f:
             j = json.load(f)
             return datetime.datetime.strptime(j['date'], '%Y-%m-%d')
 
@@ -1519,30 +1395,31 @@ class RunDiffAndAppendChangeTypesToOutputReports(luigi.Task):
         diff_dir = create_path_if_nonexistent(release_dir + "diff/")
         os.chdir(utilities_method_dir)
 
-        tmp_dir = tempfile.mkdtemp()
-        previous_data_path = extract_file(self.previous_release_tar, tmp_dir, 'output/release/artifacts/reports.tsv')
-        version_json_path = extract_file(self.previous_release_tar, tmp_dir, 'output/release/metadata/version.json')
-        previous_release_date = self._extract_release_date(version_json_path)
+        with open_previous_release(self) as previous_release:
+            previous_data_path = previous_release.cached('output/release/artifacts/reports.tsv')
+            previous_release_date = self._extract_release_date(previous_release)
         previous_release_date_str = datetime.datetime.strftime(previous_release_date, '%m-%d-%Y')
 
         args = ["python", "releaseDiff.py", "--v2", artifacts_dir + "reports.tsv", "--v1", previous_data_path,
                 "--removed", diff_dir + "removed_reports.tsv", "--added", diff_dir + "added_reports.tsv", "--added_data",
                 diff_dir + "added_data_reports.tsv", "--diff", diff_dir + "diff_reports.txt", "--diff_json", diff_dir + "diff_reports.json",
                 "--output", release_dir + "reports_with_change_types.tsv", "--artifacts_dir", artifacts_dir,
-                "--diff_dir", diff_dir, "--v1_release_date", previous_release_date_str, "--reports", "True"]
+                "--diff_dir", diff_dir, "--v1_release_date", previous_release_date_str, "--reports", "True",
+                "-w", str(release_diff().workers)]
 
         print "Running releaseDiff.py with the following args: %s" % (args)
         sp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         print_subprocess_output_and_error(sp)
 
-        shutil.rmtree(tmp_dir) # cleaning up
-
         check_input_and_output_tsvs_for_same_number_variants(artifacts_dir + "reports.tsv",
-                                                             release_dir + "reports_with_change_types.tsv")
+                                                             release_dir + "reports_with_change_types.tsv",
+                                                             reportFile=artifacts_dir + "stage_integrity.json")
 
 
 @requires(RunDiffAndAppendChangeTypesToOutputReports)
 class GenerateReleaseNotes(luigi.Task):
+    # the release date is written to version.json
+    build_hash_params = ["date"]
 
     def output(self):
         metadata_dir = create_path_if_nonexistent(self.output_dir + "/release/metadata/")
@@ -1573,25 +1450,23 @@ class TopLevelReadme(luigi.Task):
         shutil.copyfile(top_level_readme_src, self.output().path)
 
 @requires(TopLevelReadme)
-class GenerateMD5Sums(luigi.Task):        
+class GenerateMD5Sums(luigi.Task):
+    '''
+    Only needed to refresh md5sums.txt without building an archive, GenerateReleaseArchive
+    writes md5sums.txt while archiving the release
+    '''
     def output(self):
         return luigi.LocalTarget(self.output_dir + "/md5sums.txt")
 
     def run(self):
-        output_dir = self.output_dir
-        md5sumsFile = output_dir + "/md5sums.txt"
-
-        os.chdir(utilities_method_dir)
-
-        args = ["python", "generateMD5Sums.py", "-i", output_dir, "-o", md5sumsFile]
-        print "Generating md5sums with the following args: %s" % (args)
-        sp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print_subprocess_output_and_error(sp)
+        md5sumsFile = self.output_dir + "/md5sums.txt"
+        print "Generating md5sums for %s" % (self.output_dir)
+        release_archive.write_md5sums(self.output_dir, md5sumsFile, archive().workers or None)
 
         check_file_for_contents(md5sumsFile)
 
 
-@requires(GenerateMD5Sums)
+@requires(TopLevelReadme)
 class GenerateReleaseArchive(luigi.Task):
 
     def getArchiveName(self):
@@ -1605,9 +1480,17 @@ class GenerateReleaseArchive(luigi.Task):
         return luigi.LocalTarget(self.getArchiveParentDirectory() + self.getArchiveName())
 
     def run(self):
-        os.chdir(self.getArchiveParentDirectory())
-        with tarfile.open(self.getArchiveParentDirectory() + self.getArchiveName(), "w:gz") as tar:
-            tar.add(self.output_dir, arcname=os.path.basename(self.output_dir))
+        # the build manifest is shipped in the release, so the next release can reuse unchanged outputs
+        build_manifest.write_manifest(self, script_dirs)
+        # the task profile of the build is shipped in the release next to md5sums.txt
+        task_profile.write_profile_report(self, self.output_dir, self.previous_release_tar)
+
+        # files are hashed for md5sums.txt while they are compressed, md5sums.txt is the last member
+        archive_path = self.getArchiveParentDirectory() + self.getArchiveName()
+        print "Archiving %s to %s" % (self.output_dir, archive_path)
+        release_archive.write_archive(self.output_dir, archive_path, archive().workers or None)
+
+        check_file_for_contents(self.output_dir + "/md5sums.txt")
 
 
 ###############################################
@@ -1638,29 +1521,78 @@ class RunAll(luigi.WrapperTask):
 
     release_notes = luigi.Parameter(default=None, description='notes for release, must be a .txt file')
 
-    def requires(self):
+    def final_task(self):
         '''
         If release notes and a previous release are provided, generate a version.json file and
         run the releaseDiff.py script to generate change_types between releases of variants.
+        All source pipelines are required through MergeVCFsIntoTSVFile.
         '''
         if self.release_notes and self.previous_release_tar:
-            yield GenerateReleaseArchive(self.date, self.resources_dir, self.output_dir,
-                                         self.file_parent_dir, self.previous_release_tar,
-                                         self.release_notes)
+            return self.clone(GenerateReleaseArchive)
         elif self.previous_release_tar:
-            yield RunDiffAndAppendChangeTypesToOutputReports(self.date, self.resources_dir, self.output_dir,
-                                                      self.file_parent_dir, self.previous_release_tar)
+            return self.clone(RunDiffAndAppendChangeTypesToOutputReports)
         else:
-            yield BuildAggregatedOutput(self.date, self.resources_dir, self.output_dir, self.file_parent_dir)
-
-        yield CopyClinvarVCFToOutputDir(self.date, self.resources_dir, self.output_dir, self.file_parent_dir)
-        yield CopyESPOutputToOutputDir(self.date, self.resources_dir, self.output_dir, self.file_parent_dir)
-        yield CopyBICOutputToOutputDir(self.date, self.u, self.p, self.resources_dir, self.output_dir,
-                                       self.file_parent_dir)
-        yield CopyG1KOutputToOutputDir(self.date, self.resources_dir, self.output_dir, self.file_parent_dir)
-        yield CopyEXACOutputToOutputDir(self.date, self.resources_dir, self.output_dir, self.file_parent_dir)
-        yield CopyEXLOVDOutputToOutputDir(self.date, self.resources_dir, self.output_dir, self.file_parent_dir)
-        yield CopySharedLOVDOutputToOutputDir(date=self.date, resources_dir=self.resources_dir, output_dir=self.output_dir, file_parent_dir=self.file_parent_dir)
-
-        yield DownloadLatestEnigmaData(self.date, self.synapse_username, self.synapse_password, self.synapse_enigma_file_id, self.resources_dir,
-                                       self.output_dir, self.file_parent_dir)
+            return self.clone(BuildAggregatedOutput)
+
+    def requires(self):
+        if incremental_build().reuse and self.previous_release_tar:
+            reuse_task = self.clone(ReuseUnchangedOutputs)
+            yield reuse_task
+            # the final task is a dynamic dependency of ReuseUnchangedOutputs, it is only listed
+            # here once it has run so the DAG report includes it
+            if not reuse_task.complete():
+                return
+        yield self.final_task()
+
+
+@inherits(RunAll)
+class ReuseUnchangedOutputs(luigi.Task):
+    '''
+    Runs the source tasks (downloads) of the release, restores the outputs of every task whose build
+    hash matches the previous release archive, then runs the rest of the release.
+    '''
+
+    def final_task(self):
+        return self.clone(RunAll).final_task()
+
+    def requires(self):
+        dag = dag_report.build_dag(self.final_task())
+        return [task for task, requirements in dag.values() if not requirements]
+
+    def output(self):
+        return luigi.LocalTarget(self.file_parent_dir + "/reused_outputs.json")
+
+    def complete(self):
+        return super(ReuseUnchangedOutputs, self).complete() and self.final_task().complete()
+
+    def run(self):
+        final_task = self.final_task()
+        reused = build_manifest.reuse_previous_outputs(final_task, self.previous_release_tar, script_dirs)
+        yield final_task
+
+        with open(self.output().path, "w") as f:
+            json.dump({"previous_release_tar": self.previous_release_tar, "reused_tasks": reused}, f, indent=4)
+
+
+###############################################
+#                TASK REPORTS                 #
+###############################################
+
+
+luigi.Task.event_handler(luigi.Event.START)(dag_report.record_task_start)
+luigi.Task.event_handler(luigi.Event.SUCCESS)(dag_report.record_task_end)
+luigi.Task.event_handler(luigi.Event.START)(build_manifest.record_task_start)
+luigi.Task.event_handler(luigi.Event.SUCCESS)(build_manifest.record_task_outputs)
+luigi.Task.event_handler(luigi.Event.SUCCESS)(task_profile.record_task_end)
+luigi.Task.event_handler(luigi.Event.FAILURE)(task_profile.record_task_end)
+
+
+@luigi.Task.event_handler(luigi.Event.START)
+def start_task_profile(task):
+    task_profile.record_task_start(task, profiling().cprofile)
+
+
+@RunAll.event_handler(luigi.Event.SUCCESS)
+def write_dag_report(task):
+    dag_report.write_dag_report(task, run_id=dag_report.RUN_ID)
+    task_profile.write_profile_report(task, previous_release_tar=task.previous_release_tar)
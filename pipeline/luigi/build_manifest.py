@@ -0,0 +1,506 @@
+#!/usr/bin/env python
+
+"""
+Build manifests for content hash based incremental rebuilds of the luigi release pipeline.
+
+Every task gets a build hash computed from
+  * its significant parameters (except locations and dates, see UNHASHED_PARAMS;
+    parameters naming a file are hashed by the file contents),
+  * the code version of the task: its source in CompileVCFFiles.py, the functions of
+    CompileVCFFiles.py it calls (e.g. get_liftover), the scripts it runs and the local
+    modules it calls in process (found from the imports of CompileVCFFiles.py),
+    including local modules they import,
+  * the build hashes of the tasks it requires, or for source tasks (tasks without
+    requirements, i.e. the downloads) the contents of their outputs.
+
+write_manifest stores the hashes, and the files each task wrote to the output
+directory, in output_dir/release/metadata/build_manifest.json, which is shipped in
+the release archive. With the manifest of the previous release archive,
+reuse_previous_outputs finds the tasks whose hash did not change and extracts their
+files from the archive instead of running them again, so only the branches of the
+DAG downstream of a changed source (or changed code) are rebuilt.
+
+Files written to the output directory by a task are recorded by record_task_start
+and record_task_outputs (luigi event handlers) in file_parent_dir/task_outputs.jsonl.
+External tools (CrossMap, vcf-sort, ...) and the contents of the resources directory
+beyond file names and sizes are not part of the hash.
+"""
+
+import argparse
+import ast
+import hashlib
+import inspect
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import textwrap
+
+from luigi.task import flatten
+
+import dag_report
+import download_manager
+import release_archive
+
+MANIFEST_PATH = "release/metadata/build_manifest.json"
+OUTPUTS_FILE_NAME = "task_outputs.jsonl"
+MANIFEST_VERSION = 1
+
+# parameters that only say where or when a release is built, tasks using them for their
+# contents (e.g. the date in version.json, the previous release of the diff tasks) list them in a
+# build_hash_params attribute
+UNHASHED_PARAMS = frozenset(["date", "output_dir", "file_parent_dir", "resources_dir", "u", "synapse_username",
+                             "previous_release_tar"])
+
+SCRIPT_PATTERNS = [re.compile(r"""["'](?:\./)?([\w.-]+\.(?:py|sh|pl|R))["']"""),
+                   re.compile(r"""["']\./([\w.-]+)["']""")]
+PIPELINE_SCRIPT_PATTERN = re.compile(r"""run_pipeline_script\([^,]+,\s*["'](\w+)["']""")
+
+
+def task_output_paths(task):
+    return [os.path.normpath(target.path) for target in flatten(task.output()) if hasattr(target, "path")]
+
+
+def used_names(source):
+    '''
+    Returns the names the (possibly indented) source of a class or function refers to
+    '''
+    tree = ast.parse(textwrap.dedent(source))
+    return set(node.id for node in ast.walk(tree) if isinstance(node, ast.Name))
+
+
+def relative_path(path, directory):
+    '''
+    Returns path relative to directory, or None if it is outside of directory
+    '''
+    relative = os.path.relpath(os.path.normpath(path), os.path.normpath(directory))
+    if relative == os.curdir or relative.startswith(os.pardir + os.sep) or relative == os.pardir:
+        return None
+    return relative
+
+
+class BuildHasher(object):
+    '''
+    Computes build hashes of tasks, caching file hashes and code versions
+    '''
+
+    def __init__(self, script_dirs=(), import_dirs=None):
+        self.script_dirs = list(script_dirs)
+        # where the scripts import local modules from besides their own directory
+        self.import_dirs = python_path_dirs(self.script_dirs) if import_dirs is None else list(import_dirs)
+        self.file_hashes = {}
+        self.code_versions = {}
+        self.resource_fingerprints = {}
+        self.task_hashes = {}
+
+    def file_hash(self, path):
+        path = os.path.abspath(path)
+        if path not in self.file_hashes:
+            sha256 = download_manager.read_manifest(path)
+            if sha256 is None or os.path.getmtime(path + ".sha256") < os.path.getmtime(path):
+                sha256 = download_manager.sha256_file(path)
+            self.file_hashes[path] = sha256
+        return self.file_hashes[path]
+
+    def path_hash(self, path):
+        '''
+        Returns the hash of a file, or of every file in a directory, None if path does not exist
+        '''
+        if os.path.isfile(path):
+            return self.file_hash(path)
+        if not os.path.isdir(path):
+            return None
+        sha256 = hashlib.sha256()
+        for dir_path, dir_names, file_names in os.walk(path):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                file_path = os.path.join(dir_path, file_name)
+                sha256.update("%s %s\n" % (os.path.relpath(file_path, path), self.file_hash(file_path)))
+        return sha256.hexdigest()
+
+    def find_script(self, name):
+        return [os.path.join(directory, name) for directory in self.script_dirs
+                if os.path.isfile(os.path.join(directory, name))]
+
+    def task_functions(self, task_class):
+        '''
+        Returns the sources of the task's class and of the functions of its module it calls, directly or
+        through other functions, and the names of the modules imported by the task's module that they use
+        '''
+        module = inspect.getmodule(task_class)
+        sources = [inspect.getsource(task_class)]
+        functions = set()
+        modules = set()
+        pending = list(used_names(sources[0]))
+        while pending:
+            name = pending.pop()
+            value = getattr(module, name, None)
+            if inspect.ismodule(value):
+                modules.add(value.__name__.split(".")[0])
+            elif inspect.isfunction(value) and value.__module__ == module.__name__ and name not in functions:
+                functions.add(name)
+                source = inspect.getsource(value)
+                sources.append(source)
+                pending.extend(used_names(source))
+        return sources, sorted(modules)
+
+    def script_paths(self, task_class):
+        '''
+        Returns the scripts run by task_class, the local modules it calls in process (e.g. vcf_tools) and the
+        modules they import from their own directory or the import directories, and so on
+        '''
+        sources, modules = self.task_functions(task_class)
+        source = "".join(sources)
+        names = set(name for pattern in SCRIPT_PATTERNS for name in pattern.findall(source))
+        names.update(module + ".py" for module in PIPELINE_SCRIPT_PATTERN.findall(source))
+        names.update(module + ".py" for module in modules)
+        pending = [path for name in sorted(names) for path in self.find_script(name)]
+        paths = set()
+        while pending:
+            path = pending.pop()
+            if path in paths:
+                continue
+            paths.add(path)
+            if path.endswith(".py"):
+                pending.extend(local_imports(path, self.import_dirs))
+        return sorted(paths)
+
+    def code_version(self, task_class):
+        if task_class not in self.code_versions:
+            sha256 = hashlib.sha256()
+            for source in self.task_functions(task_class)[0]:
+                sha256.update(source)
+            for path in self.script_paths(task_class):
+                sha256.update("%s %s\n" % (os.path.basename(path), self.file_hash(path)))
+            self.code_versions[task_class] = sha256.hexdigest()
+        return self.code_versions[task_class]
+
+    def resources_fingerprint(self, resources_dir):
+        # resources are large and rarely change, so only their names and sizes are hashed
+        if resources_dir not in self.resource_fingerprints:
+            files = []
+            if os.path.isdir(resources_dir):
+                files = [(name, os.path.getsize(os.path.join(resources_dir, name)))
+                         for name in sorted(os.listdir(resources_dir))
+                         if os.path.isfile(os.path.join(resources_dir, name))]
+            self.resource_fingerprints[resources_dir] = files
+        return self.resource_fingerprints[resources_dir]
+
+    def param_values(self, task):
+        hashed_params = set(getattr(task, "build_hash_params", []))
+        values = {}
+        for name, param in task.get_params():
+            if not param.significant or (name in UNHASHED_PARAMS and name not in hashed_params):
+                continue
+            value = getattr(task, name)
+            if isinstance(value, basestring) and os.path.isfile(value):
+                values[name] = {"sha256": self.file_hash(value)}
+            else:
+                values[name] = param.serialize(value)
+        return values
+
+    def task_hash(self, task):
+        '''
+        Returns the build hash of task, None if the outputs of one of its source tasks are missing
+        '''
+        if task.task_id in self.task_hashes:
+            return self.task_hashes[task.task_id]
+
+        requirements = flatten(task.requires())
+        if requirements:
+            inputs = [self.task_hash(requirement) for requirement in requirements]
+        else:
+            inputs = [self.path_hash(path) for path in task_output_paths(task)]
+        build = {"task_family": task.task_family,
+                 "params": self.param_values(task),
+                 "code": self.code_version(task.__class__),
+                 "inputs": inputs}
+        if hasattr(task, "resources_dir"):
+            build["resources"] = self.resources_fingerprint(task.resources_dir)
+
+        build_hash = None
+        if None not in inputs:
+            build_hash = hashlib.sha256(json.dumps(build, sort_keys=True)).hexdigest()
+        self.task_hashes[task.task_id] = build_hash
+        return build_hash
+
+
+def python_path_dirs(script_dirs):
+    '''
+    Returns the directories of script_dirs on the PYTHONPATH, in its order
+    '''
+    script_dirs = set(os.path.normpath(os.path.abspath(directory)) for directory in script_dirs)
+    directories = []
+    for directory in os.environ.get("PYTHONPATH", "").split(os.pathsep):
+        directory = os.path.normpath(os.path.abspath(directory)) if directory else None
+        if directory in script_dirs and directory not in directories:
+            directories.append(directory)
+    return directories
+
+
+def local_imports(script_path, import_dirs=()):
+    '''
+    Returns the modules imported by the script that are in the directory of script_path or in one of
+    import_dirs, looked up in that order as python does with the PYTHONPATH
+    '''
+    with open(script_path, "r") as f:
+        try:
+            tree = ast.parse(f.read(), script_path)
+        except SyntaxError:
+            return []
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.add(node.module.split(".")[0])
+    directories = [os.path.dirname(script_path)] + list(import_dirs)
+    paths = []
+    for module in sorted(modules):
+        found = [os.path.join(directory, module + ".py") for directory in directories
+                 if os.path.isfile(os.path.join(directory, module + ".py"))]
+        if found:
+            paths.append(found[0])
+    return paths
+
+
+###############################################
+#          RECORDING TASK OUTPUTS             #
+###############################################
+
+
+def get_outputs_file(task):
+    return os.path.join(task.file_parent_dir, OUTPUTS_FILE_NAME)
+
+
+def record_task_start(task):
+    # the start time is taken from the file system clock, which file modification times are compared to
+    if not hasattr(task, "file_parent_dir"):
+        return
+    if not os.path.isdir(task.file_parent_dir):
+        os.makedirs(task.file_parent_dir)
+    with tempfile.NamedTemporaryFile(dir=task.file_parent_dir, prefix=".task_start") as f:
+        task._build_manifest_start = os.fstat(f.fileno()).st_mtime
+
+
+def files_modified_since(directory, since):
+    files = []
+    for dir_path, dir_names, file_names in os.walk(directory):
+        for file_name in file_names:
+            path = os.path.join(dir_path, file_name)
+            if os.path.isfile(path) and os.path.getmtime(path) >= since:
+                files.append(os.path.relpath(path, directory))
+    return sorted(files)
+
+
+def append_task_outputs(task, files, declared):
+    outputs = {"task_family": task.task_family, "files": sorted(set(files)), "declared": sorted(set(declared))}
+    if not os.path.isdir(task.file_parent_dir):
+        os.makedirs(task.file_parent_dir)
+    with open(get_outputs_file(task), "a") as f:
+        f.write(json.dumps(outputs) + "\n")
+
+
+def record_task_outputs(task):
+    '''
+    Records the files task wrote to its output directory, called when task succeeds
+    '''
+    if not hasattr(task, "_build_manifest_start") or not hasattr(task, "output_dir") \
+            or not hasattr(task, "file_parent_dir"):
+        return
+    declared = [relative_path(path, task.output_dir) for path in task_output_paths(task)]
+    declared = [path for path in declared if path is not None]
+    files = files_modified_since(task.output_dir, task._build_manifest_start) if os.path.isdir(task.output_dir) else []
+    append_task_outputs(task, files + declared, declared)
+
+
+def read_task_outputs(outputs_file):
+    '''
+    Returns a dictionary mapping task_family to its most recently recorded outputs
+    '''
+    outputs = {}
+    if not os.path.exists(outputs_file):
+        return outputs
+    with open(outputs_file, "r") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                outputs[entry["task_family"]] = entry
+    return outputs
+
+
+###############################################
+#                 MANIFESTS                   #
+###############################################
+
+
+def make_manifest(root_task, hasher, task_outputs):
+    '''
+    Returns the build manifest for every task required by root_task (root_task itself
+    is still running when the manifest is written, so it is not included)
+    '''
+    dag = dag_report.build_dag(root_task)
+    tasks = {}
+    for task_id, (task, requirements) in dag.items():
+        if task_id == root_task.task_id:
+            continue
+        outputs = task_outputs.get(task.task_family, {})
+        tasks[task.task_family] = {"hash": hasher.task_hash(task),
+                                   "files": outputs.get("files", []),
+                                   "declared": outputs.get("declared", [])}
+
+    # files declared as the output of a task only belong to that task, even if a task
+    # running at the same time was recorded as writing them too
+    declared = set(path for entry in tasks.values() for path in entry["declared"])
+    for entry in tasks.values():
+        entry["files"] = sorted((set(entry["files"]) - declared) | set(entry["declared"]))
+    return {"version": MANIFEST_VERSION, "tasks": tasks}
+
+
+def write_manifest(root_task, script_dirs=()):
+    manifest = make_manifest(root_task, BuildHasher(script_dirs), read_task_outputs(get_outputs_file(root_task)))
+    manifest_file = os.path.join(root_task.output_dir, MANIFEST_PATH)
+    if not os.path.isdir(os.path.dirname(manifest_file)):
+        os.makedirs(os.path.dirname(manifest_file))
+    with open(manifest_file, "w") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    return manifest
+
+
+def read_archive_manifest(archive_path):
+    '''
+    Returns (path prefix of the output directory in the archive, manifest), (None, None) if there is no manifest
+    '''
+    with release_archive.ReleaseArchive(archive_path) as archive:
+        for name in archive.names():
+            if name == MANIFEST_PATH or name.endswith("/" + MANIFEST_PATH):
+                try:
+                    manifest = json.loads(archive.read(name))
+                except KeyError:
+                    continue
+                if manifest.get("version") != MANIFEST_VERSION:
+                    return None, None
+                return name[:-len(MANIFEST_PATH)], manifest
+    return None, None
+
+
+def reusable_tasks(dag, hashes, manifest, output_dir):
+    '''
+    Given a dag from dag_report.build_dag, a dictionary of task_id to build hash and a previous manifest,
+    Returns the task_ids whose outputs can be taken from the previous release:
+      * the build hash is unchanged (source tasks always run, they decide whether anything changed),
+      * outputs outside output_dir are not in the archive, so the task is only reusable if
+        every task requiring it is reusable, i.e. its outputs are not needed,
+      * files shared with a task that has to run again are left to that task.
+    '''
+    previous = manifest["tasks"]
+    families = {}
+    for task_id, (task, requirements) in dag.items():
+        families.setdefault(task.task_family, []).append(task_id)
+    consumers = dict((task_id, []) for task_id in dag)
+    for task_id, (task, requirements) in dag.items():
+        for requirement in requirements:
+            consumers[requirement].append(task_id)
+
+    claimants = {}
+    for family, entry in previous.items():
+        for path in entry["files"]:
+            claimants.setdefault(path, set()).add(family)
+
+    reusable = set(task_id for task_id, (task, requirements) in dag.items()
+                   if requirements and len(families[task.task_family]) == 1 and hashes.get(task_id) is not None
+                   and previous.get(task.task_family, {}).get("hash") == hashes[task_id])
+
+    changed = True
+    while changed:
+        changed = False
+        for task_id in sorted(reusable):
+            task = dag[task_id][0]
+            outside = any(relative_path(path, output_dir) is None for path in task_output_paths(task))
+            needed = outside and not (consumers[task_id] and all(c in reusable for c in consumers[task_id]))
+            shared = any(family not in families or families[family][0] not in reusable
+                         for path in previous[task.task_family]["files"] for family in claimants[path])
+            if needed or shared:
+                reusable.discard(task_id)
+                changed = True
+    return reusable
+
+
+def restore_files(archive_path, prefix, files, output_dir):
+    '''
+    Extracts files (relative to output_dir) from the archive, skipping existing files, in the order
+    of the archive. Only the blocks of the files are decompressed if the archive has an index.
+    Returns the restored files
+    '''
+    wanted = dict((prefix + path, path) for path in files if not os.path.exists(os.path.join(output_dir, path)))
+    restored = []
+    if not wanted:
+        return restored
+    with release_archive.ReleaseArchive(archive_path) as archive:
+        for name in archive.names():
+            if name not in wanted:
+                continue
+            try:
+                source = archive.open(name)
+            except KeyError:
+                continue
+            path = os.path.join(output_dir, wanted[name])
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            tmp_path = path + ".restoring"
+            try:
+                with open(tmp_path, "wb") as f:
+                    shutil.copyfileobj(source, f, download_manager.BLOCK_SIZE)
+            finally:
+                source.close()
+            os.rename(tmp_path, path)
+            restored.append(wanted[name])
+    return restored
+
+
+def reuse_previous_outputs(root_task, archive_path, script_dirs=()):
+    '''
+    Restores the outputs of every task required by root_task whose build hash matches the previous
+    release archive. The source tasks of root_task must have run.
+    Returns the task families that were reused
+    '''
+    prefix, manifest = read_archive_manifest(archive_path)
+    if manifest is None:
+        print "No build manifest in %s, all tasks will run." % (archive_path)
+        return []
+
+    hasher = BuildHasher(script_dirs)
+    dag = dag_report.build_dag(root_task)
+    hashes = dict((task_id, hasher.task_hash(task)) for task_id, (task, requirements) in dag.items())
+    reusable = reusable_tasks(dag, hashes, manifest, root_task.output_dir)
+
+    files = sorted(set(path for task_id in reusable for path in manifest["tasks"][dag[task_id][0].task_family]["files"]))
+    restored = restore_files(archive_path, prefix, files, root_task.output_dir)
+
+    for task_id in reusable:
+        task = dag[task_id][0]
+        entry = manifest["tasks"][task.task_family]
+        append_task_outputs(task, entry["files"], entry["declared"])
+
+    families = sorted(dag[task_id][0].task_family for task_id in reusable)
+    print "Reusing %d of %d tasks (%d files) from %s: %s" % (len(families), len(dag), len(restored),
+                                                           archive_path, ", ".join(families))
+    return families
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the build manifest of a release archive.")
+    parser.add_argument("archive", help="release archive (.tar.gz)")
+    args = parser.parse_args()
+
+    prefix, manifest = read_archive_manifest(args.archive)
+    if manifest is None:
+        sys.exit("No build manifest in %s" % (args.archive))
+    for family, entry in sorted(manifest["tasks"].items()):
+        print "%s  %-45s %d files" % ((entry["hash"] or "-" * 64)[:12], family, len(entry["files"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+
+"""
+Critical path report for the luigi release DAG.
+
+While the pipeline runs, every task appends its start and end time to
+file_parent_dir/task_timings.jsonl (see record_task_start/record_task_end), with
+the id of the run. The file keeps the timings of earlier runs (run_plan.py
+estimates durations from them). write_dag_report walks the task graph from the
+root task and combines it with the timings recorded by one run to report:
+
+  * serial_seconds: sum of all task durations, i.e. the wall clock time with --workers 1
+  * critical_path_seconds: the longest chain of true dependencies, i.e. the lower
+    bound on wall clock time with unlimited workers
+  * elapsed_seconds: the observed wall clock time of the run
+  * the tasks on the critical path and the number of tasks at each depth of the DAG
+
+To regenerate the report for the last run, pass the same arguments used for the run:
+    python dag_report.py --module CompileVCFFiles RunAll --output-dir $OUTPUT_DIR ...
+"""
+
+import json
+import os
+import sys
+import time
+
+from luigi.cmdline_parser import CmdlineParser
+from luigi.task import flatten
+
+TIMINGS_FILE_NAME = "task_timings.jsonl"
+REPORT_FILE_NAME = "dag_report.json"
+# set when luigi imports the pipeline, before it forks the worker processes, which inherit it
+RUN_ID = "%d-%d" % (time.time() * 1000, os.getpid())
+
+
+def get_timings_file(task):
+    return os.path.join(task.file_parent_dir, TIMINGS_FILE_NAME)
+
+
+def record_task_start(task):
+    task._dag_report_start = time.time()
+
+
+def record_task_end(task):
+    # tasks run in forked worker processes with --workers, so timings are shared through a file
+    if not hasattr(task, "_dag_report_start") or not hasattr(task, "file_parent_dir"):
+        return
+    timing = {"run_id": RUN_ID,
+              "task_id": task.task_id,
+              "task_family": task.task_family,
+              "start": task._dag_report_start,
+              "end": time.time()}
+    if not os.path.isdir(task.file_parent_dir):
+        os.makedirs(task.file_parent_dir)
+    with open(get_timings_file(task), "a") as f:
+        f.write(json.dumps(timing) + "\n")
+
+
+def read_timings(timings_file, run_id=None):
+    '''
+    Returns a dictionary mapping task_id to its timing in the run run_id (default: the last run recorded),
+    empty if nothing was recorded
+    '''
+    runs = {}
+    last_run = None
+    if not os.path.exists(timings_file):
+        return {}
+    with open(timings_file, "r") as f:
+        for line in f:
+            if line.strip():
+                timing = json.loads(line)
+                last_run = timing.get("run_id")
+                runs.setdefault(last_run, {})[timing["task_id"]] = timing
+    return runs.get(last_run if run_id is None else run_id, {})
+
+
+def build_dag(root_task):
+    '''
+    Returns a dictionary mapping task_id to (task, [task_ids of requirements]) for every task reachable from root_task
+    '''
+    dag = {}
+    stack = [root_task]
+    while stack:
+        task = stack.pop()
+        if task.task_id in dag:
+            continue
+        requirements = flatten(task.requires())
+        dag[task.task_id] = (task, [requirement.task_id for requirement in requirements])
+        stack.extend(requirements)
+    return dag
+
+
+def topological_order(dag):
+    '''
+    Returns task_ids ordered so that every task comes after all of its requirements
+    '''
+    order = []
+    visited = set()
+    for task_id in sorted(dag):
+        stack = [(task_id, False)]
+        while stack:
+            current, expanded = stack.pop()
+            if expanded:
+                order.append(current)
+                continue
+            if current in visited:
+                continue
+            visited.add(current)
+            stack.append((current, True))
+            stack.extend((requirement, False) for requirement in reversed(dag[current][1])
+                         if requirement not in visited)
+    return order
+
+
+def critical_path(dag, durations):
+    '''
+    Given a dag from build_dag and a dictionary of task_id to duration in seconds (missing tasks count as 0),
+    Returns (length in seconds, [task_ids on the longest path from a source task to the root task])
+    '''
+    finish = {}
+    previous = {}
+    for task_id in topological_order(dag):
+        requirements = dag[task_id][1]
+        latest = max(requirements, key=lambda requirement: finish[requirement]) if requirements else None
+        previous[task_id] = latest
+        finish[task_id] = (finish[latest] if latest else 0.0) + durations.get(task_id, 0.0)
+
+    if not finish:
+        return 0.0, []
+    task_id = max(finish, key=lambda t: finish[t])
+    length = finish[task_id]
+    path = []
+    while task_id is not None:
+        path.append(task_id)
+        task_id = previous[task_id]
+    return length, list(reversed(path))
+
+
+def task_depths(dag):
+    '''
+    Returns a dictionary mapping task_id to the number of tasks on its longest chain of requirements
+    '''
+    depths = {}
+    for task_id in topological_order(dag):
+        depths[task_id] = 1 + max([depths[requirement] for requirement in dag[task_id][1]] or [0])
+    return depths
+
+
+def make_dag_report(root_task, timings):
+    dag = build_dag(root_task)
+    durations = dict((task_id, timings[task_id]["end"] - timings[task_id]["start"])
+                     for task_id in dag if task_id in timings)
+    length, path = critical_path(dag, durations)
+    depths = task_depths(dag)
+
+    width = {}
+    for depth in depths.values():
+        width[depth] = width.get(depth, 0) + 1
+
+    recorded = [timings[task_id] for task_id in dag if task_id in timings]
+    elapsed = (max(t["end"] for t in recorded) - min(t["start"] for t in recorded)) if recorded else 0.0
+    serial = sum(durations.values())
+
+    return {"root_task": root_task.task_id,
+            "num_tasks": len(dag),
+            "num_timed_tasks": len(durations),
+            "serial_seconds": serial,
+            "critical_path_seconds": length,
+            "elapsed_seconds": elapsed,
+            "savings_seconds": serial - elapsed,
+            "max_parallelism": max(width.values()) if width else 0,
+            "tasks_per_depth": [width[depth] for depth in sorted(width)],
+            "critical_path": [{"task_id": task_id,
+                               "task_family": dag[task_id][0].task_family,
+                               "seconds": durations.get(task_id, 0.0)} for task_id in path],
+            "tasks": dict((task_id, {"task_family": task.task_family,
+                                     "requires": requirements,
+                                     "depth": depths[task_id],
+                                     "seconds": durations.get(task_id)})
+                          for task_id, (task, requirements) in dag.items())}
+
+
+def format_dag_report(report):
+    lines = ["DAG report for %s" % (report["root_task"]),
+             "Tasks: %d (%d timed), max parallelism: %d" % (report["num_tasks"], report["num_timed_tasks"],
+                                                            report["max_parallelism"]),
+             "Serial time: %.1fs" % (report["serial_seconds"]),
+             "Critical path: %.1fs" % (report["critical_path_seconds"]),
+             "Elapsed time: %.1fs (%.1fs saved over a serial run)" % (report["elapsed_seconds"],
+                                                                      report["savings_seconds"]),
+             "Critical path tasks:"]
+    for step in report["critical_path"]:
+        lines.append("  %10.1fs  %s" % (step["seconds"], step["task_id"]))
+    return "\n".join(lines)
+
+
+def write_dag_report(root_task, report_file=None, run_id=None):
+    timings = read_timings(get_timings_file(root_task), run_id)
+    report = make_dag_report(root_task, timings)
+    if report_file is None:
+        report_file = os.path.join(root_task.file_parent_dir, REPORT_FILE_NAME)
+    with open(report_file, "w") as f:
+        json.dump(report, f, indent=4, sort_keys=True)
+    print format_dag_report(report)
+    return report
+
+
+def main():
+    with CmdlineParser.global_instance(sys.argv[1:]) as cp:
+        write_dag_report(cp.get_task_obj())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+
+"""
+Resumable, checksummed downloads for the luigi pipeline sources.
+
+DownloadManager.fetch(url, file_name) downloads url to file_name and writes a
+SHA-256 manifest next to it (file_name + ".sha256", in `sha256sum -c` format).
+Interrupted downloads are resumed from their partial file (HTTP Range requests,
+FTP REST) instead of restarting from zero.
+
+With a mirror directory, every downloaded file is also stored by content hash:
+
+    mirror/objects/<first 2 hash characters>/<sha256>   file contents
+    mirror/urls/<sha1 of url>.json                      url -> sha256, size and server validator
+    mirror/partial/<sha1 of url>.part                   partial downloads
+
+and later fetches of an unchanged url (same ETag/Last-Modified, or same FTP size and
+modification time) are served from the mirror without downloading the file again.
+
+A mirror given as a file:// url is used offline: files are only taken from the
+mirror and nothing is requested from the network, so a release can be built from
+a pre-populated mirror directory. To populate a mirror ahead of time:
+    python download_manager.py --mirror /path/to/mirror --workers 4 url [url ...]
+"""
+
+import argparse
+import ftplib
+import hashlib
+import httplib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import urllib2
+import urlparse
+from multiprocessing.pool import ThreadPool
+
+BLOCK_SIZE = 1024 * 1024
+
+
+class DownloadError(Exception):
+    pass
+
+
+class ChecksumError(DownloadError):
+    pass
+
+
+def sha256_file(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), ""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def make_parent_dir(path):
+    '''
+    Creates the directory containing path if it doesn't exist yet and returns path
+    '''
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        os.makedirs(directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
+    return path
+
+
+def read_manifest(file_name):
+    '''
+    Returns the sha256 recorded in file_name's manifest, or None if there is no manifest
+    '''
+    manifest = file_name + ".sha256"
+    if not os.path.exists(manifest):
+        return None
+    with open(manifest, "r") as f:
+        return f.read().split()[0]
+
+
+def write_manifest(file_name, sha256):
+    with open(file_name + ".sha256", "w") as f:
+        f.write("%s  %s\n" % (sha256, os.path.basename(file_name)))
+
+
+def print_progress(file_name, size_dl, size):
+    if size:
+        status = r"%10d  [%3.2f%%]" % (size_dl, size_dl * 100. / size)
+    else:
+        status = r"%10d" % (size_dl)
+    status = status + chr(8)*(len(status)+1)
+    print status,
+
+
+class DownloadManager(object):
+    '''
+    mirror is None (no mirror, partial files are kept next to the destination), a directory
+    used as a content-addressed mirror, or a file:// url of a pre-populated mirror used offline
+    '''
+    def __init__(self, mirror=None, attempts=3, wait=3, show_progress=True):
+        self.offline = bool(mirror) and mirror.startswith("file://")
+        if self.offline:
+            mirror = urllib2.url2pathname(urlparse.urlparse(mirror).path)
+        self.mirror = os.path.abspath(mirror) if mirror else None
+        self.attempts = attempts
+        self.wait = wait
+        self.show_progress = show_progress
+        self._url_locks = {}
+        self._lock = threading.Lock()
+
+    def _url_lock(self, url):
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def _url_key(self, url):
+        return hashlib.sha1(url).hexdigest()
+
+    def object_path(self, sha256):
+        return os.path.join(self.mirror, "objects", sha256[:2], sha256)
+
+    def _url_entry_path(self, url):
+        return os.path.join(self.mirror, "urls", self._url_key(url) + ".json")
+
+    def get_url_entry(self, url):
+        '''
+        Returns the mirror's record for url ({"url", "sha256", "size", "validator"}) or None
+        '''
+        if not self.mirror:
+            return None
+        path = self._url_entry_path(url)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            entry = json.load(f)
+        if not os.path.exists(self.object_path(entry["sha256"])):
+            return None
+        return entry
+
+    def _partial_path(self, url, file_name):
+        if self.mirror:
+            return make_parent_dir(os.path.join(self.mirror, "partial", self._url_key(url) + ".part"))
+        return make_parent_dir(file_name + ".part")
+
+    def fetch(self, url, file_name=None, expected_sha256=None, username=None, password=None):
+        '''
+        Downloads url to file_name (default: last component of the url in the current directory),
+        resuming a previous partial download and reusing the mirror's copy if the file is unchanged.
+        Raises ChecksumError if expected_sha256 is given and doesn't match.
+        Returns the sha256 of the file
+        '''
+        if file_name is None:
+            file_name = url.split('/')[-1]
+        with self._url_lock(url):
+            if self.offline:
+                entry = self.get_url_entry(url)
+                if entry is None:
+                    raise DownloadError("%s is not in the offline mirror %s" % (url, self.mirror))
+                sha256 = entry["sha256"]
+                self._check_sha256(url, sha256, expected_sha256)
+                self._copy_object(sha256, file_name)
+            else:
+                sha256 = self._fetch_with_retries(url, file_name, expected_sha256, username, password)
+            write_manifest(file_name, sha256)
+        print "Finished downloading %s" % (file_name)
+        return sha256
+
+    def fetch_all(self, downloads, workers=4):
+        '''
+        Given a list of (url, file_name) tuples or dictionaries of fetch arguments,
+        downloads them concurrently and returns their sha256s in the same order
+        '''
+        def fetch(download):
+            if isinstance(download, dict):
+                return self.fetch(**download)
+            return self.fetch(*download)
+
+        pool = ThreadPool(max(1, workers))
+        try:
+            return pool.map(fetch, downloads)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _check_sha256(self, url, sha256, expected_sha256):
+        if expected_sha256 and sha256 != expected_sha256:
+            raise ChecksumError("Checksum mismatch for %s: expected %s, got %s" % (url, expected_sha256, sha256))
+
+    def _copy_object(self, sha256, file_name):
+        tmp_file_name = make_parent_dir(file_name + ".tmp")
+        shutil.copyfile(self.object_path(sha256), tmp_file_name)
+        os.rename(tmp_file_name, file_name)
+
+    def _fetch_with_retries(self, url, file_name, expected_sha256, username, password):
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return self._fetch(url, file_name, expected_sha256, username, password)
+            except ChecksumError:
+                raise
+            except (EnvironmentError, httplib.HTTPException, ftplib.Error, DownloadError) as e:
+                if attempt == self.attempts:
+                    raise DownloadError("Downloading %s failed after %d attempts: %s" % (url, attempt, e))
+                print "Download of %s interrupted (%s), resuming in %s seconds" % (url, e, self.wait)
+                time.sleep(self.wait)
+
+    def _fetch(self, url, file_name, expected_sha256, username, password):
+        partial = self._partial_path(url, file_name)
+        partial_info_path = partial + ".json"
+        entry = self.get_url_entry(url)
+
+        offset = 0
+        partial_validator = None
+        if os.path.exists(partial) and os.path.exists(partial_info_path):
+            with open(partial_info_path, "r") as f:
+                partial_validator = json.load(f).get("validator")
+            offset = os.path.getsize(partial)
+
+        scheme = urlparse.urlparse(url).scheme
+        if scheme == "ftp":
+            response = FTPResponse(url, offset, partial_validator)
+        else:
+            response = HTTPResponse(url, offset, partial_validator,
+                                    entry["validator"] if entry else None, username, password)
+
+        try:
+            if response.not_modified or (entry and response.validator and response.validator == entry["validator"]
+                                         and response.size == entry["size"]):
+                # unchanged since it was mirrored
+                print "%s is unchanged, using mirrored copy" % (url)
+                sha256 = entry["sha256"]
+                self._check_sha256(url, sha256, expected_sha256)
+                self._copy_object(sha256, file_name)
+                return sha256
+
+            if not response.resumed:
+                offset = 0
+            with open(partial_info_path, "w") as f:
+                json.dump({"url": url, "validator": response.validator}, f)
+
+            size = response.size
+            print "Downloading: %s Bytes: %s%s" % (file_name, size,
+                                                   " (resuming at %d)" % offset if offset else "")
+            with open(partial, "ab" if offset else "wb") as f:
+                size_dl = offset
+                for block in response.blocks():
+                    f.write(block)
+                    size_dl += len(block)
+                    if self.show_progress:
+                        print_progress(file_name, size_dl, size)
+        finally:
+            response.close()
+
+        if size is not None and os.path.getsize(partial) != size:
+            raise DownloadError("Incomplete download of %s: %d of %d bytes" % (url, os.path.getsize(partial), size))
+
+        sha256 = sha256_file(partial)
+        if expected_sha256 and sha256 != expected_sha256:
+            os.remove(partial)
+            os.remove(partial_info_path)
+            self._check_sha256(url, sha256, expected_sha256)
+
+        if self.mirror:
+            os.rename(partial, make_parent_dir(self.object_path(sha256)))
+            with open(make_parent_dir(self._url_entry_path(url)), "w") as f:
+                json.dump({"url": url, "sha256": sha256, "size": size,
+                           "validator": response.validator, "fetched": time.time()}, f)
+            self._copy_object(sha256, file_name)
+        else:
+            os.rename(partial, file_name)
+        os.remove(partial_info_path)
+        return sha256
+
+    def verify(self):
+        '''
+        Returns the list of mirror objects whose contents don't match their sha256
+        '''
+        corrupt = []
+        objects_dir = os.path.join(self.mirror, "objects")
+        for root, dirs, files in os.walk(objects_dir):
+            for name in files:
+                if sha256_file(os.path.join(root, name)) != name:
+                    corrupt.append(os.path.join(root, name))
+        return corrupt
+
+
+class HTTPResponse(object):
+    '''
+    GET of url starting at offset (resumed only if the server still has the version the partial
+    file came from) and conditional on mirror_validator (not_modified is set if unchanged).
+    username and password are only sent when the host of url asks for them, not to hosts it redirects to
+    '''
+    def __init__(self, url, offset, partial_validator, mirror_validator, username=None, password=None):
+        opener = urllib2.build_opener()
+        if username is not None:
+            passwords = urllib2.HTTPPasswordMgrWithDefaultRealm()
+            parsed = urlparse.urlparse(url)
+            passwords.add_password(None, "%s://%s/" % (parsed.scheme, parsed.netloc), username, password)
+            opener = urllib2.build_opener(urllib2.HTTPBasicAuthHandler(passwords))
+        request = urllib2.Request(url)
+        if offset and partial_validator:
+            request.add_header("Range", "bytes=%d-" % offset)
+            request.add_header("If-Range", partial_validator)
+        elif mirror_validator:
+            header = "If-None-Match" if mirror_validator.startswith(('"', 'W/')) else "If-Modified-Since"
+            request.add_header(header, mirror_validator)
+
+        self.not_modified = False
+        self.resumed = False
+        self.response = None
+        self.validator = None
+        self.size = None
+        try:
+            self.response = opener.open(request)
+        except urllib2.HTTPError as e:
+            if e.code == 304:
+                self.not_modified = True
+                return
+            if e.code == 416:
+                # the partial file is not a prefix of the current version
+                self.response = opener.open(urllib2.Request(url, headers=dict(
+                    (k, v) for k, v in request.header_items() if k not in ("Range", "If-range"))))
+            else:
+                raise
+
+        info = self.response.info()
+        self.validator = info.getheader("ETag") or info.getheader("Last-Modified")
+        self.resumed = self.response.getcode() == 206
+        length = info.getheader("Content-Length")
+        if self.resumed:
+            content_range = info.getheader("Content-Range")
+            self.size = int(content_range.split("/")[-1]) if content_range and "*" not in content_range else None
+        elif length is not None:
+            self.size = int(length)
+
+    def blocks(self):
+        for block in iter(lambda: self.response.read(BLOCK_SIZE), ""):
+            yield block
+
+    def close(self):
+        if self.response is not None:
+            self.response.close()
+
+
+class FTPResponse(object):
+    '''
+    RETR of url starting at offset, resumed with REST if the file's size and modification time
+    are the same as when the partial file was started
+    '''
+    def __init__(self, url, offset, partial_validator):
+        parsed = urlparse.urlparse(url)
+        self.path = urllib2.unquote(parsed.path)
+        self.ftp = ftplib.FTP()
+        self.ftp.connect(parsed.hostname, parsed.port or ftplib.FTP_PORT)
+        self.ftp.login(parsed.username or "anonymous", parsed.password or "anonymous@")
+        self.ftp.voidcmd("TYPE I")
+        self.size = self.ftp.size(self.path)
+        try:
+            modified = self.ftp.sendcmd("MDTM " + self.path).split()[-1]
+        except ftplib.error_perm:
+            modified = None
+        self.validator = "%s %s" % (modified, self.size) if modified else None
+        self.not_modified = False
+        self.resumed = bool(offset) and self.validator is not None and self.validator == partial_validator
+        self.offset = offset if self.resumed else 0
+
+    def blocks(self):
+        connection = self.ftp.transfercmd("RETR " + self.path, rest=self.offset or None)
+        try:
+            for block in iter(lambda: connection.recv(BLOCK_SIZE), ""):
+                yield block
+        finally:
+            connection.close()
+        self.ftp.voidresp()
+
+    def close(self):
+        try:
+            self.ftp.quit()
+        except (ftplib.Error, EnvironmentError):
+            self.ftp.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download files into a content-addressed mirror.")
+    parser.add_argument("--mirror", required=True, help="mirror directory")
+    parser.add_argument("--workers", type=int, default=4, help="number of concurrent downloads")
+    parser.add_argument("--output-dir", default=".", help="directory to also save the downloaded files in")
+    parser.add_argument("--verify", action="store_true", help="check the checksums of all mirrored files")
+    parser.add_argument("urls", nargs="*", help="urls to download")
+    args = parser.parse_args()
+
+    manager = DownloadManager(args.mirror, show_progress=False)
+    downloads = [(url, os.path.join(args.output_dir, url.split('/')[-1].split('?')[0])) for url in args.urls]
+    for (url, file_name), sha256 in zip(downloads, manager.fetch_all(downloads, args.workers)):
+        print "%s  %s" % (sha256, url)
+
+    if args.verify:
+        corrupt = manager.verify()
+        for path in corrupt:
+            print "Checksum mismatch: %s" % (path)
+        if corrupt:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,497 @@
+#!/usr/bin/env python
+
+"""
+Release archives written with parallel block compression and an index of their members.
+
+write_archive tars a release directory in a single pass. Every file is read once and
+MD5 hashed as it is written into the archive, and md5sums.txt (same format as
+utilities/generateMD5Sums.py) is added as the last member. The tar stream is compressed
+as independent BGZF blocks (gzip members of at most 64KB of data, the format used by
+bgzip and tabix), so blocks are compressed by a pool of workers and the archive is
+still a regular .tar.gz for tar, gzip and the tarfile module.
+
+The index written next to the archive (<archive>.index.json) lists the compressed and
+uncompressed offset of every block, and the offset, size and MD5 of every member, so
+ReleaseArchive (and read_member and extract_member) can stream a single file from a release
+by decompressing only the blocks it spans.
+
+Usage:
+    python release_archive.py create --workers 8 output_dir release.tar.gz
+    python release_archive.py list release.tar.gz
+    python release_archive.py extract release.tar.gz output/release/built.tsv -o /tmp
+"""
+
+import argparse
+import bisect
+import collections
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import struct
+import sys
+import tarfile
+import zlib
+from multiprocessing.pool import ThreadPool
+
+MD5SUMS_FILE_NAME = "md5sums.txt"
+INDEX_SUFFIX = ".index.json"
+INDEX_VERSION = 1
+
+# data per BGZF block, as used by bgzip, so that a compressed block never exceeds 64KB
+BGZF_BLOCK_SIZE = 0xff00
+# data handed to a compression worker at a time
+CHUNK_SIZE = 64 * BGZF_BLOCK_SIZE
+READ_SIZE = 1024 * 1024
+# names of the cache directories of archives, see ReleaseArchive.cached
+CACHE_KEY = re.compile("^[0-9a-f]{32}$")
+
+BGZF_HEADER = struct.Struct("<4BI2BH2BHH")
+BGZF_FOOTER = struct.Struct("<II")
+BGZF_EOF = ("\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00\x42\x43\x02\x00\x1b\x00"
+            "\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00")
+
+
+def compress_block(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = compressor.compress(data) + compressor.flush()
+    # block size - 1 is stored in the BC extra field
+    header = BGZF_HEADER.pack(0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, ord("B"), ord("C"), 2,
+                              BGZF_HEADER.size + len(compressed) + BGZF_FOOTER.size - 1)
+    return header + compressed + BGZF_FOOTER.pack(zlib.crc32(data) & 0xffffffff, len(data))
+
+
+def compress_chunk(args):
+    '''
+    Returns [(compressed block, uncompressed size)] for the BGZF blocks of a chunk of data
+    '''
+    data, level = args
+    return [(compress_block(data[start:start + BGZF_BLOCK_SIZE], level), len(data[start:start + BGZF_BLOCK_SIZE]))
+            for start in xrange(0, len(data), BGZF_BLOCK_SIZE)]
+
+
+class BGZFWriter(object):
+    '''
+    File-like object compressing everything written to it as BGZF blocks with a pool of workers,
+    recording the compressed and uncompressed offset of every block
+    '''
+
+    def __init__(self, fileobj, workers=None, level=6):
+        self.fileobj = fileobj
+        self.workers = workers or multiprocessing.cpu_count()
+        self.level = level
+        self.pool = ThreadPool(self.workers)
+        self.pending = collections.deque()
+        self.buffer = []
+        self.buffered = 0
+        self.uncompressed_offset = 0
+        self.written_uncompressed = 0
+        self.compressed_offset = 0
+        self.blocks = []
+
+    def tell(self):
+        return self.uncompressed_offset
+
+    def write(self, data):
+        self.buffer.append(data)
+        self.buffered += len(data)
+        self.uncompressed_offset += len(data)
+        if self.buffered >= CHUNK_SIZE:
+            self._submit()
+
+    def _submit(self):
+        data = "".join(self.buffer)
+        self.buffer, self.buffered = [], 0
+        for start in xrange(0, len(data), CHUNK_SIZE):
+            self.pending.append(self.pool.apply_async(compress_chunk, ((data[start:start + CHUNK_SIZE], self.level),)))
+        # zlib releases the GIL, so the chunks are compressed in parallel while more data is read
+        while len(self.pending) > 2 * self.workers:
+            self._write_compressed(self.pending.popleft().get())
+
+    def _write_compressed(self, blocks):
+        for block, size in blocks:
+            self.blocks.append([self.compressed_offset, self.written_uncompressed])
+            self.fileobj.write(block)
+            self.compressed_offset += len(block)
+            self.written_uncompressed += size
+
+    def close(self):
+        if self.buffered:
+            self._submit()
+        while self.pending:
+            self._write_compressed(self.pending.popleft().get())
+        self.pool.close()
+        self.pool.join()
+        self.fileobj.write(BGZF_EOF)
+        self.compressed_offset += len(BGZF_EOF)
+
+
+class HashingReader(object):
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.md5 = hashlib.md5()
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.md5.update(data)
+        return data
+
+
+def walk_release(directory, exclude=()):
+    '''
+    Yields (path, archive name) of directory and everything in it, in sorted order
+    '''
+    base = os.path.basename(os.path.normpath(directory))
+    yield directory, base
+    for dir_path, dir_names, file_names in os.walk(directory):
+        dir_names.sort()
+        relative = os.path.relpath(dir_path, directory)
+        for name in sorted(dir_names) + sorted(file_names):
+            path = os.path.join(dir_path, name)
+            if os.path.abspath(path) in exclude:
+                continue
+            yield path, os.path.normpath(os.path.join(base, relative, name))
+
+
+def add_member(tar, writer, path, arcname, index):
+    '''
+    Adds path to tar and its entry to index, Returns the md5 of the file (None for other members)
+    '''
+    tarinfo = tar.gettarinfo(path, arcname)
+    header_offset = writer.tell()
+    md5 = None
+    if tarinfo.isreg():
+        with open(path, "rb") as f:
+            reader = HashingReader(f)
+            tar.addfile(tarinfo, reader)
+        md5 = reader.md5.hexdigest()
+    else:
+        tar.addfile(tarinfo)
+    blocks = (tarinfo.size + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE if tarinfo.isreg() else 0
+    index[arcname] = {"offset": header_offset,
+                      "data_offset": writer.tell() - blocks * tarfile.BLOCKSIZE,
+                      "size": tarinfo.size if tarinfo.isreg() else 0,
+                      "type": "file" if tarinfo.isreg() else ("dir" if tarinfo.isdir() else "other"),
+                      "md5": md5}
+    return md5
+
+
+def write_archive(directory, archive_path, workers=None, level=6, md5sums_file_name=MD5SUMS_FILE_NAME):
+    '''
+    Writes directory to archive_path (with md5sums_file_name, written to directory too, as the last member)
+    and the member index to archive_path + INDEX_SUFFIX
+    Returns the index
+    '''
+    md5sums_path = os.path.join(directory, md5sums_file_name)
+    md5sums = []
+    members = collections.OrderedDict()
+
+    tmp_archive_path = archive_path + ".tmp"
+    with open(tmp_archive_path, "wb") as f:
+        writer = BGZFWriter(f, workers, level)
+        tar = tarfile.open(fileobj=writer, mode="w", format=tarfile.GNU_FORMAT)
+        for path, arcname in walk_release(directory, exclude=[os.path.abspath(md5sums_path)]):
+            md5 = add_member(tar, writer, path, arcname, members)
+            if md5 is not None and os.path.basename(path) != md5sums_file_name:
+                md5sums.append("%s: %s\n" % (os.path.basename(path), md5))
+
+        with open(md5sums_path, "w") as md5sums_file:
+            md5sums_file.writelines(md5sums)
+        add_member(tar, writer, md5sums_path,
+                   os.path.join(os.path.basename(os.path.normpath(directory)), md5sums_file_name), members)
+        tar.close()
+        writer.close()
+    os.rename(tmp_archive_path, archive_path)
+
+    index = {"version": INDEX_VERSION,
+             "archive": os.path.basename(archive_path),
+             "archive_size": os.path.getsize(archive_path),
+             "uncompressed_size": writer.written_uncompressed,
+             "blocks": writer.blocks,
+             "members": members}
+    with open(archive_path + INDEX_SUFFIX + ".tmp", "w") as f:
+        json.dump(index, f)
+    os.rename(archive_path + INDEX_SUFFIX + ".tmp", archive_path + INDEX_SUFFIX)
+    return index
+
+
+def write_md5sums(directory, md5sums_path, workers=None):
+    '''
+    Writes the md5sums of every file in directory to md5sums_path like utilities/generateMD5Sums.py,
+    hashing files in parallel
+    '''
+    # like generateMD5Sums.py, files with the name of the md5sums file are skipped
+    paths = [path for path, arcname in walk_release(directory)
+             if os.path.isfile(path) and os.path.basename(path) != os.path.basename(md5sums_path)]
+
+    def md5_file(path):
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(READ_SIZE), ""):
+                md5.update(block)
+        return md5.hexdigest()
+
+    pool = ThreadPool(workers or multiprocessing.cpu_count())
+    try:
+        md5s = pool.map(md5_file, paths)
+    finally:
+        pool.close()
+    with open(md5sums_path, "w") as f:
+        for path, md5 in zip(paths, md5s):
+            f.write("%s: %s\n" % (os.path.basename(path), md5))
+
+
+###############################################
+#                  READING                    #
+###############################################
+
+
+def read_index(archive_path):
+    '''
+    Returns the member index of archive_path, None if it has none or the archive changed since
+    '''
+    index_path = archive_path + INDEX_SUFFIX
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, "r") as f:
+        index = json.load(f, object_pairs_hook=collections.OrderedDict)
+    if index.get("version") != INDEX_VERSION or index["archive_size"] != os.path.getsize(archive_path):
+        return None
+    return index
+
+
+def read_block(f):
+    '''
+    Returns the uncompressed data of the BGZF block at the position of f
+    '''
+    header = f.read(BGZF_HEADER.size)
+    if len(header) < BGZF_HEADER.size:
+        raise IOError("unexpected end of archive")
+    block_size = BGZF_HEADER.unpack(header)[-1] + 1
+    return zlib.decompress(header + f.read(block_size - BGZF_HEADER.size), 16 + zlib.MAX_WBITS)
+
+
+def seek_uncompressed(f, index, offset):
+    '''
+    Seeks the BGZF file f to the block holding offset of the uncompressed stream
+    Returns the position of offset in the block
+    '''
+    uncompressed_offsets = [block[1] for block in index["blocks"]]
+    block_number = bisect.bisect_right(uncompressed_offsets, offset) - 1
+    compressed_offset, block_offset = index["blocks"][block_number]
+    f.seek(compressed_offset)
+    return offset - block_offset
+
+
+class MemberReader(object):
+    '''
+    File-like object streaming a member of an indexed archive, decompressing one BGZF block at a time.
+    The md5 of the member is checked when it has been read to the end
+    '''
+
+    def __init__(self, archive_path, index, member, name):
+        self.fileobj = open(archive_path, "rb")
+        self.skip = seek_uncompressed(self.fileobj, index, member["data_offset"])
+        self.remaining = member["size"]
+        self.expected_md5 = member["md5"]
+        self.md5 = hashlib.md5()
+        self.name = name
+        self.buffer = ""
+        self.position = 0
+
+    def _fill(self, size):
+        '''
+        Decompresses blocks until size bytes (everything if size < 0) are buffered or the member ends
+        '''
+        blocks = [self.buffer[self.position:]]
+        buffered = len(blocks[0])
+        while self.remaining > 0 and (size < 0 or buffered < size):
+            block = read_block(self.fileobj)[self.skip:self.skip + self.remaining]
+            self.skip = 0
+            self.remaining -= len(block)
+            self.md5.update(block)
+            blocks.append(block)
+            buffered += len(block)
+            if self.remaining == 0 and self.expected_md5 is not None and self.md5.hexdigest() != self.expected_md5:
+                raise IOError("md5 mismatch for %s" % (self.name))
+        self.buffer = "".join(blocks)
+        self.position = 0
+
+    def read(self, size=-1):
+        if size < 0 or len(self.buffer) - self.position < size:
+            self._fill(size)
+        end = len(self.buffer) if size < 0 else self.position + size
+        data = self.buffer[self.position:end]
+        self.position += len(data)
+        return data
+
+    def readline(self):
+        end = self.buffer.find("\n", self.position)
+        while end < 0 and self.remaining > 0:
+            searched = len(self.buffer) - self.position
+            self._fill(searched + 1)
+            end = self.buffer.find("\n", searched)
+        return self.read(end + 1 - self.position if end >= 0 else -1)
+
+    def __iter__(self):
+        return iter(self.readline, "")
+
+    def close(self):
+        self.fileobj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ReleaseArchive(object):
+    '''
+    Reads the members of a release archive without extracting it. The member index is read from the
+    index next to the archive, members of indexed archives are streamed from the BGZF blocks they span.
+    For other archives (e.g. made with tar), the tar headers are read once, when a member is first
+    needed, and members are streamed with tarfile.
+    Members copied with cached are kept in cache_dir, and taken from there by every later reader of
+    the same archive
+    '''
+
+    def __init__(self, archive_path, index=None, cache_dir=None):
+        self.archive_path = archive_path
+        self.index = index or read_index(archive_path)
+        self.cache_dir = cache_dir
+        self.tar = None
+        self._members = None
+
+    @property
+    def members(self):
+        if self._members is None:
+            if self.index is None:
+                self.tar = tarfile.open(self.archive_path, "r:*")
+                self._members = collections.OrderedDict((member.name, member) for member in self.tar.getmembers())
+            else:
+                self._members = self.index["members"]
+        return self._members
+
+    def names(self):
+        return self.members.keys()
+
+    def open(self, name):
+        '''
+        Returns a file-like object streaming member name
+        Raises KeyError if there is no such file
+        '''
+        member = self.members[name]
+        if self.tar is not None:
+            if not member.isfile():
+                raise KeyError("%s is not a file" % (name))
+            return self.tar.extractfile(member)
+        if member["type"] != "file":
+            raise KeyError("%s is not a file" % (name))
+        return MemberReader(self.archive_path, self.index, member, "%s in %s" % (name, self.archive_path))
+
+    def read(self, name):
+        f = self.open(name)
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def extract(self, name, output_dir):
+        '''
+        Writes member name to output_dir (keeping its path in the archive), Returns the path of the extracted file
+        '''
+        path = os.path.join(output_dir, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        source = self.open(name)
+        try:
+            with open(path + ".tmp", "wb") as f:
+                for data in iter(lambda: source.read(READ_SIZE), ""):
+                    f.write(data)
+        finally:
+            source.close()
+        os.rename(path + ".tmp", path)
+        return path
+
+    def cached(self, name):
+        '''
+        Returns the path of member name in the cache directory, where it is extracted the first time.
+        The members of other archives (e.g. an earlier previous release) are removed from the cache
+        when the first member of this one is extracted
+        '''
+        stat = os.stat(self.archive_path)
+        key = hashlib.md5("%s:%d:%d" % (os.path.abspath(self.archive_path), stat.st_size, stat.st_mtime)).hexdigest()
+        archive_cache_dir = os.path.join(self.cache_dir, key)
+        path = os.path.join(archive_cache_dir, name)
+        if os.path.exists(path):
+            return path
+        if not os.path.isdir(archive_cache_dir) and os.path.isdir(self.cache_dir):
+            for other_key in os.listdir(self.cache_dir):
+                if CACHE_KEY.match(other_key) and other_key != key:
+                    shutil.rmtree(os.path.join(self.cache_dir, other_key))
+        return self.extract(name, archive_cache_dir)
+
+    def close(self):
+        if self.tar is not None:
+            self.tar.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_member(archive_path, name, index=None):
+    '''
+    Returns the contents of member name, decompressing only the blocks it spans if the archive has
+    an index, and reading through the archive otherwise
+    Raises KeyError if there is no such member
+    '''
+    with ReleaseArchive(archive_path, index) as archive:
+        return archive.read(name)
+
+
+def extract_member(archive_path, name, output_dir, index=None):
+    '''
+    Writes member name to output_dir (keeping its path in the archive), Returns the path of the extracted file
+    '''
+    with ReleaseArchive(archive_path, index) as archive:
+        return archive.extract(name, output_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create, list or extract from indexed release archives.")
+    subparsers = parser.add_subparsers(dest="command")
+    create = subparsers.add_parser("create", help="archive a release directory")
+    create.add_argument("directory")
+    create.add_argument("archive")
+    create.add_argument("--workers", type=int, default=None, help="compression threads (default: number of cpus)")
+    create.add_argument("--level", type=int, default=6, help="compression level")
+    list_parser = subparsers.add_parser("list", help="list the members of an indexed archive")
+    list_parser.add_argument("archive")
+    extract = subparsers.add_parser("extract", help="extract members of an archive")
+    extract.add_argument("archive")
+    extract.add_argument("members", nargs="+")
+    extract.add_argument("-o", "--output_dir", default=".")
+    args = parser.parse_args()
+
+    if args.command == "create":
+        index = write_archive(args.directory, args.archive, args.workers, args.level)
+        print "Wrote %d members (%d bytes) to %s" % (len(index["members"]), index["archive_size"], args.archive)
+    elif args.command == "list":
+        index = read_index(args.archive)
+        if index is None:
+            sys.exit("%s has no index" % (args.archive))
+        for name, member in index["members"].items():
+            print "%12d  %s  %s" % (member["size"], member["md5"] or " " * 32, name)
+    else:
+        for name in args.members:
+            print extract_member(args.archive, name, args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+
+"""
+Dry-run plan of a luigi run: which tasks would run, which are already complete and how long the run
+should take.
+
+plan_run walks the task graph from the root task the way the luigi scheduler does: every task's
+complete() is checked and the requirements of complete tasks are not visited. Nothing is run and
+nothing but local files is read.
+
+The duration of each task that would run is estimated from the timings recorded by previous runs
+(dag_report.py appends them to file_parent_dir/task_timings.jsonl): the median duration of the same
+task if it has run before, otherwise the median of its task family (task ids change with the date
+parameter). The run is then simulated with the given number of workers, starting ready tasks in
+order of priority like the scheduler, to estimate the wall clock time.
+
+Pass the arguments of the run (including --workers):
+    python run_plan.py --module CompileVCFFiles RunAll --workers 4 --output-dir $OUTPUT_DIR ...
+Timings of other runs can be added with --timings-file (before the task name).
+"""
+
+import argparse
+import heapq
+import json
+import os
+
+import luigi
+import luigi.interface
+from luigi.cmdline_parser import CmdlineParser
+from luigi.task import flatten
+
+import dag_report
+
+PLAN_FILE_NAME = "run_plan.json"
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def read_timing_history(timings_files):
+    '''
+    Returns ({task_id: [seconds]}, {task_family: [seconds]}) of every timing recorded in timings_files
+    '''
+    by_task, by_family = {}, {}
+    for timings_file in timings_files:
+        if not os.path.exists(timings_file):
+            continue
+        with open(timings_file, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                timing = json.loads(line)
+                seconds = timing["end"] - timing["start"]
+                by_task.setdefault(timing["task_id"], []).append(seconds)
+                by_family.setdefault(timing["task_family"], []).append(seconds)
+    return by_task, by_family
+
+
+def estimate_duration(task, by_task, by_family):
+    '''
+    Returns (estimated seconds, "task", "family" or None for the timings the estimate is based on)
+    '''
+    if task.task_id in by_task:
+        return median(by_task[task.task_id]), "task"
+    if task.task_family in by_family:
+        return median(by_family[task.task_family]), "family"
+    return 0.0, None
+
+
+def plan_run(root_task):
+    '''
+    Returns a dictionary mapping task_id to (task, [task_ids of requirements], complete) for every task the
+    scheduler would look at: the requirements of complete tasks are not checked
+    '''
+    plan = {}
+    stack = [root_task]
+    while stack:
+        task = stack.pop()
+        if task.task_id in plan:
+            continue
+        try:
+            complete = task.complete()
+        except Exception as e:
+            print "complete() of %s failed, it is planned to run: %s" % (task.task_id, e)
+            complete = False
+        requirements = [] if complete else flatten(task.requires())
+        plan[task.task_id] = (task, [requirement.task_id for requirement in requirements], complete)
+        stack.extend(requirements)
+    return plan
+
+
+def simulate_run(dag, durations, workers, priorities=None):
+    '''
+    Given the dag of the tasks to run (task_id: (task, [task_ids of requirements])), their durations and the
+    number of workers, Returns (wall clock seconds, {task_id: start seconds}). Ready tasks are started by
+    priority, then in topological order
+    '''
+    priorities = priorities or {}
+    order = dict((task_id, i) for i, task_id in enumerate(dag_report.topological_order(dag)))
+    waiting = dict((task_id, set(requirements)) for task_id, (task, requirements) in dag.items())
+    dependents = dict((task_id, []) for task_id in dag)
+    for task_id, (task, requirements) in dag.items():
+        for requirement in requirements:
+            dependents[requirement].append(task_id)
+
+    ready = [(-priorities.get(task_id, 0), order[task_id], task_id) for task_id in dag if not waiting[task_id]]
+    heapq.heapify(ready)
+    running = []
+    starts = {}
+    now = 0.0
+    while ready or running:
+        while ready and len(running) < max(workers, 1):
+            task_id = heapq.heappop(ready)[2]
+            starts[task_id] = now
+            heapq.heappush(running, (now + durations.get(task_id, 0.0), order[task_id], task_id))
+        now, _, task_id = heapq.heappop(running)
+        for dependent in dependents[task_id]:
+            waiting[dependent].discard(task_id)
+            if not waiting[dependent]:
+                heapq.heappush(ready, (-priorities.get(dependent, 0), order[dependent], dependent))
+    return now, starts
+
+
+def make_plan(root_task, timings_files, workers):
+    plan = plan_run(root_task)
+    by_task, by_family = read_timing_history(timings_files)
+
+    # requirements that are complete are already done, they don't hold up the tasks to run
+    to_run = dict((task_id, (task, [requirement for requirement in requirements if not plan[requirement][2]]))
+                  for task_id, (task, requirements, complete) in plan.items() if not complete)
+    estimates = dict((task_id, estimate_duration(task, by_task, by_family)) for task_id, (task, r) in to_run.items())
+    durations = dict((task_id, seconds) for task_id, (seconds, basis) in estimates.items())
+    critical_path_seconds, path = dag_report.critical_path(to_run, durations)
+    priorities = dict((task_id, getattr(task, "priority", 0)) for task_id, (task, r) in to_run.items())
+    wall_seconds, starts = simulate_run(to_run, durations, workers, priorities)
+
+    tasks = []
+    for task_id in dag_report.topological_order(dict((t, plan[t][:2]) for t in plan)):
+        task, requirements, complete = plan[task_id]
+        entry = {"task_id": task_id, "task_family": task.task_family, "complete": complete}
+        if not complete:
+            entry["seconds"], entry["estimate_from"] = estimates[task_id]
+            entry["start_seconds"] = starts[task_id]
+        tasks.append(entry)
+
+    return {"root_task": root_task.task_id,
+            "workers": workers,
+            "num_tasks": len(plan),
+            "num_complete": len(plan) - len(to_run),
+            "num_to_run": len(to_run),
+            "num_without_timings": sum(1 for seconds, basis in estimates.values() if basis is None),
+            "serial_seconds": sum(durations.values()),
+            "critical_path_seconds": critical_path_seconds,
+            "estimated_wall_seconds": wall_seconds,
+            "critical_path": path,
+            "tasks": tasks}
+
+
+def format_seconds(seconds):
+    return "%dh%02dm%02ds" % (seconds // 3600, seconds % 3600 // 60, seconds % 60)
+
+
+def format_plan(plan):
+    lines = ["Run plan for %s" % (plan["root_task"]),
+             "%d tasks: %d complete, %d to run (%d without recorded timings)" % (
+                 plan["num_tasks"], plan["num_complete"], plan["num_to_run"], plan["num_without_timings"])]
+    for entry in plan["tasks"]:
+        if entry["complete"]:
+            lines.append("  complete  %22s  %s" % ("", entry["task_id"]))
+        else:
+            estimate = format_seconds(entry["seconds"]) if entry["estimate_from"] else "unknown"
+            on_path = "*" if entry["task_id"] in plan["critical_path"] else " "
+            lines.append("  run     %s starts +%s, %9s  %s" % (on_path, format_seconds(entry["start_seconds"]),
+                                                           estimate, entry["task_id"]))
+    lines.extend(["Serial time: %s" % (format_seconds(plan["serial_seconds"])),
+                  "Critical path (* above): %s" % (format_seconds(plan["critical_path_seconds"])),
+                  "Estimated wall time with %d workers: %s" % (plan["workers"],
+                                                                format_seconds(plan["estimated_wall_seconds"]))])
+    return "\n".join(lines)
+
+
+def write_plan(root_task, timings_files=(), workers=1, plan_file=None):
+    timings_files = [dag_report.get_timings_file(root_task)] + list(timings_files)
+    plan = make_plan(root_task, timings_files, workers)
+    if plan_file is None:
+        plan_file = os.path.join(root_task.file_parent_dir, PLAN_FILE_NAME)
+    if os.path.isdir(os.path.dirname(os.path.abspath(plan_file))):
+        with open(plan_file, "w") as f:
+            json.dump(plan, f, indent=4, sort_keys=True)
+    print format_plan(plan)
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--timings-file", action="append", default=[],
+                        help="task_timings.jsonl of another run to estimate durations from")
+    parser.add_argument("--plan-file", help="where to write the plan as JSON (default: file parent dir)")
+    args, luigi_args = parser.parse_known_args()
+    with CmdlineParser.global_instance(luigi_args) as cp:
+        write_plan(cp.get_task_obj(), args.timings_file, luigi.interface.core().workers, args.plan_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Streaming checks that pipeline stages keep every variant of their input TSV.
+
+count_tsv_records counts the rows csv.DictReader would return without parsing
+the file: it counts newlines block by block and only falls back to the csv
+module if the file has blank lines, quoted fields or carriage returns outside
+of line endings, which could make the two counts differ.
+
+fingerprint_tsv computes an order independent fingerprint per column (number of
+non-empty values and a sum of value checksums), so stages can be compared
+column by column without holding either file in memory.
+
+record_stage appends the result of each check to a JSON stage integrity report
+which is shipped with the release artifacts.
+"""
+
+import csv
+import json
+import os
+import zlib
+
+BLOCK_SIZE = 4 * 1024 * 1024
+EMPTY = "-"
+
+
+def count_tsv_records(path, delimiter="\t", quotechar='"'):
+    '''
+    Returns the number of records after the header line in path, the same as len(list(csv.DictReader(...)))
+    '''
+    newlines = 0
+    # the last two characters of the previous block, so patterns spanning blocks are found
+    tail = "\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), ""):
+            data = tail + block
+            # a carriage return at the end of data is checked with the next block
+            stray_carriage_returns = data.count("\r") - data.count("\r\n") - data.endswith("\r")
+            if ("\n\n" in data or "\n\r\n" in data or "\n" + quotechar in data or delimiter + quotechar in data
+                    or stray_carriage_returns):
+                return count_tsv_records_with_csv(path, delimiter)
+            newlines += block.count("\n")
+            tail = data[-2:]
+
+    # the last line is not newline terminated unless it is empty
+    lines = newlines if tail.endswith("\n") or tail.endswith("\n\r") else newlines + 1
+    return max(lines - 1, 0)
+
+
+def count_tsv_records_with_csv(path, delimiter="\t"):
+    with open(path, "rb") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        # like csv.DictReader, the first row is the header even if it is empty
+        next(reader, None)
+        return sum(1 for row in reader if row)
+
+
+def fingerprint_tsv(path, columns=None, delimiter="\t"):
+    '''
+    Given a TSV and optionally the columns to fingerprint (default: all),
+    Returns (number of records, {column: {"non_empty": count, "checksum": hex string}})
+    The checksum is independent of row order, so equal columns have equal fingerprints
+    '''
+    with open(path, "rb") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, [])
+        if columns is None:
+            columns = header
+        indices = [(column, header.index(column)) for column in columns if column in header]
+        non_empty = dict((column, 0) for column, index in indices)
+        checksums = dict((column, 0) for column, index in indices)
+        records = 0
+        for row in reader:
+            if not row:
+                continue
+            records += 1
+            for column, index in indices:
+                value = row[index] if index < len(row) else ""
+                if value and value != EMPTY:
+                    non_empty[column] += 1
+                checksum = ((zlib.crc32(value) & 0xffffffff) << 32) | (zlib.adler32(value) & 0xffffffff)
+                checksums[column] = (checksums[column] + checksum) & 0xffffffffffffffff
+
+    return records, dict((column, {"non_empty": non_empty[column], "checksum": "%016x" % checksums[column]})
+                         for column, index in indices)
+
+
+def check_stage(tsv_in, tsv_out, num_variants_removed=0, fingerprints=False):
+    '''
+    Returns a dictionary describing the stage that turned tsv_in into tsv_out, "passed" is True
+    if tsv_out has num_variants_removed fewer records than tsv_in
+    '''
+    stage = {"input": os.path.basename(tsv_in),
+             "output": os.path.basename(tsv_out),
+             "variants_removed": num_variants_removed}
+    if fingerprints:
+        stage["input_variants"], input_columns = fingerprint_tsv(tsv_in)
+        stage["output_variants"], output_columns = fingerprint_tsv(tsv_out)
+        shared = sorted(set(input_columns) & set(output_columns))
+        stage["columns_added"] = sorted(set(output_columns) - set(input_columns))
+        stage["columns_removed"] = sorted(set(input_columns) - set(output_columns))
+        stage["columns_changed"] = [column for column in shared if input_columns[column] != output_columns[column]]
+        stage["output_columns"] = output_columns
+    else:
+        stage["input_variants"] = count_tsv_records(tsv_in)
+        stage["output_variants"] = count_tsv_records(tsv_out)
+    stage["passed"] = stage["input_variants"] - num_variants_removed == stage["output_variants"]
+    return stage
+
+
+def record_stage(report_file, stage):
+    '''
+    Adds stage to the JSON report in report_file (keyed by the stage output file), creating it if needed
+    '''
+    report = {}
+    if os.path.exists(report_file):
+        with open(report_file, "r") as f:
+            report = json.load(f)
+    report[stage["output"]] = stage
+    tmp_report_file = report_file + ".tmp"
+    with open(tmp_report_file, "w") as f:
+        json.dump(report, f, indent=4, sort_keys=True)
+    os.rename(tmp_report_file, report_file)
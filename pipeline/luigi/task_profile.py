@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+
+"""
+Per task resource profile of a luigi release build.
+
+record_task_start and record_task_end (luigi event handlers) measure every task and
+append the measurements to file_parent_dir/task_profiles.jsonl:
+
+  * wall_seconds: elapsed time
+  * cpu_seconds: user and system time of the worker process and of the subprocesses
+    the task waited for (CrossMap, vcf-sort, the source scripts, ...)
+  * peak_rss_bytes: peak resident set size of the worker while the task ran (where
+    /proc/self/clear_refs can't reset the peak, the peak of the worker so far), or of
+    the largest subprocess if that is larger
+  * bytes_read / bytes_written: I/O of the worker and its finished subprocesses
+    (from /proc/self/io, None on systems without it)
+  * outputs: size and number of records of every output file (rows of .tsv files,
+    non-header lines of .vcf files)
+
+With --profiling-cprofile, every task also runs under cProfile. The stats are
+saved in file_parent_dir/profiles/<task_id>.pstats and the functions with the most
+cumulative time are included in the report.
+
+write_profile_report combines the measurements of every task required by a root task
+into task_profile.json and task_profile.html. The release archive ships both next to
+md5sums.txt. Given the previous release archive, each task is compared with its
+previous wall time, so regressions between releases stand out.
+
+To regenerate the report for a finished run, pass the same arguments used for the run:
+    python task_profile.py --module CompileVCFFiles RunAll --output-dir $OUTPUT_DIR ...
+"""
+
+import cgi
+import cProfile
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+
+from luigi.cmdline_parser import CmdlineParser
+from luigi.task import flatten
+
+import dag_report
+import release_archive
+import stage_integrity
+
+PROFILES_FILE_NAME = "task_profiles.jsonl"
+PROFILE_DIR_NAME = "profiles"
+REPORT_JSON_NAME = "task_profile.json"
+REPORT_HTML_NAME = "task_profile.html"
+TOP_FUNCTIONS = 15
+
+# tasks that take longer than the previous release by this factor (and at least MIN_REGRESSION_SECONDS) are flagged
+REGRESSION_FACTOR = 1.25
+MIN_REGRESSION_SECONDS = 10.0
+
+
+def get_profiles_file(task):
+    return os.path.join(task.file_parent_dir, PROFILES_FILE_NAME)
+
+
+def cpu_seconds():
+    times = os.times()
+    return times[0] + times[1] + times[2] + times[3]
+
+
+def read_proc_io():
+    '''
+    Returns (bytes read, bytes written) by this process and its finished children, (None, None) without /proc
+    '''
+    try:
+        with open("/proc/self/io", "r") as f:
+            counters = dict(line.split(":") for line in f if ":" in line)
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (IOError, KeyError, ValueError):
+        return None, None
+
+
+def reset_peak_rss():
+    '''
+    Resets the peak resident set size of this process (Linux only), returns True on success
+    '''
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except IOError:
+        return False
+
+
+def peak_rss_bytes():
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except IOError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def children_peak_rss_bytes():
+    maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def count_records(path):
+    '''
+    Returns the number of records in a .tsv or .vcf file, None for other files
+    '''
+    if path.endswith(".tsv"):
+        return stage_integrity.count_tsv_records(path)
+    if path.endswith(".vcf"):
+        records = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip() and not line.startswith("#"):
+                    records += 1
+        return records
+    return None
+
+
+def describe_outputs(task):
+    outputs = []
+    for target in flatten(task.output()):
+        path = getattr(target, "path", None)
+        if path is None or not os.path.isfile(path):
+            continue
+        outputs.append({"path": os.path.basename(path),
+                        "bytes": os.path.getsize(path),
+                        "records": count_records(path)})
+    return outputs
+
+
+def record_task_start(task, cprofile=False):
+    if not hasattr(task, "file_parent_dir"):
+        return
+    bytes_read, bytes_written = read_proc_io()
+    task._task_profile_start = {"wall": time.time(),
+                                "cpu": cpu_seconds(),
+                                "bytes_read": bytes_read,
+                                "bytes_written": bytes_written,
+                                "peak_rss_reset": reset_peak_rss(),
+                                "children_peak_rss": children_peak_rss_bytes()}
+    if cprofile:
+        task._task_profile_profiler = cProfile.Profile()
+        task._task_profile_profiler.enable()
+
+
+def top_functions(stats_file, limit=TOP_FUNCTIONS):
+    stats = pstats.Stats(stats_file)
+    functions = []
+    for (file_name, line, name), (calls, primitive, own, cumulative, callers) in stats.stats.items():
+        functions.append({"function": "%s:%d(%s)" % (os.path.basename(file_name), line, name),
+                          "calls": calls,
+                          "own_seconds": own,
+                          "cumulative_seconds": cumulative})
+    functions.sort(key=lambda function: function["cumulative_seconds"], reverse=True)
+    return functions[:limit]
+
+
+def record_task_end(task, exception=None):
+    '''
+    Appends the profile of task to the profiles file, called when task succeeds or fails
+    '''
+    start = getattr(task, "_task_profile_start", None)
+    if start is None:
+        return
+    profile = {"task_id": task.task_id,
+               "task_family": task.task_family,
+               "status": "failed" if exception is not None else "done",
+               "start": start["wall"],
+               "end": time.time(),
+               "cpu_seconds": cpu_seconds() - start["cpu"]}
+    profile["wall_seconds"] = profile["end"] - profile["start"]
+
+    children_peak_rss = children_peak_rss_bytes()
+    profile["peak_rss_bytes"] = max(peak_rss_bytes(),
+                                    children_peak_rss if children_peak_rss > start["children_peak_rss"] else 0)
+    profile["peak_rss_since_task_start"] = start["peak_rss_reset"]
+
+    bytes_read, bytes_written = read_proc_io()
+    profile["bytes_read"] = bytes_read - start["bytes_read"] if bytes_read is not None else None
+    profile["bytes_written"] = bytes_written - start["bytes_written"] if bytes_written is not None else None
+    profile["outputs"] = describe_outputs(task) if exception is None else []
+
+    profiler = getattr(task, "_task_profile_profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        profile_dir = os.path.join(task.file_parent_dir, PROFILE_DIR_NAME)
+        if not os.path.isdir(profile_dir):
+            os.makedirs(profile_dir)
+        stats_file = os.path.join(profile_dir, task.task_id + ".pstats")
+        profiler.dump_stats(stats_file)
+        profile["cprofile"] = os.path.relpath(stats_file, task.file_parent_dir)
+        profile["top_functions"] = top_functions(stats_file)
+        task._task_profile_profiler = None
+
+    if not os.path.isdir(task.file_parent_dir):
+        os.makedirs(task.file_parent_dir)
+    with open(get_profiles_file(task), "a") as f:
+        f.write(json.dumps(profile) + "\n")
+
+
+def read_profiles(profiles_file):
+    '''
+    Returns a dictionary mapping task_id to its most recent profile, empty if nothing was recorded
+    '''
+    profiles = {}
+    if not os.path.exists(profiles_file):
+        return profiles
+    with open(profiles_file, "r") as f:
+        for line in f:
+            if line.strip():
+                profile = json.loads(line)
+                profiles[profile["task_id"]] = profile
+    return profiles
+
+
+def read_archived_report(archive_path):
+    '''
+    Returns the task profile report shipped in a release archive, None if there is none
+    '''
+    with release_archive.ReleaseArchive(archive_path) as archive:
+        for name in archive.names():
+            if os.path.basename(name) == REPORT_JSON_NAME:
+                try:
+                    return json.loads(archive.read(name))
+                except KeyError:
+                    continue
+    return None
+
+
+def make_profile_report(root_task, profiles, previous_report=None):
+    dag = dag_report.build_dag(root_task)
+    previous_tasks = previous_report["tasks"] if previous_report else {}
+
+    tasks = {}
+    for task_id, (task, requirements) in dag.items():
+        if task_id not in profiles:
+            continue
+        profile = dict(profiles[task_id])
+        previous = previous_tasks.get(task.task_family)
+        if previous is not None:
+            profile["previous_wall_seconds"] = previous["wall_seconds"]
+            profile["regression"] = (profile["wall_seconds"] > previous["wall_seconds"] * REGRESSION_FACTOR and
+                                     profile["wall_seconds"] - previous["wall_seconds"] > MIN_REGRESSION_SECONDS)
+        tasks[task.task_family] = profile
+
+    totals = {}
+    for key in ["wall_seconds", "cpu_seconds", "bytes_read", "bytes_written"]:
+        totals[key] = sum(profile[key] for profile in tasks.values() if profile.get(key) is not None)
+    totals["peak_rss_bytes"] = max([profile["peak_rss_bytes"] for profile in tasks.values()] or [0])
+
+    return {"root_task": root_task.task_id,
+            "generated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "num_tasks": len(dag),
+            "num_profiled_tasks": len(tasks),
+            "totals": totals,
+            "regressions": sorted(family for family, profile in tasks.items() if profile.get("regression")),
+            "tasks": tasks}
+
+
+def format_bytes(value):
+    if value is None:
+        return "-"
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(value) < 1024.0:
+            return "%.1f %s" % (value, unit)
+        value /= 1024.0
+    return "%.1f TB" % (value)
+
+
+def format_profile_html(report):
+    tasks = sorted(report["tasks"].items(), key=lambda item: item[1]["wall_seconds"], reverse=True)
+    longest = max([profile["wall_seconds"] for family, profile in tasks] or [1.0]) or 1.0
+    totals = report["totals"]
+
+    lines = ["<!DOCTYPE html>",
+             "<html><head><meta charset=\"utf-8\"><title>Task profile</title>",
+             "<style>",
+             "body { font-family: sans-serif; font-size: 13px; }",
+             "table { border-collapse: collapse; }",
+             "td, th { padding: 2px 8px; text-align: right; border-bottom: 1px solid #ddd; }",
+             "td.name, th.name { text-align: left; }",
+             ".bar { background: #4a90d9; height: 10px; }",
+             "tr.regression td { background: #fbe3e3; }",
+             "</style></head><body>",
+             "<h1>Task profile for %s</h1>" % (cgi.escape(report["root_task"])),
+             "<p>Generated %s. %d of %d tasks profiled. Total wall time %.1fs, CPU time %.1fs, "
+             "read %s, written %s, peak RSS %s.</p>" % (report["generated"], report["num_profiled_tasks"],
+                                                       report["num_tasks"], totals["wall_seconds"],
+                                                       totals["cpu_seconds"], format_bytes(totals["bytes_read"]),
+                                                       format_bytes(totals["bytes_written"]),
+                                                       format_bytes(totals["peak_rss_bytes"]))]
+    if report["regressions"]:
+        lines.append("<p>Slower than the previous release: %s</p>" % (cgi.escape(", ".join(report["regressions"]))))
+
+    lines.extend(["<table>",
+                  "<tr><th class=\"name\">Task</th><th>Wall</th><th>Previous</th><th>CPU</th><th>Peak RSS</th>"
+                  "<th>Read</th><th>Written</th><th>Records</th><th class=\"name\"></th></tr>"])
+    for family, profile in tasks:
+        previous = profile.get("previous_wall_seconds")
+        records = [output["records"] for output in profile["outputs"] if output["records"] is not None]
+        lines.append("<tr%s><td class=\"name\">%s</td><td>%.1fs</td><td>%s</td><td>%.1fs</td><td>%s</td>"
+                     "<td>%s</td><td>%s</td><td>%s</td><td class=\"name\"><div class=\"bar\" style=\"width: %dpx\">"
+                     "</div></td></tr>" % (" class=\"regression\"" if profile.get("regression") else "",
+                                           cgi.escape(family), profile["wall_seconds"],
+                                           "%.1fs" % (previous) if previous is not None else "-",
+                                           profile["cpu_seconds"], format_bytes(profile["peak_rss_bytes"]),
+                                           format_bytes(profile["bytes_read"]),
+                                           format_bytes(profile["bytes_written"]),
+                                           sum(records) if records else "-",
+                                           int(200 * profile["wall_seconds"] / longest)))
+    lines.append("</table>")
+
+    for family, profile in tasks:
+        if not profile.get("top_functions"):
+            continue
+        lines.extend(["<h2>%s</h2>" % (cgi.escape(family)),
+                      "<table><tr><th class=\"name\">Function</th><th>Calls</th><th>Own</th><th>Cumulative</th></tr>"])
+        for function in profile["top_functions"]:
+            lines.append("<tr><td class=\"name\">%s</td><td>%d</td><td>%.3fs</td><td>%.3fs</td></tr>" % (
+                cgi.escape(function["function"]), function["calls"], function["own_seconds"],
+                function["cumulative_seconds"]))
+        lines.append("</table>")
+
+    lines.append("</body></html>")
+    return "\n".join(lines) + "\n"
+
+
+def write_profile_report(root_task, report_dir=None, previous_release_tar=None):
+    '''
+    Writes task_profile.json and task_profile.html for every task required by root_task to report_dir
+    (default: the file parent directory), comparing with the report in previous_release_tar if given
+    '''
+    previous_report = None
+    if previous_release_tar and os.path.exists(previous_release_tar):
+        previous_report = read_archived_report(previous_release_tar)
+    report = make_profile_report(root_task, read_profiles(get_profiles_file(root_task)), previous_report)
+
+    if report_dir is None:
+        report_dir = root_task.file_parent_dir
+    if not os.path.isdir(report_dir):
+        os.makedirs(report_dir)
+    with open(os.path.join(report_dir, REPORT_JSON_NAME), "w") as f:
+        json.dump(report, f, indent=4, sort_keys=True)
+    with open(os.path.join(report_dir, REPORT_HTML_NAME), "w") as f:
+        f.write(format_profile_html(report))
+    return report
+
+
+def main():
+    with CmdlineParser.global_instance(sys.argv[1:]) as cp:
+        task = cp.get_task_obj()
+        write_profile_report(task, previous_release_tar=getattr(task, "previous_release_tar", None))
+
+
+if __name__ == "__main__":
+    main()
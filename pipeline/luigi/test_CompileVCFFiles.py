@@ -0,0 +1,50 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import json
+import os
+pytest.importorskip("synapseclient")
+import CompileVCFFiles
+
+
+class testCompileVCFFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, variants):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w") as f:
+            f.write("Genomic_Coordinate\tSource\n")
+            for i in xrange(variants):
+                f.write("chr17:g.%d:A>G\tClinVar\n" % (43044295 + i))
+        return path
+
+    def test_checkVariantCountsRecordsStage(self):
+        '''Tests that the removed variant count and the report file reach the stage integrity check'''
+        tsvIn = self.write("merged.tsv", 10)
+        tsvOut = self.write("annotated.tsv", 7)
+        reportFile = os.path.join(self.tmp_dir, "stage_integrity.json")
+        CompileVCFFiles.check_input_and_output_tsvs_for_same_number_variants(tsvIn, tsvOut, 3,
+                                                                             reportFile=reportFile)
+        self.assertTrue(os.path.exists(tsvOut))
+        with open(reportFile, "r") as f:
+            stage = json.load(f)["annotated.tsv"]
+        self.assertEquals((stage["input_variants"], stage["output_variants"], stage["variants_removed"],
+                           stage["passed"]), (10, 7, 3, True))
+
+    def test_checkVariantCountsFailure(self):
+        '''Tests that an output with an unexpected number of variants is renamed and recorded as failed'''
+        tsvIn = self.write("aggregated.tsv", 10)
+        tsvOut = self.write("built.tsv", 9)
+        reportFile = os.path.join(self.tmp_dir, "stage_integrity.json")
+        CompileVCFFiles.check_input_and_output_tsvs_for_same_number_variants(tsvIn, tsvOut, reportFile=reportFile)
+        self.assertFalse(os.path.exists(tsvOut))
+        self.assertEquals([name for name in os.listdir(self.tmp_dir) if name.startswith("FAILED_")][0][-9:],
+                          "built.tsv")
+        with open(reportFile, "r") as f:
+            self.assertFalse(json.load(f)["built.tsv"]["passed"])
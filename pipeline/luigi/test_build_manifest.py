@@ -0,0 +1,274 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import tarfile
+import os
+import inspect
+import time
+import mock
+import luigi
+from luigi.util import requires
+import build_manifest
+import dag_report
+import release_archive
+
+
+class Source(luigi.Task):
+    output_dir = luigi.Parameter()
+    file_parent_dir = luigi.Parameter()
+
+    def output(self):
+        return luigi.LocalTarget(self.file_parent_dir + "/source.txt")
+
+
+def transform(data):
+    return data.upper()
+
+
+@requires(Source)
+class Transform(luigi.Task):
+    def output(self):
+        return luigi.LocalTarget(self.file_parent_dir + "/transformed.txt")
+
+    def run(self):
+        with open(self.input().path, "r") as f:
+            data = f.read()
+        with open(self.output().path, "w") as f:
+            f.write(transform(data))
+        with open(self.output_dir + "/transform.log", "w") as f:
+            f.write("transformed\n")
+
+
+@requires(Transform)
+class Publish(luigi.Task):
+    suffix = luigi.Parameter(default="!")
+
+    def output(self):
+        return luigi.LocalTarget(self.output_dir + "/published.txt")
+
+    def run(self):
+        with open(self.input().path, "r") as f:
+            data = f.read()
+        with open(self.output().path, "w") as f:
+            f.write(data + self.suffix)
+
+
+@requires(Publish)
+class Package(luigi.Task):
+    def output(self):
+        return luigi.LocalTarget(self.output_dir + "/package.txt")
+
+    def run(self):
+        with open(self.input().path, "r") as f:
+            data = f.read()
+        with open(self.output().path, "w") as f:
+            f.write("package: " + data)
+
+
+class Annotate(Publish):
+    previous_release_tar = luigi.Parameter(default=None)
+
+
+class Compare(Publish):
+    previous_release_tar = luigi.Parameter(default=None)
+    build_hash_params = ["previous_release_tar"]
+
+
+class ConvertLOVD(luigi.Task):
+    def run(self):
+        return ["python", "lovd2vcf.py"]
+
+
+class testBuildManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.tmp_dir, "output")
+        self.file_parent_dir = os.path.join(self.tmp_dir, "parent")
+        os.makedirs(self.output_dir)
+        os.makedirs(self.file_parent_dir)
+        self.archive = os.path.join(self.tmp_dir, "release.tar.gz")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_source(self, data):
+        with open(os.path.join(self.file_parent_dir, "source.txt"), "w") as f:
+            f.write(data)
+
+    def task(self, cls=Package, **kwargs):
+        return cls(output_dir=self.output_dir, file_parent_dir=self.file_parent_dir, **kwargs)
+
+    def build(self, root_task):
+        # runs the tasks the way the luigi worker does, with the event handlers recording their outputs
+        for task_id in dag_report.topological_order(dag_report.build_dag(root_task)):
+            task = dag_report.build_dag(root_task)[task_id][0]
+            if not task.complete():
+                # file modification times are compared to the start time, so tasks start on a new clock tick
+                time.sleep(0.02)
+                build_manifest.record_task_start(task)
+                task.run()
+                build_manifest.record_task_outputs(task)
+
+    def release(self, root_task, indexed=False):
+        self.build(root_task)
+        build_manifest.write_manifest(root_task)
+        if indexed:
+            release_archive.write_archive(self.output_dir, self.archive)
+            return
+        with tarfile.open(self.archive, "w:gz") as tar:
+            tar.add(self.output_dir, arcname="output")
+
+    def start_new_release(self):
+        shutil.rmtree(self.output_dir)
+        shutil.rmtree(self.file_parent_dir)
+        os.makedirs(self.output_dir)
+        os.makedirs(self.file_parent_dir)
+
+    def read(self, path):
+        with open(os.path.join(self.output_dir, path), "r") as f:
+            return f.read()
+
+    def test_taskHash(self):
+        self.write_source("a")
+        hasher = build_manifest.BuildHasher()
+        publish_hash = hasher.task_hash(self.task(Publish))
+        self.assertEquals(build_manifest.BuildHasher().task_hash(self.task(Publish)), publish_hash)
+
+        # locations are not part of the hash
+        other_dir = self.task(Publish)
+        other_dir.output_dir = self.tmp_dir
+        self.assertEquals(build_manifest.BuildHasher().task_hash(other_dir), publish_hash)
+
+        self.assertNotEqual(build_manifest.BuildHasher().task_hash(self.task(Publish, suffix="?")), publish_hash)
+        self.write_source("b")
+        self.assertNotEqual(build_manifest.BuildHasher().task_hash(self.task(Publish)), publish_hash)
+
+        os.remove(os.path.join(self.file_parent_dir, "source.txt"))
+        self.assertIsNone(build_manifest.BuildHasher().task_hash(self.task(Publish)))
+
+    def test_codeVersionIncludesCalledFunctions(self):
+        hasher = build_manifest.BuildHasher([os.path.dirname(os.path.abspath(__file__))])
+        self.assertEquals(hasher.task_functions(Transform), ([inspect.getsource(Transform),
+                                                               inspect.getsource(transform)], ["luigi"]))
+        self.assertEquals(hasher.task_functions(Source), ([inspect.getsource(Source)], ["luigi"]))
+        self.assertNotEqual(hasher.code_version(Transform),
+                            build_manifest.BuildHasher().code_version(Publish))
+
+    def test_codeVersionIncludesModulesFromPythonPath(self):
+        lovd_dir, data_merging_dir = [os.path.join(self.tmp_dir, name) for name in ["lovd", "data_merging"]]
+        scripts = {os.path.join(lovd_dir, "lovd2vcf.py"): "import os\nimport packed_resources\n",
+                   os.path.join(data_merging_dir, "packed_resources.py"): "import numpy\nfrom columnar_table import *\n",
+                   os.path.join(data_merging_dir, "columnar_table.py"): "import mmap\n"}
+        for directory in [lovd_dir, data_merging_dir]:
+            os.makedirs(directory)
+        for path, source in scripts.items():
+            with open(path, "w") as f:
+                f.write(source)
+
+        # lovd2vcf.py imports packed_resources from data_merging, which the pipeline puts on the PYTHONPATH
+        with mock.patch.dict(os.environ, {"PYTHONPATH": os.pathsep.join(["/usr/lib/python", data_merging_dir])}):
+            hasher = build_manifest.BuildHasher([lovd_dir, data_merging_dir])
+        self.assertEquals(hasher.import_dirs, [data_merging_dir])
+        self.assertEquals(hasher.script_paths(ConvertLOVD),
+                          sorted([os.path.join(data_merging_dir, "columnar_table.py"),
+                                  os.path.join(data_merging_dir, "packed_resources.py"),
+                                  os.path.join(lovd_dir, "lovd2vcf.py")]))
+        code_version = hasher.code_version(ConvertLOVD)
+
+        with open(os.path.join(data_merging_dir, "columnar_table.py"), "a") as f:
+            f.write("import struct\n")
+        changed = build_manifest.BuildHasher([lovd_dir, data_merging_dir], [data_merging_dir])
+        self.assertNotEqual(changed.code_version(ConvertLOVD), code_version)
+        self.assertEquals(build_manifest.BuildHasher([lovd_dir], []).script_paths(ConvertLOVD),
+                          [os.path.join(lovd_dir, "lovd2vcf.py")])
+
+    def test_previousReleaseHashedOnlyWhereUsed(self):
+        self.write_source("a")
+        releases = [os.path.join(self.tmp_dir, name) for name in ["first.tar.gz", "second.tar.gz"]]
+        for release in releases:
+            with open(release, "w") as f:
+                f.write(release)
+        hasher = build_manifest.BuildHasher()
+        self.assertEquals(hasher.task_hash(self.task(Annotate, previous_release_tar=releases[0])),
+                          hasher.task_hash(self.task(Annotate, previous_release_tar=releases[1])))
+        self.assertNotEqual(hasher.task_hash(self.task(Compare, previous_release_tar=releases[0])),
+                            hasher.task_hash(self.task(Compare, previous_release_tar=releases[1])))
+
+    def test_manifestRecordsTaskFiles(self):
+        self.write_source("a")
+        self.release(self.task())
+        prefix, manifest = build_manifest.read_archive_manifest(self.archive)
+        self.assertEquals(prefix, "output/")
+        tasks = manifest["tasks"]
+        self.assertEquals(tasks["Transform"]["files"], ["transform.log"])
+        self.assertEquals(tasks["Publish"]["files"], ["published.txt"])
+        self.assertEquals(tasks["Publish"]["declared"], ["published.txt"])
+        self.assertEquals(tasks["Source"]["files"], [])
+        self.assertNotIn("Package", tasks)
+
+    def test_reuseUnchangedOutputs(self):
+        self.write_source("a")
+        self.release(self.task())
+
+        self.start_new_release()
+        self.write_source("a")
+        reused = build_manifest.reuse_previous_outputs(self.task(Publish), self.archive)
+        self.assertEquals(reused, ["Publish", "Transform"])
+        self.assertEquals(self.read("published.txt"), "A!")
+        self.assertEquals(self.read("transform.log"), "transformed\n")
+        # the intermediate output of Transform is not needed
+        self.assertFalse(os.path.exists(os.path.join(self.file_parent_dir, "transformed.txt")))
+
+        # reused tasks are recorded for the next manifest
+        manifest = build_manifest.make_manifest(self.task(), build_manifest.BuildHasher(),
+                                                build_manifest.read_task_outputs(
+                                                    os.path.join(self.file_parent_dir, "task_outputs.jsonl")))
+        self.assertEquals(manifest["tasks"]["Transform"]["files"], ["transform.log"])
+
+    def test_reuseFromIndexedArchive(self):
+        self.write_source("a")
+        self.release(self.task(), indexed=True)
+
+        self.start_new_release()
+        self.write_source("a")
+        # only the blocks of the manifest and the restored files are read, through the index
+        with mock.patch.object(release_archive.tarfile, "open", side_effect=AssertionError("archive read as tar")):
+            self.assertEquals(build_manifest.read_archive_manifest(self.archive)[0], "output/")
+            self.assertEquals(build_manifest.reuse_previous_outputs(self.task(Publish), self.archive),
+                              ["Publish", "Transform"])
+        self.assertEquals(self.read("published.txt"), "A!")
+        self.assertEquals(self.read("transform.log"), "transformed\n")
+
+    def test_reuseRebuildsChangedBranches(self):
+        self.write_source("a")
+        self.release(self.task())
+
+        self.start_new_release()
+        self.write_source("b")
+        self.assertEquals(build_manifest.reuse_previous_outputs(self.task(Publish), self.archive), [])
+        self.assertEquals(os.listdir(self.output_dir), [])
+
+        self.start_new_release()
+        self.write_source("a")
+        self.assertEquals(build_manifest.reuse_previous_outputs(self.task(Publish, suffix="?"), self.archive), [])
+
+    def test_reusableTasksWithSharedFiles(self):
+        self.write_source("a")
+        root_task = self.task(Publish)
+        dag = dag_report.build_dag(root_task)
+        hasher = build_manifest.BuildHasher()
+        hashes = dict((task_id, hasher.task_hash(task)) for task_id, (task, requirements) in dag.items())
+        ids = dict((task.task_family, task_id) for task_id, (task, requirements) in dag.items())
+        manifest = {"tasks": {"Source": {"hash": hashes[ids["Source"]], "files": [], "declared": []},
+                              "Transform": {"hash": hashes[ids["Transform"]], "files": ["shared.log"],
+                                            "declared": []},
+                              "Publish": {"hash": "changed", "files": ["published.txt", "shared.log"],
+                                          "declared": ["published.txt"]}}}
+        # Transform's output is needed by Publish, which has to run again
+        self.assertEquals(build_manifest.reusable_tasks(dag, hashes, manifest, self.output_dir), set())
+
+        manifest["tasks"]["Publish"]["hash"] = hashes[ids["Publish"]]
+        self.assertEquals(build_manifest.reusable_tasks(dag, hashes, manifest, self.output_dir),
+                          set([ids["Transform"], ids["Publish"]]))
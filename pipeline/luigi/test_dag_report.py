@@ -0,0 +1,34 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import json
+import os
+import dag_report
+
+
+class testDagReport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.timings_file = os.path.join(self.tmp_dir, dag_report.TIMINGS_FILE_NAME)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def record(self, run_id, task_id, start, end):
+        with open(self.timings_file, "a") as f:
+            f.write(json.dumps({"run_id": run_id, "task_id": task_id, "task_family": task_id,
+                                "start": start, "end": end}) + "\n")
+
+    def test_readTimingsOfOneRun(self):
+        self.assertEquals(dag_report.read_timings(self.timings_file), {})
+        self.record("run1", "Download", 0.0, 10.0)
+        self.record("run1", "Convert", 10.0, 30.0)
+        self.record("run2", "Convert", 100.0, 105.0)
+        self.assertEquals(sorted(dag_report.read_timings(self.timings_file, "run1")), ["Convert", "Download"])
+        self.assertEquals(dag_report.read_timings(self.timings_file, "run1")["Convert"]["end"], 30.0)
+        # the last run by default, the tasks of earlier runs that didn't run again are not part of it
+        self.assertEquals(dag_report.read_timings(self.timings_file).keys(), ["Convert"])
+        self.assertEquals(dag_report.read_timings(self.timings_file)["Convert"]["start"], 100.0)
+        self.assertEquals(dag_report.read_timings(self.timings_file, "run3"), {})
@@ -0,0 +1,180 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import threading
+import hashlib
+import base64
+import os
+import BaseHTTPServer
+import download_manager
+from download_manager import DownloadManager, DownloadError, ChecksumError
+
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    '''
+    Serves server.files with ETags, conditional requests and Range requests.
+    If server.truncate is set, the next response is cut off after that many bytes.
+    If server.authorization is set, requests without that Authorization header are refused with a basic
+    auth challenge. server.redirects maps paths to the urls they are redirected to.
+    '''
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.server.authorization and self.headers.getheader("Authorization") != self.server.authorization:
+            self.send_response(401)
+            self.send_header("WWW-Authenticate", 'Basic realm="downloads"')
+            self.end_headers()
+            return
+        if self.path in self.server.redirects:
+            self.send_response(302)
+            self.send_header("Location", self.server.redirects[self.path])
+            self.end_headers()
+            return
+        if self.path not in self.server.files:
+            self.send_error(404)
+            return
+        content = self.server.files[self.path]
+        etag = '"%s"' % hashlib.sha1(content).hexdigest()
+        if self.headers.getheader("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        start = 0
+        range_header = self.headers.getheader("Range")
+        if range_header and self.headers.getheader("If-Range", etag) == etag:
+            start = int(range_header.split("=")[1].split("-")[0])
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" % (start, len(content) - 1, len(content)))
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(content) - start))
+        self.end_headers()
+
+        body = content[start:]
+        if self.server.truncate:
+            body = body[:self.server.truncate]
+            self.server.truncate = None
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class testDownloadManager(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = []
+        self.server = self.start_server({"/data.vcf.gz": os.urandom(3 * download_manager.BLOCK_SIZE + 123),
+                                         "/data.vcf.gz.tbi": "index contents"})
+        self.base_url = "http://127.0.0.1:%d" % (self.server.server_address[1])
+        self.tmp_dir = tempfile.mkdtemp()
+        self.mirror = os.path.join(self.tmp_dir, "mirror")
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def start_server(self, files):
+        server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), StandInHandler)
+        server.files = files
+        server.requests = []
+        server.truncate = None
+        server.authorization = None
+        server.redirects = {}
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.servers.append(server)
+        return server
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_fetchWritesFileAndManifest(self):
+        manager = DownloadManager(self.mirror, show_progress=False)
+        file_name = os.path.join(self.tmp_dir, "data.vcf.gz")
+        sha256 = manager.fetch(self.base_url + "/data.vcf.gz", file_name)
+        content = self.server.files["/data.vcf.gz"]
+        self.assertEquals(self.read(file_name), content)
+        self.assertEquals(sha256, hashlib.sha256(content).hexdigest())
+        self.assertEquals(download_manager.read_manifest(file_name), sha256)
+        self.assertEquals(self.read(manager.object_path(sha256)), content)
+
+    def test_fetchResumesInterruptedDownload(self):
+        self.server.truncate = download_manager.BLOCK_SIZE + 10
+        manager = DownloadManager(self.mirror, wait=0, show_progress=False)
+        file_name = os.path.join(self.tmp_dir, "data.vcf.gz")
+        manager.fetch(self.base_url + "/data.vcf.gz", file_name)
+        self.assertEquals(self.read(file_name), self.server.files["/data.vcf.gz"])
+        self.assertEquals(len(self.server.requests), 2)
+        self.assertEquals(self.server.requests[1][1]["range"], "bytes=%d-" % (download_manager.BLOCK_SIZE + 10))
+
+    def test_fetchResumesWithoutMirror(self):
+        self.server.truncate = 100
+        manager = DownloadManager(wait=0, show_progress=False)
+        file_name = os.path.join(self.tmp_dir, "data.vcf.gz")
+        manager.fetch(self.base_url + "/data.vcf.gz", file_name)
+        self.assertEquals(self.read(file_name), self.server.files["/data.vcf.gz"])
+        self.assertFalse(os.path.exists(file_name + ".part"))
+
+    def test_fetchUnchangedUsesMirror(self):
+        manager = DownloadManager(self.mirror, show_progress=False)
+        url = self.base_url + "/data.vcf.gz.tbi"
+        manager.fetch(url, os.path.join(self.tmp_dir, "first.tbi"))
+        manager.fetch(url, os.path.join(self.tmp_dir, "second.tbi"))
+        self.assertIn("if-none-match", self.server.requests[1][1])
+        self.assertEquals(self.read(os.path.join(self.tmp_dir, "second.tbi")), "index contents")
+
+        # a changed file is downloaded again
+        self.server.files["/data.vcf.gz.tbi"] = "new index contents"
+        manager.fetch(url, os.path.join(self.tmp_dir, "third.tbi"))
+        self.assertEquals(self.read(os.path.join(self.tmp_dir, "third.tbi")), "new index contents")
+
+    def test_fetchChecksumMismatch(self):
+        manager = DownloadManager(self.mirror, show_progress=False)
+        with self.assertRaises(ChecksumError):
+            manager.fetch(self.base_url + "/data.vcf.gz.tbi", os.path.join(self.tmp_dir, "data.tbi"),
+                          expected_sha256="0" * 64)
+
+    def test_fetchWithBasicAuth(self):
+        self.server.authorization = "Basic " + base64.b64encode("user:secret")
+        other = self.start_server({"/moved.tbi": "moved index contents"})
+        self.server.redirects["/moved.tbi"] = "http://127.0.0.1:%d/moved.tbi" % (other.server_address[1])
+        manager = DownloadManager(show_progress=False)
+
+        file_name = os.path.join(self.tmp_dir, "data.tbi")
+        manager.fetch(self.base_url + "/data.vcf.gz.tbi", file_name, username="user", password="secret")
+        self.assertEquals(self.read(file_name), "index contents")
+        # the credentials are sent once the server asks for them
+        self.assertEquals([headers.get("authorization") for path, headers in self.server.requests],
+                          [None, self.server.authorization])
+
+        # and not to the host of a redirect
+        file_name = os.path.join(self.tmp_dir, "moved.tbi")
+        manager.fetch(self.base_url + "/moved.tbi", file_name, username="user", password="secret")
+        self.assertEquals(self.read(file_name), "moved index contents")
+        self.assertEquals([(path, headers.get("authorization")) for path, headers in other.requests],
+                          [("/moved.tbi", None)])
+
+    def test_offlineMirror(self):
+        urls = [self.base_url + "/data.vcf.gz", self.base_url + "/data.vcf.gz.tbi"]
+        online = DownloadManager(self.mirror, show_progress=False)
+        online.fetch_all([(url, os.path.join(self.tmp_dir, url.split("/")[-1])) for url in urls], workers=2)
+        requests = len(self.server.requests)
+
+        offline = DownloadManager("file://" + self.mirror, show_progress=False)
+        offline_dir = os.path.join(self.tmp_dir, "offline")
+        for url in urls:
+            file_name = os.path.join(offline_dir, url.split("/")[-1])
+            offline.fetch(url, file_name)
+            self.assertEquals(self.read(file_name), self.server.files["/" + url.split("/")[-1]])
+        self.assertEquals(len(self.server.requests), requests)
+        self.assertEquals(offline.verify(), [])
+
+        with self.assertRaises(DownloadError):
+            offline.fetch(self.base_url + "/missing.vcf", os.path.join(offline_dir, "missing.vcf"))
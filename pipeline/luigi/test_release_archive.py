@@ -0,0 +1,141 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import tarfile
+import hashlib
+import random
+import os
+import release_archive
+
+
+class testReleaseArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.tmp_dir, "output")
+        self.archive = os.path.join(self.tmp_dir, "release.tar.gz")
+        rng = random.Random(37)
+        self.files = {"README.txt": "release\n",
+                      "empty.txt": "",
+                      "release/built.tsv": "".join("chr13:g.%d:A>G\tClinVar\n" % (i) for i in range(200000)),
+                      "release/artifacts/random.bin": "".join(chr(rng.randint(0, 255)) for i in range(300000)),
+                      "release/diff/removed.tsv": "Genomic_Coordinate\n"}
+        for name, content in self.files.items():
+            path = os.path.join(self.output_dir, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, "wb") as f:
+                f.write(content)
+        # a stale md5sums.txt is replaced
+        with open(os.path.join(self.output_dir, "md5sums.txt"), "w") as f:
+            f.write("stale\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_archiveIsRegularTarGz(self):
+        index = release_archive.write_archive(self.output_dir, self.archive, workers=3)
+        self.assertGreater(len(index["blocks"]), 10)
+        with tarfile.open(self.archive, "r:gz") as tar:
+            names = tar.getnames()
+            for name, content in self.files.items():
+                self.assertEquals(tar.extractfile("output/" + name).read(), content)
+        self.assertEquals(names[0], "output")
+        self.assertEquals(names[-1], "output/md5sums.txt")
+        self.assertIn("output/release/artifacts", names)
+        with open(self.archive, "rb") as f:
+            self.assertTrue(f.read().endswith(release_archive.BGZF_EOF))
+
+    def test_md5sums(self):
+        release_archive.write_archive(self.output_dir, self.archive, workers=2)
+        expected = sorted("%s: %s" % (os.path.basename(name), hashlib.md5(content).hexdigest())
+                          for name, content in self.files.items())
+        with open(os.path.join(self.output_dir, "md5sums.txt"), "r") as f:
+            archived = f.read()
+        self.assertEquals(sorted(archived.splitlines()), expected)
+        self.assertEquals(release_archive.read_member(self.archive, "output/md5sums.txt"), archived)
+
+        md5sums_path = os.path.join(self.tmp_dir, "md5sums.txt")
+        release_archive.write_md5sums(self.output_dir, md5sums_path, workers=2)
+        with open(md5sums_path, "r") as f:
+            self.assertEquals(sorted(f.read().splitlines()), sorted(archived.splitlines()))
+
+    def test_readMember(self):
+        index = release_archive.write_archive(self.output_dir, self.archive, workers=2)
+        for name, content in self.files.items():
+            self.assertEquals(release_archive.read_member(self.archive, "output/" + name, index), content)
+            self.assertEquals(index["members"]["output/" + name]["md5"], hashlib.md5(content).hexdigest())
+
+        extracted = release_archive.extract_member(self.archive, "output/release/built.tsv", self.tmp_dir)
+        with open(extracted, "rb") as f:
+            self.assertEquals(f.read(), self.files["release/built.tsv"])
+
+        with self.assertRaises(KeyError):
+            release_archive.read_member(self.archive, "output/missing.tsv")
+
+    def test_readMemberWithoutIndex(self):
+        release_archive.write_archive(self.output_dir, self.archive)
+        os.remove(self.archive + release_archive.INDEX_SUFFIX)
+        self.assertIsNone(release_archive.read_index(self.archive))
+        self.assertEquals(release_archive.read_member(self.archive, "output/README.txt"), "release\n")
+
+    def members(self):
+        # md5sums.txt is rewritten by every write_archive, so its mtime is left out
+        with tarfile.open(self.archive, "r:gz") as tar:
+            return [(member.name, member.type, member.mode, member.size,
+                     None if member.name.endswith("md5sums.txt") else member.mtime,
+                     tar.extractfile(member).read() if member.isfile() else None) for member in tar]
+
+    def test_sameArchiveWithAnyNumberOfWorkers(self):
+        release_archive.write_archive(self.output_dir, self.archive, workers=1)
+        single = self.members()
+        release_archive.write_archive(self.output_dir, self.archive, workers=4)
+        self.assertEquals(self.members(), single)
+
+    def test_streamMembers(self):
+        release_archive.write_archive(self.output_dir, self.archive, workers=2)
+        built = self.files["release/built.tsv"]
+        for indexed in [True, False]:
+            if not indexed:
+                os.remove(self.archive + release_archive.INDEX_SUFFIX)
+            with release_archive.ReleaseArchive(self.archive) as archive:
+                self.assertEquals(archive.index is not None, indexed)
+                self.assertIn("output/release/built.tsv", archive.names())
+                f = archive.open("output/release/built.tsv")
+                self.assertEquals(f.readline(), built[:built.index("\n") + 1])
+                self.assertEquals(f.read(100000), built[built.index("\n") + 1:][:100000])
+                self.assertEquals(list(f), built[built.index("\n") + 1:][100000:].splitlines(True))
+                f.close()
+                f = archive.open("output/release/artifacts/random.bin")
+                self.assertEquals("".join(iter(lambda: f.read(7777), "")), self.files["release/artifacts/random.bin"])
+                f.close()
+                self.assertEquals(archive.read("output/empty.txt"), "")
+                with self.assertRaises(KeyError):
+                    archive.open("output/release")
+
+    def test_cachedMembers(self):
+        release_archive.write_archive(self.output_dir, self.archive)
+        cache_dir = os.path.join(self.tmp_dir, "cache")
+        with release_archive.ReleaseArchive(self.archive, cache_dir=cache_dir) as archive:
+            path = archive.cached("output/release/built.tsv")
+        with open(path, "rb") as f:
+            self.assertEquals(f.read(), self.files["release/built.tsv"])
+        self.assertTrue(path.startswith(cache_dir))
+        # later readers of the archive take the member from the cache
+        with open(path, "wb") as f:
+            f.write("cached")
+        with release_archive.ReleaseArchive(self.archive, cache_dir=cache_dir) as archive:
+            self.assertEquals(archive.cached("output/release/built.tsv"), path)
+        with open(path, "rb") as f:
+            self.assertEquals(f.read(), "cached")
+
+        # the members of an earlier archive are removed when another archive is cached
+        other_archive = os.path.join(self.tmp_dir, "other.tar.gz")
+        release_archive.write_archive(self.output_dir, other_archive)
+        os.makedirs(os.path.join(cache_dir, "not-a-cache-key"))
+        with release_archive.ReleaseArchive(other_archive, cache_dir=cache_dir) as archive:
+            other_path = archive.cached("output/release/built.tsv")
+        self.assertFalse(os.path.exists(path))
+        self.assertEquals(sorted(os.listdir(cache_dir)),
+                          sorted([os.path.relpath(other_path, cache_dir).split(os.sep)[0], "not-a-cache-key"]))
@@ -0,0 +1,103 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import json
+import os
+import luigi
+from luigi.util import inherits, requires
+import dag_report
+import run_plan
+
+
+class Download(luigi.Task):
+    file_parent_dir = luigi.Parameter()
+    date = luigi.Parameter(default="2017-01-01")
+
+    def output(self):
+        return luigi.LocalTarget(self.file_parent_dir + "/download.txt")
+
+
+@requires(Download)
+class Convert(luigi.Task):
+    def output(self):
+        return luigi.LocalTarget(self.file_parent_dir + "/converted.txt")
+
+
+@requires(Download)
+class Annotate(luigi.Task):
+    priority = 10
+
+    def output(self):
+        return luigi.LocalTarget(self.file_parent_dir + "/annotated.txt")
+
+
+@inherits(Download)
+class Merge(luigi.Task):
+    def requires(self):
+        return [self.clone(Convert), self.clone(Annotate)]
+
+    def output(self):
+        return luigi.LocalTarget(self.file_parent_dir + "/merged.txt")
+
+
+class testRunPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def touch(self, file_name):
+        open(os.path.join(self.tmp_dir, file_name), "w").close()
+
+    def record_timings(self, timings, date="2017-01-01"):
+        with open(os.path.join(self.tmp_dir, dag_report.TIMINGS_FILE_NAME), "a") as f:
+            for cls, seconds in timings:
+                task = cls(file_parent_dir=self.tmp_dir, date=date)
+                f.write(json.dumps({"task_id": task.task_id, "task_family": task.task_family,
+                                    "start": 1000.0, "end": 1000.0 + seconds}) + "\n")
+
+    def plan(self, workers=1):
+        return run_plan.make_plan(Merge(file_parent_dir=self.tmp_dir),
+                                  [os.path.join(self.tmp_dir, dag_report.TIMINGS_FILE_NAME)], workers)
+
+    def test_planSkipsCompleteTasks(self):
+        self.touch("download.txt")
+        self.touch("converted.txt")
+        plan = self.plan()
+        self.assertEquals([(entry["task_family"], entry["complete"]) for entry in plan["tasks"]],
+                          [("Download", True), ("Annotate", False), ("Convert", True), ("Merge", False)])
+
+        # requirements of complete tasks are not checked, like the scheduler
+        self.touch("merged.txt")
+        os.remove(os.path.join(self.tmp_dir, "download.txt"))
+        plan = self.plan()
+        self.assertEquals((plan["num_tasks"], plan["num_to_run"]), (1, 0))
+        self.assertEquals(plan["estimated_wall_seconds"], 0.0)
+
+    def test_estimates(self):
+        # durations of the same task are preferred, other dates' runs are used for the task family
+        self.record_timings([(Download, 100), (Convert, 40), (Annotate, 10), (Merge, 5)], date="2016-12-01")
+        self.record_timings([(Download, 200), (Convert, 20), (Annotate, 30)], date="2016-12-02")
+        self.record_timings([(Download, 60)])
+        plan = self.plan()
+        estimates = dict((entry["task_family"], (entry["seconds"], entry["estimate_from"])) for entry in plan["tasks"])
+        self.assertEquals(estimates, {"Download": (60, "task"), "Convert": (30, "family"),
+                                      "Annotate": (20, "family"), "Merge": (5, "family")})
+        self.assertEquals(plan["serial_seconds"], 115)
+        self.assertEquals(plan["critical_path_seconds"], 95)
+        self.assertEquals([dag_report.build_dag(Merge(file_parent_dir=self.tmp_dir))[task_id][0].task_family
+                           for task_id in plan["critical_path"]], ["Download", "Convert", "Merge"])
+        self.assertEquals(plan["num_without_timings"], 0)
+
+        self.assertEquals(plan["estimated_wall_seconds"], 115)
+        self.assertEquals(self.plan(workers=2)["estimated_wall_seconds"], 95)
+
+    def test_simulateRunByPriority(self):
+        dag = {"a": (None, []), "b": (None, []), "c": (None, ["a"])}
+        durations = {"a": 10, "b": 10, "c": 10}
+        self.assertEquals(run_plan.simulate_run(dag, durations, 1), (30, {"a": 0, "b": 10, "c": 20}))
+        self.assertEquals(run_plan.simulate_run(dag, durations, 1, {"b": 1}), (30, {"b": 0, "a": 10, "c": 20}))
+        self.assertEquals(run_plan.simulate_run(dag, durations, 2), (20, {"a": 0, "b": 0, "c": 10}))
@@ -0,0 +1,91 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import csv
+import os
+import random
+import json
+import stage_integrity
+
+
+class testStageIntegrity(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, contents):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "wb") as f:
+            f.write(contents)
+        return path
+
+    def dictReaderCount(self, path):
+        return len(list(csv.DictReader(open(path, "r"), delimiter='\t')))
+
+    def test_countTsvRecords(self):
+        '''Tests that record counts match csv.DictReader for blank lines, quotes and missing final newlines'''
+        contents = ["",
+                    "a\tb\n",
+                    "a\tb",
+                    "a\tb\n1\t2\n3\t4\n",
+                    "a\tb\n1\t2\n3\t4",
+                    "a\tb\r\n1\t2\r\n3\t4\r\n",
+                    "a\tb\n1\t2\n\n3\t4\n\n",
+                    "a\tb\r\n1\t2\r\n\r\n3\t4\r\n",
+                    "\na\tb\n1\t2\n",
+                    "a\tb\n1\t\"two\nlines\"\n3\t4\n",
+                    "a\tb\n\"1\n\"\t2\n",
+                    "a\tb\n1\tsome \"quoted\" text\n"]
+        for index, content in enumerate(contents):
+            path = self.write("test%d.tsv" % (index), content)
+            self.assertEquals(stage_integrity.count_tsv_records(path), self.dictReaderCount(path), repr(content))
+
+    def test_countTsvRecordsAcrossBlocks(self):
+        '''Tests that blank lines and quotes spanning read blocks are detected'''
+        rng = random.Random(34)
+        original_block_size = stage_integrity.BLOCK_SIZE
+        stage_integrity.BLOCK_SIZE = 3
+        try:
+            for index in range(200):
+                lines = ["a\tb"] + [rng.choice(["1\t2", "", "\r", "x\t\"y\"", "3\t4"]) for ii in range(rng.randint(0, 8))]
+                path = self.write("random%d.tsv" % (index), "\n".join(lines) + rng.choice(["", "\n"]))
+                self.assertEquals(stage_integrity.count_tsv_records(path), self.dictReaderCount(path), repr(lines))
+        finally:
+            stage_integrity.BLOCK_SIZE = original_block_size
+
+    def test_fingerprintTsvIsOrderIndependent(self):
+        first = self.write("first.tsv", "a\tb\tc\n1\tx\t-\n2\ty\tz\n")
+        second = self.write("second.tsv", "b\ta\n y\t2\nx\t1\n".replace(" ", ""))
+        records, firstColumns = stage_integrity.fingerprint_tsv(first)
+        self.assertEquals(records, 2)
+        self.assertEquals(firstColumns["c"]["non_empty"], 1)
+        records, secondColumns = stage_integrity.fingerprint_tsv(second)
+        self.assertEquals(firstColumns["a"], secondColumns["a"])
+        self.assertEquals(firstColumns["b"], secondColumns["b"])
+        self.assertNotEqual(firstColumns["a"]["checksum"], firstColumns["b"]["checksum"])
+
+    def test_checkStageAndReport(self):
+        tsvIn = self.write("merged.tsv", "a\tb\n1\tx\n2\ty\n3\tz\n")
+        tsvOut = self.write("annotated.tsv", "a\tb\tc\n1\tX\tq\n3\tz\tr\n")
+        stage = stage_integrity.check_stage(tsvIn, tsvOut, 1)
+        self.assertTrue(stage["passed"])
+        self.assertEquals(stage["input_variants"], 3)
+        self.assertEquals(stage["output_variants"], 2)
+        self.assertFalse(stage_integrity.check_stage(tsvIn, tsvOut)["passed"])
+
+        stage = stage_integrity.check_stage(tsvIn, tsvOut, 1, fingerprints=True)
+        self.assertTrue(stage["passed"])
+        self.assertEquals(stage["columns_added"], ["c"])
+        self.assertEquals(stage["columns_changed"], ["a", "b"])
+
+        reportFile = os.path.join(self.tmp_dir, "stage_integrity.json")
+        stage_integrity.record_stage(reportFile, stage)
+        stage_integrity.record_stage(reportFile, stage_integrity.check_stage(tsvOut, tsvOut))
+        with open(reportFile) as f:
+            report = json.load(f)
+        self.assertEquals(sorted(report.keys()), ["annotated.tsv"])
+        self.assertEquals(report["annotated.tsv"]["input"], "annotated.tsv")
@@ -0,0 +1,107 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import json
+import os
+import luigi
+from luigi.util import requires
+import task_profile
+
+
+class WriteVariants(luigi.Task):
+    file_parent_dir = luigi.Parameter()
+
+    def output(self):
+        return {"tsv": luigi.LocalTarget(self.file_parent_dir + "/variants.tsv"),
+                "vcf": luigi.LocalTarget(self.file_parent_dir + "/variants.vcf")}
+
+    def run(self):
+        with open(self.output()["tsv"].path, "w") as f:
+            f.write("Genomic_Coordinate\tSource\n")
+            for index in range(100):
+                f.write("chr13:g.%d:A>G\tClinVar\n" % (32315474 + index))
+        with open(self.output()["vcf"].path, "w") as f:
+            f.write("##fileformat=VCFv4.0\n#CHROM\tPOS\tID\tREF\tALT\n13\t32315474\t.\tA\tG\n")
+
+
+@requires(WriteVariants)
+class SortVariants(luigi.Task):
+    def output(self):
+        return luigi.LocalTarget(self.file_parent_dir + "/sorted.tsv")
+
+    def run(self):
+        with open(self.input()["tsv"].path, "r") as f:
+            lines = f.readlines()
+        with open(self.output().path, "w") as f:
+            f.writelines(lines[:1] + sorted(lines[1:]))
+
+
+class testTaskProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def run_task(self, task, cprofile=False):
+        task_profile.record_task_start(task, cprofile)
+        task.run()
+        task_profile.record_task_end(task)
+
+    def test_recordTaskProfile(self):
+        task = WriteVariants(file_parent_dir=self.tmp_dir)
+        self.run_task(task)
+        profiles = task_profile.read_profiles(task_profile.get_profiles_file(task))
+        profile = profiles[task.task_id]
+        self.assertEquals(profile["status"], "done")
+        self.assertGreaterEqual(profile["wall_seconds"], 0)
+        self.assertGreaterEqual(profile["cpu_seconds"], 0)
+        self.assertGreater(profile["peak_rss_bytes"], 0)
+        self.assertEquals(sorted((output["path"], output["records"]) for output in profile["outputs"]),
+                          [("variants.tsv", 100), ("variants.vcf", 1)])
+        self.assertNotIn("top_functions", profile)
+
+    def test_recordFailedTask(self):
+        task = WriteVariants(file_parent_dir=self.tmp_dir)
+        task_profile.record_task_start(task)
+        task_profile.record_task_end(task, ValueError("failed"))
+        profile = task_profile.read_profiles(task_profile.get_profiles_file(task))[task.task_id]
+        self.assertEquals(profile["status"], "failed")
+        self.assertEquals(profile["outputs"], [])
+
+    def test_cprofile(self):
+        task = WriteVariants(file_parent_dir=self.tmp_dir)
+        self.run_task(task, cprofile=True)
+        profile = task_profile.read_profiles(task_profile.get_profiles_file(task))[task.task_id]
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, profile["cprofile"])))
+        self.assertTrue(any("run" in function["function"] for function in profile["top_functions"]))
+
+    def test_profileReport(self):
+        root_task = SortVariants(file_parent_dir=self.tmp_dir)
+        self.run_task(root_task.requires())
+        self.run_task(root_task)
+        report = task_profile.write_profile_report(root_task)
+        self.assertEquals(report["num_tasks"], 2)
+        self.assertEquals(sorted(report["tasks"]), ["SortVariants", "WriteVariants"])
+        self.assertEquals(report["regressions"], [])
+        with open(os.path.join(self.tmp_dir, task_profile.REPORT_JSON_NAME), "r") as f:
+            self.assertEquals(json.load(f)["tasks"]["SortVariants"]["outputs"][0]["records"], 100)
+        with open(os.path.join(self.tmp_dir, task_profile.REPORT_HTML_NAME), "r") as f:
+            self.assertIn("SortVariants", f.read())
+
+    def test_regressions(self):
+        root_task = SortVariants(file_parent_dir=self.tmp_dir)
+        profiles = {root_task.task_id: {"task_id": root_task.task_id, "task_family": "SortVariants",
+                                        "wall_seconds": 100.0, "cpu_seconds": 90.0, "peak_rss_bytes": 1024,
+                                        "bytes_read": 10, "bytes_written": 20, "outputs": []}}
+        previous_report = {"tasks": {"SortVariants": {"wall_seconds": 50.0}}}
+        report = task_profile.make_profile_report(root_task, profiles, previous_report)
+        self.assertEquals(report["regressions"], ["SortVariants"])
+        self.assertEquals(report["tasks"]["SortVariants"]["previous_wall_seconds"], 50.0)
+        self.assertIn("class=\"regression\"", task_profile.format_profile_html(report))
+
+        # small absolute differences are not regressions
+        previous_report["tasks"]["SortVariants"]["wall_seconds"] = 95.0
+        self.assertEquals(task_profile.make_profile_report(root_task, profiles, previous_report)["regressions"], [])
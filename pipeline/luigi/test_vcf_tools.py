@@ -0,0 +1,174 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import subprocess
+import datetime
+import gzip
+import random
+import os
+import vcf_tools
+
+HEADER = ["##fileformat=VCFv4.1\n",
+          "##INFO=<ID=AF,Number=A,Type=Float,Description=\"Allele Frequency\">\n",
+          "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"]
+
+# source chr17 100-150 and 160-210 map to target chr17 1000-1050 and 1055-1105, 300-400 maps to the reverse
+# strand of chr17 (size 2000) and 550-600 is in two chains, so it can't be lifted over
+CHAIN = """chain 1000 chr17 5000 + 100 210 chr17 2000 + 1000 1105 1
+50 10 5
+50
+
+chain 900 chr17 5000 + 300 400 chr17 2000 - 100 200 2
+100
+
+chain 800 chr17 5000 + 500 600 chr17 2000 + 1500 1600 3
+100
+
+chain 700 chr17 5000 + 550 650 chr13 2000 + 0 100 4
+100
+"""
+
+
+class testVCFTools(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        random.seed(38)
+        self.genome = "".join(random.choice("acgt") for i in xrange(2000))
+        self.fasta = self.path("hg38.fa")
+        with open(self.fasta, "w") as f:
+            f.write(">chr13\n" + "A" * 30 + "\n" + "C" * 30 + "\n>chr17 target\n")
+            for start in xrange(0, len(self.genome), 60):
+                f.write(self.genome[start:start + 60] + "\n")
+        self.chain = self.path("hg19ToHg38.over.chain.gz")
+        with gzip.open(self.chain, "wb") as f:
+            f.write(CHAIN)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def path(self, file_name):
+        return os.path.join(self.tmp_dir, file_name)
+
+    def write_vcf(self, file_name, records, header=HEADER):
+        with open(self.path(file_name), "w") as f:
+            f.writelines(header)
+            f.writelines(record + "\n" for record in records)
+        return self.path(file_name)
+
+    def read(self, file_name):
+        with open(self.path(file_name), "r") as f:
+            return f.readlines()
+
+    def test_fastaFile(self):
+        fasta = vcf_tools.FastaFile(self.fasta)
+        self.assertTrue(os.path.exists(self.fasta + ".fai"))
+        self.assertEquals(fasta.fetch("chr17", 55, 125), self.genome[55:125])
+        self.assertEquals(fasta.fetch("chr17", 1990, 2010), self.genome[1990:])
+        self.assertEquals(fasta.fetch("chr13", 28, 32), "AACC")
+        with self.assertRaises(KeyError):
+            fasta.fetch("chr1", 0, 10)
+
+    def test_chainIndex(self):
+        chain = vcf_tools.ChainIndex(self.chain)
+        self.assertEquals(chain.map_interval("chr17", 120, 121), ("chr17", 1020, 1021))
+        self.assertEquals(chain.map_interval("chr17", 170, 171), ("chr17", 1065, 1066))
+        # the gap between the blocks of the first chain
+        self.assertIsNone(chain.map_interval("chr17", 155, 156))
+        # the overlapping part of the query is mapped
+        self.assertEquals(chain.map_interval("chr17", 95, 105), ("chr17", 1000, 1005))
+        # reverse strand: source 300-400 is target 2000 - 200 to 2000 - 100
+        self.assertEquals(chain.map_interval("chr17", 310, 312), ("chr17", 1888, 1890))
+        self.assertIsNone(chain.map_interval("chr17", 560, 561))
+        self.assertEquals(chain.map_interval("chr17", 520, 521), ("chr17", 1520, 1521))
+        self.assertIsNone(chain.map_interval("chr13", 0, 1))
+
+    def test_liftover(self):
+        liftover = vcf_tools.Liftover(self.chain, self.fasta)
+        alt = "T" if self.genome[1019].upper() != "T" else "G"
+        self.assertEquals(liftover.lift("17\t120\trs1\tA\t%s\t.\tPASS\tAF=0.5 ;X=1\n" % (alt)),
+                          "17\t1020\trs1\t%s\t%s\t.\tPASS\tAF=0.5 ;X=1\n" % (self.genome[1019].upper(), alt))
+        # the reference allele is taken from the new genome, records with reference = alternate aren't lifted
+        self.assertIsNone(liftover.lift("17\t120\t.\tA\t%s\t.\t.\t.\n" % (self.genome[1019].upper())))
+        self.assertIsNone(liftover.lift("17\t560\t.\tA\tT\t.\t.\t.\n"))
+
+        # once a record has a "chr" chromosome, chromosomes keep their names
+        self.assertTrue(liftover.lift("chr17\t521\t.\tA\tN\t.\t.\t.\n").startswith("chr17\t1521\t"))
+        self.assertTrue(liftover.lift("17\t521\t.\tA\tN\t.\t.\t.\n").startswith("17\t1521\t"))
+
+        header = liftover.lift_header(HEADER)
+        self.assertEquals(header[:2], HEADER[:2])
+        self.assertEquals(header[2:6], ["##liftOverProgram=CrossMap(https://sourceforge.net/projects/crossmap/)\n",
+                                        "##liftOverFile=%s\n" % (self.chain),
+                                        "##new_reference_genome=%s\n" % (self.fasta),
+                                        "##liftOverTime=%s\n" % (datetime.date.today().strftime("%B%d,%Y"))])
+        self.assertEquals(header[6:], HEADER[2:])
+
+    def test_sortKeyMatchesSort(self):
+        records = ["%s\t%d\t.\t%s\tA\t.\t.\t." % (random.choice(["13", "17", "2", "X", "chr1", "1_1", "11"]),
+                                                  random.randint(1, 1000), random.choice(["C", "G", "CT"]))
+                   for i in xrange(500)]
+        sort = subprocess.Popen(["sort", "-k1,1d", "-k2,2n"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                env={"LC_ALL": "C"})
+        expected = sort.communicate("".join(record + "\n" for record in records))[0]
+        self.assertEquals("".join(sorted((record + "\n" for record in records), key=vcf_tools.sort_key)),
+                          expected)
+
+    def test_mergeVCFs(self):
+        brca1 = self.write_vcf("brca1.vcf", ["17\t170\t.\tA\tN\t.\t.\t.", "17\t110\t.\tA\tN\t.\t.\t.",
+                                             "17\t560\t.\tA\tN\t.\t.\t."])
+        brca2 = self.write_vcf("brca2.vcf", ["17\t320\t.\tA\tN\t.\t.\t.", "17\t120\tx\tA\tN\t.\t.\t."],
+                               header=HEADER[:1] + HEADER[2:])
+        output = self.path("brca12.sorted.hg38.vcf")
+        self.assertEquals(vcf_tools.merge_vcfs([brca1, brca2], output, vcf_tools.Liftover(self.chain, self.fasta)), 4)
+
+        lines = self.read("brca12.sorted.hg38.vcf")
+        self.assertEquals(lines[:2], HEADER[:2])
+        self.assertEquals(lines[6], HEADER[2])
+        self.assertEquals([line.split("\t")[:4] for line in lines[7:]],
+                          [["17", "1010", ".", self.genome[1009].upper()], ["17", "1020", "x", self.genome[1019].upper()],
+                           ["17", "1065", ".", self.genome[1064].upper()], ["17", "1881", ".", self.genome[1880].upper()]])
+        self.assertEquals(self.read("brca12.sorted.hg38.vcf.unmap"), HEADER + ["17\t560\t.\tA\tN\t.\t.\t.\n"])
+
+        # without a liftover the records are kept as they are
+        self.assertEquals(vcf_tools.merge_vcfs([brca2, brca1], output, bgzf=False), 5)
+        self.assertEquals(self.read("brca12.sorted.hg38.vcf"),
+                          HEADER[:1] + HEADER[2:] + ["17\t110\t.\tA\tN\t.\t.\t.\n", "17\t120\tx\tA\tN\t.\t.\t.\n",
+                                                     "17\t170\t.\tA\tN\t.\t.\t.\n", "17\t320\t.\tA\tN\t.\t.\t.\n",
+                                                     "17\t560\t.\tA\tN\t.\t.\t.\n"])
+
+    def test_tabixIndexAndQuery(self):
+        records = []
+        for chrom in ("13", "17"):
+            positions = sorted(random.randint(1, 200000) for i in xrange(3000))
+            for position in positions:
+                ref = random.choice(["A", "AT", "ACGTACGT"])
+                info = "END=%d" % (position + 20000) if random.random() < 0.01 else "AF=0.%d" % (random.randint(0, 9))
+                records.append("%s\t%d\t.\t%s\tG\t.\tPASS\t%s" % (chrom, position, ref, info))
+        vcf = self.write_vcf("data.vcf", records)
+        output = self.path("sorted.vcf")
+        vcf_tools.merge_vcfs([vcf], output)
+
+        with gzip.open(output + ".gz", "rb") as f:
+            self.assertEquals(f.read(), "".join(self.read("sorted.vcf")))
+        index = vcf_tools.read_tabix_index(output + ".gz.tbi")
+        self.assertEquals(sorted(index), ["13", "17"])
+
+        lines = self.read("sorted.vcf")
+        for region in ["13:1-200000", "17:50000-50100", "17:123456-150000", "13:199990", "13:300000-400000", "1:1-10"]:
+            chrom, begin, end = vcf_tools.parse_region(region)
+            expected = [line for line in lines if not line.startswith("#")
+                        and vcf_tools.record_interval(line)[0] == chrom
+                        and vcf_tools.record_interval(line)[1] < end and vcf_tools.record_interval(line)[2] > begin]
+            self.assertEquals(vcf_tools.query_tabix(output + ".gz", region, index=index), HEADER + expected)
+
+        self.assertEquals(vcf_tools.extract_region(output + ".gz", "17:50000-50100", self.path("region.vcf")),
+                          len(vcf_tools.query_tabix(output + ".gz", "17:50000-50100", header=False)))
+
+    def test_compareVCFRecords(self):
+        expected = self.write_vcf("expected.vcf", ["13\t1\t.\tA\tG\t.\t.\t.", "17\t2\t.\tA\tG\t.\t.\t."])
+        actual = self.write_vcf("actual.vcf", ["13\t1\t.\tA\tG\t.\t.\t.", "17\t2\t.\tA\tG\t.\t.\t."], header=HEADER[2:])
+        self.assertIsNone(vcf_tools.compare_vcf_records(expected, actual))
+        actual = self.write_vcf("actual.vcf", ["13\t1\t.\tA\tG\t.\t.\t."])
+        self.assertEquals(vcf_tools.compare_vcf_records(expected, actual), (2, "17\t2\t.\tA\tG\t.\t.\t.\n", None))
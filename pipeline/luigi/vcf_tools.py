@@ -0,0 +1,638 @@
+#!/usr/bin/env python
+
+"""
+In-process replacements for the vcf-concat, CrossMap.py vcf, vcf-sort and tabix calls of the pipeline.
+
+merge_vcfs turns the per-gene VCFs of a source into its sorted release VCF in one pass:
+    - the header of the first file and the records of every file are used, as by vcf-concat
+    - records are lifted over with a Liftover, which follows CrossMap.py vcf (0.2.6): the chain
+      file is loaded once into an interval index, records that do not map to exactly one chain
+      block or whose new reference allele equals the alternate allele go to <output>.unmap,
+      and the reference allele is read from the new reference genome
+    - each file's records are sorted and the files are k-way merged in the order of vcf-sort
+      (sort -k1,1d -k2,2n with the C locale)
+    - the sorted VCF is also written BGZF compressed with a tabix index (<output>.gz, <output>.gz.tbi)
+
+query_tabix returns the records of a region of a BGZF compressed, tabix indexed VCF, like tabix -h.
+
+compare_vcf_records checks that two VCFs have the same records byte for byte, for validating
+the output against a release built with the command line tools.
+
+Usage:
+    python vcf_tools.py merge -o brca12.sorted.hg38.vcf --chain hg19ToHg38.over.chain.gz --fasta hg38.fa brca1.vcf brca2.vcf
+    python vcf_tools.py query ALL.chr13.vcf.gz 13:32889617-32973809
+    python vcf_tools.py compare previous/bic_brca12.sorted.hg38.vcf bic_brca12.sorted.hg38.vcf
+"""
+
+import argparse
+import bisect
+import collections
+import datetime
+import gzip
+import heapq
+import re
+import struct
+import sys
+import zlib
+
+import release_archive
+from release_archive import BGZF_BLOCK_SIZE, BGZF_EOF, BGZF_HEADER
+
+TABIX_MAGIC = "TBI\1"
+TABIX_HEADER = struct.Struct("<4s7i")
+# tabix preset for VCF: 1-based positions, sequence in column 1, position in column 2, '#' comment lines
+TABIX_VCF_FORMAT = (2, 1, 2, 0, ord("#"), 0)
+TABIX_LINEAR_SHIFT = 14
+# bin of the metadata pseudo-bin htslib adds to every reference
+TABIX_MAX_BIN = 37450
+
+# fields of a line as seen by sort without -t: field 1 and the number starting field 2
+SORT_FIELDS = re.compile(r"([ \t]*[^ \t]*)[ \t]*(-?[0-9]*)")
+# sort -d only compares blanks and alphanumerics
+NON_DICTIONARY = re.compile(r"[^A-Za-z0-9 \t]")
+END_VALUE = re.compile(r"-?[0-9]+")
+
+_chains = {}
+_fastas = {}
+
+
+def sort_key(line):
+    '''
+    Returns the key ordering line like vcf-sort: chromosome in dictionary order, numeric position, then the whole line
+    '''
+    line = line.rstrip("\n")
+    chrom, pos = SORT_FIELDS.match(line).groups()
+    return (NON_DICTIONARY.sub("", chrom), int(pos) if pos not in ("", "-") else 0, line)
+
+
+def record_interval(line):
+    '''
+    Returns (chrom, begin, end) of a VCF record, 0-based and half open: the reference allele or
+    INFO END, as tabix 0.2.6 indexes it
+    '''
+    fields = line.rstrip("\n").split("\t", 8)
+    begin = int(fields[1]) - 1
+    end = begin + len(fields[3])
+    info = fields[7] if len(fields) > 7 else ""
+    if info.startswith("END="):
+        match = END_VALUE.match(info, 4)
+    elif ";END=" in info:
+        match = END_VALUE.match(info, info.index(";END=") + 5)
+    else:
+        match = None
+    if match:
+        end = int(match.group())
+    return fields[0], begin, end
+
+
+def read_vcf(path):
+    '''
+    Returns ([header lines], [record lines]) of a VCF, blank lines are skipped
+    '''
+    header, records = [], []
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if not line.endswith("\n"):
+                line += "\n"
+            if line.startswith("#") and not records:
+                header.append(line)
+            else:
+                records.append(line)
+    return header, records
+
+
+###############################################
+#                  Liftover                   #
+###############################################
+
+
+class ChainIndex(object):
+    '''
+    Chain file blocks by source chromosome, found with a binary search on the block starts and
+    the running maximum of the block ends (blocks of different chains can overlap)
+    '''
+
+    def __init__(self, chain_file):
+        blocks = collections.defaultdict(list)
+        opener = gzip.open if chain_file.endswith((".gz", ".Z", ".z")) else open
+        with opener(chain_file, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                fields = line.split()
+                if fields[0] == "chain" and len(fields) in (12, 13):
+                    if fields[4] != "+":
+                        raise ValueError("source strand in a chain file must be +: %s" % (line))
+                    if fields[9] not in ("+", "-"):
+                        raise ValueError("target strand must be + or -: %s" % (line))
+                    source, target, target_size, target_strand = fields[2], fields[7], int(fields[8]), fields[9]
+                    source_from, target_from = int(fields[5]), int(fields[10])
+                elif fields[0] != "chain" and len(fields) in (1, 3):
+                    size = int(fields[0])
+                    if target_strand == "+":
+                        block = (target, target_from, target_from + size, target_strand)
+                    else:
+                        block = (target, target_size - (target_from + size), target_size - target_from, target_strand)
+                    blocks[source].append((source_from, source_from + size, block))
+                    if len(fields) == 3:
+                        source_from += size + int(fields[1])
+                        target_from += size + int(fields[2])
+
+        self.index = {}
+        for source, source_blocks in blocks.items():
+            source_blocks.sort(key=lambda block: block[0])
+            max_ends = []
+            for start, end, block in source_blocks:
+                max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+            self.index[source] = ([block[0] for block in source_blocks], max_ends, source_blocks)
+
+    def find(self, chrom, start, end):
+        '''
+        Returns [(source start, source end, (target chrom, target start, target end, target strand))]
+        for the blocks overlapping start-end of chrom
+        '''
+        if chrom not in self.index:
+            return []
+        starts, max_ends, blocks = self.index[chrom]
+        found = []
+        i = bisect.bisect_left(starts, end) - 1
+        while i >= 0 and max_ends[i] > start:
+            if blocks[i][1] > start:
+                found.append(blocks[i])
+            i -= 1
+        return found
+
+    def map_interval(self, chrom, start, end):
+        '''
+        Returns (target chrom, target start, target end) of start-end of chrom, None unless it overlaps exactly one block
+        '''
+        blocks = self.find(chrom, start, end)
+        if len(blocks) != 1:
+            return None
+        source_start, source_end, (target, target_start, target_end, target_strand) = blocks[0]
+        overlap_start, overlap_end = max(start, source_start), min(end, source_end)
+        size = overlap_end - overlap_start
+        offset = overlap_start - source_start
+        if target_strand == "+":
+            new_start = target_start + offset
+        else:
+            new_start = target_end - offset - size
+        return target, new_start, new_start + size
+
+
+def load_chain(chain_file):
+    if chain_file not in _chains:
+        _chains[chain_file] = ChainIndex(chain_file)
+    return _chains[chain_file]
+
+
+class FastaFile(object):
+    '''
+    Reads regions of a FASTA file with its samtools faidx index (<fasta>.fai), creating the index if needed
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.index = {}
+        try:
+            fai = open(path + ".fai", "r")
+        except IOError:
+            write_fasta_index(path)
+            fai = open(path + ".fai", "r")
+        with fai:
+            for line in fai:
+                name, length, offset, line_bases, line_width = line.split("\t")[:5]
+                self.index[name] = (int(length), int(offset), int(line_bases), int(line_width))
+        self.f = open(path, "rb")
+
+    def fetch(self, reference, start, end):
+        '''
+        Returns the bases start-end (0-based, half open) of reference, clipped to its length
+        '''
+        if reference not in self.index:
+            raise KeyError("sequence '%s' not present in %s" % (reference, self.path))
+        length, offset, line_bases, line_width = self.index[reference]
+        start, end = max(start, 0), min(end, length)
+        if start >= end:
+            return ""
+        first = offset + start // line_bases * line_width + start % line_bases
+        last = offset + (end - 1) // line_bases * line_width + (end - 1) % line_bases + 1
+        self.f.seek(first)
+        return self.f.read(last - first).replace("\n", "").replace("\r", "")
+
+
+def write_fasta_index(path):
+    '''
+    Writes the samtools faidx index of the FASTA file path to path.fai
+    '''
+    entries = []
+    with open(path, "rb") as f:
+        offset = 0
+        for line in f:
+            offset += len(line)
+            if line.startswith(">"):
+                entries.append([line[1:].split()[0], 0, offset, 0, 0])
+            elif entries:
+                entry = entries[-1]
+                bases = len(line.rstrip("\r\n"))
+                if not entry[3]:
+                    entry[3], entry[4] = bases, len(line)
+                entry[1] += bases
+    with open(path + ".fai", "w") as f:
+        for entry in entries:
+            f.write("\t".join(str(value) for value in entry) + "\n")
+
+
+def open_fasta(path):
+    if path not in _fastas:
+        _fastas[path] = FastaFile(path)
+    return _fastas[path]
+
+
+class Liftover(object):
+    '''
+    Lifts VCF lines over like CrossMap.py vcf chain_file input.vcf fasta_file output.vcf, one Liftover
+    per CrossMap run (whether chromosomes are written with "chr" is decided by the records seen so far)
+    '''
+
+    def __init__(self, chain_file, fasta_file):
+        self.chain_file = chain_file
+        self.fasta_file = fasta_file
+        self.chain = load_chain(chain_file)
+        self.fasta = open_fasta(fasta_file)
+        self.with_chr = False
+
+    def lift_header(self, header):
+        '''
+        Returns the lifted header lines, the CrossMap lines are added before the column header line
+        '''
+        lifted = []
+        for line in header:
+            line = line.strip()
+            if not line.startswith("##"):
+                lifted.extend(["##liftOverProgram=CrossMap(https://sourceforge.net/projects/crossmap/)\n",
+                               "##liftOverFile=%s\n" % (self.chain_file),
+                               "##new_reference_genome=%s\n" % (self.fasta_file),
+                               "##liftOverTime=%s\n" % (datetime.date.today().strftime("%B%d,%Y"))])
+            lifted.append(line + "\n")
+        return lifted
+
+    def lift(self, line):
+        '''
+        Returns the lifted record line, or None if the record can't be lifted over
+        '''
+        fields = line.strip().split(None, 7)
+        if fields[0].startswith("chr"):
+            self.with_chr = True
+            chrom = fields[0]
+        else:
+            chrom = "chr" + fields[0]
+        start = int(fields[1]) - 1
+        target = self.chain.map_interval(chrom, start, start + len(fields[3]))
+        if target is None:
+            return None
+        target_chrom, target_start, target_end = target
+        if not self.with_chr:
+            fields[0] = target_chrom.replace("chr", "")
+        fields[1] = str(target_start + 1)
+        fields[3] = self.fasta.fetch(target_chrom, target_start, target_end).upper()
+        if fields[3] == fields[4]:
+            return None
+        return "\t".join(fields) + "\n"
+
+
+###############################################
+#               Concatenate/Sort              #
+###############################################
+
+
+def merge_vcfs(vcf_files, output_path, liftover=None, bgzf=True):
+    '''
+    Writes the records of vcf_files to output_path in vcf-sort order with the header of the first file,
+    lifting them over first if a Liftover is given (unmapped records are written to output_path.unmap).
+    Each file is sorted on its own and the files are k-way merged.
+    With bgzf, output_path.gz and its tabix index are written as well.
+    Returns the number of records written
+    '''
+    header = None
+    runs = []
+    unmapped = []
+    for path in vcf_files:
+        file_header, records = read_vcf(path)
+        if header is None:
+            header = file_header
+        if liftover:
+            lifted = []
+            for line in records:
+                lifted_line = liftover.lift(line)
+                if lifted_line is None:
+                    unmapped.append(line.strip() + "\n")
+                else:
+                    lifted.append(lifted_line)
+            records = lifted
+        runs.append(sorted((sort_key(line), line) for line in records))
+
+    header = header or []
+    if liftover:
+        with open(output_path + ".unmap", "w") as f:
+            f.writelines(line.strip() + "\n" for line in header)
+            f.writelines(unmapped)
+        header = liftover.lift_header(header)
+
+    records = (line for key, line in heapq.merge(*runs))
+    if bgzf:
+        return write_vcf(output_path, header, records, output_path + ".gz")
+    return write_vcf(output_path, header, records)
+
+
+def write_vcf(path, header, records, bgzf_path=None):
+    '''
+    Writes the header and record lines to path and, if bgzf_path is given, to a BGZF compressed copy
+    indexed with tabix (bgzf_path.tbi). Returns the number of records written
+    '''
+    count = 0
+    index = TabixIndexer() if bgzf_path else None
+    with open(path, "w") as f:
+        f.writelines(header)
+        offset = sum(len(line) for line in header)
+        for line in records:
+            f.write(line)
+            if index is not None:
+                index.add(line, offset, offset + len(line))
+            offset += len(line)
+            count += 1
+
+    if bgzf_path:
+        with open(bgzf_path, "wb") as compressed:
+            writer = release_archive.BGZFWriter(compressed)
+            with open(path, "rb") as f:
+                for data in iter(lambda: f.read(release_archive.READ_SIZE), ""):
+                    writer.write(data)
+            writer.close()
+        index.write(bgzf_path + ".tbi", writer.blocks)
+    return count
+
+
+###############################################
+#                    Tabix                    #
+###############################################
+
+
+def reg2bin(begin, end):
+    '''
+    Returns the smallest bin of the UCSC binning scheme containing begin-end (0-based, half open)
+    '''
+    end -= 1
+    for shift, offset in ((14, 4681), (17, 585), (20, 73), (23, 9), (26, 1)):
+        if begin >> shift == end >> shift:
+            return offset + (begin >> shift)
+    return 0
+
+
+def reg2bins(begin, end):
+    '''
+    Returns the bins which may contain records overlapping begin-end (0-based, half open)
+    '''
+    end -= 1
+    bins = [0]
+    for shift, offset in ((26, 1), (23, 9), (20, 73), (17, 585), (14, 4681)):
+        bins.extend(range(offset + (begin >> shift), offset + (end >> shift) + 1))
+    return bins
+
+
+class TabixIndexer(object):
+    '''
+    Builds the tabix index of a sorted VCF from the uncompressed offsets of its records
+    '''
+
+    def __init__(self):
+        self.names = []
+        # per reference: {bin: [[start, end]]} and [first record offset per 16kb window]
+        self.bins = []
+        self.linear = []
+        self.last = None
+
+    def add(self, line, start, end):
+        chrom, begin, record_end = record_interval(line)
+        record_end = max(record_end, begin + 1)
+        if not self.names or chrom != self.names[-1]:
+            if chrom in self.names:
+                raise ValueError("%s is not sorted: records of %s are not together" % (line.strip(), chrom))
+            self.names.append(chrom)
+            self.bins.append({})
+            self.linear.append([])
+        elif begin < self.last:
+            raise ValueError("%s is not sorted: position before the previous record" % (line.strip()))
+        self.last = begin
+
+        chunks = self.bins[-1].setdefault(reg2bin(begin, record_end), [])
+        if chunks and chunks[-1][1] == start:
+            chunks[-1][1] = end
+        else:
+            chunks.append([start, end])
+        linear = self.linear[-1]
+        for window in xrange(begin >> TABIX_LINEAR_SHIFT, ((record_end - 1) >> TABIX_LINEAR_SHIFT) + 1):
+            if window >= len(linear):
+                linear.extend([None] * (window + 1 - len(linear)))
+            if linear[window] is None:
+                linear[window] = start
+
+    def write(self, path, blocks):
+        '''
+        Writes the index to path, blocks are the [compressed offset, uncompressed offset] of the BGZF blocks
+        '''
+        uncompressed_offsets = [block[1] for block in blocks]
+
+        def virtual_offset(offset):
+            block = bisect.bisect_right(uncompressed_offsets, offset) - 1
+            return (blocks[block][0] << 16) | (offset - blocks[block][1])
+
+        names = "".join(name + "\0" for name in self.names)
+        data = [TABIX_HEADER.pack(TABIX_MAGIC, len(self.names), *TABIX_VCF_FORMAT) + struct.pack("<i", len(names)),
+                names]
+        for bins, linear in zip(self.bins, self.linear):
+            data.append(struct.pack("<i", len(bins)))
+            for bin_number in sorted(bins):
+                chunks = bins[bin_number]
+                data.append(struct.pack("<Ii", bin_number, len(chunks)))
+                for start, end in chunks:
+                    data.append(struct.pack("<QQ", virtual_offset(start), virtual_offset(end)))
+            # windows without records start at the offset of the previous window, like tabix
+            offsets = []
+            for offset in linear:
+                offsets.append(virtual_offset(offset) if offset is not None else (offsets[-1] if offsets else 0))
+            data.append(struct.pack("<i%dQ" % (len(offsets)), len(offsets), *offsets))
+
+        data = "".join(data)
+        with open(path, "wb") as f:
+            for start in xrange(0, len(data), BGZF_BLOCK_SIZE):
+                f.write(release_archive.compress_block(data[start:start + BGZF_BLOCK_SIZE], 6))
+            f.write(BGZF_EOF)
+
+
+def read_tabix_index(path):
+    '''
+    Returns {chrom: ({bin: [(start virtual offset, end virtual offset)]}, [linear index offsets])} of a tabix index
+    '''
+    with gzip.open(path, "rb") as f:
+        data = f.read()
+    header = TABIX_HEADER.unpack_from(data)
+    if header[0] != TABIX_MAGIC:
+        raise ValueError("%s is not a tabix index" % (path))
+    position = TABIX_HEADER.size
+    names_length = struct.unpack_from("<i", data, position)[0]
+    position += 4
+    names = data[position:position + names_length].split("\0")[:header[1]]
+    position += names_length
+
+    index = {}
+    for name in names:
+        bins = {}
+        n_bins = struct.unpack_from("<i", data, position)[0]
+        position += 4
+        for i in xrange(n_bins):
+            bin_number, n_chunks = struct.unpack_from("<Ii", data, position)
+            chunks = struct.unpack_from("<%dQ" % (2 * n_chunks), data, position + 8)
+            bins[bin_number] = zip(chunks[::2], chunks[1::2])
+            position += 8 + 16 * n_chunks
+        n_offsets = struct.unpack_from("<i", data, position)[0]
+        linear = list(struct.unpack_from("<%dQ" % (n_offsets), data, position + 4))
+        position += 4 + 8 * n_offsets
+        index[name] = (bins, linear)
+    return index
+
+
+def read_bgzf_lines(f, virtual_offset=0):
+    '''
+    Yields the lines of the BGZF file f from virtual_offset on
+    '''
+    f.seek(virtual_offset >> 16)
+    skip = virtual_offset & 0xffff
+    pending = ""
+    while True:
+        header = f.read(BGZF_HEADER.size)
+        if len(header) < BGZF_HEADER.size:
+            break
+        block_size = BGZF_HEADER.unpack(header)[-1] + 1
+        data = zlib.decompress(header + f.read(block_size - BGZF_HEADER.size), 16 + zlib.MAX_WBITS)[skip:]
+        skip = 0
+        lines = (pending + data).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending + "\n"
+
+
+def parse_region(region):
+    '''
+    Returns (chrom, begin, end), 0-based and half open, of a tabix region "chrom", "chrom:begin" or "chrom:begin-end"
+    '''
+    chrom, _, positions = region.partition(":")
+    begin, _, end = positions.replace(",", "").partition("-")
+    return chrom, max(int(begin) - 1, 0) if begin else 0, int(end) if end else 1 << 29
+
+
+def query_tabix(vcf_gz, region, header=True, index=None):
+    '''
+    Returns the lines of the tabix indexed vcf_gz overlapping region, preceded by its header lines if header is True
+    '''
+    if index is None:
+        index = read_tabix_index(vcf_gz + ".tbi")
+    chrom, begin, end = parse_region(region)
+    lines = []
+    with open(vcf_gz, "rb") as f:
+        if header:
+            for line in read_bgzf_lines(f):
+                if not line.startswith("#"):
+                    break
+                lines.append(line)
+        if chrom not in index:
+            return lines
+
+        bins, linear = index[chrom]
+        min_offset = linear[min(begin >> TABIX_LINEAR_SHIFT, len(linear) - 1)] if linear else 0
+        starts = [start for bin_number in reg2bins(begin, end) if bin_number < TABIX_MAX_BIN
+                  for start, chunk_end in bins.get(bin_number, []) if chunk_end > min_offset]
+        if not starts:
+            return lines
+        # records are sorted, so reading on from the first chunk finds every overlapping record
+        for line in read_bgzf_lines(f, min(starts)):
+            if line.startswith("#"):
+                continue
+            record_chrom, record_begin, record_end = record_interval(line)
+            if record_chrom != chrom or record_begin >= end:
+                break
+            if record_end > begin:
+                lines.append(line)
+    return lines
+
+
+def extract_region(vcf_gz, region, output_path):
+    '''
+    Writes the header and the records of region of the tabix indexed vcf_gz to output_path, like tabix -h
+    Returns the number of records written
+    '''
+    lines = query_tabix(vcf_gz, region)
+    with open(output_path, "w") as f:
+        f.writelines(lines)
+    return sum(1 for line in lines if not line.startswith("#"))
+
+
+###############################################
+#                 Validation                  #
+###############################################
+
+
+def compare_vcf_records(expected_path, actual_path):
+    '''
+    Returns None if both VCFs have the same record lines in the same order, otherwise
+    (record number, expected line, actual line) of the first difference (a line is None past the end)
+    '''
+    expected_records = read_vcf(expected_path)[1]
+    actual_records = read_vcf(actual_path)[1]
+    for i in xrange(max(len(expected_records), len(actual_records))):
+        expected = expected_records[i] if i < len(expected_records) else None
+        actual = actual_records[i] if i < len(actual_records) else None
+        if expected != actual:
+            return i + 1, expected, actual
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concatenate, lift over, sort and index VCF files.")
+    subparsers = parser.add_subparsers(dest="command")
+    merge = subparsers.add_parser("merge", help="concatenate, lift over and sort VCF files")
+    merge.add_argument("vcf_files", nargs="+")
+    merge.add_argument("-o", "--output", required=True)
+    merge.add_argument("--chain", help="chain file to lift the records over with")
+    merge.add_argument("--fasta", help="reference genome the records are lifted over to")
+    query = subparsers.add_parser("query", help="print a region of a tabix indexed VCF")
+    query.add_argument("vcf_gz")
+    query.add_argument("region")
+    compare = subparsers.add_parser("compare", help="check that two VCFs have the same records")
+    compare.add_argument("expected")
+    compare.add_argument("actual")
+    args = parser.parse_args()
+
+    if args.command == "merge":
+        if bool(args.chain) != bool(args.fasta):
+            parser.error("--chain and --fasta are needed to lift over")
+        liftover = Liftover(args.chain, args.fasta) if args.chain else None
+        print "Wrote %d records to %s" % (merge_vcfs(args.vcf_files, args.output, liftover), args.output)
+    elif args.command == "query":
+        sys.stdout.writelines(query_tabix(args.vcf_gz, args.region))
+    elif args.command == "compare":
+        difference = compare_vcf_records(args.expected, args.actual)
+        if difference is None:
+            print "Records are identical"
+        else:
+            print "Record %d differs:\n  expected: %r\n  actual:   %r" % difference
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
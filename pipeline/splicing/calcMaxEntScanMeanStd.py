@@ -3,30 +3,39 @@
    over the indicated transcripts.  These scores can be used to convert raw maxEntscan scores into z-scores.
    Generates an output file in json format.
 
-   Usage: calcMaxEntscanMeanStd -t NM_007294.3 NM_000059.3  -o brca.zscore.json
+   Transcript exon coordinates are read from a local RefSeq genePred file and splice site sequences
+   from a local genome, so no network access is needed.
+
+   Usage: calcMaxEntscanMeanStd -t NM_007294.3 NM_000059.3 -r refseq_annotation.hg38.gp -g hg38.fa -o brca.zscore.json
 
 """
 import argparse
-from Bio.Seq import Seq
 import json
-from MySQLdb.constants import FIELD_TYPE
-import _mysql
+import math
 import numpy
 import os
 import re
-import requests
-import subprocess
-import tempfile
+import string
+import packed_resources
 
 db = None
 
+# Column names of the UCSC ncbiRefSeq table, which is in genePred format with a leading bin column
+GENEPRED_FIELDS = ["bin", "name", "chrom", "strand", "txStart", "txEnd", "cdsStart", "cdsEnd", "exonCount",
+                   "exonStarts", "exonEnds", "score", "name2", "cdsStartStat", "cdsEndStat", "exonFrames"]
+GENEPRED_INT_FIELDS = ["txStart", "txEnd", "cdsStart", "cdsEnd", "exonCount", "score"]
+
+REV_COMP_TABLE = string.maketrans("ACGTNacgtn", "TGCANtgcan")
+
 def fetch_gene_coordinates(transcript_name):
     """Query the indicated transcripts from the genome browser hg38 refseq table"""
+    from MySQLdb.constants import FIELD_TYPE
+    import _mysql
     global db # db is global to prevent reconnecting.
     if db is None:
         print 'connect'
-    conv= { FIELD_TYPE.LONG: int }
-    db = _mysql.connect(host='genome-mysql.cse.ucsc.edu',user='genome',passwd='',db="hg38",conv=conv)
+        conv= { FIELD_TYPE.LONG: int }
+        db = _mysql.connect(host='genome-mysql.cse.ucsc.edu',user='genome',passwd='',db="hg38",conv=conv)
     db.query("""SELECT * FROM ncbiRefSeq WHERE name = '%s'""" % transcript_name)
     r = db.use_result().fetch_row(how=1,maxrows=0)
     if len(r)>1:
@@ -34,27 +43,204 @@ def fetch_gene_coordinates(transcript_name):
     else:
         return r[0]
 
+def is_primary_chrom(chrom):
+    """Whether chrom is a chromosome of the primary assembly, rather than an alt, fix or unplaced contig
+       (e.g. chr17_KI270909v1_alt)"""
+    return '_' not in chrom
+
+def read_gene_coordinates(genePredFile, transcript_names=None):
+    """Read transcripts from a genePred file (with or without the leading bin column), returning a dict
+       of transcript name to a row in the same form as fetch_gene_coordinates.  If transcript_names
+       is given, only those transcripts are returned.  A transcript that is also aligned to alt contigs
+       is taken from its primary assembly row, ValueError is raised if it has different rows on the
+       same kind of sequence"""
+    wanted = None if transcript_names is None else set(transcript_names)
+    transcripts = {}
+    with open(genePredFile) as fp:
+        for line in fp:
+            if line.startswith('#'):
+                continue
+            row = line.rstrip('\n').split('\t')
+            if len(row) == len(GENEPRED_FIELDS) - 1:
+                row = ['0'] + row
+            if len(row) != len(GENEPRED_FIELDS):
+                raise ValueError("%s is not in genePred format: %s" % (genePredFile, line.strip()))
+            transcript = dict(zip(GENEPRED_FIELDS, row))
+            if wanted is not None and transcript['name'] not in wanted:
+                continue
+            for field in GENEPRED_INT_FIELDS:
+                transcript[field] = int(transcript[field])
+            previous = transcripts.get(transcript['name'])
+            if previous is not None:
+                isPrimary = is_primary_chrom(transcript['chrom'])
+                wasPrimary = is_primary_chrom(previous['chrom'])
+                if wasPrimary and not isPrimary:
+                    continue
+                if wasPrimary == isPrimary and any(previous[field] != transcript[field]
+                                                   for field in GENEPRED_FIELDS if field != 'bin'):
+                    raise ValueError("%s has conflicting rows for %s on %s and %s" %
+                                     (genePredFile, transcript['name'], previous['chrom'], transcript['chrom']))
+            transcripts[transcript['name']] = transcript
+    return transcripts
+
+# MaxEntScan models, as used by score5.pl (donors) and score3.pl (acceptors).  They are loaded
+# from the files in this directory the first time a sequence is scored.
+MAXENTSCAN_DIR = os.path.dirname(os.path.abspath(__file__))
+ACCEPTOR_MODEL_FILES = ["me2x3acc%d" % ii for ii in range(1, 10)]
+BACKGROUND = {"A": 0.27, "C": 0.23, "G": 0.23, "T": 0.27}
+DONOR_CONSENSUS = ({"A": 0.004, "C": 0.0032, "G": 0.9896, "T": 0.0032},
+                   {"A": 0.0034, "C": 0.0039, "G": 0.0042, "T": 0.9884})
+ACCEPTOR_CONSENSUS = ({"A": 0.9903, "C": 0.0032, "G": 0.0034, "T": 0.0030},
+                      {"A": 0.0027, "C": 0.0037, "G": 0.9905, "T": 0.0030})
+HASH_DIGITS = {"A": 0, "C": 1, "G": 2, "T": 3}
+
+maxEntScanModels = None
+
+
+def _readModelFile(path):
+    with open(path) as fp:
+        return [line.strip() for line in fp]
+
+
+def loadMaxEntScanModels():
+    """Read the MaxEntScan donor and acceptor score tables.  The tables are cached at module level,
+       so they are read only once per process"""
+    global maxEntScanModels
+    if maxEntScanModels is None:
+        donorSequences = _readModelFile(os.path.join(MAXENTSCAN_DIR, "splicemodels", "splice5sequences"))
+        donorScores = [float(score) for score in _readModelFile(os.path.join(MAXENTSCAN_DIR, "me2x5"))]
+        acceptorScores = [[float(score) for score in _readModelFile(os.path.join(MAXENTSCAN_DIR, "splicemodels", ff))]
+                          for ff in ACCEPTOR_MODEL_FILES]
+        maxEntScanModels = {"donorIndex": dict((seq, ii) for ii, seq in enumerate(donorSequences)),
+                            "donorScores": donorScores,
+                            "acceptorScores": acceptorScores,
+                            "donorTable": numpy.array(donorScores),
+                            "acceptorTables": [numpy.array(scores) for scores in acceptorScores]}
+    return maxEntScanModels
+
+
+def hashSeq(sequence):
+    """Return the base 4 hash of a sequence, as computed by hashseq in score3.pl (e.g. CAGAAGT returns 4619)"""
+    total = 0
+    for base in sequence:
+        total = total * 4 + HASH_DIGITS[base]
+    return total
+
+
+def scoreConsensus(sequence, consensus, firstPos):
+    """Score the two invariant consensus positions of a splice site, starting at firstPos"""
+    first = sequence[firstPos]
+    second = sequence[firstPos + 1]
+    return consensus[0][first] * consensus[1][second] / (BACKGROUND[first] * BACKGROUND[second])
+
+
+def maxEntScoreDonor(sequence, models):
+    """Raw (unlogged) MaxEntScan score of a 9bp donor sequence, as computed by score5.pl"""
+    rest = sequence[0:3] + sequence[5:9]
+    return scoreConsensus(sequence, DONOR_CONSENSUS, 3) * models["donorScores"][models["donorIndex"][rest]]
+
+
+def maxEntScoreAcceptor(sequence, models):
+    """Raw (unlogged) MaxEntScan score of a 23bp acceptor sequence, as computed by score3.pl"""
+    rest = sequence[0:18] + sequence[20:23]
+    tables = models["acceptorScores"]
+    sc = [tables[0][hashSeq(rest[0:7])],
+          tables[1][hashSeq(rest[7:14])],
+          tables[2][hashSeq(rest[14:21])],
+          tables[3][hashSeq(rest[4:11])],
+          tables[4][hashSeq(rest[11:18])],
+          tables[5][hashSeq(rest[4:7])],
+          tables[6][hashSeq(rest[7:11])],
+          tables[7][hashSeq(rest[11:14])],
+          tables[8][hashSeq(rest[14:18])]]
+    maxEntScore = sc[0] * sc[1] * sc[2] * sc[3] * sc[4] / (sc[5] * sc[6] * sc[7] * sc[8])
+    return scoreConsensus(sequence, ACCEPTOR_CONSENSUS, 18) * maxEntScore
+
+
 def runMaxEntScan(sequence, donor=False):
-    """Run maxEntScan on the indicated sequence.  Run score5.pl on candidate donor sequences, 
-       score3.pl on candidate acceptor sequences.  Return the score"""
-    (fd, tmpfile) = tempfile.mkstemp()
-    fp = os.fdopen(fd, "w")
-    fp.write(sequence)
-    fp.close()
+    """Run maxEntScan on the indicated sequence.  Score candidate donor sequences with the score5.pl
+       model, candidate acceptor sequences with the score3.pl model.  Return the score.
+       The models are evaluated in-process and the score is rounded to two decimal places,
+       exactly as printed by the perl scripts"""
+    models = loadMaxEntScanModels()
+    sequence = sequence.upper()
+    for base in sequence:
+        if base not in HASH_DIGITS:
+            raise ValueError("MaxEntScan cannot score sequence %s" % sequence)
+    if donor:
+        rawScore = maxEntScoreDonor(sequence, models)
+    else:
+        rawScore = maxEntScoreAcceptor(sequence, models)
+    return float("%.2f" % (math.log(rawScore) / math.log(2)))
+
+
+# Lookup tables for scoring many sequences at once: base character -> hash digit (255 for anything else),
+# and the consensus and background probabilities indexed by hash digit
+BASE_CODES = numpy.full(256, 255, dtype=numpy.uint8)
+for _base, _digit in HASH_DIGITS.items():
+    BASE_CODES[ord(_base)] = _digit
+    BASE_CODES[ord(_base.lower())] = _digit
+BACKGROUND_ARRAY = numpy.array([BACKGROUND[base] for base in "ACGT"])
+DONOR_CONSENSUS_ARRAYS = [numpy.array([pp[base] for base in "ACGT"]) for pp in DONOR_CONSENSUS]
+ACCEPTOR_CONSENSUS_ARRAYS = [numpy.array([pp[base] for base in "ACGT"]) for pp in ACCEPTOR_CONSENSUS]
+
+
+def encodeSequences(sequences, length):
+    """Return an N x length array of hash digits for N sequences, each of the given length"""
+    sequences = list(sequences)
+    for sequence in sequences:
+        if len(sequence) != length:
+            raise ValueError("MaxEntScan cannot score sequence %s, expected length %d" % (sequence, length))
+    buf = numpy.frombuffer("".join(sequences), dtype=numpy.uint8).reshape(len(sequences), length)
+    codes = BASE_CODES[buf]
+    if (codes == 255).any():
+        badRow = numpy.nonzero((codes == 255).any(axis=1))[0][0]
+        raise ValueError("MaxEntScan cannot score sequence %s" % sequences[badRow])
+    return codes.astype(numpy.int64)
+
+
+def hashColumns(codes):
+    """Vectorized hashSeq over the rows of an array of hash digits"""
+    return codes.dot(4 ** numpy.arange(codes.shape[1] - 1, -1, -1))
+
+
+def scoreConsensusBatch(codes, consensus, firstPos):
+    """Vectorized scoreConsensus"""
+    first = codes[:, firstPos]
+    second = codes[:, firstPos + 1]
+    return consensus[0][first] * consensus[1][second] / (BACKGROUND_ARRAY[first] * BACKGROUND_ARRAY[second])
+
+
+def runMaxEntScanBatch(sequences, donor=False):
+    """Score a list of sequences (all donors or all acceptors) in one pass, returning a numpy array
+       of scores equal to calling runMaxEntScan on each sequence"""
+    models = loadMaxEntScanModels()
     if donor:
-        pipe = subprocess.Popen(["perl", os.path.join(os.path.dirname(__file__), 'score5.pl'), tmpfile], stdout=subprocess.PIPE)
+        codes = encodeSequences(sequences, 9)
+        rest = numpy.hstack([codes[:, 0:3], codes[:, 5:9]])
+        rawScores = scoreConsensusBatch(codes, DONOR_CONSENSUS_ARRAYS, 3) * models["donorTable"][hashColumns(rest)]
     else:
-        pipe = subprocess.Popen(["perl", os.path.join(os.path.dirname(__file__), 'score3.pl'), tmpfile], stdout=subprocess.PIPE)
-    result = pipe.stdout.read()
-    entScore = re.findall("[+-]?\d+(?:\.\d+)?", str(result))
-    os.remove(tmpfile)
-    return(float(entScore[0]))
+        codes = encodeSequences(sequences, 23)
+        rest = numpy.hstack([codes[:, 0:18], codes[:, 20:23]])
+        tables = models["acceptorTables"]
+        sc = [tables[0][hashColumns(rest[:, 0:7])],
+              tables[1][hashColumns(rest[:, 7:14])],
+              tables[2][hashColumns(rest[:, 14:21])],
+              tables[3][hashColumns(rest[:, 4:11])],
+              tables[4][hashColumns(rest[:, 11:18])],
+              tables[5][hashColumns(rest[:, 4:7])],
+              tables[6][hashColumns(rest[:, 7:11])],
+              tables[7][hashColumns(rest[:, 11:14])],
+              tables[8][hashColumns(rest[:, 14:18])]]
+        maxEntScores = sc[0] * sc[1] * sc[2] * sc[3] * sc[4] / (sc[5] * sc[6] * sc[7] * sc[8])
+        rawScores = scoreConsensusBatch(codes, ACCEPTOR_CONSENSUS_ARRAYS, 18) * maxEntScores
+    # round the same way as runMaxEntScan so that batch and single scores agree exactly
+    return numpy.array([float("%.2f" % score) for score in numpy.log2(rawScores)])
 
 
-def scoreSeq(chrom, strand, coordinate, donor=False, verbose=False):
+def spliceSiteRange(strand, coordinate, donor=False):
     """Given the coordinate of a putative splice site (either a donor or acceptor, as indicated by
-       the donor argument), return the maxEntScan score describing the splice site fitness of the genome at
-       that coordinate"""
+       the donor argument), return the 1-based inclusive genomic range of the sequence maxEntScan scores"""
     if donor:
         if strand == '+':
             rangeStartCoord = int(coordinate) - 3 + 1
@@ -69,64 +255,60 @@ def scoreSeq(chrom, strand, coordinate, donor=False, verbose=False):
         else:
             rangeStartCoord = int(coordinate) - 3 + 1
             rangeEndCoord = int(coordinate) + 20
-    url = "http://togows.org/api/ucsc/hg38/%s:%d-%d.fasta" % (chrom, rangeStartCoord, rangeEndCoord)
-    rr = requests.get(url)
-    if verbose:
-        print rr.content
-    lines = rr.content.split('\n')
-    headerLine = lines[0]
-    sequence = ""
-    for ii in range(1,len(lines)):
-        sequence += lines[ii]
+    return (rangeStartCoord, rangeEndCoord)
+
+
+def getSpliceSiteSeq(genome, chrom, strand, coordinate, donor=False):
+    """Return the sequence of the putative splice site at coordinate, on the transcript strand"""
+    (rangeStartCoord, rangeEndCoord) = spliceSiteRange(strand, coordinate, donor=donor)
+    sequence = str(genome[chrom][rangeStartCoord - 1:rangeEndCoord]).upper()
     if strand == '-':
-        sequence = str(Seq(sequence).reverse_complement())
-    if verbose:
-        print "Sequence to be scored:", sequence
-    score = runMaxEntScan(sequence, donor=donor)
-    if verbose:
-        print "score:", score
-    return score
+        sequence = sequence.translate(REV_COMP_TABLE)[::-1]
+    return sequence
 
-def addDataForThisTranscript(donors, acceptors, transcript, verbose=False):
-    """Given a transcript, score the interior splice sites of that transcript, and add the scores
-       to the donor and acceptor arrays respectively."""
+
+def getSpliceSiteSeqsForTranscript(genome, transcript):
+    """Given a transcript, return lists of the sequences of its interior splice donors and acceptors.
+       As in the scores of brca.zscore.json, the end of the first exon is taken as a donor even when it
+       is also the last exon"""
     if transcript['strand'] == '+':
         exonStarts = transcript['exonStarts'].split(',')
         exonEnds = transcript['exonEnds'].split(',')
     else:
         exonStarts = list(reversed(transcript['exonEnds'].split(',')))
         exonEnds = list(reversed(transcript['exonStarts'].split(',')))
+    donors = []
+    acceptors = []
     for ii in range(transcript['exonCount']):
-        if ii == 0:
-            donors = numpy.append(donors, [scoreSeq(transcript['chrom'], transcript['strand'], exonEnds[ii], 
-                                                    donor=True, verbose=verbose)])
-        elif ii == transcript['exonCount'] - 1:
-            acceptors = numpy.append(acceptors, [scoreSeq(transcript['chrom'], transcript['strand'], exonStarts[ii], 
-                                                          donor=False, verbose=verbose)])
-        else:
-            donors = numpy.append(donors, [scoreSeq(transcript['chrom'], transcript['strand'], exonEnds[ii], 
-                                                    donor=True, verbose=verbose)])
-            acceptors = numpy.append(acceptors, [scoreSeq(transcript['chrom'], transcript['strand'], exonStarts[ii], 
-                                                          donor=False, verbose=verbose)])
-    return(donors, acceptors)
+        if ii == 0 or ii != transcript['exonCount'] - 1:
+            donors.append(getSpliceSiteSeq(genome, transcript['chrom'], transcript['strand'], exonEnds[ii],
+                                           donor=True))
+        if ii != 0:
+            acceptors.append(getSpliceSiteSeq(genome, transcript['chrom'], transcript['strand'], exonStarts[ii],
+                                              donor=False))
+    return (donors, acceptors)
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('-o', "--outputFile", type=str)
-    parser.add_argument('-t', "--transcripts", nargs='+', type=str)
-    parser.add_argument('-v', "--verbose", type=bool, default=False)
-    args = parser.parse_args()
-    donors = numpy.array([])
-    acceptors = numpy.array([])
-    for this_transcript in args.transcripts:
-        transcript = fetch_gene_coordinates(this_transcript)
-        if args.verbose:
+def calcMeanStd(transcripts, genome, verbose=False):
+    """Score the interior splice sites of all the given transcripts in one batch, and return the
+       mean and std of the donor and acceptor scores in the brca.zscore.json layout"""
+    donorSeqs = []
+    acceptorSeqs = []
+    for transcript in transcripts:
+        if verbose:
             print transcript
+        transcript = dict(transcript)
         transcript['exonStarts'] = re.sub(",(\s)*$", "", transcript['exonStarts'])
         transcript['exonEnds'] = re.sub(",(\s)*$", "", transcript['exonEnds'])
-        (donors, acceptors) = addDataForThisTranscript(donors, acceptors, transcript, args.verbose)
-    results = {
+        (donors, acceptors) = getSpliceSiteSeqsForTranscript(genome, transcript)
+        donorSeqs.extend(donors)
+        acceptorSeqs.extend(acceptors)
+    donors = runMaxEntScanBatch(donorSeqs, donor=True)
+    acceptors = runMaxEntScanBatch(acceptorSeqs, donor=False)
+    if verbose:
+        for sequence, score in zip(donorSeqs + acceptorSeqs, list(donors) + list(acceptors)):
+            print sequence, score
+    return {
         "donors": {
             "mean": donors.mean(),
             "std": donors.std()
@@ -136,6 +318,22 @@ def main():
             "std": acceptors.std()
             }
         }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', "--outputFile", type=str)
+    parser.add_argument('-t', "--transcripts", nargs='+', type=str)
+    parser.add_argument('-r', "--genePredFile", type=str, help="RefSeq annotation hg38-based genepred file")
+    parser.add_argument('-g', "--genomeFile", type=str, help="Fasta file containing hg38 reference genome")
+    parser.add_argument('-v', "--verbose", type=bool, default=False)
+    args = parser.parse_args()
+    transcriptData = read_gene_coordinates(args.genePredFile, args.transcripts)
+    missing = [name for name in args.transcripts if name not in transcriptData]
+    if len(missing) > 0:
+        raise ValueError("Transcripts not found in %s: %s" % (args.genePredFile, ", ".join(missing)))
+    genome = packed_resources.open_genome(args.genomeFile)
+    results = calcMeanStd([transcriptData[name] for name in args.transcripts], genome, args.verbose)
     if args.verbose:
         print "donors mean", results["donors"]["mean"], "std", results["donors"]["std"]
         print "acceptors mean", results["acceptors"]["mean"], "std", results["acceptors"]["std"]
@@ -146,5 +344,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
-
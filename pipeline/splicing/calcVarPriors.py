@@ -18,10 +18,8 @@ import subprocess
 import tempfile
 import os
 import pyhgvs
-import pyhgvs.utils as pyhgvs_utils
-from pygr.seqdb import SequenceFileDB
-from Bio.Seq import Seq
-from calcMaxEntScanMeanStd import fetch_gene_coordinates, runMaxEntScan
+from calcMaxEntScanMeanStd import fetch_gene_coordinates, read_gene_coordinates, runMaxEntScan, REV_COMP_TABLE
+import packed_resources
 
 '''
 GENERAL NOTES ON REFSEQ NUMBERING AND SPLICING
@@ -117,6 +115,9 @@ BRCA2_CANONICAL = "ENST00000380152"
 # Rest Ensembl server
 SERVER = "http://rest.ensembl.org"
 
+# most variants Ensembl VEP takes in one POST request
+VEP_POST_SIZE = 200
+
 # clinically important domain boundaries
 brca1CIDomains = {"enigma": {"ring": {"domStart": 43124096,
                                       "domEnd": 43104260},
@@ -169,9 +170,10 @@ STD_DE_NOVO_OFFSET = STD_DE_NOVO_LENGTH - STD_EXONIC_PORTION
 BRCA1_RefSeq = "NM_007294.3"
 BRCA2_RefSeq = "NM_000059.3"
 
-# Fetch transcript data for BRCA1/BRCA2 RefSeq transcripts
-brca1TranscriptData = fetch_gene_coordinates(BRCA1_RefSeq)
-brca2TranscriptData = fetch_gene_coordinates(BRCA2_RefSeq)
+# Transcript data (ncbiRefSeq rows) for the BRCA1/BRCA2 RefSeq transcripts, keyed by reference sequence
+# Filled by getTranscriptData from the UCSC genome browser database the first time a transcript is needed,
+# or beforehand from a genePred file with loadTranscriptData
+brcaTranscriptData = {}
 
 # Probability constants from SVT and MP valid as of 5/24/18
 LOW_PROBABILITY = 0.02 
@@ -196,6 +198,28 @@ REF_ACC_LOW_CUTOFF = -1.5
 DE_NOVO_DONOR_HIGH_CUTOFF = 0.0
 DE_NOVO_DONOR_LOW_CUTOFF = -2.0
 
+# Output fields added to each variant row, in output column order
+PRIOR_FIELDS = ["applicablePrior", "applicableEnigmaClass", "proteinPrior", "refDonorPrior", "deNovoDonorPrior",
+                "refRefDonorMES", "refRefDonorZ", "altRefDonorMES", "altRefDonorZ", "refRefDonorSeq", "altRefDonorSeq", "refDonorVarStart",
+                "refDonorVarLength", "refDonorExonStart", "refDonorIntronStart", "refDeNovoDonorMES", "refDeNovoDonorZ", "altDeNovoDonorMES",
+                "altDeNovoDonorZ", "refDeNovoDonorSeq", "altDeNovoDonorSeq", "deNovoDonorVarStart", "deNovoDonorVarLength",
+                "deNovoDonorExonStart", "deNovoDonorIntronStart", "deNovoDonorGenomicSplicePos", "deNovoDonorTranscriptSplicePos",
+                "closestDonorGenomicSplicePos", "closestDonorTranscriptSplicePos", "closestDonorRefMES", "closestDonorRefZ",
+                "closestDonorRefSeq", "closestDonorAltMES", "closestDonorAltZ", "closestDonorAltSeq", "closestDonorExonStart",
+                "closestDonorIntronStart", "deNovoDonorAltGreaterRefFlag", "deNovoDonorAltGreaterClosestRefFlag",
+                "deNovoDonorAltGreaterClosestAltFlag", "deNovoDonorFrameshiftFlag", "refAccPrior", "deNovoAccPrior", "refRefAccMES",
+                "refRefAccZ", "altRefAccMES", "altRefAccZ", "refRefAccSeq", "altRefAccSeq", "refAccVarStart", "refAccVarLength", "refAccExonStart",
+                "refAccIntronStart", "refDeNovoAccMES", "refDeNovoAccZ", "altDeNovoAccMES", "altDeNovoAccZ", "refDeNovoAccSeq", "altDeNovoAccSeq",
+                "deNovoAccVarStart", "deNovoAccVarLength", "deNovoAccExonStart", "deNovoAccIntronStart", "deNovoAccGenomicSplicePos",
+                "deNovoAccTranscriptSplicePos", "closestAccGenomicSplicePos", "closestAccTranscriptSplicePos", "closestAccRefMES",
+                "closestAccRefZ", "closestAccRefSeq", "closestAccAltMES", "closestAccAltZ", "closestAccAltSeq",
+                "closestAccExonStart", "closestAccIntronStart", "deNovoAccAltGreaterRefFlag", "deNovoAccAltGreaterClosestRefFlag",
+                "deNovoAccAltGreaterClosestAltFlag", "deNovoAccFrameshiftFlag", "spliceSite", "spliceRescue", "spliceFlag", "frameshiftFlag",
+                "inExonicPortionFlag", "CIDomainInRegionFlag", "isDivisibleFlag", "lowMESFlag"]
+
+# brca.zscore.json contents, loaded once by getZScore
+zScoreStats = None
+
 def checkSequence(sequence):
     '''Checks if a given sequence contains acceptable nucleotides returns True if sequence is comprised entirely of acceptable bases'''
     acceptableBases = ["A", "C", "T", "G", "N", "R", "Y"]
@@ -244,45 +268,102 @@ def _make_request(url):
 
     return req.json()
 
+def _make_post_request(url, data):
+    '''Posts data to API as json and returns json file'''
+    req = requests.post(url, headers = {"Content-Type": "application/json", "Accept": "application/json"},
+                        data = json.dumps(data))
+
+    if req.status_code == 429 and 'Retry-After' in req.headers:
+        retry = float(req.headers['Retry-After'])
+        time.sleep(retry)
+        return _make_post_request(url, data)
+
+    if not req.ok:
+        req.raise_for_status()
+        sys.exit()
+
+    return req.json()
+
+def canGetVarConsequences(variant):
+    '''
+    Returns True if the Ensembl VEP API can determine the consequences of variant,
+    which must be on chromosome 13 or 17 with an alt allele of the 4 canonical bases
+    '''
+    if variant["Chr"] not in ["13", "17"]:
+        return False
+    for base in variant["Alt"]:
+        if base not in ["A", "C", "G", "T"]:
+            return False
+    return True
+
+def getCanonicalConsequence(vepOutput):
+    '''
+    Given the Ensembl VEP output for a variant,
+    returns the consequence of the variant for the canonical BRCA1 or BRCA2 transcript
+    '''
+    assert(vepOutput.has_key("transcript_consequences"))
+    for gene in vepOutput["transcript_consequences"]:
+        if gene.has_key("transcript_id"):
+            # need to filter for canonical BRCA1 transcript
+            if re.search(BRCA1_CANONICAL, gene["transcript_id"]):
+                return gene["consequence_terms"][0]
+            # need to filter for canonical BRCA2 transcript
+            elif re.search(BRCA2_CANONICAL, gene["transcript_id"]):
+                return gene["consequence_terms"][0]
+
 def getVarConsequences(variant):
     '''
     Given a variant, uses Ensembl VEP API to get variant consequences
     (e.g. intron variant, frameshift variant, missense variant)
     using variant chromosome, Hg38 start, Hg38 end, and alternate allele as input for API
     returns a string detailing consequences of variant
+    The consequences of a variant with a varConsequences field were looked up ahead of time
+    (see getVarConsequencesBatch) and are returned without a request
     '''
+    if "varConsequences" in variant:
+        return variant["varConsequences"]
+
     ext = "/vep/human/region/"
 
     # varStrand always 1 because all alternate alleles and positions refer to the plus strand
     varStrand = 1
     varAlt = variant["Alt"]
-    
-    if variant["Chr"] not in ["13", "17"]:
+
+    if not canGetVarConsequences(variant):
+        # API only works for BRCA1/BRCA2 alt alleles that are composed of the 4 canonical bases
         return "unable_to_determine"
     else:
-        for base in varAlt:
-            # API only works for alt alleles that are composed of the 4 canonical bases
-            if base not in ["A", "C", "G", "T"]:
-                return "unable_to_determine"     
-           
         query = "%s:%s-%s:%s/%s?" % (variant["Chr"], variant["Hg38_Start"],
                                      variant["Hg38_End"], varStrand, varAlt)
-    
+
         req_url = SERVER+ext+query
         jsonOutput = _make_request(req_url)
-    
+
         assert(len(jsonOutput) == 1)
-        assert(jsonOutput[0].has_key("transcript_consequences"))
-        # below is to extract variant consequence from json file
-        for gene in jsonOutput[0]["transcript_consequences"]:
-            if gene.has_key("transcript_id"):
-                # need to filter for canonical BRCA1 transcript
-                if re.search(BRCA1_CANONICAL, gene["transcript_id"]):
-                    return gene["consequence_terms"][0]
-                # need to filter for canonical BRCA2 transcript
-                elif re.search(BRCA2_CANONICAL, gene["transcript_id"]):
-                    return gene["consequence_terms"][0]
-    
+        return getCanonicalConsequence(jsonOutput[0])
+
+def getVarConsequencesBatch(variants):
+    '''
+    Given a list of variants, uses Ensembl VEP API to get the consequences of each of them
+    as getVarConsequences does, with one POST request for every VEP_POST_SIZE variants
+    Returns a list of consequences, in the order of variants
+    '''
+    ext = "/vep/human/region"
+
+    consequences = ["unable_to_determine"] * len(variants)
+    # variants in Ensembl default format: chromosome, Hg38 start, Hg38 end, ref/alt alleles and strand
+    queries = [(index, "%s %s %s %s/%s +" % (variant["Chr"], variant["Hg38_Start"], variant["Hg38_End"],
+                                             variant["Ref"], variant["Alt"]))
+               for index, variant in enumerate(variants) if canGetVarConsequences(variant)]
+    for start in xrange(0, len(queries), VEP_POST_SIZE):
+        chunk = queries[start:start + VEP_POST_SIZE]
+        jsonOutput = _make_post_request(SERVER + ext, {"variants": [query for index, query in chunk]})
+        # VEP returns the output of each variant with its input
+        vepOutputs = dict((vepOutput["input"], vepOutput) for vepOutput in jsonOutput)
+        for index, query in chunk:
+            consequences[index] = getCanonicalConsequence(vepOutputs[query])
+    return consequences
+
 def getVarType(variant):
     '''
     Returns a string describing type of variant 
@@ -334,15 +415,23 @@ def checkWithinBoundaries(varStrand, varGenPos, boundaryStart, boundaryEnd):
     else:
         return False
 
+def loadTranscriptData(genePredFile):
+    '''
+    Reads the transcript data of the BRCA1/BRCA2 RefSeq transcripts from genePredFile (hg38),
+    so getTranscriptData doesn't query the UCSC genome browser database
+    '''
+    brcaTranscriptData.update(read_gene_coordinates(genePredFile, [BRCA1_RefSeq, BRCA2_RefSeq]))
+
 def getTranscriptData(referenceSequence):
     '''
     Given a reference sequence (e.g. "NM_007294.3"),
     Returns transcript data for that reference sequencee
     '''
-    if referenceSequence == BRCA1_RefSeq:
-        return brca1TranscriptData
-    elif referenceSequence == BRCA2_RefSeq:
-        return brca2TranscriptData
+    if referenceSequence not in [BRCA1_RefSeq, BRCA2_RefSeq]:
+        return None
+    if referenceSequence not in brcaTranscriptData:
+        brcaTranscriptData[referenceSequence] = fetch_gene_coordinates(referenceSequence)
+    return brcaTranscriptData[referenceSequence]
     
 def varOutsideBoundaries(variant):
     '''Given a variant, determines if variant is outside transcript boundaries'''
@@ -707,13 +796,14 @@ def getVarLocation(variant, boundaries):
             return "UTR_variant"
         return "intron_variant"
 
-def getFastaSeq(chrom, rangeStart, rangeStop, plusStrandSeq=True):
+def getFastaSeq(chrom, rangeStart, rangeStop, plusStrandSeq=True, genome=None):
     '''
     Given chromosome (in format 'chr13'), region genomic start position, and
     region genomic end position:
     Returns a string containing the sequence inclusive of rangeStart and rangeStop
     If plusStrandSeq=True, returns plus strand sequence
     If plusStrandSeq=False, returns minus strand sequence
+    The sequence is read from genome (hg38 packed_resources.TwoBitGenome) if given, from the UCSC DAS server otherwise
     '''
     if rangeStart < rangeStop:
         regionStart = rangeStart
@@ -722,76 +812,114 @@ def getFastaSeq(chrom, rangeStart, rangeStop, plusStrandSeq=True):
         regionStart = rangeStop
         regionEnd = rangeStart
     
-    url = "http://genome.ucsc.edu/cgi-bin/das/hg38/dna?segment=%s:%d,%d" % (chrom, regionStart, regionEnd)
-    req = requests.get(url)
-    
-    if req.status_code == 429 and 'Retry-After' in req.headers:
-        retry = float(req.headers['Retry-After'])
-        time.sleep(retry)
+    if genome is not None:
+        # local hg38 genome, avoids a UCSC DAS request per call
+        sequence = str(genome[chrom][regionStart-1:regionEnd])
+    else:
+        url = "http://genome.ucsc.edu/cgi-bin/das/hg38/dna?segment=%s:%d,%d" % (chrom, regionStart, regionEnd)
         req = requests.get(url)
-    
-    lines = req.content.split('\n')
-    # because sequence is located at index 5 in dictionary
-    sequence = lines[5]
+
+        if req.status_code == 429 and 'Retry-After' in req.headers:
+            retry = float(req.headers['Retry-After'])
+            time.sleep(retry)
+            req = requests.get(url)
+
+        lines = req.content.split('\n')
+        # because sequence is located at index 5 in dictionary
+        sequence = lines[5]
     for base in sequence:
         assert base in ["A", "C", "G", "T", "a", "c", "g", "t"]
     if plusStrandSeq == True:
         return sequence.upper()
     else:
-        return str(Seq(sequence.upper()).reverse_complement())
+        return reverseComplement(sequence.upper())
+
+def reverseComplement(sequence):
+    '''Given a sequence, returns its reverse complement'''
+    return sequence.translate(REV_COMP_TABLE)[::-1]
+
+class SeqWindow(object):
+    '''
+    Plus strand sequence for the genomic region regionStart-regionEnd (inclusive), stored in a bytearray
+    Bases are indexed by genomic position, so window[genPos] is the plus strand base at genPos
+    getSeq returns the sequence for the given strand, reverse complemented for minus strand
+    '''
+    __slots__ = ("bases", "regionStart", "regionEnd")
+
+    def __init__(self, sequence, regionStart):
+        self.bases = bytearray(sequence)
+        self.regionStart = regionStart
+        self.regionEnd = regionStart + len(self.bases) - 1
+
+    def _index(self, genPos):
+        if genPos < self.regionStart or genPos > self.regionEnd:
+            raise KeyError(genPos)
+        return genPos - self.regionStart
 
-def getSeqLocDict(chrom, varStrand, rangeStart, rangeStop):
+    def __getitem__(self, genPos):
+        return chr(self.bases[self._index(genPos)])
+
+    def __setitem__(self, genPos, bases):
+        # replaces the single base at genPos, so a multi-base allele is inserted and shifts the bases after it
+        index = self._index(genPos)
+        self.bases[index:index + 1] = bases
+
+    def __contains__(self, genPos):
+        return self.regionStart <= genPos <= self.regionEnd
+
+    def __len__(self):
+        return len(self.bases)
+
+    def copy(self):
+        return SeqWindow(self.bases, self.regionStart)
+
+    def getSeq(self, strand="+"):
+        sequence = str(self.bases)
+        if strand == "-":
+            return reverseComplement(sequence)
+        return sequence
+
+def getSeqLocDict(chrom, varStrand, rangeStart, rangeStop, genome=None):
     '''
     Given chromosome, strand, region genomic start position, and region genomic end position
-    returns a dictionary containing the genomic position as the key and reference allele as the value
+    returns a SeqWindow that maps each genomic position in the region to its reference allele
     For minus strand gene (rangeStart > rangeStop), for plus strand gene (rangeStart < rangeStop)
-    Always returns plus strand sequence 
+    Always contains plus strand sequence 
     '''
-    seqLocDict = {}
     if varStrand == "-":
         regionStart = int(rangeStop)
         regionEnd = int(rangeStart)
     else:
         regionStart = int(rangeStart)
         regionEnd = int(rangeStop)
-    sequence = getFastaSeq(chrom, regionStart, regionEnd, plusStrandSeq=True)
-    genPos = regionStart   
-    while genPos <= regionEnd:
-        for base in sequence:
-            seqLocDict[genPos] = base
-            genPos += 1
-    return seqLocDict
+    sequence = getFastaSeq(chrom, regionStart, regionEnd, plusStrandSeq=True, genome=genome)
+    return SeqWindow(sequence, regionStart)
 
 def getAltSeqDict(variant, seqLocDict):
     '''
-    Given a variant and a dictionary containing a sequence with bases and their locations,
-    returns the dictionary with the alternate allele in place of the reference allele
+    Given a variant and a SeqWindow containing a sequence with bases and their locations,
+    returns a copy of the SeqWindow with the alternate allele in place of the reference allele
     at the variant's genomic position
     '''
     varRef = variant["Ref"]
     varAlt = variant["Alt"]
     varGenPos = int(variant["Pos"])
-    seqLocDictRef = seqLocDict[varGenPos]
-    if varRef == seqLocDictRef:
-        altSeqDict = seqLocDict.copy()
-        altSeqDict[varGenPos] = varAlt
+    if seqLocDict[varGenPos] != varRef:
+        raise ValueError("Reference allele %s does not match genome base %s at %d" %
+                         (varRef, seqLocDict[varGenPos], varGenPos))
+    altSeqDict = seqLocDict.copy()
+    altSeqDict[varGenPos] = varAlt
     return altSeqDict
 
 def getAltSeq(altSeqDict, varStrand):
     '''
-    Given a dictionary containing an alternate sequence with bases and their locations
+    Given a SeqWindow containing an alternate sequence with bases and their locations
     and the strand that the alternate allele is on
     Returns a string of the sequence containing the alternate allele
     '''
-    sequence = ""
-    # to ensure that items in dictionary are sorted numerically
-    for key, value in sorted(altSeqDict.items()):
-        sequence += altSeqDict[key]
-    if varStrand == "-":
-        sequence = str(Seq(sequence).reverse_complement())
-    return sequence
+    return altSeqDict.getSeq(varStrand)
 
-def getRefAltSeqs(variant, rangeStart, rangeStop):
+def getRefAltSeqs(variant, rangeStart, rangeStop, genome=None):
     '''
     Given a variant, rangeStart, and rangeStop:
     Returns a dicitonary with ref and alt seq for the specified variant and range
@@ -799,10 +927,10 @@ def getRefAltSeqs(variant, rangeStart, rangeStop):
     varChrom = getVarChrom(variant)
     varStrand = getVarStrand(variant)
     if varStrand == "-":
-        refSeq = getFastaSeq(varChrom, rangeStart, rangeStop, plusStrandSeq=False)
+        refSeq = getFastaSeq(varChrom, rangeStart, rangeStop, plusStrandSeq=False, genome=genome)
     else:
-        refSeq = getFastaSeq(varChrom, rangeStart, rangeStop, plusStrandSeq=True)
-    refSeqDict = getSeqLocDict(varChrom, varStrand, rangeStart, rangeStop)
+        refSeq = getFastaSeq(varChrom, rangeStart, rangeStop, plusStrandSeq=True, genome=genome)
+    refSeqDict = getSeqLocDict(varChrom, varStrand, rangeStart, rangeStop, genome=genome)
     altSeqDict = getAltSeqDict(variant, refSeqDict)
     altSeq = getAltSeq(altSeqDict, varStrand)
     return {"refSeq": refSeq,
@@ -831,7 +959,10 @@ def getZScore(maxEntScanScore, donor=False):
     If donor is True, uses splice donor mean and std
     If donor is False, uses splice acceptor mean and std
     '''
-    stdMeanData = json.load(open(os.path.join(os.path.dirname(__file__), 'brca.zscore.json')))
+    global zScoreStats
+    if zScoreStats is None:
+        zScoreStats = json.load(open(os.path.join(os.path.dirname(__file__), 'brca.zscore.json')))
+    stdMeanData = zScoreStats
     if donor == False:
         std = stdMeanData["acceptors"]["std"]
         mean = stdMeanData["acceptors"]["mean"]
@@ -864,7 +995,7 @@ def getRefAltScores(refSeq, altSeq, donor=False):
                                "zScore": altZScore}}
     return scoreDict
 
-def getMaxEntScanScoresSlidingWindowSNS(variant, windowSize, donor=False):
+def getMaxEntScanScoresSlidingWindowSNS(variant, windowSize, donor=False, genome=None):
     '''
     Given a variant and window size determines window sequences and scores for a sliding window
       that is the size of windowSize
@@ -890,7 +1021,7 @@ def getMaxEntScanScoresSlidingWindowSNS(variant, windowSize, donor=False):
     else:
         regionStart = varGenPos - offset
         regionEnd = varGenPos + offset
-    refAltSeqs = getRefAltSeqs(variant, regionStart, regionEnd)
+    refAltSeqs = getRefAltSeqs(variant, regionStart, regionEnd, genome=genome)
     refSeq = refAltSeqs["refSeq"]
     altSeq = refAltSeqs["altSeq"]
     windowStart = 0
@@ -916,7 +1047,7 @@ def getMaxEntScanScoresSlidingWindowSNS(variant, windowSize, donor=False):
             "windowScores": windowScores,
             "windowAltMaxEntScanScores": windowAltMaxEntScanScores}
 
-def getMaxMaxEntScanScoreSlidingWindowSNS(variant, exonicPortionSize, deNovoLength, donor=True, deNovo=False, deNovoDonorInRefAcc=False):
+def getMaxMaxEntScanScoreSlidingWindowSNS(variant, exonicPortionSize, deNovoLength, donor=True, deNovo=False, deNovoDonorInRefAcc=False, genome=None):
     '''
     Given a variant, determines the maximum alt MaxEntScan score in 
        a sliding window of size STD_DONOR_SIZE with the variant in each position (1-STD_DONOR_SIZE) if donor = True
@@ -937,10 +1068,10 @@ def getMaxMaxEntScanScoreSlidingWindowSNS(variant, exonicPortionSize, deNovoLeng
     '''
     if donor == True:
         # uses default window size for a splice donor region
-        slidingWindowInfo = getMaxEntScanScoresSlidingWindowSNS(variant, STD_DONOR_SIZE, donor=donor)
+        slidingWindowInfo = getMaxEntScanScoresSlidingWindowSNS(variant, STD_DONOR_SIZE, donor=donor, genome=genome)
     else:
         # uses default window size for a splice acceptor region
-        slidingWindowInfo = getMaxEntScanScoresSlidingWindowSNS(variant, STD_ACC_SIZE, donor=donor)
+        slidingWindowInfo = getMaxEntScanScoresSlidingWindowSNS(variant, STD_ACC_SIZE, donor=donor, genome=genome)
     windowAltMaxEntScanScores = slidingWindowInfo["windowAltMaxEntScanScores"]
     # checks to see if variatn is within reference splice donor region
     inRefSpliceDonorRegion = varInSpliceRegion(variant, donor=True, deNovo=False)
@@ -952,9 +1083,9 @@ def getMaxMaxEntScanScoreSlidingWindowSNS(variant, exonicPortionSize, deNovoLeng
         if donor == True:
             refSpliceBounds = getVarSpliceRegionBounds(variant, donor=donor, deNovo=False)
             if getVarStrand(variant) == "+":
-                refSpliceSeq = getFastaSeq(getVarChrom(variant), refSpliceBounds["donorStart"], refSpliceBounds["donorEnd"], plusStrandSeq=True)
+                refSpliceSeq = getFastaSeq(getVarChrom(variant), refSpliceBounds["donorStart"], refSpliceBounds["donorEnd"], plusStrandSeq=True, genome=genome)
             else:
-                refSpliceSeq = getFastaSeq(getVarChrom(variant), refSpliceBounds["donorStart"], refSpliceBounds["donorEnd"], plusStrandSeq=False)
+                refSpliceSeq = getFastaSeq(getVarChrom(variant), refSpliceBounds["donorStart"], refSpliceBounds["donorEnd"], plusStrandSeq=False, genome=genome)
         else:
             refSpliceBounds = getVarSpliceRegionBounds(variant, donor=donor, deNovo=True)
             deNovoOffset = deNovoLength - exonicPortionSize
@@ -962,11 +1093,11 @@ def getMaxMaxEntScanScoreSlidingWindowSNS(variant, exonicPortionSize, deNovoLeng
             if getVarStrand(variant) == "+":
                 # acceptorEnd - deNovoOffset because genomic position increases from left to right on plus strand, refSeq reduced to correct length
                 refSpliceSeq = getFastaSeq(getVarChrom(variant), refSpliceBounds["acceptorStart"],
-                                           (refSpliceBounds["acceptorEnd"] - deNovoOffset), plusStrandSeq=True)
+                                           (refSpliceBounds["acceptorEnd"] - deNovoOffset), plusStrandSeq=True, genome=genome)
             else:
                 # acceptorEnd + deNovoOffset because genomic position decreases from left to right on minus strand, refSeq reduced to correct length
                 refSpliceSeq = getFastaSeq(getVarChrom(variant), refSpliceBounds["acceptorStart"],
-                                           (refSpliceBounds["acceptorEnd"] + deNovoOffset), plusStrandSeq=False)
+                                           (refSpliceBounds["acceptorEnd"] + deNovoOffset), plusStrandSeq=False, genome=genome)
         for position, seqs in slidingWindowInfo["windowSeqs"].iteritems():
             if seqs["refSeq"] == refSpliceSeq:
                 refSpliceWindow = position
@@ -1000,7 +1131,7 @@ def getMaxMaxEntScanScoreSlidingWindowSNS(variant, exonicPortionSize, deNovoLeng
             "varWindowPosition": maxVarPosition,
             "inExonicPortion": inExonicPortion}
 
-def varInExonicPortion(variant, exonicPortionSize, deNovoLength, donor=True, deNovoDonorInRefAcc=False):
+def varInExonicPortion(variant, exonicPortionSize, deNovoLength, donor=True, deNovoDonorInRefAcc=False, genome=None):
     '''
     Given a variant, determines if variant in in the exonic portion as specified
     exonicPortionLength refers to the number of bases that are considered to be in the exon
@@ -1013,12 +1144,12 @@ def varInExonicPortion(variant, exonicPortionSize, deNovoLength, donor=True, deN
     '''
     slidingWindowInfo = getMaxMaxEntScanScoreSlidingWindowSNS(variant, exonicPortionSize=exonicPortionSize,
                                                               deNovoLength=deNovoLength, donor=donor,
-                                                              deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+                                                              deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
     if slidingWindowInfo["inExonicPortion"] == True:
         return True
     return False
 
-def getVarWindowPosition(variant, donor=True, deNovoDonorInRefAcc=False):
+def getVarWindowPosition(variant, donor=True, deNovoDonorInRefAcc=False, genome=None):
     '''
     Given a variant, determines window position for highest scoring sliding window
     donor=True if function being used for splice donor, donor=False if function being used for splice acceptor
@@ -1027,7 +1158,7 @@ def getVarWindowPosition(variant, donor=True, deNovoDonorInRefAcc=False):
     deNovoDonorInRefAcc=True if looking for deNovoDonor in ref acceptor site, False otherwise
     '''
     slidingWindowInfo = getMaxMaxEntScanScoreSlidingWindowSNS(variant, STD_EXONIC_PORTION, STD_DE_NOVO_LENGTH,
-                                                              donor=donor, deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+                                                              donor=donor, deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
     varWindowPos = slidingWindowInfo["varWindowPosition"]
     return varWindowPos
 
@@ -1063,7 +1194,7 @@ def getClosestExonNumberIntronicSNS(variant, boundaries, donor=True):
         return closestExonInfo[0]
     return "exon0"
                 
-def getClosestSpliceSiteScores(variant, deNovoOffset, donor=True, deNovo=False, deNovoDonorInRefAcc=False, testMode=False):
+def getClosestSpliceSiteScores(variant, deNovoOffset, donor=True, deNovo=False, deNovoDonorInRefAcc=False, testMode=False, genome=None):
     '''
     Given a variant, determines scores for closest reference splice sequence
     Also returns sequence of closest reference splice site and genomic position of splice site
@@ -1105,12 +1236,12 @@ def getClosestSpliceSiteScores(variant, deNovoOffset, donor=True, deNovo=False,
         exonName = closestSpliceBounds["exonName"]
     if donor == True:
         if getVarStrand(variant) == "+":
-            refSeq = getFastaSeq(varChrom, closestSpliceBounds["donorStart"], closestSpliceBounds["donorEnd"], plusStrandSeq=True)
+            refSeq = getFastaSeq(varChrom, closestSpliceBounds["donorStart"], closestSpliceBounds["donorEnd"], plusStrandSeq=True, genome=genome)
             # splice site is 3 bp to the right of donor Start (+3 because plus strand numbering increases from left to right)
             # splice site is 3 bp to the right because exon end is 3 bp to the right of donor start
             genomicSplicePos = closestSpliceBounds["donorStart"] + 3
         else:
-            refSeq = getFastaSeq(varChrom, closestSpliceBounds["donorStart"], closestSpliceBounds["donorEnd"], plusStrandSeq=False)
+            refSeq = getFastaSeq(varChrom, closestSpliceBounds["donorStart"], closestSpliceBounds["donorEnd"], plusStrandSeq=False, genome=genome)
             # splice site is 3 bp to the right of donor Start (-3 because minus strand numbering decreases from left to right)
             # splice site is 3 bp to the right because exon end is 3 bp to the right of donor start
             genomicSplicePos = closestSpliceBounds["donorStart"] - 3
@@ -1123,12 +1254,12 @@ def getClosestSpliceSiteScores(variant, deNovoOffset, donor=True, deNovo=False,
         # for minus strand it is acceptorEnd + deNovoOffset because
         # the genomic position decreases from left to right on the minus strand and addition reduces the refSeq to correct length
         if getVarStrand(variant) == "+":
-            refSeq = getFastaSeq(varChrom, closestSpliceBounds["acceptorStart"], (closestSpliceBounds["acceptorEnd"] - deNovoOffset), plusStrandSeq=True)
+            refSeq = getFastaSeq(varChrom, closestSpliceBounds["acceptorStart"], (closestSpliceBounds["acceptorEnd"] - deNovoOffset), plusStrandSeq=True, genome=genome)
             # splice site is 3 bp to the left of reference acceptor End (-3 because plus strand numbering increases from left to right)
             # minus deNovoOffset because deNovo splice acceptor region is deNovoOffset bp longer than reference splice acceptor region
             genomicSplicePos = closestSpliceBounds["acceptorEnd"] - 3 - deNovoOffset
         else:
-            refSeq = getFastaSeq(varChrom, closestSpliceBounds["acceptorStart"], (closestSpliceBounds["acceptorEnd"] + deNovoOffset), plusStrandSeq=False)
+            refSeq = getFastaSeq(varChrom, closestSpliceBounds["acceptorStart"], (closestSpliceBounds["acceptorEnd"] + deNovoOffset), plusStrandSeq=False, genome=genome)
             # splice site is 3 bp to the left of reference acceptor End (+3 because minus strand numbering decreases from left to right)
             # plus deNovoOffset because deNovo splice acceptor region is deNovoOffset bp longer than reference splice acceptor region
             genomicSplicePos = closestSpliceBounds["acceptorEnd"] + 3 + deNovoOffset
@@ -1261,7 +1392,7 @@ def getNewSplicePosition(varGenPos, varStrand, varWindowPos, inExonicPortion, ex
                 newSplicePos = int(varGenPos) + (varWindowPos - intronicPortionSize)
     return newSplicePos
     
-def getAltExonLength(variant, exonicPortionSize, intronicPortionSize, deNovoDonorInRefAcc=False, donor=True):
+def getAltExonLength(variant, exonicPortionSize, intronicPortionSize, deNovoDonorInRefAcc=False, donor=True, genome=None):
     '''
     Given a variant and the exonic portion size,
     returns the length of the alternate exon after splicing occurs in max MES window
@@ -1278,7 +1409,7 @@ def getAltExonLength(variant, exonicPortionSize, intronicPortionSize, deNovoDono
             varExonNum = getClosestExonNumberIntronicSNS(variant, "enigma", donor=donor)
     exonBounds = getExonBoundaries(variant)
     slidingWindowInfo = getMaxMaxEntScanScoreSlidingWindowSNS(variant, exonicPortionSize, STD_DE_NOVO_LENGTH, donor=donor,
-                                                              deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+                                                              deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
     newSplicePos = getNewSplicePosition(variant["Pos"], getVarStrand(variant), slidingWindowInfo["varWindowPosition"],
                                         slidingWindowInfo["inExonicPortion"], exonicPortionSize, intronicPortionSize, donor=donor)
     if getVarStrand(variant) == "-":
@@ -1313,7 +1444,7 @@ def compareRefAltExonLengths(refLength, altLength):
     else:
         return False
 
-def isSplicingWindowInFrame(variant, exonicPortionSize, intronicPortionSize, deNovoDonorInRefAcc=False, donor=True):
+def isSplicingWindowInFrame(variant, exonicPortionSize, intronicPortionSize, deNovoDonorInRefAcc=False, donor=True, genome=None):
     '''
     Given a variant, determines ref and alt exon length and compares them
     exonicPortionSize refers to length in bp that is considered to be in exonic portion of splice site
@@ -1323,11 +1454,11 @@ def isSplicingWindowInFrame(variant, exonicPortionSize, intronicPortionSize, deN
     If ref and alt exon are in the same reading frame, returns True
     '''
     refLength = getRefExonLength(variant, donor=donor)
-    altLength = getAltExonLength(variant, exonicPortionSize, intronicPortionSize, deNovoDonorInRefAcc=deNovoDonorInRefAcc, donor=donor)
+    altLength = getAltExonLength(variant, exonicPortionSize, intronicPortionSize, deNovoDonorInRefAcc=deNovoDonorInRefAcc, donor=donor, genome=genome)
     return compareRefAltExonLengths(refLength, altLength)
 
 def isDeNovoWildTypeSplicePosDistanceDivisibleByThree(variant, exonicPortionSize, intronicPortionSize,
-                                                      deNovoDonorInRefAcc=False, donor=True):
+                                                      deNovoDonorInRefAcc=False, donor=True, genome=None):
     '''
     Given a variant, compares de novo splicing position with wild-type splicing position
     exonicPortionSize refers to length in bp that is considered to be in exonic portion of splice site
@@ -1351,7 +1482,7 @@ def isDeNovoWildTypeSplicePosDistanceDivisibleByThree(variant, exonicPortionSize
     varStrand = getVarStrand(variant)
     refExonBounds = getExonBoundaries(variant)
     slidingWindowInfo = getMaxMaxEntScanScoreSlidingWindowSNS(variant, exonicPortionSize, STD_DE_NOVO_LENGTH, donor=donor,
-                                                              deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+                                                              deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
     deNovoSplicePos = getNewSplicePosition(variant["Pos"], varStrand, slidingWindowInfo["varWindowPosition"],
                                            slidingWindowInfo["inExonicPortion"], exonicPortionSize, intronicPortionSize, donor=donor)
     if donor == True:
@@ -1373,7 +1504,7 @@ def isDeNovoWildTypeSplicePosDistanceDivisibleByThree(variant, exonicPortionSize
         return True
     return False
         
-def getPriorProbSpliceRescueNonsenseSNS(variant, boundaries, deNovoDonorInRefAcc=False):
+def getPriorProbSpliceRescueNonsenseSNS(variant, boundaries, deNovoDonorInRefAcc=False, genome=None):
     '''
     Given a variant, determines if there is a possibility of splice rescue
     deNovoDonorInRefAcc argument = True  if looking for deNovoDonor in ref acceptor site, False otherwise
@@ -1408,13 +1539,13 @@ def getPriorProbSpliceRescueNonsenseSNS(variant, boundaries, deNovoDonorInRefAcc
         lowMESFlag = "-"
         # if variant is in specified exonic portion of highest scoring sliding window, no splice rescue
         if varInExonicPortion(variant, STD_EXONIC_PORTION, STD_DE_NOVO_LENGTH, donor=True,
-                              deNovoDonorInRefAcc=deNovoDonorInRefAcc) == True:
+                              deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome) == True:
             priorProb = PATHOGENIC_PROBABILITY
             inExonicPortionFlag = 1
             spliceRescue = 0
         else:
             inFrame = isSplicingWindowInFrame(variant, STD_EXONIC_PORTION, STD_ACC_INTRONIC_LENGTH,
-                                              deNovoDonorInRefAcc=deNovoDonorInRefAcc, donor=True)
+                                              deNovoDonorInRefAcc=deNovoDonorInRefAcc, donor=True, genome=genome)
             # if variant causes a frameshift, no splice rescue
             if inFrame == False:
                 priorProb = PATHOGENIC_PROBABILITY
@@ -1433,16 +1564,16 @@ def getPriorProbSpliceRescueNonsenseSNS(variant, boundaries, deNovoDonorInRefAcc
                 if variant["Gene_Symbol"] == "BRCA1" and nextExonNum == "exon4":
                     nextExonNum = "exon5"
                 refSpliceAccBounds = getSpliceAcceptorBoundaries(variant, STD_ACC_INTRONIC_LENGTH, STD_ACC_EXONIC_LENGTH)
-                varWindowPos = getVarWindowPosition(variant, donor=True, deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+                varWindowPos = getVarWindowPosition(variant, donor=True, deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
                 inExonicPortion = varInExonicPortion(variant, STD_EXONIC_PORTION, STD_DE_NOVO_LENGTH, donor=True,
-                                                     deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+                                                     deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
                 # gets region from new splice position to next splice acceptor
                 regionStart = getNewSplicePosition(varGenPos, varStrand, varWindowPos, inExonicPortion, STD_EXONIC_PORTION,
                                                    STD_ACC_INTRONIC_LENGTH, donor=True)
                 regionEnd = refSpliceAccBounds[nextExonNum]["acceptorStart"]
                 CIDomainInRegion = isCIDomainInRegion(regionStart, regionEnd, boundaries, variant["Gene_Symbol"])
                 isDivisible = isDeNovoWildTypeSplicePosDistanceDivisibleByThree(variant, STD_EXONIC_PORTION, STD_ACC_INTRONIC_LENGTH,
-                                                                                deNovoDonorInRefAcc=deNovoDonorInRefAcc, donor=True)
+                                                                                deNovoDonorInRefAcc=deNovoDonorInRefAcc, donor=True, genome=genome)
                 # if truncated region includes a clinically important domain or causes a frameshift
                 if CIDomainInRegion == True:
                     priorProb = PATHOGENIC_PROBABILITY
@@ -1464,7 +1595,7 @@ def getPriorProbSpliceRescueNonsenseSNS(variant, boundaries, deNovoDonorInRefAcc
                     CIDomainInRegionFlag = 0
                     isDivisibleFlag = 0
                     deNovoSpliceData = getMaxMaxEntScanScoreSlidingWindowSNS(variant, STD_EXONIC_PORTION, STD_DE_NOVO_LENGTH,
-                                                                             donor=True, deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+                                                                             donor=True, deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
                     altMES = deNovoSpliceData["altMaxEntScanScore"]
                     refZScore = deNovoSpliceData["refZScore"]
                     altZScore = deNovoSpliceData["altZScore"]
@@ -1484,10 +1615,10 @@ def getPriorProbSpliceRescueNonsenseSNS(variant, boundaries, deNovoDonorInRefAcc
                             # still a weak splice site, but possibility of splice rescue
                             deNovoOffset = 0
                             closestRefData = getClosestSpliceSiteScores(variant, deNovoOffset, donor=True, deNovo=False,
-                                                                        deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+                                                                        deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
                             closestZScore = closestRefData["zScore"]
                             if varInSpliceRegion(variant, donor=True, deNovo=False) == True:
-                                closestAltData = getPriorProbRefSpliceDonorSNS(variant, boundaries)
+                                closestAltData = getPriorProbRefSpliceDonorSNS(variant, boundaries, genome=genome)
                                 closestZScore = closestAltData["altZScore"]
                             if altZScore > closestZScore:
                                 # splice site created by variant is stronger than subsequent (closest) wild-type donor
@@ -1539,7 +1670,7 @@ def getPriorProbSpliceRescueNonsenseSNS(variant, boundaries, deNovoDonorInRefAcc
                 "isDivisibleFlag": isDivisibleFlag,
                 "lowMESFlag": lowMESFlag}
 
-def getDeNovoSpliceFrameshiftStatus(variant, donor=True, deNovoDonorInRefAcc=False):
+def getDeNovoSpliceFrameshiftStatus(variant, donor=True, deNovoDonorInRefAcc=False, genome=None):
     '''
     Given a variant, determiens if de novo splice site (either donor or acceptor based on donor argument)
       causes a frameshift
@@ -1550,10 +1681,10 @@ def getDeNovoSpliceFrameshiftStatus(variant, donor=True, deNovoDonorInRefAcc=Fal
     '''
     # if inFrame == False then alt and ref exons are not in the same reading frame
     inFrame = isSplicingWindowInFrame(variant, STD_EXONIC_PORTION, STD_ACC_INTRONIC_LENGTH,
-                                      deNovoDonorInRefAcc=deNovoDonorInRefAcc, donor=donor)
+                                      deNovoDonorInRefAcc=deNovoDonorInRefAcc, donor=donor, genome=genome)
     # if isDivisble == Flase then distance between old and new splice position is not divislbe by 3
     isDivisible = isDeNovoWildTypeSplicePosDistanceDivisibleByThree(variant, STD_EXONIC_PORTION, STD_ACC_INTRONIC_LENGTH,
-                                                                    deNovoDonorInRefAcc=deNovoDonorInRefAcc, donor=donor)
+                                                                    deNovoDonorInRefAcc=deNovoDonorInRefAcc, donor=donor, genome=genome)
     if inFrame == False or isDivisible == False:
         return True
     return False
@@ -1577,7 +1708,7 @@ def getEnigmaClass(priorProb):
         else:
             return "class_3"
 
-def getPriorProbRefSpliceDonorSNS(variant, boundaries):
+def getPriorProbRefSpliceDonorSNS(variant, boundaries, genome=None):
     '''
     Given a variant and location boundaries (either PRIORS or enigma)
     Checks that variant is in a splice donor site and is a single nucleotide substitution
@@ -1595,7 +1726,7 @@ def getPriorProbRefSpliceDonorSNS(variant, boundaries):
     if varType == "substitution" and (varLoc == "splice_donor_variant" or varLoc == "CI_splice_donor_variant"):
         # to get region boundaries to get ref and alt seq
         spliceDonorBounds = getVarSpliceRegionBounds(variant, donor=True, deNovo=False)
-        refAltSeqs = getRefAltSeqs(variant, spliceDonorBounds["donorStart"], spliceDonorBounds["donorEnd"])
+        refAltSeqs = getRefAltSeqs(variant, spliceDonorBounds["donorStart"], spliceDonorBounds["donorEnd"], genome=genome)
         scores = getRefAltScores(refAltSeqs["refSeq"], refAltSeqs["altSeq"], donor=True)
         refMaxEntScanScore = scores["refScores"]["maxEntScanScore"]
         refZScore = scores["refScores"]["zScore"]
@@ -1641,7 +1772,7 @@ def getPriorProbRefSpliceDonorSNS(variant, boundaries):
                 "altZScore": altZScore,
                 "spliceSite": 1}
     
-def getPriorProbRefSpliceAcceptorSNS(variant, boundaries):
+def getPriorProbRefSpliceAcceptorSNS(variant, boundaries, genome=None):
     '''
     Given a variant and location boundaries (either PRIORS or enigma)
     Checks that variant is in a splice acceptor site and is a single nucleotide substitution
@@ -1659,7 +1790,7 @@ def getPriorProbRefSpliceAcceptorSNS(variant, boundaries):
     if varType == "substitution" and (varLoc == "splice_acceptor_variant" or varLoc == "CI_splice_acceptor_variant"):
         # to get region boundaires to get ref and alt seq
         spliceAcceptorBounds = getVarSpliceRegionBounds(variant, donor=False, deNovo=False)
-        refAltSeqs = getRefAltSeqs(variant, spliceAcceptorBounds["acceptorStart"], spliceAcceptorBounds["acceptorEnd"])
+        refAltSeqs = getRefAltSeqs(variant, spliceAcceptorBounds["acceptorStart"], spliceAcceptorBounds["acceptorEnd"], genome=genome)
         scores = getRefAltScores(refAltSeqs["refSeq"], refAltSeqs["altSeq"], donor=False)
         refMaxEntScanScore = scores["refScores"]["maxEntScanScore"]
         refZScore = scores["refScores"]["zScore"]
@@ -1822,7 +1953,7 @@ def varInIneligibleDeNovoExon(variant, donor=True):
                 return True
         return False
 
-def getDeNovoFrameshiftAndCIStatus(variant, boundaries, donor=True, deNovoDonorInRefAcc=False):
+def getDeNovoFrameshiftAndCIStatus(variant, boundaries, donor=True, deNovoDonorInRefAcc=False, genome=None):
     '''
     Given a variant, boundaries (enigma or priors), donor argument, and deNovoDonorInRefAcc argument:
       donor argument = True for de novo donors, False for de novo acceptors
@@ -1833,7 +1964,7 @@ def getDeNovoFrameshiftAndCIStatus(variant, boundaries, donor=True, deNovoDonorI
     If variant de novo splice position does not cause a frameshift and does not disrupt a CI domain, reutrns True
       Returns False otherwise
     '''
-    frameshiftStatus = getDeNovoSpliceFrameshiftStatus(variant, donor=donor, deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+    frameshiftStatus = getDeNovoSpliceFrameshiftStatus(variant, donor=donor, deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
     # checks to make sure that variant does not cause a frameshift
     if frameshiftStatus == True:
         return False
@@ -1851,9 +1982,9 @@ def getDeNovoFrameshiftAndCIStatus(variant, boundaries, donor=True, deNovoDonorI
                     # so no part of a CI domain will be spliced out
                     return True
         # varExonNum is a string in the format "exonN"
-        varWindowPos = getVarWindowPosition(variant, donor=donor, deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+        varWindowPos = getVarWindowPosition(variant, donor=donor, deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
         inExonicPortion = varInExonicPortion(variant, STD_EXONIC_PORTION, STD_DE_NOVO_LENGTH, donor=donor,
-                                             deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+                                             deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
         regionStart = getNewSplicePosition(variant["Pos"], getVarStrand(variant), varWindowPos, inExonicPortion,
                                            STD_EXONIC_PORTION, STD_ACC_INTRONIC_LENGTH, donor=donor)
         if donor == True:
@@ -1880,7 +2011,7 @@ def getDeNovoFrameshiftAndCIStatus(variant, boundaries, donor=True, deNovoDonorI
     
 def convertGenomicPosToTranscriptPos(genomicPos, chrom, genome, transcript):
     '''
-    Given a genomic position, chrom (in format "chrN"), genome (SequenceFileDB for genome),
+    Given a genomic position, chrom (in format "chrN"), genome (packed_resources.TwoBitGenome),
       and transcript (pyhgvs transcript object):
     Returns a string of the transcript position at the given genomic position
     '''
@@ -1907,7 +2038,7 @@ def getPriorProbDeNovoDonorSNS(variant, boundaries, exonicPortionSize, genome, t
     Given a variant, boundaries (either priors or enigma), and exonicPortionSize
       1. checks that variant is a single nucleotide substitution
       2. checks that variant is in an exon or is in a reference splice donor region
-    Genome is a SequenceFileDB for genome and transcript is a pyhgvs transcript object)
+    Genome is a packed_resources.TwoBitGenome and transcript is a pyhgvs transcript object)
        both genome and transcript are necessary to convert from genomic to transcript coordinates
     Returns a dictionary containing: 
       prior probability of pathogenecity and predicted qualitative engima class 
@@ -1956,7 +2087,7 @@ def getPriorProbDeNovoDonorSNS(variant, boundaries, exonicPortionSize, genome, t
                         "altGreaterClosestRefFlag": "N/A",
                         "altGreaterClosestAltFlag": "N/A"}
             slidingWindowInfo = getMaxMaxEntScanScoreSlidingWindowSNS(variant, exonicPortionSize, STD_DE_NOVO_LENGTH,
-                                                                      donor=True, deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+                                                                      donor=True, deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
             # +-1 because per HCI PRIORS website donor position is defined as being first nucleotide that is NOT included in spliced exon
             if getVarStrand(variant) == "-":
                 newGenomicSplicePos = getNewSplicePosition(variant["Pos"], "-", slidingWindowInfo["varWindowPosition"],
@@ -1968,7 +2099,7 @@ def getPriorProbDeNovoDonorSNS(variant, boundaries, exonicPortionSize, genome, t
                                                             donor=True) + 1
             deNovoOffset = 0
             subDonorInfo = getClosestSpliceSiteScores(variant, deNovoOffset, donor=True, deNovo=False,
-                                                      deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+                                                      deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
             subZScore = subDonorInfo["zScore"]
             refAltZScore = "N/A"
             refAltMES = "N/A"
@@ -1976,13 +2107,13 @@ def getPriorProbDeNovoDonorSNS(variant, boundaries, exonicPortionSize, genome, t
             altGreaterClosestRefFlag = 0
             altGreaterClosestAltFlag = "N/A"
             if varInSpliceRegion(variant, donor=True, deNovo=False) == True:
-                refDonorInfo = getPriorProbRefSpliceDonorSNS(variant, "enigma")
+                refDonorInfo = getPriorProbRefSpliceDonorSNS(variant, "enigma", genome=genome)
                 refAltZScore = refDonorInfo["altZScore"]
                 refAltMES = refDonorInfo["altMaxEntScanScore"]
                 refAltSeq = refDonorInfo["altSeq"]
                 altGreaterClosestAltFlag = 0
             frameshiftFlag = 0
-            frameshiftStatus = getDeNovoSpliceFrameshiftStatus(variant, donor=True, deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+            frameshiftStatus = getDeNovoSpliceFrameshiftStatus(variant, donor=True, deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
             if frameshiftStatus == True:
                 frameshiftFlag = 1
             altZScore = slidingWindowInfo["altZScore"]
@@ -2021,7 +2152,7 @@ def getPriorProbDeNovoDonorSNS(variant, boundaries, exonicPortionSize, genome, t
 
             if frameshiftFlag == 0 and priorProb != 0:
                 frameshiftAndCIStatus = getDeNovoFrameshiftAndCIStatus(variant, boundaries, donor=True,
-                                                                       deNovoDonorInRefAcc=deNovoDonorInRefAcc)
+                                                                       deNovoDonorInRefAcc=deNovoDonorInRefAcc, genome=genome)
                 if frameshiftAndCIStatus == True:
                     priorProb = LOW_PROBABILITY
 
@@ -2066,7 +2197,7 @@ def getPriorProbDeNovoAcceptorSNS(variant, exonicPortionSize, deNovoLength, geno
       1. checks that variant is a single nucleotide substitution
       2. checks that variant is in de novo splice acceptor region 
          de novo splice acceptor region defined by deNovoLength
-    Genome is a SequenceFileDB for genome and transcript is a pyhgvs transcript object)
+    Genome is a packed_resources.TwoBitGenome and transcript is a pyhgvs transcript object)
        both genome and transcript are necessary to convert from genomic to transcript coordinates
     Returns a dictionary containing: 
       prior probability of pathogenecity and predicted qualitative engima class (both N/A)
@@ -2084,26 +2215,26 @@ def getPriorProbDeNovoAcceptorSNS(variant, exonicPortionSize, deNovoLength, geno
     if getVarType(variant) == "substitution":
         if varInSpliceRegion(variant, donor=False, deNovo=True) == True:
             slidingWindowInfo = getMaxMaxEntScanScoreSlidingWindowSNS(variant, exonicPortionSize, deNovoLength,
-                                                                        donor=False)
+                                                                        donor=False, genome=genome)
             newGenomicSplicePos = getNewSplicePosition(variant["Pos"], getVarStrand(variant), slidingWindowInfo["varWindowPosition"],
                                                        slidingWindowInfo["inExonicPortion"], STD_EXONIC_PORTION, STD_ACC_INTRONIC_LENGTH,
                                                        donor=False)
             deNovoOffset = deNovoLength - exonicPortionSize
             closestAccInfo = getClosestSpliceSiteScores(variant, STD_DE_NOVO_OFFSET, donor=False, deNovo=True,
-                                                        deNovoDonorInRefAcc=False)
+                                                        deNovoDonorInRefAcc=False, genome=genome)
             refAltZScore = "N/A"
             refAltMES = "N/A"
             refAltSeq = "N/A"
             altGreaterClosestRefFlag = 0
             altGreaterClosestAltFlag = "N/A"
             if varInSpliceRegion(variant, donor=False, deNovo=False) == True:
-                refAccInfo = getPriorProbRefSpliceAcceptorSNS(variant, "enigma")
+                refAccInfo = getPriorProbRefSpliceAcceptorSNS(variant, "enigma", genome=genome)
                 refAltZScore = refAccInfo["altZScore"]
                 refAltMES = refAccInfo["altMaxEntScanScore"]
                 refAltSeq = refAccInfo["altSeq"]
                 altGreaterClosestAltFlag = 0
             frameshiftFlag = 0
-            frameshiftStatus = getDeNovoSpliceFrameshiftStatus(variant, donor=False, deNovoDonorInRefAcc=False)
+            frameshiftStatus = getDeNovoSpliceFrameshiftStatus(variant, donor=False, deNovoDonorInRefAcc=False, genome=genome)
             if frameshiftStatus == True:
                 frameshiftFlag = 1
             altZScore = slidingWindowInfo["altZScore"]
@@ -2154,8 +2285,8 @@ def getPriorProbDeNovoAcceptorSNS(variant, exonicPortionSize, deNovoLength, geno
 
 def getPriorProbSpliceDonorSNS(variant, boundaries, variantData, genome, transcript):
     '''
-    Given a variant, boundaries (either PRIORS or ENIGMA), and a list of dictionaries with variant data
-    Genome is a SequenceFileDB for genome and transcript is a pyhgvs transcript object)
+    Given a variant, boundaries (either PRIORS or ENIGMA), and protein priors indexed by getProteinPriorsIndex
+    Genome is a packed_resources.TwoBitGenome and transcript is a pyhgvs transcript object)
        both genome and transcript are necessary to convert from genomic to transcript coordinates
     Determines reference donor and de novo donor scores for variant
     If variant causes a nonsense mutation, determines if splice rescue occurs
@@ -2187,7 +2318,7 @@ def getPriorProbSpliceDonorSNS(variant, boundaries, variantData, genome, transcr
     Dictionary also contains formatting variables for each listed sequence
     ''' 
     if varInSpliceRegion(variant, donor=True, deNovo=False) and getVarType(variant) == "substitution":
-        refSpliceInfo = getPriorProbRefSpliceDonorSNS(variant, boundaries)
+        refSpliceInfo = getPriorProbRefSpliceDonorSNS(variant, boundaries, genome=genome)
         deNovoSpliceInfo = getPriorProbDeNovoDonorSNS(variant, boundaries, STD_EXONIC_PORTION, genome, transcript,
                                                       deNovoDonorInRefAcc=False)
         deNovoPrior = deNovoSpliceInfo["priorProb"]
@@ -2214,7 +2345,7 @@ def getPriorProbSpliceDonorSNS(variant, boundaries, variantData, genome, transcr
         lowMESFlag = "N/A"
         # to check for nonsense variants in exonic portion of splice donor site
         if varInExon(variant) == True and getVarConsequences(variant) == "stop_gained":
-            nonsenseData = getPriorProbSpliceRescueNonsenseSNS(variant, boundaries)
+            nonsenseData = getPriorProbSpliceRescueNonsenseSNS(variant, boundaries, genome=genome)
             applicablePrior = nonsenseData["priorProb"]
             spliceRescue = nonsenseData["spliceRescue"]
             spliceFlag = nonsenseData["spliceFlag"]
@@ -2314,7 +2445,7 @@ def getPriorProbSpliceDonorSNS(variant, boundaries, variantData, genome, transcr
 
 def getPriorProbSpliceAcceptorSNS(variant, boundaries, variantData, genome, transcript):
     '''
-    Given a variant, boundaries (either PRIORS or ENIGMA), and list of dictionaries with variant data
+    Given a variant, boundaries (either PRIORS or ENIGMA), and protein priors indexed by getProteinPriorsIndex
     Determines reference and de novo acceptor scores for variant
       If variant in exon, also determines de novo donor scores and protein prior
     If variant causes a nonsense mutation, determines if splice rescue occurs
@@ -2347,7 +2478,7 @@ def getPriorProbSpliceAcceptorSNS(variant, boundaries, variantData, genome, tran
     Dictionary also contains formatting variables for each listed sequence
     '''
     if varInSpliceRegion(variant, donor=False, deNovo=False) and getVarType(variant) == "substitution":
-        refSpliceInfo = getPriorProbRefSpliceAcceptorSNS(variant, boundaries)
+        refSpliceInfo = getPriorProbRefSpliceAcceptorSNS(variant, boundaries, genome=genome)
         deNovoAccInfo = getPriorProbDeNovoAcceptorSNS(variant, STD_EXONIC_PORTION, STD_DE_NOVO_LENGTH, genome, transcript)
         refPrior = refSpliceInfo["priorProb"]
         proteinPrior = "N/A"
@@ -2402,7 +2533,7 @@ def getPriorProbSpliceAcceptorSNS(variant, boundaries, variantData, genome, tran
         lowMESFlag = "N/A"
         # to check for nonsense variants in exonic portion of splice acceptor site
         if varInExon(variant) == True and getVarConsequences(variant) == "stop_gained":
-            nonsenseData = getPriorProbSpliceRescueNonsenseSNS(variant, boundaries, deNovoDonorInRefAcc=True)
+            nonsenseData = getPriorProbSpliceRescueNonsenseSNS(variant, boundaries, deNovoDonorInRefAcc=True, genome=genome)
             applicablePrior = nonsenseData["priorProb"]
             spliceRescue = nonsenseData["spliceRescue"]
             spliceFlag = nonsenseData["spliceFlag"]
@@ -2500,33 +2631,50 @@ def getPriorProbSpliceAcceptorSNS(variant, boundaries, variantData, genome, tran
                 "isDivisibleFlag": isDivisibleFlag,
                 "lowMESFlag": lowMESFlag}
     
+def getVarHGVScDNA(variant):
+    '''
+    Given a variant, returns its HGVS cDNA nomenclature in format c.65C>T
+    If HGVS_cDNA field is blank uses pyhgvs_cDNA field instead
+    '''
+    varHGVS = variant["HGVS_cDNA"]
+    if varHGVS == "-":
+        # [12:] parses out the NM_ accession so varHGVS is in format c.65C>T
+        varHGVS = variant["pyhgvs_cDNA"][12:]
+    return varHGVS
+
+def getProteinPriorsIndex(variantData):
+    '''
+    Given an iterable of dictionaries containing protein prior variant data,
+    Returns a dictionary keyed by (gene, nthgvs) with a list of matching rows as the value
+    Rows are kept in file order so lookups match a linear scan of variantData
+    '''
+    index = {}
+    for var in variantData:
+        index.setdefault((var['gene'], var['nthgvs']), []).append(var)
+    return index
+
 def getPriorProbProteinSNS(variant, variantData):
     '''
-    Given a variant and a list of dictionaries containing variant data,
+    Given a variant and protein prior variant data indexed by getProteinPriorsIndex,
     Returns a dictionary containing:
       the variant's protein prior probability and enigma class for that prior
     '''
     proteinPrior = "-"
     enigmaClass = "-"
     if getVarType(variant) == "substitution":
-        varHGVS = variant["HGVS_cDNA"]
-        if varHGVS == "-":
-            # if HGVS_cDNA field is blank use pyhgvs field instead
-            # [12:] parses out the NM_ accession so varHGVS is in format c.65C>T
-            varHGVS = variant["pyhgvs_cDNA"][12:]
+        varHGVS = getVarHGVScDNA(variant)
         varGene = variant["Gene_Symbol"]
 
-        for var in variantData:
-            if var['gene'] == varGene and var['nthgvs'] == varHGVS:
-                proteinPrior = float(var["protein_prior"])
-                enigmaClass = getEnigmaClass(proteinPrior)
+        for var in variantData.get((varGene, varHGVS), []):
+            proteinPrior = float(var["protein_prior"])
+            enigmaClass = getEnigmaClass(proteinPrior)
             
         return {"priorProb": proteinPrior,
                 "enigmaClass": enigmaClass}
 
 def getPriorProbInGreyZoneSNS(variant, boundaries, variantData):
     '''
-    Given a variant and a list of dicitionaries with variant data,
+    Given a variant and protein priors indexed by getProteinPriorsIndex,
     Returns applicable prior and enigma class based on protein priors for that variant
     Dictionary also contains other values that are either "N/A", "-", or 0 because they are not relevant
     '''
@@ -2626,14 +2774,14 @@ def getPriorProbInGreyZoneSNS(variant, boundaries, variantData):
     
 def getPriorProbInExonSNS(variant, boundaries, variantData, genome, transcript):
     '''
-    Given a variant, boundaries (either "enigma" or "priors") and a list of dictionaries containing variant data:
+    Given a variant, boundaries (either "enigma" or "priors") and protein priors indexed by getProteinPriorsIndex:
       1. Checks that variant is in an exon or clinically important domains and NOT in a splice site
       2. Checks that variant is a SNS variant
       3. Gets protein prior from variantData
       4. Determines if variant is a nonsense variant, if yes determines if splice rescue occurs
       5. If not a nonsense variant, calculates de novo donor prior and de novo acceptor prior if applicable
          Gets applicable prior if variant has a de novo donor prior
-    Genome is a SequenceFileDB for genome and transcript is a pyhgvs transcript object)
+    Genome is a packed_resources.TwoBitGenome and transcript is a pyhgvs transcript object)
        both genome and transcript are necessary to convert from genomic to transcript coordinates
     Returns a dictionary containing all values, dictionary entry is "-" if not relevant to variant
     Values in dictionary include:
@@ -2698,7 +2846,7 @@ def getPriorProbInExonSNS(variant, boundaries, variantData, genome, transcript):
                              "frameshiftFlag": "N/A"}
         varCons = getVarConsequences(variant)
         if varCons == "stop_gained":
-            nonsenseData = getPriorProbSpliceRescueNonsenseSNS(variant, boundaries, deNovoDonorInRefAcc=False)
+            nonsenseData = getPriorProbSpliceRescueNonsenseSNS(variant, boundaries, deNovoDonorInRefAcc=False, genome=genome)
             applicablePrior = nonsenseData["priorProb"]
             applicableClass = nonsenseData["enigmaClass"]
             spliceRescue = nonsenseData["spliceRescue"]
@@ -2907,7 +3055,7 @@ def getPriorProbIntronicDeNovoDonorSNS(variant, genome, transcript):
     Given a variant,
       1. Checks that variant is NOT in exon or reference donor/acceptor site
       2. Checks that variant is a substitution variant
-    Genome is a SequenceFileDB for genome and transcript is a pyhgvs transcript object)
+    Genome is a packed_resources.TwoBitGenome and transcript is a pyhgvs transcript object)
        both genome and transcript are necessary to convert from genomic to transcript coordinates
     Determines if alt MES score is greater than ref MES score for highest scoring sliding window
       If altMES > refMES, then deNovoDonorAltGreaterRefFlag = 1 (0 otherwise)
@@ -2924,7 +3072,7 @@ def getPriorProbIntronicDeNovoDonorSNS(variant, genome, transcript):
     if inExon == False and inRefDonor == False and inRefAcc == False:
         if getVarType(variant) == "substitution":
             deNovoDonorInfo = getMaxMaxEntScanScoreSlidingWindowSNS(variant, STD_EXONIC_PORTION, STD_DE_NOVO_LENGTH,
-                                                                    donor=True, deNovo=False, deNovoDonorInRefAcc=False)
+                                                                    donor=True, deNovo=False, deNovoDonorInRefAcc=False, genome=genome)
             # +-1 because per HCI PRIORS website donor position is defined as being first nucleotide that is NOT included in spliced exon
             if getVarStrand(variant) == "-":
                  newGenomicSplicePos = getNewSplicePosition(variant["Pos"], "-", deNovoDonorInfo["varWindowPosition"],
@@ -2937,7 +3085,7 @@ def getPriorProbIntronicDeNovoDonorSNS(variant, genome, transcript):
             refMES = deNovoDonorInfo["refMaxEntScanScore"]
             altMES = deNovoDonorInfo["altMaxEntScanScore"]
             deNovoOffset = 0
-            closestDonorInfo = getClosestSpliceSiteScores(variant, deNovoOffset, donor=True, deNovo=False, deNovoDonorInRefAcc=False, testMode=False)
+            closestDonorInfo = getClosestSpliceSiteScores(variant, deNovoOffset, donor=True, deNovo=False, deNovoDonorInRefAcc=False, testMode=False, genome=genome)
             closestMES = closestDonorInfo["maxEntScanScore"]
             spliceFlag = 0
             altGreaterRefFlag = 0
@@ -2949,7 +3097,7 @@ def getPriorProbIntronicDeNovoDonorSNS(variant, genome, transcript):
                 spliceFlag = 1
                 altGreaterClosestRefFlag = 1
 
-            frameshiftStatus = getDeNovoSpliceFrameshiftStatus(variant, donor=True, deNovoDonorInRefAcc=False)
+            frameshiftStatus = getDeNovoSpliceFrameshiftStatus(variant, donor=True, deNovoDonorInRefAcc=False, genome=genome)
             frameshiftFlag = 0
             if frameshiftStatus == True:
                 frameshiftFlag = 1
@@ -2995,7 +3143,7 @@ def getPriorProbInIntronSNS(variant, boundaries, genome, transcript):
     Given a variant and boundaries (either "priors or "enigma"),
     Checks that variant is located in an intron and is a substitution variant
     Determines if variant creates a de novo donor site in the intron
-    Genome is a SequenceFileDB for genome and transcript is a pyhgvs transcript object)
+    Genome is a packed_resources.TwoBitGenome and transcript is a pyhgvs transcript object)
        both genome and transcript are necessary to convert from genomic to transcript coordinates
     Returns a dictionary containing applicable prior and predicted qualitative enigma class
     Dictionary also contains de novo donor ref and alt scores
@@ -3106,7 +3254,7 @@ def getPriorProbInUTRSNS(variant, boundaries, genome, transcript):
     Given a variant and boundaries (either "priors" or "enigma"),
     Checks that variant is a SNS variant in a UTR
     Determines prior prob based on location (5'/3' UTR and intron/exon)
-    Genome is a SequenceFileDB for genome and transcript is a pyhgvs transcript object)
+    Genome is a packed_resources.TwoBitGenome and transcript is a pyhgvs transcript object)
        both genome and transcript are necessary to convert from genomic to transcript coordinates
     Returns a dictionary containing applicable prior and predicted qualitative enigma class
     Dictionary also contains de novo donor/acceptor ref and alt scores if applicable
@@ -3287,8 +3435,8 @@ def getPriorProbInUTRSNS(variant, boundaries, genome, transcript):
 
 def getVarData(variant, boundaries, variantData, genome, transcript):
     '''
-    Given variant, boundaries (either "priors" or "enigma') and list of dictionaries with variant data
-    Genome is a SequenceFileDB for genome and transcript is a pyhgvs transcript object)
+    Given variant, boundaries (either "priors" or "enigma') and protein priors indexed by getProteinPriorsIndex
+    Genome is a packed_resources.TwoBitGenome and transcript is a pyhgvs transcript object)
        both genome and transcript are necessary to convert from genomic to transcript coordinates
     Checks that variant is a single nucleotide substitution
     Determines prior prob dictionary based on variant location
@@ -3457,34 +3605,20 @@ def main():
 
     inputData = csv.DictReader(open(args.inputFile, "r"), delimiter="\t")
     fieldnames = inputData.fieldnames
-    newHeaders = ["varType", "varLoc", "applicablePrior", "applicableEnigmaClass", "proteinPrior", "refDonorPrior", "deNovoDonorPrior",
-                  "refRefDonorMES", "refRefDonorZ", "altRefDonorMES", "altRefDonorZ", "refRefDonorSeq", "altRefDonorSeq", "refDonorVarStart",
-                  "refDonorVarLength", "refDonorExonStart", "refDonorIntronStart", "refDeNovoDonorMES", "refDeNovoDonorZ", "altDeNovoDonorMES",
-                  "altDeNovoDonorZ", "refDeNovoDonorSeq", "altDeNovoDonorSeq", "deNovoDonorVarStart", "deNovoDonorVarLength",
-                  "deNovoDonorExonStart", "deNovoDonorIntronStart", "deNovoDonorGenomicSplicePos", "deNovoDonorTranscriptSplicePos",
-                  "closestDonorGenomicSplicePos", "closestDonorTranscriptSplicePos", "closestDonorRefMES", "closestDonorRefZ",
-                  "closestDonorRefSeq", "closestDonorAltMES", "closestDonorAltZ", "closestDonorAltSeq", "closestDonorExonStart",
-                  "closestDonorIntronStart", "deNovoDonorAltGreaterRefFlag", "deNovoDonorAltGreaterClosestRefFlag",
-                  "deNovoDonorAltGreaterClosestAltFlag", "deNovoDonorFrameshiftFlag", "refAccPrior", "deNovoAccPrior", "refRefAccMES",
-                  "refRefAccZ", "altRefAccMES", "altRefAccZ", "refRefAccSeq", "altRefAccSeq", "refAccVarStart", "refAccVarLength", "refAccExonStart",
-                  "refAccIntronStart", "refDeNovoAccMES", "refDeNovoAccZ", "altDeNovoAccMES", "altDeNovoAccZ", "refDeNovoAccSeq", "altDeNovoAccSeq",
-                  "deNovoAccVarStart", "deNovoAccVarLength", "deNovoAccExonStart", "deNovoAccIntronStart", "deNovoAccGenomicSplicePos",
-                  "deNovoAccTranscriptSplicePos", "closestAccGenomicSplicePos", "closestAccTranscriptSplicePos", "closestAccRefMES",
-                  "closestAccRefZ", "closestAccRefSeq", "closestAccAltMES", "closestAccAltZ", "closestAccAltSeq",
-                  "closestAccExonStart", "closestAccIntronStart", "deNovoAccAltGreaterRefFlag", "deNovoAccAltGreaterClosestRefFlag",
-                  "deNovoAccAltGreaterClosestAltFlag", "deNovoAccFrameshiftFlag", "spliceSite", "spliceRescue", "spliceFlag", "frameshiftFlag",
-                  "inExonicPortionFlag", "CIDomainInRegionFlag", "isDivisibleFlag", "lowMESFlag"]
+    newHeaders = ["varType", "varLoc"] + PRIOR_FIELDS
     for header in newHeaders:
         fieldnames.append(header)
     outputData = csv.DictWriter(open(args.outputFile, "w"), delimiter="\t", fieldnames=fieldnames)
     outputData.writerow(dict((fn,fn) for fn in inputData.fieldnames))
 
-    # read genome sequence
-    genome38 = SequenceFileDB(args.genomeFile)
+    # read genome sequence, also used for sequence lookups in place of UCSC
+    genome38 = packed_resources.open_genome(args.genomeFile)
+
+    # read protein priors once and index them by gene and HGVS
+    variantData = getProteinPriorsIndex(csv.DictReader(open(args.variantFile, "r"), delimiter="\t"))
 
     # read RefSeq transcripts
-    with open(args.transcriptFile) as infile:
-        transcripts = pyhgvs_utils.read_transcripts(infile)
+    transcripts = packed_resources.TranscriptIndex(args.transcriptFile)
 
     def get_transcript(name):
         return transcripts.get(name)
@@ -3494,7 +3628,6 @@ def main():
 
     totalVariants = 0
     for variant in inputData:
-        variantData = csv.DictReader(open(args.variantFile, "r"), delimiter="\t")
         if variant["Gene_Symbol"] == "BRCA1":
             varData = getVarData(variant, args.boundaries, variantData, genome38, brca1Transcript)
         elif variant["Gene_Symbol"] == "BRCA2":
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+'''
+calcVarPriorsBatch
+
+Library entry point for calcVarPriors that scores variants without reading or writing TSVs
+
+Takes an iterable of (gene, pos, ref, alt) tuples (hg38 genomic coordinates) and returns
+the prior probability fields from calcVarPriors as a columnar dictionary:
+    {"varType": [...], "varLoc": [...], "applicablePrior": [...], ...}
+with one list entry per input variant, in input order
+
+The VEP consequences of the variants can be given with them (e.g. from an earlier run), otherwise
+they are looked up with one Ensembl VEP POST request per calcVarPriors.VEP_POST_SIZE variants
+instead of a request per variant
+
+Shared resources (hg38 genome, RefSeq transcripts, MaxEntScan models, protein priors)
+are loaded lazily once per process by getPriorsResources
+'''
+
+import argparse
+import csv
+import pyhgvs
+import calcVarPriors
+from calcVarPriors import BRCA1_RefSeq, BRCA2_RefSeq, PRIOR_FIELDS, getProteinPriorsIndex, getVarData, \
+    getVarConsequencesBatch
+from calcMaxEntScanMeanStd import loadMaxEntScanModels
+import packed_resources
+
+RESULT_FIELDS = ["varType", "varLoc"] + PRIOR_FIELDS
+
+GENE_INFO = {"BRCA1": {"chrom": "17", "refSeq": BRCA1_RefSeq},
+             "BRCA2": {"chrom": "13", "refSeq": BRCA2_RefSeq}}
+
+# process wide PriorsResources, keyed by (genomeFile, transcriptFile, variantFile)
+priorsResources = {}
+
+
+class PriorsResources(object):
+    '''
+    Holds the shared data needed to calculate priors, each item is loaded on first use
+    genomeFile is an hg38 fasta, transcriptFile is a RefSeq hg38 genepred and
+    variantFile is a tsv containing protein priors (e.g. mod_res_dn_brca20160525.txt)
+    '''
+    def __init__(self, genomeFile, transcriptFile, variantFile):
+        self.genomeFile = genomeFile
+        self.transcriptFile = transcriptFile
+        self.variantFile = variantFile
+        self._genome = None
+        self._transcripts = None
+        self._proteinPriors = None
+
+    @property
+    def genome(self):
+        if self._genome is None:
+            self._genome = packed_resources.open_genome(self.genomeFile)
+        return self._genome
+
+    @property
+    def transcripts(self):
+        if self._transcripts is None:
+            self._transcripts = packed_resources.TranscriptIndex(self.transcriptFile)
+            # the transcript boundaries calcVarPriors uses come from the same genepred instead of UCSC
+            calcVarPriors.loadTranscriptData(self.transcriptFile)
+        return self._transcripts
+
+    @property
+    def proteinPriors(self):
+        if self._proteinPriors is None:
+            with open(self.variantFile, "r") as infile:
+                self._proteinPriors = getProteinPriorsIndex(csv.DictReader(infile, delimiter="\t"))
+        return self._proteinPriors
+
+    def getTranscript(self, gene):
+        return self.transcripts.get(GENE_INFO[gene]["refSeq"])
+
+    def load(self):
+        '''Loads all resources up front (e.g. before timing or forking worker processes)'''
+        self.genome
+        self.transcripts
+        self.proteinPriors
+        loadMaxEntScanModels()
+        return self
+
+
+def getPriorsResources(genomeFile, transcriptFile, variantFile):
+    '''
+    Returns the PriorsResources for the given files, creating it on the first call in this process
+    '''
+    key = (genomeFile, transcriptFile, variantFile)
+    if key not in priorsResources:
+        priorsResources[key] = PriorsResources(genomeFile, transcriptFile, variantFile)
+    return priorsResources[key]
+
+
+def makeVariant(gene, pos, ref, alt, resources):
+    '''
+    Given gene, hg38 genomic position, ref and alt alleles,
+    Returns a variant dictionary with the fields calcVarPriors reads from built.tsv
+    '''
+    if gene not in GENE_INFO:
+        raise ValueError("Unsupported gene %s, expected one of %s" % (gene, sorted(GENE_INFO.keys())))
+    info = GENE_INFO[gene]
+    pos = int(pos)
+    hgvsName = str(pyhgvs.format_hgvs_name("chr" + info["chrom"], pos, ref, alt, resources.genome,
+                                           resources.getTranscript(gene), use_gene=False, max_allele_length=100))
+    return {"Gene_Symbol": gene,
+            "Chr": info["chrom"],
+            "Pos": str(pos),
+            "Ref": ref,
+            "Alt": alt,
+            "Hg38_Start": str(pos),
+            "Hg38_End": str(pos + len(ref) - 1),
+            "Reference_Sequence": info["refSeq"],
+            "HGVS_cDNA": "-",
+            "pyhgvs_cDNA": hgvsName}
+
+
+def calcVarPriorsBatch(variants, resources, boundaries="enigma", consequences=None):
+    '''
+    Given an iterable of (gene, pos, ref, alt) tuples, a PriorsResources object,
+    boundaries (either "enigma" or "priors") and optionally a list of the VEP consequences
+    of the variants (e.g. "missense_variant"), which are looked up with getVarConsequencesBatch if not given
+    Returns a dictionary mapping each field in RESULT_FIELDS to a list of values, one per variant
+    '''
+    resources.load()
+    variants = [makeVariant(gene, pos, ref, alt, resources) for gene, pos, ref, alt in variants]
+    if consequences is None:
+        consequences = getVarConsequencesBatch(variants)
+    elif len(consequences) != len(variants):
+        raise ValueError("Got %d consequences for %d variants" % (len(consequences), len(variants)))
+    results = dict((field, []) for field in RESULT_FIELDS)
+    for variant, consequence in zip(variants, consequences):
+        variant["varConsequences"] = consequence
+        varData = getVarData(variant, boundaries, resources.proteinPriors, resources.genome,
+                             resources.getTranscript(variant["Gene_Symbol"]))
+        for field in RESULT_FIELDS:
+            results[field].append(varData[field])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', "--inputFile",
+                        help="tsv with gene, pos, ref and alt columns (hg38) and optionally a consequence column")
+    parser.add_argument('-o', "--outputFile", help="File where results will be output")
+    parser.add_argument('-v', "--variantFile", help="File containing protein priors for variants")
+    parser.add_argument('-b', "--boundaries", default="enigma",
+                        help="Specifies which boundaries ('enigma' or 'priors') to use for clinically important domains")
+    parser.add_argument('-g', "--genomeFile", help="Fasta file containing hg38 reference genome")
+    parser.add_argument('-t', "--transcriptFile", help="RefSeq annotation hg38-based genepred file")
+    args = parser.parse_args()
+
+    resources = getPriorsResources(args.genomeFile, args.transcriptFile, args.variantFile)
+    inputData = csv.DictReader(open(args.inputFile, "r"), delimiter="\t")
+    rows = list(inputData)
+    variants = [(row["gene"], row["pos"], row["ref"], row["alt"]) for row in rows]
+    # VEP consequences from the input, instead of looking them up
+    consequences = [row["consequence"] for row in rows] if "consequence" in inputData.fieldnames else None
+    results = calcVarPriorsBatch(variants, resources, boundaries=args.boundaries, consequences=consequences)
+
+    outputData = csv.writer(open(args.outputFile, "w"), delimiter="\t")
+    outputData.writerow(["gene", "pos", "ref", "alt"] + RESULT_FIELDS)
+    for index, variant in enumerate(variants):
+        outputData.writerow(list(variant) + [results[field][index] for field in RESULT_FIELDS])
+
+
+if __name__ == "__main__":
+    main()
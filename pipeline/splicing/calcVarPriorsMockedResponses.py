@@ -1,5 +1,7 @@
 '''Mocked responses for testing calcVarPriors.py'''
 
+import random
+
 # exon boundary data to mock responses for getExonBoundaries function for BRCA1 and BRCA2
 brca1Exons = {'exon1': {'exonEnd': 43125270,
                         'exonStart': 43125483},
@@ -384,3 +386,43 @@ variantData = [{'de_novo_prior': '0.02',
                 'gene': 'BRCA1',
                 'removesKeyDomain': 'Y',
                 'protein_prior': '0.02'}]
+
+# genomic extent of the synthetic genome, covering BRCA1 (chr17) and BRCA2 (chr13) with some flanking sequence
+GENOME_REGIONS = {"chr17": (43040000, 43130000),
+                  "chr13": (32310000, 32405000)}
+
+# transcript coordinates in genePred format, same values as the mocked ncbiRefSeq rows in test_calcVarPriors.py
+TRANSCRIPT_GENEPRED = [
+    ["0", "NM_007294.3", "chr17", "-", "43044294", "43125483", "43045677", "43124096", "23",
+     "43044294,43047642,43049120,43051062,43057051,43063332,43063873,43067607,43070927,43074330,43076487,43082403,"
+     "43090943,43091434,43095845,43097243,43099774,43104121,43104867,43106455,43115725,43124016,43125270,",
+     "43045802,43047703,43049194,43051117,43057135,43063373,43063951,43067695,43071238,43074521,43076614,43082575,"
+     "43091032,43094860,43095922,43097289,43099880,43104261,43104956,43106533,43115779,43124115,43125483,",
+     "0", "BRCA1", "cmpl", "cmpl", "1,0,1,0,0,1,1,0,1,2,1,0,1,1,2,1,0,1,2,2,2,0,-1,"],
+    ["0", "NM_000059.3", "chr13", "+", "32315479", "32399672", "32316460", "32398770", "27",
+     "32315479,32316421,32319076,32325075,32326100,32326241,32326498,32329442,32330918,32332271,32336264,32344557,"
+     "32346826,32354860,32356427,32357741,32362522,32363178,32370401,32370955,32376669,32379316,32379749,32380006,"
+     "32394688,32396897,32398161,",
+     "32315667,32316527,32319325,32325184,32326150,32326282,32326613,32329492,32331030,32333387,32341196,32344653,"
+     "32346896,32355288,32356609,32357929,32362693,32363533,32370557,32371100,32376791,32379515,32379913,32380145,"
+     "32394933,32397044,32399672,",
+     "0", "BRCA2", "cmpl", "cmpl", "-1,0,1,1,2,1,0,1,0,1,1,1,1,2,1,0,2,2,0,0,1,0,1,0,1,0,0,"]]
+
+
+class SyntheticSeq(object):
+    '''Sequence of one chromosome region, sliced by 0-based genomic coordinates'''
+    def __init__(self, sequence, offset):
+        self.sequence = sequence
+        self.offset = offset
+
+    def __getitem__(self, region):
+        return self.sequence[region.start - self.offset:region.stop - self.offset]
+
+
+class SyntheticGenome(dict):
+    '''Deterministic random genome for GENOME_REGIONS, used in place of an hg38 SequenceFileDB'''
+    def __init__(self, regions, seed=2018):
+        rng = random.Random(seed)
+        for chrom, (start, end) in sorted(regions.items()):
+            sequence = "".join(rng.choice("ACGT") for ii in xrange(end - start))
+            self[chrom] = SyntheticSeq(sequence, start)
@@ -2,7 +2,10 @@
 
 import argparse
 import csv
-from Bio.Seq import Seq
+import re
+import string
+import sys
+import time
 import pyhgvs as hgvs
 
 '''
@@ -10,38 +13,73 @@ checkVarHGVS
 
 Takes a tsv as input (usually built.tsv) and checks if the variant ref and alt alleles are consistent with the parsed HGVS_cDNA string for that variant
 
-Prints the total number of variants with inconsistencies
+Prints the total number of variants with inconsistencies and the number of variants checked per second
 
 Outputs a file that contains information for each inconsistent variant
 '''
 
+# complement of each IUPAC base, matching Bio.Seq reverse_complement
+REV_COMP_TABLE = string.maketrans("ACGTNRYKMSWBDHVacgtnrykmswbdhv", "TGCANYRMKSWVHDBtgcanyrmkswvhdb")
+
+# cDNA HGVS forms that make up nearly all variants: substitution, del, ins, dup and delins with explicit alleles
+# e.g. NM_000059.3:c.66A>T, c.*179delT, c.1017_1018insC, c.1008dupA, c.100_102delinsAT, c.100_102delACGinsT
+CDNA_POSITION = r"[-*]?\d+(?:[-+]\d+)?"
+HGVS_CDNA_RE = re.compile(r"^(?:[^:]*:)?c\.%s(?:_%s)?"
+                          r"(?:(?P<subRef>[ACGTN])>(?P<subAlt>[ACGTN])"
+                          r"|delins(?P<delinsAlt>[ACGTN]+)"
+                          r"|del(?P<delinsRef>[ACGTN]+)ins(?P<delinsRefAlt>[ACGTN]+)"
+                          r"|del(?P<delRef>[ACGTN]+)"
+                          r"|ins(?P<insAlt>[ACGTN]+)"
+                          r"|dup(?P<dupRef>[ACGTN]+))$" % (CDNA_POSITION, CDNA_POSITION))
+
 def getRevComp(sequence):
     '''Given a sequence returns the reverse complement'''
-    revCompDict = {"A": "T",
-                   "T": "A",
-                   "C": "G",
-                   "G": "C",
-                   "N": "N"}
-
-    if len(sequence) == 1:
-        revComp = revCompDict[sequence]
-    else:
-        revComp = str(Seq(sequence).reverse_complement())
+    return str(sequence).translate(REV_COMP_TABLE)[::-1]
 
-    return revComp
+
+def parseVarFast(variantHGVS):
+    '''
+    Parses the common cDNA HGVS forms with HGVS_CDNA_RE
+    Returns the same dictionary as parseVar, or None if variantHGVS is not one of those forms
+    '''
+    match = HGVS_CDNA_RE.match(variantHGVS)
+    if match is None:
+        return None
+    groups = match.groupdict()
+    if groups["subRef"] is not None:
+        varRef, varAlt, varType = groups["subRef"], groups["subAlt"], ">"
+    elif groups["delinsAlt"] is not None:
+        varRef, varAlt, varType = "", groups["delinsAlt"], "delins"
+    elif groups["delinsRef"] is not None:
+        varRef, varAlt, varType = groups["delinsRef"], groups["delinsRefAlt"], "delins"
+    elif groups["delRef"] is not None:
+        varRef, varAlt, varType = groups["delRef"], "", "del"
+    elif groups["insAlt"] is not None:
+        varRef, varAlt, varType = "", groups["insAlt"], "ins"
+    else:
+        varRef, varAlt, varType = groups["dupRef"], groups["dupRef"] * 2, "dup"
+    return {"typeHGVS": "c",
+            "varRef": varRef,
+            "varAlt": varAlt,
+            "varType": varType}
 
 
 def parseVar(variantHGVS):
     '''
     Parses the given variant HGVS and returns a dictionary containing: 
     HGVS type, variant type, ref allele, and alt allele
+    Common cDNA forms are parsed with a regular expression, anything else with pyhgvs
     ''' 
+    varParsed = parseVarFast(variantHGVS)
+    if varParsed is not None:
+        return varParsed
+
     varHGVS = hgvs.HGVSName(str(variantHGVS))
     
-    varParsed =  {"typeHGVS": varHGVS.kind,
-                  "varRef": varHGVS.ref_allele,
-                  "varAlt": varHGVS.alt_allele,
-                  "varType": varHGVS.mutation_type}
+    varParsed =  {"typeHGVS": str(varHGVS.kind),
+                  "varRef": str(varHGVS.ref_allele),
+                  "varAlt": str(varHGVS.alt_allele),
+                  "varType": str(varHGVS.mutation_type)}
     
     return varParsed
 
@@ -135,30 +173,46 @@ def checkVarHGVS(variant):
         
         return varData
             
+def checkVarsHGVS(variants):
+    '''
+    Given an iterable of variants, yields (variant, checkVarHGVS result) for each variant
+    Variants are processed one at a time so the input can be streamed from a file
+    '''
+    for variant in variants:
+        yield (variant, checkVarHGVS(variant))
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('-i', "--inputFile", help = "File with variant HGVS to be checked")
     parser.add_argument('-o', "--outputFile", help = "Output file that contains variants with inconsistent genomic and cDNA HGVS")
     args = parser.parse_args()
 
-    inputData = csv.DictReader(open(args.inputFile, "r"), delimiter="\t")
-    outputData = csv.writer(open(args.outputFile, "w"), delimiter="\t")
+    inputFile = open(args.inputFile, "r")
+    outputFile = open(args.outputFile, "w")
+    inputData = csv.DictReader(inputFile, delimiter="\t")
+    outputData = csv.writer(outputFile, delimiter="\t")
 
     headers = ["Gene_Symbol", "HGVS_cDNA", "varType", "genRef", "genAlt", "cDNARef", "cDNAAlt"]
     outputData.writerow(headers)
 
+    startTime = time.time()
+    totalVars = 0
     inconVars = 0
-    for variant in inputData:
-        checkVar = checkVarHGVS(variant)
+    for variant, checkVar in checkVarsHGVS(inputData):
+        totalVars += 1
         if checkVar == True:
             pass
         else:
             inconVars += 1
             outputData.writerow(checkVar)
+    elapsed = time.time() - startTime
     
     print "Number of inconsitent genomic and cDNA HGVS variants is:" + str(inconVars)
+    print >> sys.stderr, "Checked %d variants in %.2f seconds (%.0f variants/second)" % (
+        totalVars, elapsed, totalVars / elapsed if elapsed > 0 else 0)
 
-    outputData.close()
+    inputFile.close()
+    outputFile.close()
             
 if __name__ == "__main__":
     main()
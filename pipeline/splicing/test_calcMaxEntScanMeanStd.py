@@ -0,0 +1,98 @@
+import pytest
+import unittest
+import tempfile
+import calcMaxEntScanMeanStd
+
+class testCalcMaxEntScanMeanStd(unittest.TestCase):
+
+    def test_runMaxEntScanDonor(self):
+        '''Tests that donor scores match score5.pl output'''
+        self.assertEquals(calcMaxEntScanMeanStd.runMaxEntScan("CAGGTAAGT", donor=True), 10.86)
+        self.assertEquals(calcMaxEntScanMeanStd.runMaxEntScan("AAGGTGAGC", donor=True), 9.60)
+        self.assertEquals(calcMaxEntScanMeanStd.runMaxEntScan("ttggtatgt", donor=True), 7.12)
+
+    def test_runMaxEntScanAcceptor(self):
+        '''Tests that acceptor scores match score3.pl output'''
+        self.assertEquals(calcMaxEntScanMeanStd.runMaxEntScan("TTCCAAACGAACTTTTGTAGGGA", donor=False), 2.89)
+        self.assertEquals(calcMaxEntScanMeanStd.runMaxEntScan("CTCTTTTTTTTTCCTCTCAGGTA", donor=False), 12.06)
+
+    def test_runMaxEntScanInvalidBase(self):
+        '''Tests that sequences with non ACGT bases are rejected'''
+        with self.assertRaises(ValueError):
+            calcMaxEntScanMeanStd.runMaxEntScan("CAGGTNAGT", donor=True)
+
+    def test_runMaxEntScanBatch(self):
+        '''Tests that batch scores match single sequence scores'''
+        donors = ["CAGGTAAGT", "AAGGTGAGC", "TTGGTATGT"]
+        acceptors = ["TTCCAAACGAACTTTTGTAGGGA", "CTCTTTTTTTTTCCTCTCAGGTA"]
+        self.assertEquals(list(calcMaxEntScanMeanStd.runMaxEntScanBatch(donors, donor=True)),
+                          [calcMaxEntScanMeanStd.runMaxEntScan(seq, donor=True) for seq in donors])
+        self.assertEquals(list(calcMaxEntScanMeanStd.runMaxEntScanBatch(acceptors, donor=False)),
+                          [calcMaxEntScanMeanStd.runMaxEntScan(seq, donor=False) for seq in acceptors])
+
+    def test_runMaxEntScanBatchInvalid(self):
+        '''Tests that batches with a bad base or wrong length sequence are rejected'''
+        with self.assertRaises(ValueError):
+            calcMaxEntScanMeanStd.runMaxEntScanBatch(["CAGGTAAGT", "CAGGTNAGT"], donor=True)
+        with self.assertRaises(ValueError):
+            calcMaxEntScanMeanStd.runMaxEntScanBatch(["CAGGTAAGT", "CAGGTAAG"], donor=True)
+
+    def test_read_gene_coordinates(self):
+        '''Tests that genePred rows with and without the bin column are read like ncbiRefSeq rows'''
+        genePred = tempfile.NamedTemporaryFile(suffix=".gp")
+        genePred.write("585\tNM_TEST1.1\tchr1\t+\t10\t100\t20\t90\t2\t10,60,\t40,100,\t0\tTEST1\tcmpl\tcmpl\t0,1,\n")
+        genePred.write("NM_TEST2.1\tchr2\t-\t10\t100\t20\t90\t2\t10,60,\t40,100,\t0\tTEST2\tcmpl\tcmpl\t0,1,\n")
+        genePred.flush()
+        transcripts = calcMaxEntScanMeanStd.read_gene_coordinates(genePred.name)
+        self.assertEquals(sorted(transcripts.keys()), ["NM_TEST1.1", "NM_TEST2.1"])
+        self.assertEquals(transcripts["NM_TEST1.1"]["exonCount"], 2)
+        self.assertEquals(transcripts["NM_TEST1.1"]["exonStarts"], "10,60,")
+        self.assertEquals(transcripts["NM_TEST2.1"]["strand"], "-")
+        self.assertEquals(transcripts["NM_TEST2.1"]["name2"], "TEST2")
+        selected = calcMaxEntScanMeanStd.read_gene_coordinates(genePred.name, ["NM_TEST2.1"])
+        self.assertEquals(selected.keys(), ["NM_TEST2.1"])
+
+    def test_read_gene_coordinatesDuplicates(self):
+        '''Tests that a transcript on alt contigs is read from its primary assembly row, in either order,
+           and that conflicting rows on the primary assembly are an error'''
+        primary = "NM_TEST1.1\tchr17\t+\t10\t100\t20\t90\t2\t10,60,\t40,100,\t0\tTEST1\tcmpl\tcmpl\t0,1,\n"
+        alt = "NM_TEST1.1\tchr17_KI270909v1_alt\t+\t5\t95\t15\t85\t2\t5,55,\t35,95,\t0\tTEST1\tcmpl\tcmpl\t0,1,\n"
+        for rows in [[primary, alt], [alt, primary], [primary, primary]]:
+            genePred = tempfile.NamedTemporaryFile(suffix=".gp")
+            genePred.write("".join(rows))
+            genePred.flush()
+            transcript = calcMaxEntScanMeanStd.read_gene_coordinates(genePred.name)["NM_TEST1.1"]
+            self.assertEquals((transcript["chrom"], transcript["txStart"]), ("chr17", 10))
+
+        genePred = tempfile.NamedTemporaryFile(suffix=".gp")
+        genePred.write(primary + primary.replace("\t10\t100\t", "\t11\t100\t"))
+        genePred.flush()
+        with self.assertRaises(ValueError):
+            calcMaxEntScanMeanStd.read_gene_coordinates(genePred.name)
+
+    def test_calcMeanStd(self):
+        '''Tests that interior splice sites are taken from the genome on the transcript strand'''
+        donorSeq = "CAGGTAAGT"
+        acceptorSeq = "TTCCAAACGAACTTTTGTAGGGA"
+        # exon 1 ends at 40 so the donor is at 38-46, exon 2 starts after 100 so the acceptor is at 81-103
+        chrom = "A" * 37 + donorSeq + "A" * 34 + acceptorSeq + "A" * 97
+        genome = {"chr1": chrom}
+        transcript = {"chrom": "chr1", "strand": "+", "exonCount": 2,
+                      "exonStarts": "0,100,", "exonEnds": "40,200,"}
+        results = calcMaxEntScanMeanStd.calcMeanStd([transcript], genome)
+        self.assertEquals(results["donors"]["mean"], 10.86)
+        self.assertEquals(results["donors"]["std"], 0.0)
+        self.assertEquals(results["acceptors"]["mean"], 2.89)
+        self.assertEquals(results["acceptors"]["std"], 0.0)
+
+    def test_getSpliceSiteSeqsSingleExon(self):
+        '''Tests that the end of a single exon transcript is scored as a donor, as before the batch scoring'''
+        donorSeq = "CAGGTAAGT"
+        genome = {"chr1": "A" * 37 + donorSeq + "A" * 34}
+        transcript = {"chrom": "chr1", "strand": "+", "exonCount": 1, "exonStarts": "0", "exonEnds": "40"}
+        self.assertEquals(calcMaxEntScanMeanStd.getSpliceSiteSeqsForTranscript(genome, transcript), ([donorSeq], []))
+
+    def test_getSpliceSiteSeqMinusStrand(self):
+        '''Tests that minus strand splice sites are reverse complemented'''
+        genome = {"chr1": "NNNN" + "ACTTACCTG" + "NNNN"}
+        self.assertEquals(calcMaxEntScanMeanStd.getSpliceSiteSeq(genome, "chr1", "-", 10, donor=True), "CAGGTAAGT")
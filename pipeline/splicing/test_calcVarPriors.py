@@ -7,7 +7,10 @@ import calcMaxEntScanMeanStd
 from calcVarPriorsMockedResponses import brca1Exons, brca2Exons 
 from calcVarPriorsMockedResponses import brca1RefSpliceDonorBounds, brca2RefSpliceDonorBounds 
 from calcVarPriorsMockedResponses import brca1RefSpliceAcceptorBounds, brca2RefSpliceAcceptorBounds
-from calcVarPriorsMockedResponses import variantData
+import calcVarPriorsMockedResponses
+
+# protein priors, indexed as calcVarPriors.main reads them
+variantData = calcVarPriors.getProteinPriorsIndex(calcVarPriorsMockedResponses.variantData)
 
 # fill in argument for genome
 GENOME = "hg38"
@@ -1661,6 +1664,35 @@ class test_calcVarPriors(unittest.TestCase):
         self.assertEquals(refAltSeqs["refSeq"], brca2RefSeq)
         self.assertEquals(refAltSeqs["altSeq"], brca2AltSeq)
 
+    def test_SeqWindow(self):
+        '''Tests that SeqWindow indexes by genomic position and returns strand specific sequence'''
+        window = calcVarPriors.SeqWindow(brca1Seq, 43051115)
+        self.assertEquals(window[43051115], brca1Seq[0])
+        self.assertEquals(window[43051137], brca1Seq[-1])
+        self.assertEquals(len(window), len(brca1Seq))
+        self.assertFalse(43051138 in window)
+        with self.assertRaises(KeyError):
+            window[43051114]
+        self.assertEquals(window.getSeq("+"), brca1Seq)
+        self.assertEquals(window.getSeq("-"), "CTCTTCCTCTCTTCTTCCAGATC")
+
+    def test_SeqWindowCopy(self):
+        '''Tests that substituting a base in a copy of a SeqWindow leaves the original unchanged'''
+        window = calcVarPriors.SeqWindow(brca2Seq, 32370936)
+        altWindow = window.copy()
+        altWindow[32370944] = "C"
+        self.assertEquals(window.getSeq("+"), brca2Seq)
+        self.assertEquals(altWindow.getSeq("+"), "TGTGTAACCCATTATTACAGTGG")
+
+    def test_SeqWindowMultiBaseAlt(self):
+        '''Tests that a multi-base alt allele is inserted at its position without overwriting the following bases'''
+        window = calcVarPriors.SeqWindow(brca2Seq, 32370936)
+        variant = {"Ref": "A", "Alt": "ACT", "Pos": "32370944"}
+        altWindow = calcVarPriors.getAltSeqDict(variant, window)
+        self.assertEquals(window.getSeq("+"), brca2Seq)
+        self.assertEquals(altWindow.getSeq("+"), "TGTGTAACACTCATTATTACAGTGG")
+        self.assertEquals(altWindow.getSeq("-"), calcVarPriors.reverseComplement("TGTGTAACACTCATTATTACAGTGG"))
+
     def test_getVarSeqIndexSNSDiffLengths(self):
         '''Tests that function returns "N/A" for ref and alt seqs of different lengths'''
         refSeq = "ACTGTACTC"
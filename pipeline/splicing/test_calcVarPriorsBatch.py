@@ -0,0 +1,145 @@
+import pytest
+import unittest
+import tempfile
+import shutil
+import csv
+import re
+import mock
+from os import path
+import calcVarPriors
+import calcVarPriorsBatch
+import calcVarPriorsMockedResponses
+from calcVarPriorsMockedResponses import GENOME_REGIONS, TRANSCRIPT_GENEPRED, SyntheticGenome
+
+# VEP consequences of the test variants on the canonical transcripts, by hg38 position
+CONSEQUENCES = {43104122: "splice_donor_variant",
+                43082500: "missense_variant",
+                43094000: "stop_gained",
+                43095300: "intron_variant",
+                43124100: "5_prime_UTR_variant",
+                32356609: "splice_donor_variant",
+                32363200: "stop_gained",
+                32330000: "intron_variant"}
+
+
+def vepOutput(chrom, pos):
+    transcript = {"17": calcVarPriors.BRCA1_CANONICAL, "13": calcVarPriors.BRCA2_CANONICAL}[chrom]
+    return {"transcript_consequences": [{"transcript_id": "ENST00000000001", "consequence_terms": ["intron_variant"]},
+                                        {"transcript_id": transcript, "consequence_terms": [CONSEQUENCES[pos]]}]}
+
+
+def vepGet(url):
+    '''Mocked Ensembl VEP region GET request'''
+    chrom, pos = re.search("/region/([0-9]+):([0-9]+)-", url).groups()
+    return [vepOutput(chrom, int(pos))]
+
+
+def vepPost(url, data):
+    '''Mocked Ensembl VEP region POST request'''
+    outputs = []
+    for query in data["variants"]:
+        chrom, pos = query.split(" ")[:2]
+        outputs.append(dict(vepOutput(chrom, int(pos)), input=query))
+    return list(reversed(outputs))
+
+
+class testCalcVarPriorsBatch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.genome = SyntheticGenome(GENOME_REGIONS)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        transcriptFile = path.join(self.tmp_dir, "hg38.refGene.txt")
+        with open(transcriptFile, "w") as f:
+            f.write("".join("\t".join(row) + "\n" for row in TRANSCRIPT_GENEPRED))
+        variantFile = path.join(self.tmp_dir, "proteinPriors.tsv")
+        with open(variantFile, "w") as f:
+            fieldnames = sorted(calcVarPriorsMockedResponses.variantData[0].keys())
+            writer = csv.DictWriter(f, delimiter="\t", fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(calcVarPriorsMockedResponses.variantData)
+
+        # the genome is opened and the transcript data loaded by the resources of each test
+        patches = [mock.patch("packed_resources.open_genome", return_value=self.genome),
+                   mock.patch.dict(calcVarPriors.brcaTranscriptData, clear=True)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.resources = calcVarPriorsBatch.PriorsResources(path.join(self.tmp_dir, "hg38.fa"), transcriptFile,
+                                                            variantFile)
+        self.variants = [self.substitution(gene, pos) for gene, pos in [
+            ("BRCA1", 43104122), ("BRCA1", 43082500), ("BRCA1", 43094000), ("BRCA1", 43095300),
+            ("BRCA1", 43124100), ("BRCA2", 32356609), ("BRCA2", 32363200), ("BRCA2", 32330000)]]
+        # an insertion and a substitution to an ambiguous base, which VEP isn't asked about
+        self.variants += [("BRCA2", 32363200, self.variants[-2][2], self.variants[-2][2] + "T"),
+                          ("BRCA1", 43082500, self.variants[1][2], "N")]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def substitution(self, gene, pos):
+        '''The variant at pos with the genome base as ref allele and another base as alt allele'''
+        ref = self.genome[{"BRCA1": "chr17", "BRCA2": "chr13"}[gene]][pos - 1:pos]
+        return (gene, pos, ref, "ACGT"["ACGT".index(ref) - 1])
+
+    def test_makeVariant(self):
+        gene, pos, ref, alt = self.variants[1]
+        variant = calcVarPriorsBatch.makeVariant(gene, pos, ref, alt, self.resources)
+        self.assertEquals(dict((field, variant[field]) for field in ["Chr", "Pos", "Hg38_Start", "Hg38_End",
+                                                                     "Reference_Sequence"]),
+                          {"Chr": "17", "Pos": str(pos), "Hg38_Start": str(pos), "Hg38_End": str(pos),
+                           "Reference_Sequence": calcVarPriors.BRCA1_RefSeq})
+        self.assertTrue(variant["pyhgvs_cDNA"].startswith(calcVarPriors.BRCA1_RefSeq + ":c."))
+        self.assertEquals(calcVarPriors.getVarLocation(variant, "enigma"), "exon_variant")
+
+        insertion = calcVarPriorsBatch.makeVariant(*self.variants[-2] + (self.resources,))
+        self.assertEquals((insertion["Hg38_Start"], insertion["Hg38_End"]), ("32363200", "32363200"))
+        self.assertEquals(calcVarPriors.getVarType(insertion), "insertion")
+
+        with self.assertRaises(ValueError):
+            calcVarPriorsBatch.makeVariant("TP53", 7676154, "G", "C", self.resources)
+
+    @mock.patch("calcVarPriors._make_request", side_effect=vepGet)
+    @mock.patch("calcVarPriors._make_post_request", side_effect=vepPost)
+    def test_calcVarPriorsBatch(self, post, get):
+        # scored one variant at a time, with a VEP request per consequence lookup
+        expected = dict((field, []) for field in calcVarPriorsBatch.RESULT_FIELDS)
+        for gene, pos, ref, alt in self.variants:
+            self.resources.load()
+            varData = calcVarPriors.getVarData(calcVarPriorsBatch.makeVariant(gene, pos, ref, alt, self.resources),
+                                               "enigma", self.resources.proteinPriors, self.resources.genome,
+                                               self.resources.getTranscript(gene))
+            for field in calcVarPriorsBatch.RESULT_FIELDS:
+                expected[field].append(varData[field])
+        self.assertTrue(get.called)
+        self.assertFalse(post.called)
+        get.reset_mock()
+
+        with mock.patch("calcVarPriors.VEP_POST_SIZE", 3):
+            results = calcVarPriorsBatch.calcVarPriorsBatch(self.variants, self.resources, "enigma")
+        self.assertEquals(results, expected)
+        self.assertFalse(get.called)
+        # the variants VEP can annotate, 3 per request
+        self.assertEquals([len(call[0][1]["variants"]) for call in post.call_args_list], [3, 3, 3])
+        self.assertEquals(post.call_args_list[0][0][1]["variants"][0], "17 43104122 43104122 %s/%s +" %
+                          self.variants[0][2:])
+        self.assertEquals(results["varLoc"][:5], ["splice_donor_variant", "exon_variant", "exon_variant",
+                                                  "intron_variant", "UTR_variant"])
+        self.assertEquals(results["varType"][-2:], ["insertion", "substitution"])
+        self.assertEquals(results["applicablePrior"][-2:], ["-", "-"])
+        post.reset_mock()
+
+        # with the consequences given, VEP isn't queried
+        consequences = calcVarPriors.getVarConsequencesBatch(
+            [calcVarPriorsBatch.makeVariant(gene, pos, ref, alt, self.resources)
+             for gene, pos, ref, alt in self.variants])
+        self.assertEquals(consequences[-2:], ["stop_gained", "unable_to_determine"])
+        post.reset_mock()
+        self.assertEquals(calcVarPriorsBatch.calcVarPriorsBatch(self.variants, self.resources, "enigma",
+                                                                consequences), expected)
+        self.assertFalse(post.called or get.called)
+
+        with self.assertRaises(ValueError):
+            calcVarPriorsBatch.calcVarPriorsBatch(self.variants, self.resources, "enigma", consequences[1:])
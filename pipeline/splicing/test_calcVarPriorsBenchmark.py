@@ -0,0 +1,172 @@
+'''
+Benchmarks for the calcVarPriors prior category functions
+
+Each benchmark scores a fixed panel of variants through one prior category function with the
+network lookups replaced by local data:
+  - genomic sequence comes from a deterministic synthetic genome (SyntheticGenome), passed as the
+    genome argument and used for the pyhgvs transcript coordinate conversions
+  - transcript coordinates are the mocked ncbiRefSeq rows from test_calcVarPriors.py, protein priors
+    come from calcVarPriorsMockedResponses and VEP consequences are mocked with mock.patch
+
+Each benchmark also checks the priors, classes and MaxEntScan scores it computed for its panel.
+
+Run the benchmarks alone and compare against the baseline checked in under benchmarks/ with e.g.:
+    pytest splicing/test_calcVarPriorsBenchmark.py --benchmark-storage=benchmarks \
+        --benchmark-compare=0001_baseline --benchmark-compare-fail=min:25%
+which fails if any benchmark's fastest round regresses by more than 25% (min is less noisy than mean)
+Use --benchmark-skip to leave them out of a regular test run
+'''
+
+import StringIO
+import mock
+import pytest
+pytest.importorskip("pytest_benchmark")
+import pyhgvs.utils as pyhgvs_utils
+import calcVarPriors
+from calcVarPriors import STD_EXONIC_PORTION
+import calcMaxEntScanMeanStd
+import calcVarPriorsMockedResponses
+from calcVarPriorsMockedResponses import GENOME_REGIONS, TRANSCRIPT_GENEPRED, SyntheticGenome
+
+BOUNDARIES = "enigma"
+
+variantData = calcVarPriors.getProteinPriorsIndex(calcVarPriorsMockedResponses.variantData)
+
+# variant panels (gene, hg38 position) for each prior category
+SPLICE_DONOR_PANEL = [("BRCA1", 43104122), ("BRCA1", 43104120), ("BRCA2", 32356609), ("BRCA2", 32356612)]
+EXON_PANEL = [("BRCA1", 43082500), ("BRCA1", 43094000), ("BRCA2", 32363200), ("BRCA2", 32340000)]
+INTRON_PANEL = [("BRCA1", 43095300), ("BRCA1", 43080000), ("BRCA2", 32330000), ("BRCA2", 32360000)]
+UTR_PANEL = [("BRCA1", 43124100), ("BRCA1", 43045000), ("BRCA2", 32316440), ("BRCA2", 32399000)]
+
+# fields of the prior category results checked for each panel, and their values on the synthetic genome
+SPLICE_DONOR_FIELDS = ["applicablePrior", "applicableEnigmaClass", "refDonorPrior", "deNovoDonorPrior",
+                       "refRefDonorMES", "altRefDonorMES"]
+SPLICE_DONOR_RESULTS = [("-", "class_5", 0.04, 0.3, -23.66, -15.03),
+                        (0.97, "class_4", 0.97, 0.3, -23.66, -31.84),
+                        ("-", "class_5", 0.97, 0.3, -26.2, -42.5),
+                        (0.3, "class_3", 0.04, 0.3, -26.2, -14.85)]
+DE_NOVO_DONOR_FIELDS = ["priorProb", "enigmaClass", "refMaxEntScanScore", "altMaxEntScanScore"]
+DE_NOVO_DONOR_RESULTS = [(0.02, "class_2", -7.41, 0.53),
+                         (0.3, "class_3", 6.63, 2.77),
+                         (0.02, "class_2", -4.05, -9.45),
+                         (0.02, "class_2", 2.27, -2.17)]
+EXON_FIELDS = ["applicablePrior", "applicableEnigmaClass", "proteinPrior", "deNovoDonorPrior"]
+EXON_RESULTS = [("-", "class_5", "-", 0.02),
+                ("-", "class_5", "-", 0.3),
+                ("-", "class_5", "-", 0.02),
+                ("-", "class_5", "-", 0.02)]
+INTRON_FIELDS = ["applicablePrior", "applicableEnigmaClass", "spliceFlag", "altDeNovoDonorMES"]
+INTRON_RESULTS = [("N/A", "N/A", 1, -0.72),
+                  ("N/A", "N/A", 1, -6.33),
+                  ("N/A", "N/A", 1, -9.68),
+                  ("N/A", "N/A", 1, -13.38)]
+UTR_FIELDS = ["applicablePrior", "applicableEnigmaClass", "deNovoDonorPrior", "altDeNovoDonorMES"]
+UTR_RESULTS = [(0.3, "class_3", 0.3, -0.37),
+               ("N/A", "N/A", "N/A", "N/A"),
+               (0.3, "class_3", 0.3, 0.88),
+               ("N/A", "N/A", "N/A", "N/A")]
+
+
+def makeVariant(genome, gene, pos):
+    '''Returns a variant at pos with the genome base as ref allele and the next base as alt allele'''
+    chrom = {"BRCA1": "17", "BRCA2": "13"}[gene]
+    ref = genome["chr" + chrom][pos - 1:pos]
+    alt = "ACGT"["ACGT".index(ref) - 1]
+    return {"Gene_Symbol": gene,
+            "Chr": chrom,
+            "Pos": str(pos),
+            "Ref": ref,
+            "Alt": alt,
+            "Hg38_Start": str(pos),
+            "Hg38_End": str(pos),
+            "Reference_Sequence": {"BRCA1": calcVarPriors.BRCA1_RefSeq, "BRCA2": calcVarPriors.BRCA2_RefSeq}[gene],
+            "HGVS_cDNA": "-",
+            "pyhgvs_cDNA": "-"}
+
+
+def resultFields(results, fields):
+    return [tuple(result[field] for field in fields) for result in results]
+
+
+@pytest.fixture(scope="module")
+def genome():
+    return SyntheticGenome(GENOME_REGIONS)
+
+
+@pytest.fixture(scope="module")
+def transcripts():
+    # pyhgvs expects the leading bin column
+    genePred = StringIO.StringIO("".join("\t".join(row) + "\n" for row in TRANSCRIPT_GENEPRED))
+    transcriptData = pyhgvs_utils.read_transcripts(genePred)
+    return {"BRCA1": transcriptData["NM_007294.3"],
+            "BRCA2": transcriptData["NM_000059.3"]}
+
+
+@pytest.fixture(autouse=True)
+def localData():
+    '''Replaces the transcript data lookups with the mocked transcript rows'''
+    transcriptData = dict((row[1], dict(zip(calcMaxEntScanMeanStd.GENEPRED_FIELDS, row)))
+                          for row in TRANSCRIPT_GENEPRED)
+    for transcript in transcriptData.values():
+        for field in calcMaxEntScanMeanStd.GENEPRED_INT_FIELDS:
+            transcript[field] = int(transcript[field])
+    with mock.patch.dict(calcVarPriors.brcaTranscriptData, transcriptData):
+        yield
+
+
+@mock.patch("calcVarPriors.getVarConsequences", return_value="splice_donor_variant")
+def test_benchmarkSpliceDonorSNS(getVarConsequences, benchmark, genome, transcripts):
+    variants = [makeVariant(genome, gene, pos) for gene, pos in SPLICE_DONOR_PANEL]
+    for variant in variants:
+        assert calcVarPriors.getVarLocation(variant, BOUNDARIES) in ["splice_donor_variant", "CI_splice_donor_variant"]
+    benchmark.extra_info["variants"] = len(variants)
+    results = benchmark(lambda: [calcVarPriors.getPriorProbSpliceDonorSNS(variant, BOUNDARIES, variantData, genome,
+                                                                          transcripts[variant["Gene_Symbol"]])
+                                 for variant in variants])
+    assert resultFields(results, SPLICE_DONOR_FIELDS) == SPLICE_DONOR_RESULTS
+
+
+@mock.patch("calcVarPriors.getVarConsequences", return_value="missense_variant")
+def test_benchmarkDeNovoDonorSNS(getVarConsequences, benchmark, genome, transcripts):
+    variants = [makeVariant(genome, gene, pos) for gene, pos in EXON_PANEL]
+    benchmark.extra_info["variants"] = len(variants)
+    results = benchmark(lambda: [calcVarPriors.getPriorProbDeNovoDonorSNS(variant, BOUNDARIES, STD_EXONIC_PORTION, genome,
+                                                                          transcripts[variant["Gene_Symbol"]])
+                                 for variant in variants])
+    assert resultFields(results, DE_NOVO_DONOR_FIELDS) == DE_NOVO_DONOR_RESULTS
+
+
+@mock.patch("calcVarPriors.getVarConsequences", return_value="missense_variant")
+def test_benchmarkInExonSNS(getVarConsequences, benchmark, genome, transcripts):
+    variants = [makeVariant(genome, gene, pos) for gene, pos in EXON_PANEL]
+    for variant in variants:
+        assert calcVarPriors.getVarLocation(variant, BOUNDARIES) in ["exon_variant", "CI_domain_variant"]
+    benchmark.extra_info["variants"] = len(variants)
+    results = benchmark(lambda: [calcVarPriors.getPriorProbInExonSNS(variant, BOUNDARIES, variantData, genome,
+                                                                     transcripts[variant["Gene_Symbol"]])
+                                 for variant in variants])
+    assert resultFields(results, EXON_FIELDS) == EXON_RESULTS
+
+
+@mock.patch("calcVarPriors.getVarConsequences", return_value="intron_variant")
+def test_benchmarkInIntronSNS(getVarConsequences, benchmark, genome, transcripts):
+    variants = [makeVariant(genome, gene, pos) for gene, pos in INTRON_PANEL]
+    for variant in variants:
+        assert calcVarPriors.getVarLocation(variant, BOUNDARIES) == "intron_variant"
+    benchmark.extra_info["variants"] = len(variants)
+    results = benchmark(lambda: [calcVarPriors.getPriorProbInIntronSNS(variant, BOUNDARIES, genome,
+                                                                       transcripts[variant["Gene_Symbol"]])
+                                 for variant in variants])
+    assert resultFields(results, INTRON_FIELDS) == INTRON_RESULTS
+
+
+@mock.patch("calcVarPriors.getVarConsequences", return_value="5_prime_UTR_variant")
+def test_benchmarkInUTRSNS(getVarConsequences, benchmark, genome, transcripts):
+    variants = [makeVariant(genome, gene, pos) for gene, pos in UTR_PANEL]
+    for variant in variants:
+        assert calcVarPriors.getVarLocation(variant, BOUNDARIES) == "UTR_variant"
+    benchmark.extra_info["variants"] = len(variants)
+    results = benchmark(lambda: [calcVarPriors.getPriorProbInUTRSNS(variant, BOUNDARIES, genome,
+                                                                    transcripts[variant["Gene_Symbol"]])
+                                 for variant in variants])
+    assert resultFields(results, UTR_FIELDS) == UTR_RESULTS
@@ -1,5 +1,6 @@
 import pytest
 import unittest
+import pyhgvs as hgvs
 import checkVarHGVS
 
 class testCheckVarHGVS(unittest.TestCase):
@@ -294,3 +295,32 @@ class testCheckVarHGVS(unittest.TestCase):
         self.varBRCA2["Alt"] = "GTCA"
         checkVar = checkVarHGVS.checkVarHGVS(self.varBRCA2)
         self.assertNotEqual(True, checkVar)
+
+    def test_parseVarFast(self):
+        '''Tests that the common HGVS forms are parsed the same as pyhgvs'''
+        for varHGVS in ["NM_007294.3:c.5485G>A", "NM_007294.3:c.*179delT", "NM_007294.3:c.-19-85_-19-81delCTTTA",
+                        "NM_007294.3:c.1017_1018insC", "NM_007294.3:c.1008_1010dupACG", "NM_000059.3:c.100_102delinsAT",
+                        "NM_000059.3:c.1232_1242delTACCCCTATTGinsACAT", "NM_000059.3(BRCA2):c.100+1G>T"]:
+            varHGVS_pyhgvs = hgvs.HGVSName(varHGVS)
+            self.assertEquals(checkVarHGVS.parseVarFast(varHGVS),
+                              {"typeHGVS": varHGVS_pyhgvs.kind,
+                               "varRef": varHGVS_pyhgvs.ref_allele,
+                               "varAlt": varHGVS_pyhgvs.alt_allele,
+                               "varType": varHGVS_pyhgvs.mutation_type})
+
+    def test_parseVarFallback(self):
+        '''Tests that forms without explicit alleles are left to pyhgvs'''
+        self.assertEquals(checkVarHGVS.parseVarFast("NM_000059.3:c.100_102del"), None)
+        self.assertEquals(checkVarHGVS.parseVarFast("NM_000059.3:c.100_102del3"), None)
+        varParsed = checkVarHGVS.parseVar("NM_000059.3:c.100_102del3")
+        self.assertEquals(varParsed["varType"], "del")
+        self.assertEquals(varParsed["varRef"], "NNN")
+
+    def test_checkVarsHGVS(self):
+        '''Tests that checkVarsHGVS yields a result for each variant in order'''
+        self.varBRCA2["Ref"] = "T"
+        results = list(checkVarHGVS.checkVarsHGVS([self.varBRCA1, self.varBRCA2]))
+        self.assertEquals(len(results), 2)
+        self.assertIs(results[0][0], self.varBRCA1)
+        self.assertTrue(results[0][1] == True)
+        self.assertNotEqual(True, results[1][1])
@@ -1,17 +1,33 @@
 #!/usr/bin/env python
 import argparse
+import cStringIO
 import csv
+import heapq
+import itertools
 import re
 import json
 import logging
+import marshal
+import multiprocessing
+import operator
+import os
+import shutil
+import tempfile
 from math import floor, log10
 
+import release_table
+
 added_data = None
 diff = None
 total_variants_with_changes = 0
 total_variants_with_additions = 0
 diff_json = {}
 reports = False
+# Keeps the log records of a diff worker process
+logBuffer = None
+
+# Rows of a release that are sorted in memory, larger releases are sorted in temporary files
+SORT_CHUNK_SIZE = 100000
 
 # Change types as used in the DB to signify changes to variants between versions
 CHANGE_TYPES = {
@@ -82,16 +98,157 @@ EXAC_AF_FIELDS = [
 ]
 
 
+# Columns that compareRow doesn't compare
+# Uncomment if using old data schema (e.g. pre pyhgvs_Genomic_Coordinate_38)
+COLUMNS_TO_IGNORE = frozenset(["change_type", "Assertion_method_citation_ENIGMA", "Genomic_Coordinate_hg36",
+                               "Genomic_Coordinate_hg37", "Genomic_Coordinate_hg38", "HGVS_cDNA", "HGVS_Protein",
+                               "Hg37_Start", "Hg37_End", "Hg36_Start", "Hg36_End", "BX_ID_ENIGMA", "BX_ID_ClinVar",
+                               "BX_ID_BIC", "BX_ID_ExAC", "BX_ID_LOVD", "BX_ID_exLOVD", "BX_ID_1000_Genomes",
+                               "BX_ID_ESP", "Polyphen_Prediction", "Polyphen_Score", "Minor_allele_frequency_ESP",
+                               "Max_Allele_Frequency", "mupit_structure"])
+
+# Normalized values of these columns are memoized: they're lists of submitters, methods, sources etc.
+# with few distinct values. Each column keeps at most MEMOIZED_VALUES of them, the memo of a column
+# with more distinct values is cleared when it is full
+MEMOIZED_COLUMNS = frozenset(LIST_KEYS)
+MEMOIZED_VALUES = 4096
+
+HGVS_PROTEIN_PATTERNS = [(re.compile("p."), "p.("),
+                         (re.compile("$"), ")"),
+                         (re.compile(".p."), ":p.")]
+SIFT_PREDICTION_PATTERN = re.compile("\(*$")
+EMPTY_PATTERN = re.compile("")
+TWO_DIGIT_YEAR_PATTERN = re.compile("/15$")
+
+
+def normalizeSubmitters(value):
+    # Nagging trailing underscore and other random disparities...
+    value = value.replace("Invitae_", "Invitae")
+    value = value.replace("The_Consortium_of_Investigators_of_Modifiers_of_BRCA1/2_(CIMBA)", "Consortium_of_Investigators_of_Modifiers_of_BRCA1/2_(CIMBA)")
+    value = value.replace("_c/o_University_of_Cambridge", "c/o_University_of_Cambridge")
+    return value.replace("LabCorp", "Laboratory_Corporation_of_America")
+
+
+def normalizeHGVSProtein(value):
+    # overlook the following:
+    # - version numbers being provided in the new but not old accession
+    # - the addition of parentheses as delimiters
+    # - colons as delimiters before the 'p'
+    value = value.replace("NM_000059", "NP_000050.2")
+    for pattern, replacement in HGVS_PROTEIN_PATTERNS:
+        value = pattern.sub(replacement, value)
+    return value
+
+
+def normalizeReferenceSequence(value):
+    # Handle reference sequence is accessions
+    return value.replace("NM_007294", "NM_007294.3").replace("NM_000059", "NM_000059.3")
+
+
+def normalizeAlleleFrequency(value):
+    if 'ExAC' not in value:
+        return value
+    # Ensure value is rounded to 3 sig figs
+    value_source_list = value.split(' ', 1)
+    val = value_source_list[0]
+    source_string = value_source_list[1]
+    val = str(round_sigfigs(float(val), 3))
+    value = val + ' ' + source_string
+    # (ExAC) was changed to (ExAC minus TCGA)
+    return value.replace("(ExAC)", "(ExAC minus TCGA)")
+
+
+def normalizeSiftPrediction(value):
+    # for sift predictions, some data combines the
+    # numerical and categorical scores
+    return SIFT_PREDICTION_PATTERN.sub("", value)
+
+
+def normalizeCitationsENIGMA(value):
+    # In some data, empty fields are indicated by a single hyphen
+    return EMPTY_PATTERN.sub("-", value)
+
+
+def normalizeDateLastEvaluatedENIGMA(value):
+    # Some dates had two-digit years. Some have four digits.
+    return TWO_DIGIT_YEAR_PATTERN.sub("/2015", value)
+
+
+def normalizePathogenicityExpert(value):
+    # Updated wording for non-expert-reviewed...
+    return value.replace("Not Yet Classified", "Not Yet Reviewed")
+
+
+FIELD_NORMALIZERS = {
+    "Submitter_ClinVar": normalizeSubmitters,
+    "HGVS_Protein": normalizeHGVSProtein,
+    "Reference_Sequence": normalizeReferenceSequence,
+    "Allele_Frequency": normalizeAlleleFrequency,
+    "Sift_Prediction": normalizeSiftPrediction,
+    "Clinical_significance_citations_ENIGMA": normalizeCitationsENIGMA,
+    "Date_last_evaluated_ENIGMA": normalizeDateLastEvaluatedENIGMA,
+    "Pathogenicity_expert": normalizePathogenicityExpert
+}
+
+
+def fieldNormalizer(field):
+    """
+    Returns a function that normalizes the values of a field for comparison: blank values become
+    dashes, leading and trailing commas and whitespace are dropped, and the field's own
+    normalization (FIELD_NORMALIZERS, rounding of ExAC allele frequencies) is applied. Values
+    that need no changes are returned as they are
+    """
+    fieldNormalization = FIELD_NORMALIZERS.get(field)
+    roundsFrequency = field in EXAC_AF_FIELDS
+
+    def normalize(value):
+        # Replace all blank values with dashes for easier comparison
+        if value == "" or value is None:
+            value = "-"
+        # Some values start with ", " which throws off the comparison -- overwrite it.
+        if value[:1] == ",":
+            value = value[1:]
+        # Some values end with "," which throws off the comparison -- overwrite it.
+        if value[len(value)-1] == ",":
+            value = value[:len(value)-1]
+        if fieldNormalization is not None:
+            value = fieldNormalization(value)
+        if roundsFrequency and value != "-":
+            value = str(round_sigfigs(float(value), 3))
+        # Strip leading and trailing whitespace
+        return value.strip()
+
+    if field not in MEMOIZED_COLUMNS:
+        return normalize
+
+    normalized = {}
+
+    def memoizedNormalize(value):
+        if value not in normalized:
+            if len(normalized) >= MEMOIZED_VALUES:
+                normalized.clear()
+            normalized[value] = normalize(value)
+        return normalized[value]
+    return memoizedNormalize
+
+
 class transformer(object):
     """
     Make the expected changes to update data from one version to another
     """
     _renamedColumns = {}
 
-    def __init__(self, oldColumns, newColumns):
+    def __init__(self, oldColumns, newColumns, unchangedColumns=()):
         (self._oldColumnsRemoved, self._newColumnsAdded,
          self._newColumnNameToOld) = self._mapColumnNames(oldColumns,
                                                           newColumns)
+        # new columns that aren't renamed old columns
+        self._addedColumns = set(self._newColumnsAdded) - set(self._renamedColumns.values())
+        # columns that compareRow doesn't compare: the ignored columns, and the columns known to have
+        # the same values in both releases (see unchangedColumns)
+        self._skippedColumns = COLUMNS_TO_IGNORE | frozenset(unchangedColumns)
+        self._normalizers = {}
+        self._listTokens = {}
 
     def _mapColumnNames(self, oldColumns, newColumns):
         """
@@ -129,8 +286,8 @@ class transformer(object):
             (added, removed) = determineDiffForPathogenicityAll(oldValues, newValues)
             return (added is None and removed is None)
         elif field in LIST_KEYS:
-            oldTokens = set([s.strip() for s in oldValues.split(",")])
-            newTokens = set([s.strip() for s in newValues.split(",")])
+            oldTokens = self._tokens(oldValues)
+            newTokens = self._tokens(newValues)
             numberSharedTokens = 0
             for token in oldTokens:
                 if token in newTokens:
@@ -140,68 +297,20 @@ class transformer(object):
                 listsAreConsistent = True
         return listsAreConsistent
 
+    def _tokens(self, values):
+        """The set of the elements of a comma-separated list"""
+        if values not in self._listTokens:
+            self._listTokens[values] = frozenset([s.strip() for s in values.split(",")])
+        return self._listTokens[values]
+
     def _normalize(self, value, field):
         """Make all values similar for improved comparison"""
+        return self._normalizer(field)(value)
 
-        # Replace all blank values with dashes for easier comparison
-        if value == "" or value is None:
-            value = "-"
-        # Some values start with ", " which throws off the comparison -- overwrite it.
-        if value[:1] == ",":
-            value = value[1:]
-        # Some values end with "," which throws off the comparison -- overwrite it.
-        if value[len(value)-1] == ",":
-            value = value[:len(value)-1]
-
-        if field == "Submitter_ClinVar":
-            # Nagging trailing underscore and other random disparities...
-            value = re.sub("Invitae_", "Invitae", value)
-            value = value.replace("The_Consortium_of_Investigators_of_Modifiers_of_BRCA1/2_(CIMBA)", "Consortium_of_Investigators_of_Modifiers_of_BRCA1/2_(CIMBA)")
-            value = value.replace("_c/o_University_of_Cambridge", "c/o_University_of_Cambridge")
-            value = value.replace("LabCorp", "Laboratory_Corporation_of_America")
-        elif field == "HGVS_Protein":
-            # overlook the following:
-            # - version numbers being provided in the new but not old accession
-            # - the addition of parentheses as delimiters
-            # - colons as delimiters before the 'p'
-            value = re.sub(".p.", ":p.",
-                           re.sub("$", ")",
-                                  re.sub("p.", "p.(",
-                                         re.sub("NM_000059", "NP_000050.2", value))))
-        elif field == "Reference_Sequence":
-            # Handle reference sequence is accessions
-            value = re.sub("NM_000059", "NM_000059.3",
-                           re.sub("NM_007294", "NM_007294.3", value))
-        elif field == "Allele_Frequency" and 'ExAC' in value:
-            # Ensure value is rounded to 3 sig figs
-            value_source_list = value.split(' ', 1)
-            val = value_source_list[0]
-            source_string = value_source_list[1]
-            val = str(round_sigfigs(float(val), 3))
-            value = val + ' ' + source_string
-            # (ExAC) was changed to (ExAC minus TCGA)
-            value = re.sub("\(ExAC\)", "(ExAC minus TCGA)", value)
-        elif field == "Sift_Prediction":
-            # for sift predictions, some data combines the
-            # numerical and categorical scores
-            value = re.sub("\(*$", "", value)
-        elif field == "Clinical_significance_citations_ENIGMA":
-            # In some data, empty fields are indicated by a single hyphen
-            value = re.sub("", "-", value)
-        elif field == "Date_last_evaluated_ENIGMA":
-            # Some dates had two-digit years. Some have four digits.
-            value = re.sub("/15$", "/2015", value)
-        elif field == "Pathogenicity_expert":
-            # Updated wording for non-expert-reviewed...
-            value = value.replace("Not Yet Classified", "Not Yet Reviewed")
-
-        if field in EXAC_AF_FIELDS and value != "-":
-            value = str(round_sigfigs(float(value), 3))
-
-        # Strip leading and trailing whitespace
-        value = value.strip()
-
-        return value
+    def _normalizer(self, field):
+        if field not in self._normalizers:
+            self._normalizers[field] = fieldNormalizer(field)
+        return self._normalizers[field]
 
     def compareField(self, oldRow, newRow, field):
         """
@@ -209,22 +318,24 @@ class transformer(object):
         the field is added, has cosmetic changes, has major changes, or
         is unchanged.
         """
-        global added_data
-        identifier = getIdentifier(newRow, reports)
-        if identifier is None:
-            pass
-        variant = newRow[identifier]
-        newValue = self._normalize(newRow[field], field)
-        if field in self._newColumnsAdded and field not in self._renamedColumns.values():
+        if field in self._addedColumns:
+            newValue = self._normalize(newRow[field], field)
             if newValue == "-":
                 # Ignore new columns with no data in diff
                 return "unchanged"
             else:
                 oldValue = "-"
-                appendToJSON(variant, field, oldValue, newValue)
+                appendToJSON(newRow[getIdentifier(newRow, reports)], field, oldValue, newValue)
                 return "added data: %s | %s" % (oldValue, newValue)
         else:
-            oldValue = self._normalize(oldRow[self._newColumnNameToOld[field]], field)
+            newValue = newRow[field]
+            oldValue = oldRow[self._newColumnNameToOld[field]]
+            # Most fields are unchanged between releases, and equal values normalize the same way
+            if oldValue == newValue:
+                return "unchanged"
+            normalize = self._normalizer(field)
+            newValue = normalize(newValue)
+            oldValue = normalize(oldValue)
             try:
                 # This handles special cases dealing with scientific notation and
                 # equivalent values with different representations (e.g. 0 == 0.0)
@@ -238,7 +349,8 @@ class transformer(object):
                 return "unchanged"
             elif self._consistentDelimitedLists(oldValue, newValue, field):
                 return "unchanged"
-            elif oldValue == "-" or oldValue in newValue:
+            variant = newRow[getIdentifier(newRow, reports)]
+            if oldValue == "-" or oldValue in newValue:
                 appendToJSON(variant, field, oldValue, newValue)
                 return "added data: %s | %s" % (oldValue, newValue)
             else:
@@ -255,14 +367,6 @@ class transformer(object):
         global total_variants_with_additions
         global total_variants_with_changes
 
-        # Uncomment if using old data schema (e.g. pre pyhgvs_Genomic_Coordinate_38)
-        columns_to_ignore = ["change_type", "Assertion_method_citation_ENIGMA", "Genomic_Coordinate_hg36",
-                             "Genomic_Coordinate_hg37", "Genomic_Coordinate_hg38", "HGVS_cDNA", "HGVS_Protein",
-                             "Hg37_Start", "Hg37_End", "Hg36_Start", "Hg36_End", "BX_ID_ENIGMA", "BX_ID_ClinVar",
-                             "BX_ID_BIC", "BX_ID_ExAC", "BX_ID_LOVD", "BX_ID_exLOVD", "BX_ID_1000_Genomes", "BX_ID_ESP",
-                             "Polyphen_Prediction", "Polyphen_Score", "Minor_allele_frequency_ESP", "Max_Allele_Frequency",
-                             "mupit_structure"]
-
         # Header to group all logs the same variant
         variant_intro = "\n\n %s \n Old Source: %s \n New Source: %s \n\n" % (newRow[getIdentifier(newRow, isReport)],
                                                                               oldRow["Source"], newRow["Source"])
@@ -272,22 +376,24 @@ class transformer(object):
         changed_classification = False
 
         for field in newRow.keys():
-            if field not in columns_to_ignore:
+            if field not in self._skippedColumns:
                 result = self.compareField(oldRow, newRow, field)
-                if re.search("major change", result):
-                    result = re.sub("major change: ", "", result)
+                if result == "unchanged":
+                    continue
+                if "major change" in result:
+                    result = result.replace("major change: ", "")
                     changeset += "%s: %s \n" % (field, result)
                     if field == CLASSIFICATION_FIELD:
                         changed_classification = True
-                if re.search("added data", result):
-                    result = re.sub("added data: ", "", result)
+                if "added data" in result:
+                    result = result.replace("added data: ", "")
                     added_data_str += "%s: %s \n" % (field, result)
                     if field == CLASSIFICATION_FIELD:
                         changed_classification = True
 
         # If a field is no longer present in the new data, make sure to include it in the diff
         for field in oldRow.keys():
-            if field not in columns_to_ignore and field not in newRow.keys():
+            if field not in COLUMNS_TO_IGNORE and field not in newRow:
                 identifier = getIdentifier(newRow, reports)
                 if identifier is None:
                     pass
@@ -341,33 +447,30 @@ class v1ToV2(transformer):
 
 def appendVariantChangeTypesToOutput(variantChangeTypes, v2, output):
     # This function copies v2 into the output file with an appended change_type column and
-    # appropriate change_type values for each variant.
+    # appropriate change_type values for each variant. variantChangeTypes yields (line number,
+    # change type) for the rows of v2 in file order, rows without one get a None change type.
     with open(v2, 'r') as f_in:
         with open(output, 'w') as f_out:
             writer = csv.writer(f_out, delimiter='\t')
             reader = csv.reader(f_in, delimiter='\t')
 
-            # save rows of data for final output
-            result = []
-
             # add change_type to the header
             headerRow = next(reader)
             headerRow.append('change_type')
-            result.append(headerRow)
+            writer.writerow(headerRow)
 
             # add change types for individual variants
+            changeType = next(variantChangeTypes, None)
             for row in reader:
-                identifier = getIdentifier(row, reports)
-                if identifier is None:
+                while changeType is not None and changeType[0] < reader.line_num:
+                    changeType = next(variantChangeTypes, None)
+                if changeType is not None and changeType[0] == reader.line_num:
+                    row.append(changeType[1])
+                else:
                     # default to None changetype for reports whose diff we don't care about
                     row.append(None)
-                else:
-                    identifierIndex = headerRow.index(identifier)
-                    row.append(variantChangeTypes[row[identifierIndex]])
                 logging.debug('variant with change type: %s', row)
-                result.append(row)
-
-            writer.writerows(result)
+                writer.writerow(row)
 
 
 def appendToJSON(variant, field, oldValue, newValue):
@@ -526,9 +629,26 @@ def checkPathogenicityAllDiffBySource(source, oldValuesBySource, newValuesBySour
     return (classificationAdded, classificationRemoved)
 
 
-def generateDiffJSONFile(diff_json, diff_json_file):
-    with open(diff_json_file, 'w') as outfile:
-        json.dump(diff_json, outfile)
+class diffJSONWriter(object):
+    """
+    Writes the diff JSON one variant at a time, the way json.dump writes the diff_json dict
+    """
+
+    def __init__(self, diff_json_file):
+        self._outfile = open(diff_json_file, 'w')
+        self._outfile.write("{")
+        self._separator = ""
+
+    def write(self, variant, diffs):
+        self.writeEncoded(variant, json.dumps(diffs))
+
+    def writeEncoded(self, variant, diffs):
+        self._outfile.write("%s%s: %s" % (self._separator, json.dumps(variant), diffs))
+        self._separator = ", "
+
+    def close(self):
+        self._outfile.write("}")
+        self._outfile.close()
 
 
 def generateReadme(args):
@@ -594,6 +714,304 @@ def getIdentifier(obj, isReport):
         return "pyhgvs_Genomic_Coordinate_38"
 
 
+def sortedRows(rows, chunkSize=SORT_CHUNK_SIZE):
+    """
+    Yield the items of rows in sorted order. Up to chunkSize items are sorted in memory, larger
+    inputs are sorted in chunks that are written to temporary files and merged
+    """
+    chunk = sorted(itertools.islice(rows, chunkSize))
+    if len(chunk) < chunkSize:
+        for item in chunk:
+            yield item
+        return
+    chunkFiles = []
+    try:
+        while chunk:
+            chunkFile = tempfile.TemporaryFile()
+            for item in chunk:
+                marshal.dump(item, chunkFile)
+            chunkFile.seek(0)
+            chunkFiles.append(chunkFile)
+            chunk = sorted(itertools.islice(rows, chunkSize))
+        for item in heapq.merge(*[readSortedChunk(chunkFile) for chunkFile in chunkFiles]):
+            yield item
+    finally:
+        for chunkFile in chunkFiles:
+            chunkFile.close()
+
+
+def readSortedChunk(chunkFile):
+    while True:
+        try:
+            yield marshal.load(chunkFile)
+        except EOFError:
+            return
+
+
+def rowDict(fieldnames, row, isReport):
+    """
+    The row as csv.DictReader returns it, prepared for the diff
+    """
+    fields = dict(zip(fieldnames, row))
+    if len(fieldnames) < len(row):
+        fields[None] = row[len(fieldnames):]
+    else:
+        for field in fieldnames[len(row):]:
+            fields[field] = None
+    if not isReport:
+        fields = addGsIfNecessary(fields)
+    return fields
+
+
+def keyedRows(f, isOld, isReport):
+    """
+    Yield (variant key, line number, row) for the rows of a release that take part in the diff,
+    where row is the list of the row's fields. Rows are read like csv.DictReader reads them, but
+    kept as lists so that they can be sorted in temporary files and made into dictionaries with
+    the same field order again
+    """
+    reader = csv.reader(f, delimiter="\t")
+    fieldnames = next(reader)
+    for row in reader:
+        if row == []:
+            continue
+        fields = rowDict(fieldnames, row, isReport)
+        identifier = getIdentifier(fields, isReport)
+        # if a new identifier is assigned, this will skip over old data that don't have the property
+        if identifier is None or (isReport and isOld and not hasattr(fields, identifier)):
+            continue
+        yield fields[identifier], reader.line_num, row
+
+
+def mergeJoin(oldRows, newRows):
+    """
+    Yield (variant key, old rows, new rows) for every key of two sorted streams of (key, line number,
+    row), in key order. Either list of rows is empty if the key is only in the other release
+    """
+    oldGroups = itertools.groupby(oldRows, operator.itemgetter(0))
+    newGroups = itertools.groupby(newRows, operator.itemgetter(0))
+    oldKey, oldGroup = next(oldGroups, (None, None))
+    newKey, newGroup = next(newGroups, (None, None))
+    while oldGroup is not None or newGroup is not None:
+        if newGroup is None or (oldGroup is not None and oldKey < newKey):
+            yield oldKey, list(oldGroup), []
+            oldKey, oldGroup = next(oldGroups, (None, None))
+        elif oldGroup is None or newKey < oldKey:
+            yield newKey, [], list(newGroup)
+            newKey, newGroup = next(newGroups, (None, None))
+        else:
+            yield newKey, list(oldGroup), list(newGroup)
+            oldKey, oldGroup = next(oldGroups, (None, None))
+            newKey, newGroup = next(newGroups, (None, None))
+
+
+def variantDiffs(v1Rows, v2Rows, v1Fieldnames, v2Fieldnames, chunkSize=SORT_CHUNK_SIZE, unchangedColumns=()):
+    """
+    Diff two releases given as streams of (variant key, line number, row), see keyedRows. Yields a
+    record for every variant, in variant key order: (variant key, removed row, added row, change type,
+    line numbers in v2, diff text, added data text, diff JSON, log messages). The rows are None unless
+    the variant was removed or added, the line numbers are those of the variant's rows in v2, the diff
+    JSON is None or encoded, and log messages are only kept by diff workers (see initDiffWorker).
+    The columns in unchangedColumns aren't compared
+    """
+    global added_data
+    global diff
+    global diff_json
+
+    added_data = cStringIO.StringIO()
+    diff = cStringIO.StringIO()
+    diff_json = {}
+    v1v2 = v1ToV2(v1Fieldnames, v2Fieldnames, unchangedColumns)
+
+    # As with a dictionary of the rows by variant key, the last row of a variant is compared,
+    # and all of its rows get its change type
+    for variant, oldRows, newRows in mergeJoin(sortedRows(v1Rows, chunkSize), sortedRows(v2Rows, chunkSize)):
+        removedRow = addedRow = change_type = diffs = None
+        if not newRows:
+            removedRow = oldRows[-1][2]
+        elif not oldRows:
+            change_type = CHANGE_TYPES['ADDED']
+            addedRow = newRows[-1][2]
+        else:
+            logging.debug('Finding change type...')
+            change_type = v1v2.compareRow(rowDict(v1Fieldnames, oldRows[-1][2], reports),
+                                          rowDict(v2Fieldnames, newRows[-1][2], reports), reports)
+            logging.debug("newV: %s change_type: %s", variant, change_type)
+            if variant in diff_json:
+                diffs = json.dumps(diff_json.pop(variant))
+        yield (variant, removedRow, addedRow, change_type, [lineNumber for key, lineNumber, row in newRows],
+               drain(diff), drain(added_data), diffs, logBuffer.drain() if logBuffer is not None else [])
+
+
+def drain(f):
+    """The text written to a StringIO, which is emptied"""
+    text = f.getvalue()
+    if text:
+        f.seek(0)
+        f.truncate()
+    return text
+
+
+class logRecordBuffer(logging.Handler):
+    """
+    Keeps the level and message of the records logged by a diff worker, so that the main process logs
+    them in variant order
+    """
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.levelno, record.getMessage()))
+
+    def drain(self):
+        records = self.records
+        self.records = []
+        return records
+
+
+def initDiffWorker(isReport):
+    global logBuffer
+    global reports
+
+    reports = isReport
+    # the log file is written by the main process only
+    logBuffer = logRecordBuffer()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logBuffer)
+
+
+def diffPartition(v1Partition, v2Partition, resultFile, v1Fieldnames, v2Fieldnames, chunkSize, unchangedColumns):
+    """
+    Diff the variants of one partition of the releases in a diff worker and write their records to
+    resultFile. Returns the number of variants with changes and with additions
+    """
+    global total_variants_with_changes
+    global total_variants_with_additions
+
+    changes, additions = total_variants_with_changes, total_variants_with_additions
+    with open(v1Partition, "rb") as v1In, open(v2Partition, "rb") as v2In, open(resultFile, "wb") as out:
+        for record in variantDiffs(readSortedChunk(v1In), readSortedChunk(v2In), v1Fieldnames, v2Fieldnames,
+                                   chunkSize, unchangedColumns):
+            marshal.dump(record, out)
+    return total_variants_with_changes - changes, total_variants_with_additions - additions
+
+
+def partitionedVariantDiffs(v1In, v2In, v1Fieldnames, v2Fieldnames, chunkSize, workers, unchangedColumns=()):
+    """
+    Yield the records of variantDiffs for two releases that are diffed by a pool of worker processes.
+    The variant keys are hash partitioned, every worker sorts and diffs one partition of both releases,
+    and the records of the partitions are merged in variant key order
+    """
+    global total_variants_with_changes
+    global total_variants_with_additions
+
+    partitionDir = tempfile.mkdtemp()
+    pool = None
+    try:
+        partitions = []
+        for release, f, isOld in [("v1", v1In, True), ("v2", v2In, False)]:
+            paths = [os.path.join(partitionDir, "%s_%d" % (release, i)) for i in xrange(workers)]
+            outs = [open(path, "wb") for path in paths]
+            for item in keyedRows(f, isOld, reports):
+                marshal.dump(item, outs[hash(item[0]) % workers])
+            for out in outs:
+                out.close()
+            partitions.append(paths)
+        resultFiles = [os.path.join(partitionDir, "result_%d" % (i)) for i in xrange(workers)]
+
+        pool = multiprocessing.Pool(workers, initDiffWorker, (reports,))
+        counts = [pool.apply_async(diffPartition, (v1Partition, v2Partition, resultFile, v1Fieldnames,
+                                                   v2Fieldnames, chunkSize, unchangedColumns))
+                  for v1Partition, v2Partition, resultFile in zip(partitions[0], partitions[1], resultFiles)]
+        for changes, additions in [count.get() for count in counts]:
+            total_variants_with_changes += changes
+            total_variants_with_additions += additions
+        pool.close()
+
+        results = [open(resultFile, "rb") for resultFile in resultFiles]
+        try:
+            # variant keys are unique across partitions, so records are only compared by key
+            for record in heapq.merge(*[readSortedChunk(result) for result in results]):
+                yield record
+        finally:
+            for result in results:
+                result.close()
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        shutil.rmtree(partitionDir)
+
+
+def unchangedReleaseColumns(v1Columns, v2Columns):
+    """
+    The columns of v2 that have the same value as in v1 for every variant of both releases, given the
+    release tables of the releases (see data_merging/release_table.py)
+    """
+    with release_table.ReleaseTable(v1Columns) as v1Table, release_table.ReleaseTable(v2Columns) as v2Table:
+        return frozenset(v2Table.column_names) - frozenset(release_table.changed_columns(v1Table, v2Table))
+
+
+def diffReleases(v1, v2, removedFile, addedFile, addedDataFile, diffFile, diffJsonFile, outputFile,
+                 chunkSize=SORT_CHUNK_SIZE, workers=1, unchangedColumns=()):
+    """
+    Diff two releases and write the outputs. Both releases are sorted by variant key (in temporary
+    files if they're large) and merge joined, and the diff outputs are written as the variants are
+    compared, in variant key order. With more than one worker, the variants are diffed by a pool of
+    worker processes (see partitionedVariantDiffs), the outputs are the same. The columns in
+    unchangedColumns have the same values in both releases and aren't compared.
+    """
+    v1In = open(v1, "r")
+    v2In = open(v2, "r")
+    v1Fieldnames = next(csv.reader(v1In, delimiter="\t"))
+    v2Fieldnames = next(csv.reader(v2In, delimiter="\t"))
+    v1In.seek(0)
+    v2In.seek(0)
+    removedOut = open(removedFile, "w")
+    removed = csv.DictWriter(removedOut, delimiter="\t", fieldnames=v1Fieldnames)
+    removed.writeheader()
+    addedOut = open(addedFile, "w")
+    added = csv.DictWriter(addedOut, delimiter="\t", fieldnames=v2Fieldnames)
+    added.writeheader()
+    addedDataOut = open(addedDataFile, "w")
+    diffOut = open(diffFile, "w")
+    diffJSON = diffJSONWriter(diffJsonFile)
+
+    if workers > 1:
+        records = partitionedVariantDiffs(v1In, v2In, v1Fieldnames, v2Fieldnames, chunkSize, workers,
+                                          unchangedColumns)
+    else:
+        records = variantDiffs(keyedRows(v1In, True, reports), keyedRows(v2In, False, reports),
+                               v1Fieldnames, v2Fieldnames, chunkSize, unchangedColumns)
+
+    def variantChangeTypes():
+        for variant, removedRow, addedRow, change_type, lineNumbers, diffText, addedDataText, diffs, log in records:
+            for level, message in log:
+                logging.log(level, "%s", message)
+            if removedRow is not None:
+                removed.writerow(rowDict(v1Fieldnames, removedRow, reports))
+            if addedRow is not None:
+                added.writerow(rowDict(v2Fieldnames, addedRow, reports))
+            diffOut.write(diffText)
+            addedDataOut.write(addedDataText)
+            if diffs is not None:
+                diffJSON.writeEncoded(variant, diffs)
+            for lineNumber in lineNumbers:
+                yield lineNumber, change_type
+
+    # Adds change_type column and values for each variant in v2 to the output, the change types
+    # are sorted back into the order of v2
+    appendVariantChangeTypesToOutput(sortedRows(variantChangeTypes(), chunkSize), v2, outputFile)
+
+    diffJSON.close()
+    for f in [v1In, v2In, removedOut, addedOut, addedDataOut, diffOut]:
+        f.close()
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--v2", default="built.tsv",
@@ -617,6 +1035,11 @@ def main():
     parser.add_argument("--diff_dir", help='Diff directory with outputs from this file.')
     parser.add_argument("--reports", help='True means the diff is run across reports instead of variants.',
                         default="False")
+    parser.add_argument('-w', "--workers", type=int, default=0,
+                        help='Number of processes diffing the variants (default: number of cpus).')
+    parser.add_argument("--v1_columns", help='Release table of version 1 of the data (see release_table.py).')
+    parser.add_argument("--v2_columns", help='Release table of version 2 of the data, with --v1_columns the '
+                                             'columns with the same values in both versions are not compared.')
 
     args = parser.parse_args()
 
@@ -627,72 +1050,19 @@ def main():
 
     logging.basicConfig(filename=logFile, filemode="w", level=logging.DEBUG)
 
-    v1In = csv.DictReader(open(args.v1, "r"), delimiter="\t")
-    v2In = csv.DictReader(open(args.v2, "r"), delimiter="\t")
-    removed = csv.DictWriter(open(args.removed, "w"), delimiter="\t",
-                             fieldnames=v1In.fieldnames)
-    removed.writeheader()
-    added = csv.DictWriter(open(args.added, "w"), delimiter="\t",
-                           fieldnames=v2In.fieldnames)
-    added.writeheader()
-    global added_data
-    added_data = open(args.added_data, "w")
-    global diff
-    diff = open(args.diff, "w")
     global reports
     if args.reports.lower() in ('yes', 'true', 't', 'y', '1'):
         reports = True
     else:
         reports = False
 
-    # Keep track of change types for all variants to append to final output file
-    variantChangeTypes = {}
-
-    v1v2 = v1ToV2(v1In.fieldnames, v2In.fieldnames)
-
-    # Save the old variants in a dictionary for which the pyhgvs_genomic_coordinate_38
-    # string is the key, and for which the value is the full row.
-    oldData = {}
-    newData = {}
-    if reports is True:
-        # handle reports
-        for oldRow in v1In:
-            identifier = getIdentifier(oldRow, reports)
-            # if a new identifier is assigned, this will skip over old data that don't have the property
-            if identifier is not None and hasattr(oldRow, identifier):
-                oldData[oldRow[identifier]] = oldRow
-        for newRow in v2In:
-            identifier = getIdentifier(newRow, reports)
-            if identifier is not None:
-                newData[newRow[identifier]] = newRow
-    else:
-        # handle variants
-        for oldRow in v1In:
-            oldRow = addGsIfNecessary(oldRow)
-            oldData[oldRow[getIdentifier(oldRow, reports)]] = oldRow
-        for newRow in v2In:
-            newRow = addGsIfNecessary(newRow)
-            newData[newRow[getIdentifier(newRow, reports)]] = newRow
-
-    for oldVariant in oldData.keys():
-        if not newData.has_key(oldVariant):
-            removed.writerow(oldData[oldVariant])
-
-    for newVariant in newData.keys():
-        if not oldData.has_key(newVariant):
-            variantChangeTypes[newVariant] = CHANGE_TYPES['ADDED']
-            added.writerow(newData[newVariant])
-        else:
-            logging.debug('Finding change type...')
-            change_type = v1v2.compareRow(oldData[newVariant], newData[newVariant], reports)
-            logging.debug("newV: %s change_type: %s", newVariant, change_type)
-            assert(newVariant not in variantChangeTypes)
-            variantChangeTypes[newVariant] = change_type
-
-    # Adds change_type column and values for each variant in v2 to the output
-    appendVariantChangeTypesToOutput(variantChangeTypes, args.v2, args.output)
+    unchanged = frozenset()
+    if args.v1_columns and args.v2_columns and not reports:
+        unchanged = unchangedReleaseColumns(args.v1_columns, args.v2_columns)
+        logging.info("Columns with the same values in both versions, not compared: %s", ", ".join(sorted(unchanged)))
 
-    generateDiffJSONFile(diff_json, args.diff_json)
+    diffReleases(args.v1, args.v2, args.removed, args.added, args.added_data, args.diff, args.diff_json,
+                 args.output, workers=args.workers or multiprocessing.cpu_count(), unchangedColumns=unchanged)
 
     generateReadme(args)
 
@@ -2,8 +2,11 @@ import pytest
 import unittest
 import tempfile
 import csv
+import json
 import releaseDiff
+import release_table
 import copy
+import mock
 from os import path
 
 
@@ -796,6 +799,112 @@ class TestStringMethods(unittest.TestCase):
         identifier = releaseDiff.getIdentifier(self.newRow, False)
         self.assertEqual(identifier, "pyhgvs_Genomic_Coordinate_38")
 
+    def test_diff_releases(self):
+        fieldnames = sorted(set(self.fieldnames))
+
+        def variant(position, **values):
+            row = dict(self.oldRow, **values)
+            for field in releaseDiff.PYHGVS_GENOMIC_COORDINATE_FIELDS:
+                row[field] = 'chr17:g.%d:C>T' % (position)
+            return row
+
+        def write(name, rows):
+            with open(path.join(self.test_dir, name), 'w') as f:
+                writer = csv.DictWriter(f, delimiter="\t", fieldnames=fieldnames, restval='-')
+                writer.writeheader()
+                writer.writerows(rows)
+            return path.join(self.test_dir, name)
+
+        noGs = dict((field, 'chr17:43049004:C>T') for field in releaseDiff.PYHGVS_GENOMIC_COORDINATE_FIELDS)
+        v1 = write('v1.tsv', [variant(43049003), variant(43049001), variant(43049002), variant(43049004, **noGs)])
+        v2 = write('v2.tsv', [variant(43049001, Source='LOVD,1000_Genomes,ENIGMA'), variant(43049003),
+                              variant(43049005), variant(43049004), variant(43049003)])
+
+        outputs = {}
+        # the releases are sorted in memory, or in temporary files two rows at a time, and diffed
+        # in this process or by worker processes
+        for chunkSize, workers in [(releaseDiff.SORT_CHUNK_SIZE, 1), (2, 1), (releaseDiff.SORT_CHUNK_SIZE, 3), (2, 2)]:
+            names = ['removed.tsv', 'added.tsv', 'added_data.tsv', 'diff.txt', 'diff.json', 'output.tsv']
+            paths = [path.join(self.test_dir, '%d_%d_%s' % (chunkSize, workers, name)) for name in names]
+            releaseDiff.diffReleases(v1, v2, *paths, chunkSize=chunkSize, workers=workers)
+            outputs[(chunkSize, workers)] = [open(output).read() for output in paths]
+        for options in [(2, 1), (releaseDiff.SORT_CHUNK_SIZE, 3), (2, 2)]:
+            self.assertEqual(outputs[options], outputs[(releaseDiff.SORT_CHUNK_SIZE, 1)])
+
+        removed, added, added_data, diff, diff_json, output = outputs[(2, 2)]
+        self.assertEqual([row['pyhgvs_Genomic_Coordinate_38'] for row in csv.DictReader(removed.splitlines(), delimiter="\t")],
+                         ['chr17:g.43049002:C>T'])
+        self.assertEqual([row['pyhgvs_Genomic_Coordinate_38'] for row in csv.DictReader(added.splitlines(), delimiter="\t")],
+                         ['chr17:g.43049005:C>T'])
+        self.assertEqual(diff, '')
+        self.assertIn('Source: LOVD,1000_Genomes | LOVD,1000_Genomes,ENIGMA', added_data)
+        self.assertEqual(json.loads(diff_json).keys(), ['chr17:g.43049001:C>T'])
+        # change types are in the order of v2, duplicate variants get the same change type
+        self.assertEqual([row['change_type'] for row in csv.DictReader(output.splitlines(), delimiter="\t")],
+                         ['added_information', '', 'new', '', ''])
+
+    def test_diff_releases_skips_unchanged_columns(self):
+        fieldnames = sorted(set(self.fieldnames))
+
+        def variant(position, **values):
+            row = dict(self.oldRow, **values)
+            for field in releaseDiff.PYHGVS_GENOMIC_COORDINATE_FIELDS:
+                row[field] = 'chr17:g.%d:C>T' % (position)
+            return row
+
+        def write(name, rows):
+            with open(path.join(self.test_dir, name + '.tsv'), 'w') as f:
+                writer = csv.DictWriter(f, delimiter="\t", fieldnames=fieldnames, restval='-')
+                writer.writeheader()
+                writer.writerows(rows)
+            release_table.write_release_table(path.join(self.test_dir, name + '.tsv'),
+                                              path.join(self.test_dir, name + '.columns'))
+            return path.join(self.test_dir, name + '.tsv'), path.join(self.test_dir, name + '.columns')
+
+        v1, v1Columns = write('v1', [variant(43049003), variant(43049001), variant(43049002)])
+        v2, v2Columns = write('v2', [variant(43049001, Source='LOVD,1000_Genomes,ENIGMA'), variant(43049003),
+                                     variant(43049005, Submitter_ClinVar='GeneDx')])
+
+        # the variant added to v2 doesn't make Submitter_ClinVar a changed column
+        unchanged = releaseDiff.unchangedReleaseColumns(v1Columns, v2Columns)
+        self.assertIn('Submitter_ClinVar', unchanged)
+        self.assertNotIn('Source', unchanged)
+        self.assertEqual(unchanged, frozenset(fieldnames) - frozenset(['Source']))
+
+        outputs = []
+        for columns in [(), unchanged]:
+            names = ['removed.tsv', 'added.tsv', 'added_data.tsv', 'diff.txt', 'diff.json', 'output.tsv']
+            paths = [path.join(self.test_dir, '%d_%s' % (len(columns), name)) for name in names]
+            releaseDiff.diffReleases(v1, v2, *paths, unchangedColumns=columns)
+            outputs.append([open(output).read() for output in paths])
+        self.assertEqual(outputs[1], outputs[0])
+
+        # columns given as unchanged aren't compared
+        with mock.patch.object(releaseDiff.v1ToV2, 'compareField', return_value='unchanged') as compareField:
+            v1v2 = releaseDiff.v1ToV2(fieldnames, fieldnames, unchanged)
+            self.assertEqual(v1v2.compareRow(variant(43049001), variant(43049001), False), None)
+            self.assertEqual([call[0][2] for call in compareField.call_args_list], ['Source'])
+
+    def test_memoized_normalizer_is_bounded(self):
+        calls = []
+
+        def normalization(value):
+            calls.append(value)
+            return value.upper()
+
+        values = ["lab_%d" % (i % 5) for i in xrange(20)]
+        with mock.patch.dict(releaseDiff.FIELD_NORMALIZERS, {"Submitter_ClinVar": normalization}):
+            normalize = releaseDiff.fieldNormalizer("Submitter_ClinVar")
+            self.assertEqual([normalize(value) for value in values], [value.upper() for value in values])
+            self.assertEqual(len(calls), 5)
+
+            # a column with more distinct values than the memo holds is still normalized correctly
+            del calls[:]
+            with mock.patch.object(releaseDiff, "MEMOIZED_VALUES", 3):
+                normalize = releaseDiff.fieldNormalizer("Submitter_ClinVar")
+                self.assertEqual([normalize(value) for value in values], [value.upper() for value in values])
+            self.assertEqual(len(calls), 20)
+
 
 if __name__ == '__main__':
     unittest.main()
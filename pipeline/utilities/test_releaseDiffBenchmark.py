@@ -0,0 +1,109 @@
+'''
+Benchmark for comparing the variants of two releases with releaseDiff
+
+The fixture is a pair of synthetic releases of 30000 variants with the columns of a release; about
+one in ten variants has a list column reordered or extended in the new release, the rest are
+unchanged, as between real releases. The benchmark times v1ToV2.compareRow over all the pairs.
+'''
+
+import random
+import StringIO
+import pytest
+pytest.importorskip("pytest_benchmark")
+import releaseDiff
+
+VARIANTS = 30000
+
+SUBMITTERS = ["Invitae", "Ambry_Genetics", "GeneDx", "Laboratory_Corporation_of_America",
+              "Consortium_of_Investigators_of_Modifiers_of_BRCA1/2_(CIMBA),c/o_University_of_Cambridge",
+              "Breast_Cancer_Information_Core_(BIC)_(BRCA1)", "Counsyl", "Quest_Diagnostics_Nichols_Institute"]
+
+
+def variant(random, position):
+    submitters = random.sample(SUBMITTERS, random.randint(1, 4))
+    row = {
+        "Source": ",".join(random.sample(["ClinVar", "LOVD", "BIC", "ENIGMA", "ExAC", "1000_Genomes"], 3)),
+        "Gene_Symbol": random.choice(["BRCA1", "BRCA2"]),
+        "Reference_Sequence": random.choice(["NM_007294.3", "NM_000059.3"]),
+        "HGVS_cDNA": "c.%d%s>%s" % (position % 10000, random.choice("ACGT"), random.choice("ACGT")),
+        "HGVS_Protein": "NP_009225.1:p.(Lys%dGlu)" % (position % 1800),
+        "Protein_Change": "p.(Lys%dGlu)" % (position % 1800),
+        "Pathogenicity_expert": random.choice(["Not Yet Reviewed", "Benign / Little Clinical Significance",
+                                               "Pathogenic"]),
+        "Pathogenicity_all": random.choice(["Benign(ClinVar)", "Pathogenic,not_provided (ClinVar); Class 5 (BIC)",
+                                            "Uncertain_significance,Likely_benign (ClinVar)"]),
+        "Clinical_Significance_ClinVar": ",".join(random.choice(["Benign", "Pathogenic", "Uncertain_significance"])
+                                                  for submitter in submitters),
+        "Submitter_ClinVar": ",".join(submitters),
+        "Method_ClinVar": ",".join(random.choice(["clinical_testing", "literature_only", "curation"])
+                                   for submitter in submitters),
+        "Date_Last_Updated_ClinVar": ",".join("2017-0%d-01" % (random.randint(1, 9)) for submitter in submitters),
+        "SCV_ClinVar": ",".join("SCV%09d" % (random.randint(0, 10 ** 6)) for submitter in submitters),
+        "Allele_Origin_ClinVar": ",".join("germline" for submitter in submitters),
+        "Source_URL": ", ".join("http://www.ncbi.nlm.nih.gov/clinvar/?term=SCV%09d" % (random.randint(0, 10 ** 6))
+                                for submitter in submitters),
+        "Synonyms": ",".join("%d%s>%s" % (random.randint(1, 10000), random.choice("ACGT"), random.choice("ACGT"))
+                             for i in xrange(random.randint(0, 4))),
+        "Allele_frequency_ExAC": random.choice(["-", "9.841E-06", "0.0001234", "8.236e-06"]),
+        "Allele_frequency_NFE_ExAC": random.choice(["-", "1.499E-05", "0"]),
+        "Allele_Frequency": random.choice(["-", "0.0001234 (ExAC minus TCGA)", "0.0002 (1000 Genomes)"]),
+        "Sift_Prediction": random.choice(["-", "deleterious", "tolerated"]),
+        "Date_last_evaluated_ENIGMA": random.choice(["-", "10/15/2015", "01/12/2015"]),
+        "Variant_effect_LOVD": random.choice(["-", "+/+", "-/?", "?/?"]),
+        "BX_ID_ClinVar": str(position),
+        "change_type": "none",
+    }
+    for field in releaseDiff.PYHGVS_GENOMIC_COORDINATE_FIELDS:
+        row[field] = "chr17:g.%d:A>G" % (position)
+    return row
+
+
+def changed(random, row):
+    row = dict(row)
+    if random.random() < 0.1:
+        field = random.choice(["Submitter_ClinVar", "Source", "Method_ClinVar", "Synonyms"])
+        values = row[field].split(",")
+        random.shuffle(values)
+        row[field] = ",".join(values + random.choice([[], ["Extra_value"]]))
+    return row
+
+
+@pytest.fixture(scope="module")
+def releases():
+    rand = random.Random(45)
+    oldRows = [variant(rand, 43000000 + i) for i in xrange(VARIANTS)]
+    return [(oldRow, changed(rand, oldRow)) for oldRow in oldRows]
+
+
+def addedValues(oldRow, newRow):
+    """The list fields of newRow that have a value oldRow doesn't have"""
+    return [field for field in sorted(newRow) if set(newRow[field].split(",")) - set(oldRow[field].split(","))]
+
+
+def test_benchmarkCompareRows(benchmark, releases):
+    releaseDiff.added_data = StringIO.StringIO()
+    releaseDiff.diff = StringIO.StringIO()
+    fieldnames = sorted(releases[0][0])
+    benchmark.extra_info["variants"] = len(releases)
+
+    def compareRows():
+        releaseDiff.diff_json = {}
+        v1v2 = releaseDiff.v1ToV2(fieldnames, fieldnames)
+        return [v1v2.compareRow(oldRow, newRow, False) for oldRow, newRow in releases]
+
+    changeTypes = benchmark.pedantic(compareRows, rounds=5)
+    assert len(changeTypes) == VARIANTS
+    assert changeTypes.count(None) > 0.8 * VARIANTS
+    # reordered lists are unchanged, the extended ones are reported with the added value (an empty list
+    # is normalized to "-", which is reported as removed)
+    expected = {}
+    for (oldRow, newRow), changeType in zip(releases, changeTypes):
+        fields = addedValues(oldRow, newRow)
+        if fields:
+            assert changeType in ["added_information", "changed_information"]
+            expected[newRow["pyhgvs_Genomic_Coordinate_38"]] = [
+                {"field": field, "field_type": "list", "added": ["Extra_value"],
+                 "removed": ["-"] if oldRow[field] == "" else None} for field in fields]
+        else:
+            assert changeType is None
+    assert releaseDiff.diff_json == expected